@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+
+"""
+容量・コストの見積もりパッケージ
+
+このパッケージは、`cdk synth`で合成したテンプレート（cdk.out）を読み込み、スタックが提供する
+vCPU数・メモリ量、EBSの容量・IOPS・スループット、NATゲートウェイ・VPCエンドポイントの数と、
+同梱の価格表による月額費用の見積もりを表示します。AWSのAPIは呼び出しません。
+サイジングの異なる2つの構成を比較して、変更による容量・費用の差分を確認できます。
+
+使用例:
+    SIZING_PROFILE=small cdk synth -o cdk.out.small
+    SIZING_PROFILE=medium cdk synth -o cdk.out.medium
+    python -m capacity report cdk.out.small
+    python -m capacity diff cdk.out.small cdk.out.medium
+"""
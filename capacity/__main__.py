@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+"""
+容量・コストの見積もりのコマンドラインインターフェース
+
+サブコマンド:
+    report: 合成済みのスタックの容量・月額費用を表示する
+    diff: 2つのスタックの容量・月額費用を比較する（費用の増加が上限を超えた場合は終了コード1）
+"""
+
+import argparse
+import json
+import sys
+from typing import Optional
+
+from capacity.estimate import METRICS, CapacityEstimator, CapacityReport, compare_reports, load_prices
+from capacity.template import load_stack
+
+
+def report(args: argparse.Namespace) -> int:
+    """
+    合成済みのスタックの容量・月額費用を表示する
+
+    Args:
+        args: コマンドライン引数
+
+    Returns:
+        終了コード
+    """
+    prices = load_prices(args.prices)
+    estimate = CapacityEstimator(prices).estimate(load_stack(args.path, args.stack))
+    if args.json:
+        print(json.dumps(estimate.to_dict(), indent=2, ensure_ascii=False))
+        return 0
+
+    print_prices(prices)
+    print(f"Stack: {estimate.name} ({estimate.region or 'region-agnostic'})\n")
+    print(f"{'category':<19} {'resource':<38} {'detail':<44} {'count':>6} {'vCPU':>6} {'mem GiB':>8} {'USD/month':>17}")
+    for component in estimate.components:
+        cost = _range(
+            component.monthly_cost(component.min_count), component.monthly_cost(component.max_count), _cost
+        ) if component.priced else "unpriced"
+        print(f"{component.category:<19} {component.resource[:38]:<38} {component.detail[:44]:<44} "
+              f"{_range(component.min_count, component.max_count, _number):>6} "
+              f"{_number(component.vcpus):>6} {_number(component.memory):>8} {cost:>17}")
+
+    print(f"\n{'total':<22} {'min':>12} {'max':>12}")
+    for key, label in METRICS:
+        low, high = estimate.totals()[key]
+        fmt = _cost if key == "monthly_cost" else _number
+        print(f"{label:<22} {fmt(low):>12} {fmt(high):>12}")
+    print_notes(estimate, estimate.name)
+    return 0
+
+
+def diff(args: argparse.Namespace) -> int:
+    """
+    2つのスタックの容量・月額費用を比較する
+
+    Args:
+        args: コマンドライン引数
+
+    Returns:
+        終了コード（最小構成の月額費用の増加が上限を超えた場合は1）
+    """
+    prices = load_prices(args.prices)
+    estimator = CapacityEstimator(prices)
+    baseline = estimator.estimate(load_stack(args.baseline, args.stack))
+    current = estimator.estimate(load_stack(args.current, args.stack))
+    metrics, components = compare_reports(baseline, current)
+
+    print_prices(prices)
+    print(f"Baseline: {baseline.name} ({args.baseline})")
+    print(f"Current:  {current.name} ({args.current})\n")
+    print(f"{'metric':<22} {'baseline':>21} {'current':>21} {'change':>9}")
+    for row in metrics:
+        fmt = _cost if row["key"] == "monthly_cost" else _number
+        change = "-" if row["change"] is None else f"{row['change']:+.1f}%"
+        print(f"{row['metric']:<22} {_range(*row['baseline'], fmt):>21} {_range(*row['current'], fmt):>21} {change:>9}")
+
+    if components:
+        print(f"\n{'':<2}{'category':<19} {'resource':<38} {'USD/month':>10}  change")
+        for row in components:
+            summary = row["current"] if row["baseline"] is None else row["baseline"] if row["current"] is None \
+                else f"{row['baseline']} -> {row['current']}"
+            print(f"{row['change']:<2}{row['category']:<19} {row['resource'][:38]:<38} "
+                  f"{row['cost_change']:>+10,.2f}  {summary}")
+    else:
+        print("\nNo resource changes")
+    print_notes(baseline, "baseline")
+    print_notes(current, "current")
+
+    cost_change = metrics[-1]["change"]
+    if args.max_cost_increase is not None and cost_change is not None and cost_change > args.max_cost_increase:
+        print(f"\nMonthly cost increase {cost_change:+.1f}% exceeds the threshold ({args.max_cost_increase}%)")
+        return 1
+    return 0
+
+
+def print_prices(prices: dict):
+    """
+    価格表の前提を表示する
+
+    Args:
+        prices: 価格表
+    """
+    print(f"Prices: {prices['region']}, {prices['currency']}, as of {prices['as_of']}, "
+          f"{prices['hours_per_month']} hours/month (usage-based charges are excluded)")
+
+
+def print_notes(estimate: CapacityReport, label: str):
+    """
+    見積もりの対象外・注意事項を表示する
+
+    Args:
+        estimate: 見積もり
+        label: 表示するスタックのラベル
+    """
+    if estimate.unpriced:
+        names = ", ".join(sorted({component.detail.split(",")[0] for component in estimate.unpriced}))
+        print(f"\n[{label}] Not in the price table (excluded from cost): {names}")
+    if estimate.usage_based:
+        counts = ", ".join(f"{name.split('::', 1)[1]} x{count}" for name, count in estimate.usage_based.items())
+        print(f"[{label}] Usage-based, not estimated: {counts}")
+    for note in estimate.notes:
+        print(f"[{label}] {note}")
+
+
+def _number(value: float) -> str:
+    """数値を表示用に整形する"""
+    return f"{round(value, 2):g}"
+
+
+def _cost(value: Optional[float]) -> str:
+    """費用を表示用に整形する"""
+    return "-" if value is None else f"{value:,.2f}"
+
+
+def _range(low, high, fmt) -> str:
+    """
+    最小・最大の値を表示用に整形する
+
+    Args:
+        low: 最小台数での値
+        high: 最大台数での値
+        fmt: 値の整形関数
+
+    Returns:
+        同じ値の場合は1つ、異なる場合は「最小-最大」
+    """
+    return fmt(low) if low == high else f"{fmt(low)}-{fmt(high)}"
+
+
+def main() -> int:
+    """
+    エントリーポイント
+
+    Returns:
+        終了コード
+    """
+    parser = argparse.ArgumentParser(prog="python -m capacity", description="合成済みスタックの容量・コストの見積もり")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    report_parser = subparsers.add_parser("report", help="スタックの容量・月額費用を表示する")
+    report_parser.add_argument("path", nargs="?", default="cdk.out", help="cdk.outディレクトリまたはテンプレートファイル")
+    report_parser.add_argument("--json", action="store_true", help="JSONで出力する")
+    report_parser.set_defaults(func=report)
+
+    diff_parser = subparsers.add_parser("diff", help="2つのスタックの容量・月額費用を比較する")
+    diff_parser.add_argument("baseline", help="比較元のcdk.outディレクトリまたはテンプレートファイル")
+    diff_parser.add_argument("current", help="比較先のcdk.outディレクトリまたはテンプレートファイル")
+    diff_parser.add_argument("--max-cost-increase", type=float,
+                             help="許容する最小構成の月額費用の増加（％、超えた場合は終了コード1）")
+    diff_parser.set_defaults(func=diff)
+
+    for subparser in (report_parser, diff_parser):
+        subparser.add_argument("--stack", help="cdk.outに複数のスタックがある場合のスタック名")
+        subparser.add_argument("--prices", help="価格表（JSON、省略時はcapacity/prices.json）")
+
+    args = parser.parse_args()
+    try:
+        return args.func(args)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,800 @@
+# -*- coding: utf-8 -*-
+
+"""
+容量・コストの見積もり
+
+このモジュールは、合成済みのテンプレートからEC2・Fargate・RDS・ElastiCache・OpenSearchのvCPU数と
+メモリ量、EBSの容量・IOPS・スループット、NATゲートウェイ・VPCエンドポイントの数を集計し、
+同梱の価格表（prices.json）で月額費用を見積もります。
+
+- Auto Scaling GroupとECSサービスは、最小台数と最大台数のそれぞれで集計
+- データ転送・リクエスト数・ログの保存量等の従量課金は見積もりの対象外
+"""
+
+import dataclasses
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from capacity.template import StackTemplate, literal, references
+from dify_cdk.config.instance_types import instance_spec
+
+
+# 同梱の価格表
+PRICES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prices.json")
+
+# 集計する指標（キー, 表示名）
+METRICS: List[Tuple[str, str]] = [
+    ("vcpus", "vCPU"),
+    ("memory", "memory GiB"),
+    ("storage", "EBS GB"),
+    ("iops", "EBS IOPS"),
+    ("throughput", "EBS MiB/s"),
+    ("nat_gateways", "NAT gateways"),
+    ("interface_endpoints", "interface endpoints"),
+    ("gateway_endpoints", "gateway endpoints"),
+    ("monthly_cost", "monthly cost"),
+]
+
+# リソース数を集計する指標と対象の種別
+COUNTED_CATEGORIES: Dict[str, str] = {
+    "nat_gateways": "NAT gateway",
+    "interface_endpoints": "Interface endpoint",
+    "gateway_endpoints": "Gateway endpoint",
+}
+
+# 従量課金のみのリソース（見積もりの対象外として件数のみ表示）
+USAGE_BASED_TYPES = (
+    "AWS::Lambda::Function",
+    "AWS::S3::Bucket",
+    "AWS::SQS::Queue",
+    "AWS::SNS::Topic",
+    "AWS::Logs::LogGroup",
+    "AWS::DLM::LifecyclePolicy",
+)
+
+# インスタンスサイズ・Graviton（t4g・m7g等）のファミリー
+SIZE_PATTERN = re.compile(r"^(nano|micro|small|medium|large|\d*xlarge)$")
+GRAVITON_PATTERN = re.compile(r"^([tmcr])(\d)g[dn]?$")
+ENDPOINT_SERVICE_PATTERN = re.compile(r"^com\.amazonaws\.[^.]*\.(.+)$")
+
+# EC2インスタンスの論理IDの末尾に付くユーザーデータのハッシュ（比較時は除外）
+USER_DATA_HASH_PATTERN = re.compile(r"(?<=[0-9A-F]{8})[0-9a-f]{16}$")
+
+
+@dataclass
+class Component:
+    """見積もりの対象となるリソース"""
+
+    # 種別（EC2 / Fargate / RDS / ElastiCache / OpenSearch / NAT gateway 等）
+    category: str
+
+    # 論理ID（比較時の識別子）
+    logical_id: str
+
+    # 表示名（コンストラクトのパス）
+    resource: str
+
+    # 内容（インスタンスタイプ・ボリューム等）
+    detail: str
+
+    # 最小・最大の台数（スケーリングしないリソースは同じ値）
+    min_count: int = 1
+    max_count: int = 1
+
+    # 1台あたりのvCPU数・メモリ（GiB）
+    vcpus: float = 0
+    memory: float = 0
+
+    # 1台あたりのEBSの容量（GB）・IOPS・スループット（MiB/s）
+    storage: float = 0
+    iops: int = 0
+    throughput: int = 0
+
+    # 1台あたりの月額（インスタンス等の時間課金、価格表にない場合はNone）とストレージの月額
+    compute_cost: Optional[float] = 0.0
+    storage_cost: float = 0.0
+
+    # スポットインスタンスを組み合わせる場合のオンデマンドの台数・割合（％）と価格の比率
+    on_demand_base: int = 0
+    on_demand_percentage: int = 100
+    spot_ratio: float = 1.0
+
+    @property
+    def priced(self) -> bool:
+        """価格表に価格があるか"""
+        return self.compute_cost is not None
+
+    def monthly_cost(self, count: int) -> Optional[float]:
+        """
+        月額費用を求める
+
+        Args:
+            count: 台数
+
+        Returns:
+            月額費用（価格表にない場合はNone）
+        """
+        if self.compute_cost is None:
+            return None
+        on_demand = min(count, self.on_demand_base)
+        on_demand += max(0, count - self.on_demand_base) * self.on_demand_percentage / 100
+        compute = self.compute_cost * (on_demand + (count - on_demand) * self.spot_ratio)
+        return compute + self.storage_cost * count
+
+    def total(self, metric: str, count: int) -> float:
+        """
+        指標の値を求める
+
+        Args:
+            metric: 指標のキー（METRICS）
+            count: 台数
+
+        Returns:
+            指標の値
+        """
+        if metric == "monthly_cost":
+            return self.monthly_cost(count) or 0.0
+        if metric in COUNTED_CATEGORIES:
+            return count if self.category == COUNTED_CATEGORIES[metric] else 0
+        return getattr(self, metric) * count
+
+
+@dataclass
+class CapacityReport:
+    """スタックの容量・コストの見積もり"""
+
+    # スタック名・リージョン
+    name: str
+    region: Optional[str]
+
+    # 見積もりの対象となるリソース
+    components: List[Component]
+
+    # 見積もりの対象外とした従量課金のリソース（種類ごとの件数）
+    usage_based: Dict[str, int] = field(default_factory=dict)
+
+    # 見積もりの注意事項（合成時に値が決まらないプロパティ等）
+    notes: List[str] = field(default_factory=list)
+
+    def totals(self) -> Dict[str, Tuple[float, float]]:
+        """
+        指標ごとの合計を求める
+
+        Returns:
+            指標のキーごとの（最小台数での合計, 最大台数での合計）
+        """
+        return {
+            key: (
+                sum(component.total(key, component.min_count) for component in self.components),
+                sum(component.total(key, component.max_count) for component in self.components),
+            )
+            for key, _ in METRICS
+        }
+
+    @property
+    def unpriced(self) -> List[Component]:
+        """価格表に価格がないリソース（月額の合計に含まれない）"""
+        return [component for component in self.components if not component.priced]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        JSONに変換できる辞書を取得する
+
+        Returns:
+            見積もりの辞書
+        """
+        return {
+            "name": self.name,
+            "region": self.region,
+            "components": [
+                dict(
+                    dataclasses.asdict(component),
+                    monthly_cost=[component.monthly_cost(component.min_count), component.monthly_cost(component.max_count)]
+                )
+                for component in self.components
+            ],
+            "totals": {key: list(values) for key, values in self.totals().items()},
+            "usage_based": self.usage_based,
+            "notes": self.notes,
+        }
+
+
+def load_prices(path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    価格表を読み込む
+
+    Args:
+        path: 価格表のパス（省略時は同梱の価格表）
+
+    Returns:
+        価格表
+    """
+    with open(path or PRICES_FILE, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def instance_capacity(instance_type: str, prices: Dict[str, Any]) -> Optional[Tuple[int, float]]:
+    """
+    インスタンスタイプ（EC2・RDS・ElastiCache・OpenSearch）のvCPU数とメモリ量を取得する
+
+    価格表のspecsにない場合は、プレフィックス（db. / cache.）・サフィックス（.search）を除き、
+    Graviton（t4g・m7g等）を同じサイズのx86インスタンスに読み替えてinstance_specで求めます。
+
+    Args:
+        instance_type: インスタンスタイプ（例: db.r7g.large）
+        prices: 価格表
+
+    Returns:
+        (vCPU数, メモリ（GiB）)、未知のインスタンスタイプの場合はNone
+    """
+    if instance_type in prices.get("specs", {}):
+        vcpus, memory = prices["specs"][instance_type]
+        return vcpus, memory
+
+    parts = [part for part in instance_type.split(".") if part not in ("db", "cache", "search")]
+    if len(parts) != 2:
+        return None
+    family, size = parts
+    match = GRAVITON_PATTERN.match(family)
+    if match:
+        kind, generation = match.groups()
+        family = "t3" if kind == "t" else f"{kind}{min(max(int(generation), 5), 7)}"
+    return instance_spec(f"{family}.{size}")
+
+
+def hourly_price(table: Dict[str, float], instance_type: str, prices: Dict[str, Any]) -> Optional[float]:
+    """
+    インスタンスタイプの時間単価を取得する
+
+    価格表にないサイズは、同じファミリーのlargeの価格をvCPU数の比で換算します
+    （バースト可能インスタンスはサイズと価格が比例しないため換算しません）。
+
+    Args:
+        table: サービスの価格表（インスタンスタイプ -> 時間単価）
+        instance_type: インスタンスタイプ
+        prices: 価格表
+
+    Returns:
+        時間単価（価格表にない場合はNone）
+    """
+    if instance_type in table:
+        return table[instance_type]
+
+    parts = instance_type.split(".")
+    sizes = [index for index, part in enumerate(parts) if SIZE_PATTERN.match(part)]
+    if not sizes or sizes[0] == 0 or parts[sizes[0] - 1].startswith("t"):
+        return None
+    base = ".".join("large" if index == sizes[0] else part for index, part in enumerate(parts))
+    spec = instance_capacity(instance_type, prices)
+    base_spec = instance_capacity(base, prices)
+    if base not in table or not spec or not base_spec:
+        return None
+    return table[base] * spec[0] / base_spec[0]
+
+
+def volume_cost(
+    table: Dict[str, Dict[str, float]],
+    volume_type: str,
+    size: float,
+    iops: int,
+    throughput: int
+) -> Tuple[int, int, Optional[float]]:
+    """
+    ボリュームの性能と月額を求める
+
+    Args:
+        table: ストレージの価格表（ボリュームタイプ -> 単価）
+        volume_type: ボリュームタイプ（gp3 / gp2 / io1等）
+        size: 容量（GB）
+        iops: プロビジョンドIOPS（0の場合はベースライン）
+        throughput: プロビジョンドスループット（MiB/s、0の場合はベースライン）
+
+    Returns:
+        (IOPS, スループット, 月額)、価格表にないボリュームタイプの場合の月額はNone
+    """
+    rates = table.get(volume_type)
+    if rates is None:
+        return iops, throughput, None
+
+    large = size >= rates.get("large_volume_gb", float("inf"))
+    baseline_iops = rates.get("large_baseline_iops" if large else "baseline_iops", 0)
+    baseline_throughput = rates.get("large_baseline_throughput" if large else "baseline_throughput", 0)
+    iops = iops or baseline_iops or int(size * rates.get("iops_per_gb", 0))
+    throughput = throughput or baseline_throughput or rates.get("default_throughput", 0)
+
+    cost = size * rates["gb_month"]
+    cost += max(0, iops - baseline_iops) * rates.get("iops_month", 0)
+    cost += max(0, throughput - baseline_throughput) * rates.get("throughput_month", 0)
+    return iops, throughput, cost
+
+
+class CapacityEstimator:
+    """合成済みのテンプレートから容量・コストを見積もるクラス"""
+
+    def __init__(self, prices: Dict[str, Any]):
+        """
+        コンストラクタ
+
+        Args:
+            prices: 価格表
+        """
+        self.prices = prices
+        self.hours = prices["hours_per_month"]
+
+    def estimate(self, stack: StackTemplate) -> CapacityReport:
+        """
+        スタックの容量・コストを見積もる
+
+        Args:
+            stack: 合成済みのスタック
+
+        Returns:
+            見積もり
+        """
+        self.stack = stack
+        self.report = CapacityReport(name=stack.name, region=stack.region, components=[])
+        if stack.region and stack.region != self.prices["region"]:
+            self.report.notes.append(f"Prices are for {self.prices['region']}, the stack is in {stack.region}")
+
+        # ECSサービスのスケーリング範囲（サービスの論理ID -> (最小, 最大)）
+        self.scalable_targets: Dict[str, Tuple[int, int]] = {}
+        for resource in stack.resources.values():
+            props = resource.get("Properties", {})
+            if resource["Type"] == "AWS::ApplicationAutoScaling::ScalableTarget" and props.get("ServiceNamespace") == "ecs":
+                for service in references(props.get("ResourceId")):
+                    self.scalable_targets[service] = (int(props["MinCapacity"]), int(props["MaxCapacity"]))
+
+        handlers = {
+            "AWS::EC2::Instance": self._instance,
+            "AWS::AutoScaling::AutoScalingGroup": self._auto_scaling_group,
+            "AWS::AutoScaling::WarmPool": self._warm_pool,
+            "AWS::EC2::Volume": self._volume,
+            "AWS::ECS::Service": self._ecs_service,
+            "AWS::RDS::DBInstance": self._db_instance,
+            "AWS::ElastiCache::ReplicationGroup": self._cache_replication_group,
+            "AWS::ElastiCache::CacheCluster": self._cache_cluster,
+            "AWS::OpenSearchService::Domain": self._opensearch_domain,
+            "AWS::EC2::NatGateway": self._nat_gateway,
+            "AWS::EC2::EIP": self._public_ip,
+            "AWS::EC2::VPCEndpoint": self._vpc_endpoint,
+            "AWS::ElasticLoadBalancingV2::LoadBalancer": self._load_balancer,
+        }
+        monthly: Dict[str, int] = {}
+        for logical_id, resource in stack.resources.items():
+            resource_type = resource["Type"]
+            if resource_type in handlers:
+                handlers[resource_type](logical_id, resource.get("Properties", {}))
+            elif resource_type in self.prices["monthly"]:
+                monthly[resource_type] = monthly.get(resource_type, 0) + 1
+            elif resource_type in USAGE_BASED_TYPES:
+                self.report.usage_based[resource_type] = self.report.usage_based.get(resource_type, 0) + 1
+
+        # 件数で課金されるリソース（アラーム・シークレット等）は種類ごとにまとめる
+        for resource_type, count in monthly.items():
+            self.report.components.append(Component(
+                category="Other", logical_id=resource_type, resource=resource_type.split("::", 1)[1],
+                detail="monthly per resource", min_count=count, max_count=count,
+                compute_cost=self.prices["monthly"][resource_type]
+            ))
+        return self.report
+
+    def _add(self, logical_id: str, category: str, detail: str, **values) -> Component:
+        """
+        見積もりの対象となるリソースを追加する
+
+        Args:
+            logical_id: 論理ID
+            category: 種別
+            detail: 内容
+            **values: Componentのその他の値
+
+        Returns:
+            追加したリソース
+        """
+        component = Component(
+            category=category, logical_id=logical_id, resource=self.stack.display_name(logical_id),
+            detail=detail, **values
+        )
+        self.report.components.append(component)
+        return component
+
+    def _properties(self, value: Any) -> Dict[str, Any]:
+        """
+        プロパティの値が参照しているリソースのプロパティを取得する
+
+        Args:
+            value: Ref・Fn::GetAttを含むプロパティ値
+
+        Returns:
+            参照先のプロパティ（参照先がない場合は空の辞書）
+        """
+        for logical_id in references(value):
+            if logical_id in self.stack.resources:
+                return self.stack.resources[logical_id].get("Properties", {})
+        return {}
+
+    def _ec2(
+        self,
+        logical_id: str,
+        category: str,
+        instance_type: Optional[str],
+        image: Any,
+        mappings: List[Dict[str, Any]],
+        min_count: int = 1,
+        max_count: int = 1
+    ) -> Component:
+        """
+        EC2インスタンス（ルートボリューム・データ用ボリュームを含む）を追加する
+
+        Args:
+            logical_id: 論理ID
+            category: 種別
+            instance_type: インスタンスタイプ（合成時に決まらない場合はNone）
+            image: AMIのプロパティ値（Windowsの判定に使用）
+            mappings: ブロックデバイスマッピング
+            min_count: 最小台数
+            max_count: 最大台数
+
+        Returns:
+            追加したリソース
+        """
+        windows = "windows" in json.dumps(image).lower()
+        spec = instance_capacity(instance_type, self.prices) if instance_type else None
+        hourly = hourly_price(self.prices["ec2"], instance_type, self.prices) if instance_type else None
+        if hourly is not None and windows and spec:
+            license_type = "burstable" if instance_type.startswith("t") else "default"
+            hourly += self.prices["windows_license_per_vcpu"][license_type] * spec[0]
+        if instance_type is None:
+            self.report.notes.append(f"{self.stack.display_name(logical_id)}: instance type is not known at synth time")
+
+        storage, iops, throughput, storage_cost, volumes = 0.0, 0, 0, 0.0, []
+        for mapping in mappings or []:
+            ebs = mapping.get("Ebs")
+            if not ebs:
+                continue
+            size = float(literal(ebs.get("VolumeSize")) or 0)
+            volume_type = literal(ebs.get("VolumeType")) or "gp2"
+            volume_iops, volume_throughput, cost = volume_cost(
+                self.prices["ebs"], volume_type, size,
+                int(literal(ebs.get("Iops")) or 0), int(literal(ebs.get("Throughput")) or 0)
+            )
+            storage += size
+            iops += volume_iops
+            throughput += volume_throughput
+            storage_cost += cost or 0.0
+            volumes.append(f"{size:g}GB {volume_type}")
+
+        detail = ", ".join([f"{instance_type or '?'}{' Windows' if windows else ''}"] + volumes)
+        return self._add(
+            logical_id, category, detail, min_count=min_count, max_count=max_count,
+            vcpus=spec[0] if spec else 0, memory=spec[1] if spec else 0,
+            storage=storage, iops=iops, throughput=throughput,
+            compute_cost=None if hourly is None else hourly * self.hours, storage_cost=storage_cost
+        )
+
+    def _instance(self, logical_id: str, props: Dict[str, Any]):
+        """EC2インスタンス"""
+        template = self._properties(props.get("LaunchTemplate")).get("LaunchTemplateData", {})
+        instance_type = literal(props.get("InstanceType")) or literal(template.get("InstanceType"))
+        self._ec2(
+            logical_id, "EC2", instance_type, props.get("ImageId") or template.get("ImageId"),
+            props.get("BlockDeviceMappings") or template.get("BlockDeviceMappings")
+        )
+
+    def _launch_template(self, props: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str]]:
+        """
+        Auto Scaling Groupの起動テンプレートとインスタンスタイプを取得する
+
+        Args:
+            props: Auto Scaling Groupのプロパティ
+
+        Returns:
+            (起動テンプレートのデータ, インスタンスタイプ)
+        """
+        mixed = props.get("MixedInstancesPolicy", {}).get("LaunchTemplate", {})
+        template = self._properties(
+            mixed.get("LaunchTemplateSpecification") or props.get("LaunchTemplate")
+        ).get("LaunchTemplateData", {})
+        overrides = [literal(override.get("InstanceType")) for override in mixed.get("Overrides", [])]
+        instance_type = literal(template.get("InstanceType")) or next((o for o in overrides if o), None)
+        return template, instance_type
+
+    def _auto_scaling_group(self, logical_id: str, props: Dict[str, Any]):
+        """Auto Scaling Group（最小台数・最大台数）"""
+        template, instance_type = self._launch_template(props)
+        min_count = int(literal(props.get("MinSize")) or 0)
+        max_count = int(literal(props.get("MaxSize")) or min_count)
+        component = self._ec2(
+            logical_id, "EC2 Auto Scaling", instance_type, template.get("ImageId"),
+            template.get("BlockDeviceMappings"), min_count, max_count
+        )
+
+        distribution = props.get("MixedInstancesPolicy", {}).get("InstancesDistribution")
+        if distribution:
+            component.on_demand_base = int(distribution.get("OnDemandBaseCapacity", 0))
+            component.on_demand_percentage = int(distribution.get("OnDemandPercentageAboveBaseCapacity", 100))
+            if component.on_demand_percentage < 100:
+                component.spot_ratio = self.prices["spot_price_ratio"]
+                component.detail += f", spot {100 - component.on_demand_percentage}% above {component.on_demand_base} on-demand"
+
+    def _warm_pool(self, logical_id: str, props: Dict[str, Any]):
+        """ウォームプール（停止・休止中のインスタンスはEBSのみ課金）"""
+        group = self._properties(props.get("AutoScalingGroupName"))
+        size = int(literal(props.get("MinSize")) or 0)
+        if not group or not size:
+            return
+        template, instance_type = self._launch_template(group)
+        component = self._ec2(
+            logical_id, "EC2 warm pool", instance_type, template.get("ImageId"),
+            template.get("BlockDeviceMappings"), size, size
+        )
+        state = literal(props.get("PoolState")) or "Stopped"
+        component.detail += f", {state.lower()}"
+        if state != "Running":
+            component.vcpus = component.memory = 0
+            component.compute_cost = 0.0 if component.priced else None
+
+    def _volume(self, logical_id: str, props: Dict[str, Any]):
+        """EBSボリューム"""
+        size = float(literal(props.get("Size")) or 0)
+        volume_type = literal(props.get("VolumeType")) or "gp2"
+        iops, throughput, cost = volume_cost(
+            self.prices["ebs"], volume_type, size,
+            int(literal(props.get("Iops")) or 0), int(literal(props.get("Throughput")) or 0)
+        )
+        self._add(
+            logical_id, "EBS", f"{size:g}GB {volume_type}",
+            storage=size, iops=iops, throughput=throughput, compute_cost=0.0 if cost is not None else None,
+            storage_cost=cost or 0.0
+        )
+
+    def _ecs_service(self, logical_id: str, props: Dict[str, Any]):
+        """ECSサービス（Fargate、スケーリングの最小・最大タスク数）"""
+        task = self._properties(props.get("TaskDefinition"))
+        if props.get("LaunchType", "FARGATE") != "FARGATE":
+            self.report.notes.append(f"{self.stack.display_name(logical_id)}: only Fargate services are estimated")
+            return
+        vcpus = float(literal(task.get("Cpu")) or 0) / 1024
+        memory = float(literal(task.get("Memory")) or 0) / 1024
+        desired = int(literal(props.get("DesiredCount")) or 1)
+        min_count, max_count = self.scalable_targets.get(logical_id, (desired, desired))
+        hourly = vcpus * self.prices["fargate"]["vcpu"] + memory * self.prices["fargate"]["gb"]
+        self._add(
+            logical_id, "Fargate", f"{vcpus:g} vCPU / {memory:g} GiB task",
+            min_count=min_count, max_count=max_count, vcpus=vcpus, memory=memory,
+            compute_cost=hourly * self.hours
+        )
+
+    def _db_instance(self, logical_id: str, props: Dict[str, Any]):
+        """RDS・Auroraのインスタンス（マルチAZのスタンバイを含む）"""
+        instance_class = literal(props.get("DBInstanceClass"))
+        cluster = self._properties(props.get("DBClusterIdentifier"))
+        engine = literal(cluster.get("Engine") or props.get("Engine")) or ""
+        spec = instance_capacity(instance_class, self.prices) if instance_class else None
+        hourly = hourly_price(self.prices["rds"].get(engine, {}), instance_class, self.prices) if instance_class else None
+        if hourly is not None and cluster.get("StorageType") == "aurora-iopt1":
+            hourly *= self.prices["aurora_io_optimized_ratio"]
+
+        copies = 2 if props.get("MultiAZ") is True else 1
+        detail = f"{instance_class or '?'} {engine}"
+        storage, iops, throughput, storage_cost = 0.0, 0, 0, 0.0
+        if cluster:
+            detail += ", storage usage-based"
+        else:
+            storage = float(literal(props.get("AllocatedStorage")) or 0)
+            storage_type = literal(props.get("StorageType")) or "gp2"
+            iops, throughput, cost = volume_cost(
+                self.prices["rds_storage"], storage_type, storage,
+                int(literal(props.get("Iops")) or 0), int(literal(props.get("StorageThroughput")) or 0)
+            )
+            storage_cost = cost or 0.0
+            detail += f", {storage:g}GB {storage_type}"
+        if copies > 1:
+            detail += ", Multi-AZ"
+
+        self._add(
+            logical_id, "RDS", detail, min_count=copies, max_count=copies,
+            vcpus=spec[0] if spec else 0, memory=spec[1] if spec else 0,
+            storage=storage, iops=iops, throughput=throughput,
+            compute_cost=None if hourly is None else hourly * self.hours, storage_cost=storage_cost
+        )
+
+    def _cache_nodes(self, logical_id: str, node_type: Optional[str], engine: str, count: int):
+        """
+        ElastiCacheのノードを追加する
+
+        Args:
+            logical_id: 論理ID
+            node_type: ノードタイプ
+            engine: エンジン（valkey / redis）
+            count: ノード数
+        """
+        spec = instance_capacity(node_type, self.prices) if node_type else None
+        hourly = hourly_price(self.prices["elasticache"], node_type, self.prices) if node_type else None
+        if hourly is not None and engine == "valkey":
+            hourly *= self.prices["valkey_price_ratio"]
+        self._add(
+            logical_id, "ElastiCache", f"{node_type or '?'} {engine}", min_count=count, max_count=count,
+            vcpus=spec[0] if spec else 0, memory=spec[1] if spec else 0,
+            compute_cost=None if hourly is None else hourly * self.hours
+        )
+
+    def _cache_replication_group(self, logical_id: str, props: Dict[str, Any]):
+        """ElastiCacheのレプリケーショングループ"""
+        if "NumNodeGroups" in props:
+            count = int(props["NumNodeGroups"]) * (int(props.get("ReplicasPerNodeGroup", 0)) + 1)
+        else:
+            count = int(literal(props.get("NumCacheClusters")) or 1)
+        self._cache_nodes(logical_id, literal(props.get("CacheNodeType")), literal(props.get("Engine")) or "redis", count)
+
+    def _cache_cluster(self, logical_id: str, props: Dict[str, Any]):
+        """ElastiCacheのクラスター"""
+        self._cache_nodes(
+            logical_id, literal(props.get("CacheNodeType")), literal(props.get("Engine")) or "redis",
+            int(literal(props.get("NumCacheNodes")) or 1)
+        )
+
+    def _opensearch_domain(self, logical_id: str, props: Dict[str, Any]):
+        """OpenSearch Serviceのドメイン（データノード・専用マスターノード）"""
+        cluster = props.get("ClusterConfig", {})
+        ebs = props.get("EBSOptions", {})
+        nodes = [(literal(cluster.get("InstanceType")), int(literal(cluster.get("InstanceCount")) or 1), True)]
+        if cluster.get("DedicatedMasterEnabled") is True:
+            nodes.append((literal(cluster.get("DedicatedMasterType")), int(literal(cluster.get("DedicatedMasterCount")) or 3), False))
+
+        for instance_type, count, data in nodes:
+            spec = instance_capacity(instance_type, self.prices) if instance_type else None
+            hourly = hourly_price(self.prices["opensearch"], instance_type, self.prices) if instance_type else None
+            detail = f"{instance_type or '?'} {'data' if data else 'master'}"
+            storage, iops, throughput, storage_cost = 0.0, 0, 0, 0.0
+            if data and ebs.get("EBSEnabled") is True:
+                storage = float(literal(ebs.get("VolumeSize")) or 10)
+                volume_type = literal(ebs.get("VolumeType")) or "gp2"
+                iops, throughput, cost = volume_cost(
+                    self.prices["opensearch_storage"], volume_type, storage,
+                    int(literal(ebs.get("Iops")) or 0), int(literal(ebs.get("Throughput")) or 0)
+                )
+                storage_cost = cost or 0.0
+                detail += f", {storage:g}GB {volume_type}"
+            self._add(
+                logical_id if data else f"{logical_id}/master", "OpenSearch", detail,
+                min_count=count, max_count=count, vcpus=spec[0] if spec else 0, memory=spec[1] if spec else 0,
+                storage=storage, iops=iops, throughput=throughput,
+                compute_cost=None if hourly is None else hourly * self.hours, storage_cost=storage_cost
+            )
+
+    def _nat_gateway(self, logical_id: str, props: Dict[str, Any]):
+        """NATゲートウェイ（データ処理料金は対象外）"""
+        self._add(logical_id, "NAT gateway", "hourly only", compute_cost=self.prices["nat_gateway"] * self.hours)
+
+    def _public_ip(self, logical_id: str, props: Dict[str, Any]):
+        """Elastic IP（パブリックIPv4アドレス）"""
+        self._add(logical_id, "Public IPv4", "Elastic IP", compute_cost=self.prices["public_ipv4"] * self.hours)
+
+    def _vpc_endpoint(self, logical_id: str, props: Dict[str, Any]):
+        """VPCエンドポイント（インターフェイス型はAZごとに課金、ゲートウェイ型は無料）"""
+        service = props.get("ServiceName")
+        if isinstance(service, dict) and "Fn::Join" in service:
+            service = "".join(part for part in service["Fn::Join"][1] if isinstance(part, str))
+        match = ENDPOINT_SERVICE_PATTERN.match(service) if isinstance(service, str) else None
+        name = match.group(1) if match else "?"
+
+        if literal(props.get("VpcEndpointType")) == "Interface":
+            zones = len(props.get("SubnetIds", [])) or 1
+            self._add(
+                logical_id, "Interface endpoint", f"{name}, {zones} AZ",
+                compute_cost=self.prices["interface_endpoint_per_az"] * zones * self.hours
+            )
+        else:
+            self._add(logical_id, "Gateway endpoint", name)
+
+    def _load_balancer(self, logical_id: str, props: Dict[str, Any]):
+        """Elastic Load Balancing（LCUの料金は対象外）"""
+        load_balancer_type = literal(props.get("Type")) or "application"
+        hourly = self.prices["load_balancer"].get(load_balancer_type)
+        self._add(
+            logical_id, "Load balancer", f"{load_balancer_type}, hourly only",
+            compute_cost=None if hourly is None else hourly * self.hours
+        )
+
+
+def compare_reports(baseline: CapacityReport, current: CapacityReport) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    2つのスタックの見積もりを比較する
+
+    Args:
+        baseline: 比較元の見積もり
+        current: 比較先の見積もり
+
+    Returns:
+        (指標ごとの比較結果（metric, baseline, current, change）,
+         追加・削除・変更されたリソース（change, category, resource, baseline, current, cost_change）)
+    """
+    before_totals = baseline.totals()
+    after_totals = current.totals()
+    metrics = [
+        {
+            "metric": label, "key": key, "baseline": before_totals[key], "current": after_totals[key],
+            "change": _change(before_totals[key][0], after_totals[key][0]),
+        }
+        for key, label in METRICS
+    ]
+
+    before = {_key(component): component for component in baseline.components}
+    after = {_key(component): component for component in current.components}
+    components = []
+    for key in list(before) + [key for key in after if key not in before]:
+        old, new = before.get(key), after.get(key)
+        if old and new and _summary(old) == _summary(new):
+            continue
+        components.append({
+            "change": "+" if old is None else "-" if new is None else "~",
+            "category": key[0],
+            "resource": (new or old).resource,
+            "baseline": _summary(old) if old else None,
+            "current": _summary(new) if new else None,
+            "cost_change": _baseline_cost(new) - _baseline_cost(old),
+        })
+    return metrics, components
+
+
+def _key(component: Component) -> Tuple[str, str]:
+    """
+    比較時にリソースを対応付けるキーを取得する
+
+    Args:
+        component: リソース
+
+    Returns:
+        (種別, ユーザーデータのハッシュを除いた論理ID)
+    """
+    return component.category, USER_DATA_HASH_PATTERN.sub("", component.logical_id)
+
+
+def _baseline_cost(component: Optional[Component]) -> float:
+    """
+    最小台数での月額費用を求める
+
+    Args:
+        component: リソース（存在しない場合はNone）
+
+    Returns:
+        月額費用（リソースが存在しない・価格表にない場合は0）
+    """
+    if component is None:
+        return 0.0
+    return component.monthly_cost(component.min_count) or 0.0
+
+
+def _summary(component: Component) -> str:
+    """
+    リソースの内容と台数の要約を取得する
+
+    Args:
+        component: リソース
+
+    Returns:
+        要約（例: t3.large, 100GB gp3 x2-4）
+    """
+    if component.min_count == component.max_count:
+        return f"{component.detail} x{component.min_count}"
+    return f"{component.detail} x{component.min_count}-{component.max_count}"
+
+
+def _change(old: float, new: float) -> Optional[float]:
+    """
+    変化率（％）を求める
+
+    Args:
+        old: 比較元の値
+        new: 比較先の値
+
+    Returns:
+        変化率（比較元が0の場合はNone）
+    """
+    if not old:
+        return None
+    return (new - old) / old * 100
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+"""
+合成済みテンプレートの読み込み
+
+このモジュールは、`cdk synth`の出力ディレクトリ（cdk.out）またはテンプレートファイルから、
+スタックのCloudFormationテンプレートを読み込みます。AWSのAPIは呼び出しません。
+"""
+
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Set
+
+
+@dataclass
+class StackTemplate:
+    """合成済みのスタック"""
+
+    # スタック名（テンプレートファイルを直接指定した場合はファイル名）
+    name: str
+
+    # デプロイ先のリージョン（環境に依存しないスタックの場合はNone）
+    region: Optional[str]
+
+    # CloudFormationテンプレート
+    template: Dict[str, Any]
+
+    @property
+    def resources(self) -> Dict[str, Dict[str, Any]]:
+        """論理IDごとのリソース"""
+        return self.template.get("Resources", {})
+
+    def display_name(self, logical_id: str) -> str:
+        """
+        リソースの表示名を取得する
+
+        Args:
+            logical_id: 論理ID
+
+        Returns:
+            コンストラクトのパス（パスのメタデータがない場合は論理ID）
+        """
+        path = self.resources[logical_id].get("Metadata", {}).get("aws:cdk:path")
+        if not path:
+            return logical_id
+        path = path.split("/", 1)[-1]
+        return path[:-len("/Resource")] if path.endswith("/Resource") else path
+
+
+def load_stack(path: str, stack: Optional[str] = None) -> StackTemplate:
+    """
+    合成済みのスタックを読み込む
+
+    Args:
+        path: cdk.outディレクトリまたはテンプレートファイル（*.template.json）
+        stack: cdk.outに複数のスタックがある場合に読み込むスタック名
+
+    Returns:
+        合成済みのスタック
+    """
+    if not os.path.exists(path):
+        raise ValueError(f"cdk.outまたはテンプレートファイルが見つかりません: {path}")
+    if not os.path.isdir(path):
+        with open(path, encoding="utf-8") as file:
+            template = json.load(file)
+        return StackTemplate(name=os.path.basename(path).split(".")[0], region=None, template=template)
+
+    manifest_path = os.path.join(path, "manifest.json")
+    if not os.path.exists(manifest_path):
+        raise ValueError(f"cdk.outのマニフェストが見つかりません: {manifest_path}（cdk synthを実行してください）")
+    with open(manifest_path, encoding="utf-8") as file:
+        manifest = json.load(file)
+
+    stacks = {
+        artifact.get("displayName", artifact_id): artifact
+        for artifact_id, artifact in manifest.get("artifacts", {}).items()
+        if artifact.get("type") == "aws:cloudformation:stack"
+    }
+    if stack:
+        if stack not in stacks:
+            raise ValueError(f"スタックが見つかりません: {stack}（{', '.join(stacks)} のいずれかを指定してください）")
+        name = stack
+    elif len(stacks) == 1:
+        name = next(iter(stacks))
+    else:
+        raise ValueError(f"スタックを指定してください（--stack）: {', '.join(stacks) or 'スタックがありません'}")
+
+    artifact = stacks[name]
+    with open(os.path.join(path, artifact["properties"]["templateFile"]), encoding="utf-8") as file:
+        template = json.load(file)
+    region = artifact.get("environment", "").rsplit("/", 1)[-1]
+    return StackTemplate(name=name, region=None if region.startswith("unknown") else region or None, template=template)
+
+
+def literal(value: Any) -> Optional[Any]:
+    """
+    プロパティの値を取得する
+
+    Args:
+        value: テンプレートのプロパティ値
+
+    Returns:
+        文字列・数値の場合はその値、組み込み関数（Ref等）で合成時に決まらない場合はNone
+    """
+    if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+        return value
+    return None
+
+
+def references(value: Any) -> Set[str]:
+    """
+    プロパティの値が参照しているリソースを取得する
+
+    Args:
+        value: テンプレートのプロパティ値
+
+    Returns:
+        Ref・Fn::GetAttで参照している論理ID
+    """
+    found: Set[str] = set()
+    if isinstance(value, dict):
+        if isinstance(value.get("Ref"), str):
+            found.add(value["Ref"])
+        if isinstance(value.get("Fn::GetAtt"), list):
+            found.add(value["Fn::GetAtt"][0])
+        for item in value.values():
+            found |= references(item)
+    elif isinstance(value, list):
+        for item in value:
+            found |= references(item)
+    return found
@@ -8,11 +8,71 @@
 """
 
 import os
-from typing import Dict, Any
+from typing import Dict, Any, List
 from aws_cdk import App
 from dotenv import load_dotenv
 
 
+# サイジングプロファイル
+# マネージドサービス等のデフォルトサイズをまとめて切り替えるためのプリセット
+# 個別の値は環境変数またはCDKコンテキストで上書き可能
+SIZING_PROFILES: Dict[str, Dict[str, Any]] = {
+    'small': {
+        'database-instance-class': 't4g.medium',
+        'database-allocated-storage': 50,
+        'cache-node-type': 'cache.t4g.small',
+        'cache-num-nodes': 1,
+        'opensearch-instance-type': 'm7g.large.search',
+        'opensearch-data-nodes': 1,
+        'opensearch-volume-size': 50,
+        'pgbouncer-default-pool-size': 20,
+        'pgbouncer-max-client-conn': 500,
+    },
+    'medium': {
+        'database-instance-class': 'm7g.large',
+        'database-allocated-storage': 100,
+        'cache-node-type': 'cache.m7g.large',
+        'cache-num-nodes': 2,
+        'opensearch-instance-type': 'r7g.large.search',
+        'opensearch-data-nodes': 2,
+        'opensearch-volume-size': 100,
+        'pgbouncer-default-pool-size': 40,
+        'pgbouncer-max-client-conn': 1000,
+    },
+    'large': {
+        'database-instance-class': 'r7g.xlarge',
+        'database-allocated-storage': 200,
+        'cache-node-type': 'cache.r7g.large',
+        'cache-num-nodes': 2,
+        'opensearch-instance-type': 'r7g.xlarge.search',
+        'opensearch-data-nodes': 2,
+        'opensearch-volume-size': 200,
+        'pgbouncer-default-pool-size': 80,
+        'pgbouncer-max-client-conn': 2000,
+    },
+}
+
+# ECS（Fargate）構成のサービスごとの既定値
+# cpu / memory はFargateタスクのサイズ（vCPU単位 x 1024 / MiB）
+ECS_SERVICE_DEFAULTS: Dict[str, Dict[str, int]] = {
+    'nginx': {'cpu': 256, 'memory': 512, 'min-capacity': 2, 'max-capacity': 4},
+    'web': {'cpu': 512, 'memory': 1024, 'min-capacity': 2, 'max-capacity': 4},
+    'api': {'cpu': 1024, 'memory': 2048, 'min-capacity': 2, 'max-capacity': 6},
+    'worker': {'cpu': 1024, 'memory': 2048, 'min-capacity': 1, 'max-capacity': 4},
+    'sandbox': {'cpu': 512, 'memory': 1024, 'min-capacity': 1, 'max-capacity': 3},
+    'plugin-daemon': {'cpu': 1024, 'memory': 2048, 'min-capacity': 1, 'max-capacity': 2},
+}
+
+# ロール分割構成（LINUX_DEPLOYMENT_MODE=split）のロールごとの既定値
+# volume-iops / volume-throughput はgp3のベースライン（3000 IOPS / 125 MiB/s）以上を指定
+LINUX_ROLE_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    'app': {'instance-type': 't3.large', 'volume-size': 50, 'volume-iops': 3000, 'volume-throughput': 125},
+    'worker': {'instance-type': 'c6i.large', 'volume-size': 50, 'volume-iops': 3000, 'volume-throughput': 125},
+    'sandbox': {'instance-type': 'c6i.large', 'volume-size': 50, 'volume-iops': 3000, 'volume-throughput': 125},
+    'data': {'instance-type': 'r6i.large', 'volume-size': 200, 'volume-iops': 6000, 'volume-throughput': 250},
+}
+
+
 class Config:
     """CDKスタックの設定を管理するクラス"""
 
@@ -67,6 +127,105 @@ class Config:
         # デフォルト値を返す
         return default
     
+    def get_bool(self, key: str, default: bool = False) -> bool:
+        """
+        設定値を真偽値として取得する
+        
+        Args:
+            key: 設定キー
+            default: デフォルト値
+            
+        Returns:
+            設定値（"true", "1", "yes", "on" を真とみなす）
+        """
+        value = self.get_value(key, default)
+        if isinstance(value, bool):
+            return value
+        return str(value).strip().lower() in ('true', '1', 'yes', 'on')
+    
+    def get_int(self, key: str, default: int = 0) -> int:
+        """
+        設定値を整数として取得する
+        
+        Args:
+            key: 設定キー
+            default: デフォルト値
+            
+        Returns:
+            設定値
+        """
+        return int(self.get_value(key, default))
+    
+    def get_list(self, key: str, default: str = '') -> List[str]:
+        """
+        設定値をカンマ区切りのリストとして取得する
+        
+        Args:
+            key: 設定キー
+            default: デフォルト値（カンマ区切り）
+            
+        Returns:
+            設定値（空の要素は除外）
+        """
+        value = self.get_value(key, default)
+        if isinstance(value, list):
+            return [str(item) for item in value]
+        return [item.strip() for item in str(value).split(',') if item.strip()]
+    
+    def get_sizing(self, key: str) -> Any:
+        """
+        サイジングプロファイルの値を取得する
+        
+        環境変数 > CDKコンテキスト > サイジングプロファイル の順で値を探します
+        
+        Args:
+            key: 設定キー
+            
+        Returns:
+            設定値
+        """
+        return self.get_value(key, SIZING_PROFILES[self.sizing_profile][key])
+    
+    def get_ecs_service(self, service: str, key: str) -> int:
+        """
+        ECSサービスごとの設定値を取得する
+        
+        環境変数 > CDKコンテキスト > ECS_SERVICE_DEFAULTS の順で値を探します
+        （例: ECS_API_CPU、ECS_PLUGIN_DAEMON_MAX_CAPACITY）
+        
+        Args:
+            service: サービス名（ECS_SERVICE_DEFAULTSのキー）
+            key: 設定キー（cpu / memory / min-capacity / max-capacity）
+            
+        Returns:
+            設定値
+        """
+        return self.get_int(f'ecs-{service}-{key}', ECS_SERVICE_DEFAULTS[service][key])
+    
+    def get_linux_role(self, role: str, key: str) -> Any:
+        """
+        ロール分割構成のロールごとの設定値を取得する
+        
+        環境変数 > CDKコンテキスト > LINUX_ROLE_DEFAULTS の順で値を探します
+        （例: LINUX_DATA_INSTANCE_TYPE、LINUX_WORKER_VOLUME_SIZE）
+        
+        Args:
+            role: ロール名（LINUX_ROLE_DEFAULTSのキー）
+            key: 設定キー（instance-type / volume-size / volume-iops / volume-throughput）
+            
+        Returns:
+            設定値
+        """
+        return self.get_value(f'linux-{role}-{key}', LINUX_ROLE_DEFAULTS[role][key])
+    
+    @property
+    def sizing_profile(self) -> str:
+        """サイジングプロファイル（small / medium / large）"""
+        profile = self.get_value('sizing-profile', 'small')
+        if profile not in SIZING_PROFILES:
+            raise ValueError(f"不明なサイジングプロファイルです: {profile}（{', '.join(SIZING_PROFILES)} のいずれかを指定してください）")
+        return profile
+    
     @property
     def vpc_cidr(self) -> str:
         """VPCのCIDR範囲"""
@@ -92,6 +251,594 @@ class Config:
         """Linux AMIの名前パターン"""
         return self.get_value('linux-ami-name', 'ubuntu/images/hvm-ssd/ubuntu-jammy-22.04-amd64-server-*')
     
+    @property
+    def database_mode(self) -> str:
+        """Difyデータベースの配置（container / rds / aurora）"""
+        mode = self.get_value('database-mode', 'container')
+        if mode not in ('container', 'rds', 'aurora'):
+            raise ValueError(f"不明なデータベースモードです: {mode}（container / rds / aurora のいずれかを指定してください）")
+        return mode
+    
+    @property
+    def database_instance_class(self) -> str:
+        """RDS / Auroraのインスタンスクラス（"db." プレフィックスなし）"""
+        return self.get_sizing('database-instance-class')
+    
+    @property
+    def database_allocated_storage(self) -> int:
+        """RDSのストレージサイズ（GB）"""
+        return int(self.get_sizing('database-allocated-storage'))
+    
+    @property
+    def database_iops(self) -> int:
+        """RDS（gp3）のプロビジョンドIOPS（0の場合はベースライン）。AuroraではI/O最適化ストレージを使用"""
+        iops = self.get_int('database-iops', 0)
+        if iops and self.database_mode == 'rds':
+            # PostgreSQLのgp3は400GB以上でのみIOPSを指定でき、ベースラインは12000
+            if self.database_allocated_storage < 400:
+                raise ValueError(f"DATABASE_IOPSを指定する場合はDATABASE_ALLOCATED_STORAGEに400以上を指定してください: {self.database_allocated_storage}")
+            if not 12000 <= iops <= 64000:
+                raise ValueError(f"DATABASE_IOPSには12000〜64000の値を指定してください: {iops}")
+        return iops
+    
+    @property
+    def database_performance_insights(self) -> bool:
+        """Performance Insightsを有効にするか"""
+        return self.get_bool('database-performance-insights', True)
+    
+    @property
+    def database_pgvector(self) -> bool:
+        """マネージドデータベースのpgvectorをDifyのベクトルストアとして使用するか"""
+        return self.get_bool('database-pgvector', False)
+    
+    @property
+    def cache_mode(self) -> str:
+        """Dify用Redisの配置（container / elasticache）"""
+        mode = self.get_value('cache-mode', 'container')
+        if mode not in ('container', 'elasticache'):
+            raise ValueError(f"不明なキャッシュモードです: {mode}（container / elasticache のいずれかを指定してください）")
+        return mode
+    
+    @property
+    def cache_engine(self) -> str:
+        """ElastiCacheのエンジン（valkey / redis）"""
+        return self.get_value('cache-engine', 'valkey')
+    
+    @property
+    def cache_node_type(self) -> str:
+        """ElastiCacheのノードタイプ"""
+        return self.get_sizing('cache-node-type')
+    
+    @property
+    def cache_num_nodes(self) -> int:
+        """ElastiCacheのノード数（2以上で自動フェイルオーバー・マルチAZ）"""
+        return int(self.get_sizing('cache-num-nodes'))
+    
+    @property
+    def storage_mode(self) -> str:
+        """Difyのファイル保存先（local / s3）"""
+        mode = self.get_value('storage-mode', 'local')
+        if mode not in ('local', 's3'):
+            raise ValueError(f"不明なストレージモードです: {mode}（local / s3 のいずれかを指定してください）")
+        return mode
+    
+    @property
+    def vector_store_mode(self) -> str:
+        """Difyのベクトルストアの配置（container / opensearch）"""
+        mode = self.get_value('vector-store-mode', 'container')
+        if mode not in ('container', 'opensearch'):
+            raise ValueError(f"不明なベクトルストアモードです: {mode}（container / opensearch のいずれかを指定してください）")
+        return mode
+    
+    @property
+    def opensearch_instance_type(self) -> str:
+        """OpenSearch Serviceのデータノードのインスタンスタイプ"""
+        return self.get_sizing('opensearch-instance-type')
+    
+    @property
+    def opensearch_data_nodes(self) -> int:
+        """OpenSearch Serviceのデータノード数（2以上で2つのAZに分散）"""
+        return int(self.get_sizing('opensearch-data-nodes'))
+    
+    @property
+    def opensearch_volume_size(self) -> int:
+        """OpenSearch Serviceのデータノードごとのボリュームサイズ（GB）"""
+        return int(self.get_sizing('opensearch-volume-size'))
+    
+    @property
+    def opensearch_auth(self) -> str:
+        """OpenSearch Serviceの認証方式（basic / iam）"""
+        return self.get_value('opensearch-auth', 'basic')
+    
+    @property
+    def pgbouncer_enabled(self) -> bool:
+        """DifyとPostgreSQLの間にPgBouncer（トランザクションプーリング）を配置するか"""
+        return self.get_bool('pgbouncer-enabled', False)
+    
+    @property
+    def pgbouncer_default_pool_size(self) -> int:
+        """PgBouncerのユーザー・データベースごとのサーバー接続数"""
+        return int(self.get_sizing('pgbouncer-default-pool-size'))
+    
+    @property
+    def pgbouncer_max_client_conn(self) -> int:
+        """PgBouncerが受け付けるクライアント接続数の上限"""
+        return int(self.get_sizing('pgbouncer-max-client-conn'))
+    
+    @property
+    def load_balancer_enabled(self) -> bool:
+        """Linux VMの前段に内部ALBを配置するか"""
+        return self.get_bool('load-balancer-enabled', False)
+    
+    @property
+    def load_balancer_certificate_arn(self) -> str:
+        """ALBのHTTPSリスナーに使用する証明書のARN（ACMまたはインポート済み証明書）"""
+        return self.get_value('load-balancer-certificate-arn', '')
+    
+    @property
+    def load_balancer_domain_name(self) -> str:
+        """DifyのURLに使用するドメイン名（未指定の場合はALBのDNS名）"""
+        return self.get_value('load-balancer-domain-name', '')
+    
+    @property
+    def load_balancer_hosted_zone_name(self) -> str:
+        """ACM証明書のDNS検証に使用するパブリックホストゾーン名"""
+        return self.get_value('load-balancer-hosted-zone-name', '')
+    
+    @property
+    def load_balancer_idle_timeout(self) -> int:
+        """ALBのアイドルタイムアウト（秒）。LLMのストリーミング応答が途切れないよう長めに設定"""
+        return self.get_int('load-balancer-idle-timeout', 300)
+    
+    @property
+    def linux_deployment_mode(self) -> str:
+        """Dify（Linux側）の配置方式（instance / split / asg / ecs）"""
+        mode = self.get_value('linux-deployment-mode', 'instance')
+        if mode not in ('instance', 'split', 'asg', 'ecs'):
+            raise ValueError(f"不明なデプロイモードです: {mode}（instance / split / asg / ecs のいずれかを指定してください）")
+        return mode
+    
+    @property
+    def asg_min_capacity(self) -> int:
+        """Auto Scaling Groupの最小インスタンス数"""
+        return self.get_int('asg-min-capacity', 2)
+    
+    @property
+    def asg_max_capacity(self) -> int:
+        """Auto Scaling Groupの最大インスタンス数"""
+        capacity = self.get_int('asg-max-capacity', 4)
+        if capacity < max(1, self.asg_min_capacity):
+            raise ValueError(f"ASG_MAX_CAPACITYには1以上かつASG_MIN_CAPACITY以上の値を指定してください: {capacity}")
+        return capacity
+    
+    @property
+    def asg_scaling_metric(self) -> str:
+        """Auto Scalingの指標（requests: ALBリクエスト数 / cpu: CPU使用率）"""
+        return self.get_value('asg-scaling-metric', 'requests')
+    
+    @property
+    def asg_target_requests_per_instance(self) -> int:
+        """インスタンスあたりの目標リクエスト数（1分あたり）"""
+        return self.get_int('asg-target-requests-per-instance', 600)
+    
+    @property
+    def asg_target_cpu(self) -> int:
+        """目標CPU使用率（%）"""
+        return self.get_int('asg-target-cpu', 60)
+    
+    @property
+    def asg_warm_pool_enabled(self) -> bool:
+        """Auto Scaling Groupのウォームプールを有効にするか"""
+        return self.get_bool('asg-warm-pool-enabled', False)
+    
+    @property
+    def asg_warm_pool_state(self) -> str:
+        """ウォームプールのインスタンス状態（stopped / hibernated）"""
+        state = self.get_value('asg-warm-pool-state', 'stopped')
+        if state not in ('stopped', 'hibernated'):
+            raise ValueError(f"不明なウォームプール状態です: {state}（stopped / hibernated のいずれかを指定してください）")
+        return state
+    
+    @property
+    def asg_warm_pool_min_size(self) -> int:
+        """ウォームプールに保持する最小インスタンス数"""
+        return self.get_int('asg-warm-pool-min-size', 1)
+    
+    @property
+    def asg_spot_enabled(self) -> bool:
+        """Auto Scaling Group（API/Web層）でスポットインスタンスを使用するか"""
+        return self.get_bool('asg-spot-enabled', False)
+    
+    @property
+    def asg_instance_types(self) -> List[str]:
+        """スポット利用時に組み合わせるインスタンスタイプ（同等サイズ、カンマ区切り）"""
+        return self.get_list('asg-instance-types', 't3.large,t3a.large,m5.large,m5a.large,m6i.large,m6a.large')
+    
+    @property
+    def asg_on_demand_base_capacity(self) -> int:
+        """スポット利用時も常にオンデマンドで起動するインスタンス数"""
+        return self.get_int('asg-on-demand-base-capacity', 1)
+    
+    @property
+    def asg_on_demand_percentage(self) -> int:
+        """ベース容量を超える分のオンデマンドの割合（%）"""
+        return self.get_int('asg-on-demand-percentage', 0)
+    
+    @property
+    def worker_tier_enabled(self) -> bool:
+        """Celeryワーカーを専用のAuto Scaling Groupで実行するか"""
+        return self.get_bool('worker-tier-enabled', False)
+    
+    @property
+    def worker_instance_type(self) -> str:
+        """ワーカー層のインスタンスタイプ"""
+        return self.get_value('worker-instance-type', 't3.large')
+    
+    @property
+    def worker_min_capacity(self) -> int:
+        """ワーカー層の最小インスタンス数"""
+        return self.get_int('worker-min-capacity', 1)
+    
+    @property
+    def worker_max_capacity(self) -> int:
+        """ワーカー層の最大インスタンス数"""
+        capacity = self.get_int('worker-max-capacity', 4)
+        if capacity < max(1, self.worker_min_capacity):
+            raise ValueError(f"WORKER_MAX_CAPACITYには1以上かつWORKER_MIN_CAPACITY以上の値を指定してください: {capacity}")
+        return capacity
+    
+    @property
+    def worker_target_backlog_per_instance(self) -> int:
+        """ワーカー1台あたりの目標キュー滞留タスク数"""
+        return self.get_int('worker-target-backlog-per-instance', 20)
+    
+    @property
+    def worker_concurrency(self) -> int:
+        """ワーカー1台あたりのCeleryプロセス数（0の場合はDifyの既定値）"""
+        return self.get_int('worker-concurrency', 0)
+    
+    @property
+    def worker_spot_enabled(self) -> bool:
+        """ワーカー層でスポットインスタンスを使用するか"""
+        return self.get_bool('worker-spot-enabled', False)
+    
+    @property
+    def worker_instance_types(self) -> List[str]:
+        """ワーカー層のスポット利用時に組み合わせるインスタンスタイプ（同等サイズ、カンマ区切り）"""
+        return self.get_list('worker-instance-types', 't3.large,t3a.large,m5.large,m5a.large,m6i.large,m6a.large')
+    
+    @property
+    def worker_on_demand_base_capacity(self) -> int:
+        """ワーカー層でスポット利用時も常にオンデマンドで起動するインスタンス数"""
+        return self.get_int('worker-on-demand-base-capacity', 0)
+    
+    @property
+    def worker_on_demand_percentage(self) -> int:
+        """ワーカー層のベース容量を超える分のオンデマンドの割合（%）"""
+        return self.get_int('worker-on-demand-percentage', 0)
+    
+    @property
+    def dify_version(self) -> str:
+        """ECS構成で使用するDifyのコンテナイメージのバージョン"""
+        return self.get_value('dify-version', '1.4.3')
+    
+    @property
+    def ecs_target_cpu(self) -> int:
+        """ECSサービスの目標CPU使用率（%）"""
+        return self.get_int('ecs-target-cpu', 60)
+    
+    @property
+    def ecs_sandbox_network_enabled(self) -> bool:
+        """ECS構成のサンドボックスで実行するコードからのネットワーク接続を許可するか（SSRFプロキシを経由しない）"""
+        return self.get_bool('ecs-sandbox-network-enabled', False)
+    
+    @property
+    def observability_enabled(self) -> bool:
+        """CloudWatch Agent・ダッシュボード・アラームを作成するか"""
+        return self.get_bool('observability-enabled', False)
+    
+    @property
+    def alarm_email(self) -> str:
+        """アラーム通知先のメールアドレス（未指定の場合はSNSトピックのみ作成）"""
+        return self.get_value('alarm-email', '')
+    
+    @property
+    def alarm_cpu_credit_balance(self) -> int:
+        """CPUクレジット残高のアラームしきい値（バースト可能インスタンスのみ）"""
+        return self.get_int('alarm-cpu-credit-balance', 50)
+    
+    @property
+    def alarm_memory_percent(self) -> int:
+        """メモリ使用率のアラームしきい値（%）"""
+        return self.get_int('alarm-memory-percent', 90)
+    
+    @property
+    def alarm_disk_percent(self) -> int:
+        """ルートボリューム使用率のアラームしきい値（%）"""
+        return self.get_int('alarm-disk-percent', 85)
+    
+    @property
+    def alarm_disk_io_percent(self) -> int:
+        """ルートボリュームのI/Oビジー率のアラームしきい値（%）"""
+        return self.get_int('alarm-disk-io-percent', 90)
+    
+    @property
+    def log_shipping_enabled(self) -> bool:
+        """DifyコンテナのログをCloudWatch Logsに転送するか"""
+        return self.get_bool('log-shipping-enabled', False)
+    
+    @property
+    def log_shipping_services(self) -> List[str]:
+        """ログを転送するDocker Composeのサービス（カンマ区切り）"""
+        return self.get_list('log-shipping-services', 'api,worker,nginx,db')
+    
+    @property
+    def log_retention_days(self) -> int:
+        """転送したログの保持期間（日数）"""
+        return self.get_int('log-retention-days', 30)
+    
+    @property
+    def log_slow_request_seconds(self) -> int:
+        """低速リクエストとして集計するnginxの応答時間（秒）"""
+        return self.get_int('log-slow-request-seconds', 10)
+    
+    @property
+    def tracing_enabled(self) -> bool:
+        """OpenTelemetryによるDifyのトレースを有効にするか"""
+        return self.get_bool('tracing-enabled', False)
+    
+    @property
+    def tracing_exporter(self) -> str:
+        """トレースの出力先（xray / file）"""
+        exporter = self.get_value('tracing-exporter', 'xray')
+        if exporter not in ('xray', 'file'):
+            raise ValueError(f"不明なトレースの出力先です: {exporter}（xray / file のいずれかを指定してください）")
+        return exporter
+    
+    @property
+    def tracing_sample_rate(self) -> float:
+        """トレースのサンプリング率（0〜1）"""
+        rate = float(self.get_value('tracing-sample-rate', 0.1))
+        if not 0 <= rate <= 1:
+            raise ValueError(f"TRACING_SAMPLE_RATEには0〜1の値を指定してください: {rate}")
+        return rate
+    
+    @property
+    def otel_collector_image(self) -> str:
+        """OpenTelemetry Collectorのコンテナイメージ"""
+        return self.get_value('otel-collector-image', 'otel/opentelemetry-collector-contrib:0.116.1')
+    
+    @property
+    def blue_green_enabled(self) -> bool:
+        """Linux VMの置き換え時に新しいインスタンスの正常性を確認してから切り替えるか"""
+        return self.get_bool('blue-green-enabled', False)
+    
+    @property
+    def blue_green_timeout_minutes(self) -> int:
+        """新しいインスタンスのセットアップ・ヘルスチェックを待つ時間（分）"""
+        return self.get_int('blue-green-timeout-minutes', 30)
+    
+    @property
+    def blue_green_dns_name(self) -> str:
+        """ALBを使用しない場合に作成するプライベートDNS名"""
+        return self.get_value('blue-green-dns-name', 'dify.internal')
+    
+    @property
+    def snapshot_enabled(self) -> bool:
+        """Difyのデータ用ボリュームのスナップショットをData Lifecycle Managerで取得するか"""
+        return self.get_bool('snapshot-enabled', False)
+    
+    @property
+    def snapshot_interval_hours(self) -> int:
+        """スナップショットの取得間隔（時間）"""
+        hours = self.get_int('snapshot-interval-hours', 24)
+        if hours not in (1, 2, 3, 4, 6, 8, 12, 24):
+            raise ValueError(f"SNAPSHOT_INTERVAL_HOURSには1,2,3,4,6,8,12,24のいずれかを指定してください: {hours}")
+        return hours
+    
+    @property
+    def snapshot_time(self) -> str:
+        """スナップショットの取得開始時刻（UTC、HH:MM）"""
+        return self.get_value('snapshot-time', '18:00')
+    
+    @property
+    def snapshot_retain_count(self) -> int:
+        """保持するスナップショットの世代数"""
+        return self.get_int('snapshot-retain-count', 7)
+    
+    @property
+    def snapshot_fast_restore_count(self) -> int:
+        """高速スナップショット復元（FSR）を有効にする最新のスナップショットの数（0の場合は無効）"""
+        count = self.get_int('snapshot-fast-restore-count', 1)
+        if count > self.snapshot_retain_count:
+            raise ValueError(f"SNAPSHOT_FAST_RESTORE_COUNTにはSNAPSHOT_RETAIN_COUNT以下の値を指定してください: {count}")
+        return count
+    
+    @property
+    def data_volume_enabled(self) -> bool:
+        """Difyのデータをルートボリューム以外のデータ用ボリュームに格納するか（スナップショットの取得・復元時）"""
+        return self.snapshot_enabled or bool(self.snapshot_restore_id)
+    
+    @property
+    def snapshot_data_volume_size(self) -> int:
+        """Difyのデータ用ボリュームのサイズ（GB）"""
+        return self.get_int('snapshot-data-volume-size', 100)
+    
+    @property
+    def snapshot_restore_id(self) -> str:
+        """データ用ボリュームの復元元のスナップショットID（未指定の場合は空のボリュームを作成）"""
+        return self.get_value('snapshot-restore-id', '')
+    
+    @property
+    def local_inference_enabled(self) -> bool:
+        """埋め込み・リランクをDifyのホスト上のText Embeddings Inferenceで実行するか"""
+        return self.get_bool('local-inference-enabled', False)
+    
+    @property
+    def local_inference_image(self) -> str:
+        """Text Embeddings Inference（CPU版）のコンテナイメージ"""
+        return self.get_value('local-inference-image', 'ghcr.io/huggingface/text-embeddings-inference:cpu-1.7')
+    
+    @property
+    def local_embedding_model(self) -> str:
+        """埋め込みモデル（Hugging Face HubのモデルID）"""
+        return self.get_value('local-embedding-model', 'intfloat/multilingual-e5-base')
+    
+    @property
+    def local_rerank_model(self) -> str:
+        """リランクモデル（Hugging Face HubのモデルID、空の場合はリランクのサービスを作成しない）"""
+        return self.get_value('local-rerank-model', 'BAAI/bge-reranker-v2-m3')
+    
+    @property
+    def local_inference_max_batch_tokens(self) -> int:
+        """1回のバッチで処理する最大トークン数"""
+        return self.get_int('local-inference-max-batch-tokens', 16384)
+    
+    @property
+    def nginx_tuning_enabled(self) -> bool:
+        """Dify同梱のnginxの設定（圧縮・keep-alive・バッファリング・キャッシュ）を上書きするか"""
+        return self.get_bool('nginx-tuning-enabled', True)
+    
+    @property
+    def hibernation_enabled(self) -> bool:
+        """Windows VM・Linux VMの休止状態（ハイバネーション）を有効にするか"""
+        return self.get_bool('hibernation-enabled', False)
+    
+    @property
+    def power_schedule_enabled(self) -> bool:
+        """Windows VM・Linux VMを時間帯で停止（休止状態）・起動するか"""
+        return self.get_bool('power-schedule-enabled', False)
+    
+    @property
+    def power_schedule_stop(self) -> str:
+        """停止（休止状態）するスケジュール（EventBridge Schedulerのcron式）"""
+        return self.get_value('power-schedule-stop', 'cron(0 20 ? * MON-FRI *)')
+    
+    @property
+    def power_schedule_start(self) -> str:
+        """起動するスケジュール（EventBridge Schedulerのcron式）"""
+        return self.get_value('power-schedule-start', 'cron(0 8 ? * MON-FRI *)')
+    
+    @property
+    def power_schedule_timezone(self) -> str:
+        """スケジュールのタイムゾーン"""
+        return self.get_value('power-schedule-timezone', 'Asia/Tokyo')
+    
+    @property
+    def llm_gateway_enabled(self) -> bool:
+        """Difyとモデルプロバイダーの間にLLMゲートウェイ（LiteLLM Proxy）を配置するか"""
+        return self.get_bool('llm-gateway-enabled', False)
+    
+    @property
+    def llm_gateway_image(self) -> str:
+        """LiteLLM Proxyのコンテナイメージ"""
+        return self.get_value('llm-gateway-image', 'ghcr.io/berriai/litellm:main-stable')
+    
+    @property
+    def llm_gateway_models(self) -> Dict[str, str]:
+        """ゲートウェイで公開するモデル（Difyに登録するモデル名 -> プロバイダー/モデルID）"""
+        models = {}
+        for item in self.get_list(
+            'llm-gateway-models',
+            'claude-sonnet=bedrock/apac.anthropic.claude-sonnet-4-20250514-v1:0,'
+            'titan-embed=bedrock/amazon.titan-embed-text-v2:0'
+        ):
+            name, _, model = item.partition('=')
+            if not name.strip() or '/' not in model:
+                raise ValueError(f"LLM_GATEWAY_MODELSには「モデル名=プロバイダー/モデルID」の形式で指定してください: {item}")
+            models[name.strip()] = model.strip()
+        return models
+    
+    @property
+    def llm_gateway_provider_limits(self) -> Dict[str, int]:
+        """プロバイダーごとの同時リクエスト数の上限（プロバイダー -> 上限）"""
+        limits = {}
+        for item in self.get_list('llm-gateway-provider-limits', 'bedrock=8,openai=16,anthropic=16'):
+            provider, _, limit = item.partition('=')
+            if not limit.strip().isdigit() or int(limit) < 1:
+                raise ValueError(f"LLM_GATEWAY_PROVIDER_LIMITSには「プロバイダー=上限」の形式で1以上の値を指定してください: {item}")
+            limits[provider.strip()] = int(limit)
+        return limits
+    
+    @property
+    def llm_gateway_api_key_secret(self) -> str:
+        """Bedrock以外のプロバイダーのAPIキーを格納したSecrets Managerのシークレット名"""
+        return self.get_value('llm-gateway-api-key-secret', '')
+    
+    @property
+    def llm_gateway_cache_ttl(self) -> int:
+        """応答キャッシュの有効期間（秒）"""
+        return self.get_int('llm-gateway-cache-ttl', 3600)
+    
+    @property
+    def llm_gateway_semantic_cache(self) -> bool:
+        """意味的に類似したプロンプトの応答もキャッシュから返すか（セマンティックキャッシュ）"""
+        return self.get_bool('llm-gateway-semantic-cache', False)
+    
+    @property
+    def llm_gateway_semantic_cache_model(self) -> str:
+        """セマンティックキャッシュの埋め込みに使用するモデル名（LLM_GATEWAY_MODELSのモデル名）"""
+        return self.get_value('llm-gateway-semantic-cache-model', 'titan-embed')
+    
+    @property
+    def llm_gateway_semantic_cache_threshold(self) -> float:
+        """セマンティックキャッシュで同一とみなす類似度の下限（0〜1）"""
+        threshold = float(self.get_value('llm-gateway-semantic-cache-threshold', 0.9))
+        if not 0 < threshold <= 1:
+            raise ValueError(f"LLM_GATEWAY_SEMANTIC_CACHE_THRESHOLDには0より大きく1以下の値を指定してください: {threshold}")
+        return threshold
+    
+    @property
+    def ingestion_enabled(self) -> bool:
+        """S3・SQS・LambdaによるDifyのナレッジへの一括登録を有効にするか"""
+        return self.get_bool('ingestion-enabled', False)
+    
+    @property
+    def ingestion_batch_size(self) -> int:
+        """Lambda関数が1回の実行で受け取るメッセージ（ファイル）の数"""
+        return self.get_int('ingestion-batch-size', 10)
+    
+    @property
+    def ingestion_max_concurrency(self) -> int:
+        """Lambda関数の最大同時実行数（2〜1000）"""
+        concurrency = self.get_int('ingestion-max-concurrency', 2)
+        if not 2 <= concurrency <= 1000:
+            raise ValueError(f"INGESTION_MAX_CONCURRENCYには2〜1000の値を指定してください: {concurrency}")
+        return concurrency
+    
+    @property
+    def ingestion_upload_concurrency(self) -> int:
+        """Lambda関数の1回の実行内で並行して登録するファイルの数"""
+        return self.get_int('ingestion-upload-concurrency', 4)
+    
+    @property
+    def ingestion_max_queue_length(self) -> int:
+        """登録を後回しにするワーカーのキュー滞留数（ワーカー層の使用時）"""
+        return self.get_int('ingestion-max-queue-length', 100)
+    
+    @property
+    def ingestion_indexing_technique(self) -> str:
+        """インデックスの作成方法（high_quality / economy）"""
+        technique = self.get_value('ingestion-indexing-technique', 'high_quality')
+        if technique not in ('high_quality', 'economy'):
+            raise ValueError(f"不明なインデックスの作成方法です: {technique}（high_quality / economy のいずれかを指定してください）")
+        return technique
+    
+    @property
+    def ingestion_retention_days(self) -> int:
+        """受け付け用バケットのファイルを保持する日数"""
+        return self.get_int('ingestion-retention-days', 30)
+    
+    @property
+    def load_generator_enabled(self) -> bool:
+        """負荷試験用の負荷生成VMを作成するか"""
+        return self.get_bool('load-generator-enabled', False)
+    
+    @property
+    def load_generator_instance_type(self) -> str:
+        """負荷生成VMのインスタンスタイプ"""
+        return self.get_value('load-generator-instance-type', 'c6i.large')
+    
     @property
     def windows_admin_username(self) -> str:
         """Windows VMの管理者ユーザー名"""
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+"""
+インスタンスタイプの仕様
+
+このモジュールは、Dify用VMで使用するEC2インスタンスタイプのvCPU数とメモリ量を定義します。
+合成時にAWSのAPIを呼び出さずに、インスタンスタイプに応じたサイズ（休止状態用のルートボリューム、
+nginxの接続数等）を決めるために使用します。
+"""
+
+import math
+import re
+from typing import Dict, Optional, Tuple
+
+
+# バースト可能インスタンス（T系）のサイズごとの vCPU数・メモリ（GiB）
+BURSTABLE_SIZES: Dict[str, Tuple[int, float]] = {
+    "nano": (2, 0.5),
+    "micro": (2, 1),
+    "small": (2, 2),
+    "medium": (2, 4),
+    "large": (2, 8),
+    "xlarge": (4, 16),
+    "2xlarge": (8, 32),
+}
+
+# 汎用・コンピューティング・メモリ最適化のファミリーごとのvCPUあたりのメモリ（GiB）
+MEMORY_PER_VCPU: Dict[str, int] = {
+    "m": 4,
+    "c": 2,
+    "r": 8,
+}
+
+# x86_64のファミリー（Ubuntu AMIと同じアーキテクチャ、世代5〜7）
+FAMILY_PATTERN = re.compile(r"^([mcr])([5-7])(a|i)?$")
+BURSTABLE_PATTERN = re.compile(r"^t3a?$")
+
+
+def instance_spec(instance_type: str) -> Optional[Tuple[int, float]]:
+    """
+    インスタンスタイプのvCPU数とメモリ量を取得する
+
+    Args:
+        instance_type: インスタンスタイプ（例: t3.large）
+
+    Returns:
+        (vCPU数, メモリ（GiB）)、未知のインスタンスタイプの場合はNone
+    """
+    family, _, size = instance_type.partition(".")
+
+    if BURSTABLE_PATTERN.match(family):
+        return BURSTABLE_SIZES.get(size)
+
+    match = FAMILY_PATTERN.match(family)
+    if not match:
+        return None
+    if size == "large":
+        vcpus = 2
+    elif size == "xlarge":
+        vcpus = 4
+    elif re.match(r"^\d+xlarge$", size):
+        vcpus = 4 * int(size[:-len("xlarge")])
+    else:
+        return None
+    return vcpus, vcpus * MEMORY_PER_VCPU[match.group(1)]
+
+
+def hibernation_volume_size(instance_type: str, volume_size: int, used_size: int, max_memory: int) -> int:
+    """
+    休止状態を有効にする場合のルートボリュームのサイズを取得する
+
+    休止状態ではメモリの内容をルートボリューム（Linuxはスワップファイル、Windowsはhiberfil.sys）に
+    書き出すため、使用済みの容量にメモリ量を加えたサイズが必要です。
+
+    Args:
+        instance_type: インスタンスタイプ
+        volume_size: 指定されたルートボリュームのサイズ（GB）
+        used_size: OS・アプリケーションが使用する容量（GB）
+        max_memory: 休止状態に対応するメモリ量の上限（GiB）
+
+    Returns:
+        ルートボリュームのサイズ（GB、未知のインスタンスタイプの場合は指定されたサイズ）
+    """
+    spec = instance_spec(instance_type)
+    if spec is None:
+        return volume_size
+    memory = spec[1]
+    if memory > max_memory:
+        raise ValueError(f"{instance_type}のメモリ（{memory:g}GiB）は休止状態の上限（{max_memory}GiB）を超えています")
+    return max(volume_size, used_size + math.ceil(memory))
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""
+キャッシュコンストラクト
+
+このモジュールは、Dify用のElastiCache（Valkey / Redis）を定義します。
+"""
+
+from constructs import Construct
+from aws_cdk import aws_ec2 as ec2
+from aws_cdk import aws_elasticache as elasticache
+from aws_cdk import aws_secretsmanager as secretsmanager
+from aws_cdk import Tags, CfnOutput
+
+from dify_cdk.constructs.dify_runtime import DifyRuntimeSettings
+
+
+class CacheConstruct(Construct):
+    """DifyのキャッシュおよびCeleryブローカーとしてElastiCacheを作成するコンストラクト"""
+
+    # エンジンごとのバージョン
+    ENGINE_VERSIONS = {
+        "valkey": "8.0",
+        "redis": "7.1",
+    }
+
+    PORT = 6379
+
+    def __init__(
+        self,
+        scope: Construct,
+        id: str,
+        vpc: ec2.Vpc,
+        app_security_group: ec2.SecurityGroup,
+        config,
+        **kwargs
+    ):
+        """
+        コンストラクタ
+
+        Args:
+            scope: 親スコープ
+            id: コンストラクトID
+            vpc: VPCインスタンス
+            app_security_group: Difyアプリケーション（Linux VM）のセキュリティグループ
+            config: 設定オブジェクト
+            **kwargs: その他の引数
+        """
+        super().__init__(scope, id)
+
+        engine = config.cache_engine
+        if engine not in self.ENGINE_VERSIONS:
+            raise ValueError(f"不明なキャッシュエンジンです: {engine}（{' / '.join(self.ENGINE_VERSIONS)} のいずれかを指定してください）")
+
+        # キャッシュ用のセキュリティグループ
+        self.security_group = ec2.SecurityGroup(
+            self, "CacheSG",
+            vpc=vpc,
+            description="Security group for Dify cache",
+            allow_all_outbound=False
+        )
+
+        # Linux VMからのRedis接続を許可
+        self.security_group.add_ingress_rule(
+            app_security_group,
+            ec2.Port.tcp(self.PORT),
+            "Allow Redis from Linux VM"
+        )
+
+        # AUTHトークン（URLに埋め込むため記号を除外）
+        self.auth_secret = secretsmanager.Secret(
+            self, "AuthToken",
+            secret_name=f"/dify/{id}/auth-token",
+            description="Dify cache AUTH token",
+            generate_secret_string=secretsmanager.SecretStringGenerator(
+                secret_string_template="{}",
+                generate_string_key="password",
+                exclude_punctuation=True,
+                password_length=64
+            )
+        )
+
+        # 隔離サブネットに配置（NetworkConstructで作成済み）
+        subnet_group = elasticache.CfnSubnetGroup(
+            self, "SubnetGroup",
+            description="Subnet group for Dify cache",
+            subnet_ids=vpc.select_subnets(
+                subnet_type=ec2.SubnetType.PRIVATE_ISOLATED
+            ).subnet_ids
+        )
+
+        num_nodes = config.cache_num_nodes
+        self.replication_group = elasticache.CfnReplicationGroup(
+            self, "ReplicationGroup",
+            replication_group_description="Dify cache and Celery broker",
+            engine=engine,
+            engine_version=self.ENGINE_VERSIONS[engine],
+            cache_node_type=config.cache_node_type,
+            num_cache_clusters=num_nodes,
+            automatic_failover_enabled=num_nodes > 1,
+            multi_az_enabled=num_nodes > 1,
+            cache_subnet_group_name=subnet_group.ref,
+            security_group_ids=[self.security_group.security_group_id],
+            port=self.PORT,
+            transit_encryption_enabled=True,
+            at_rest_encryption_enabled=True,
+            auth_token=self.auth_secret.secret_value_from_json("password").unsafe_unwrap()
+        )
+
+        # タグの追加
+        Tags.of(self.replication_group).add("Name", f"{id}-cache")
+
+        # 出力の設定
+        CfnOutput(
+            self, "Endpoint",
+            value=self.host,
+            description="Dify cache primary endpoint"
+        )
+
+    @property
+    def host(self) -> str:
+        """プライマリエンドポイントのホスト名"""
+        return self.replication_group.attr_primary_end_point_address
+
+    def configure_dify(self, settings: DifyRuntimeSettings) -> None:
+        """
+        Difyのキャッシュ・Celeryブローカーの接続先をこのElastiCacheに設定する
+
+        Args:
+            settings: Dify実行時設定
+        """
+        settings.set_secret_env("REDIS_PASSWORD", self.auth_secret, "password")
+        settings.set_env(
+            REDIS_HOST=self.host,
+            REDIS_PORT=self.PORT,
+            REDIS_USERNAME="",
+            REDIS_USE_SSL="true",
+            REDIS_DB=0,
+            CELERY_BROKER_URL=f"rediss://:${{REDIS_PASSWORD}}@{self.host}:{self.PORT}/1",
+            BROKER_USE_SSL="true"
+        )
+
+        # コンテナのRedisを無効化
+        settings.disable_service("redis")
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+
+"""
+データベースコンストラクト
+
+このモジュールは、Dify用のマネージドPostgreSQL（RDS / Aurora）を定義します。
+"""
+
+from constructs import Construct
+from aws_cdk import aws_ec2 as ec2
+from aws_cdk import aws_rds as rds
+from aws_cdk import Duration, RemovalPolicy, Tags, Token, CfnOutput
+
+from dify_cdk.constructs.dify_runtime import DifyRuntimeSettings
+
+
+class DatabaseConstruct(Construct):
+    """DifyのデータベースとしてRDS / Aurora PostgreSQLを作成するコンストラクト"""
+
+    # Difyが使用するデータベース名
+    DATABASE_NAME = "dify"
+
+    # マスターユーザー名（"postgres" は予約語のため使用しない）
+    MASTER_USERNAME = "dify_admin"
+
+    def __init__(
+        self,
+        scope: Construct,
+        id: str,
+        vpc: ec2.Vpc,
+        app_security_group: ec2.SecurityGroup,
+        config,
+        **kwargs
+    ):
+        """
+        コンストラクタ
+
+        Args:
+            scope: 親スコープ
+            id: コンストラクトID
+            vpc: VPCインスタンス
+            app_security_group: Difyアプリケーション（Linux VM）のセキュリティグループ
+            config: 設定オブジェクト
+            **kwargs: その他の引数
+        """
+        super().__init__(scope, id)
+
+        self.config = config
+
+        # データベース用のセキュリティグループ
+        self.security_group = ec2.SecurityGroup(
+            self, "DatabaseSG",
+            vpc=vpc,
+            description="Security group for Dify database",
+            allow_all_outbound=False
+        )
+
+        # Linux VMからのPostgreSQL接続を許可
+        self.security_group.add_ingress_rule(
+            app_security_group,
+            ec2.Port.tcp(5432),
+            "Allow PostgreSQL from Linux VM"
+        )
+
+        # 認証情報（Secrets Managerで自動生成）
+        credentials = rds.Credentials.from_generated_secret(
+            self.MASTER_USERNAME,
+            secret_name=f"/dify/{id}/credentials"
+        )
+
+        # 隔離サブネットに配置（NetworkConstructで作成済み）
+        vpc_subnets = ec2.SubnetSelection(subnet_type=ec2.SubnetType.PRIVATE_ISOLATED)
+        instance_type = ec2.InstanceType(config.database_instance_class)
+
+        if config.database_mode == "aurora":
+            self.database = self._create_aurora_cluster(vpc, vpc_subnets, instance_type, credentials)
+            self.endpoint = self.database.cluster_endpoint
+        else:
+            self.database = self._create_rds_instance(vpc, vpc_subnets, instance_type, credentials)
+            self.endpoint = self.database.instance_endpoint
+
+        self.secret = self.database.secret
+
+        # タグの追加
+        Tags.of(self.database).add("Name", f"{id}-database")
+
+        # 出力の設定
+        CfnOutput(
+            self, "Endpoint",
+            value=self.endpoint.hostname,
+            description="Dify database endpoint"
+        )
+
+        CfnOutput(
+            self, "SecretArn",
+            value=self.secret.secret_arn,
+            description="Dify database credentials secret ARN"
+        )
+
+    def _create_rds_instance(
+        self,
+        vpc: ec2.Vpc,
+        vpc_subnets: ec2.SubnetSelection,
+        instance_type: ec2.InstanceType,
+        credentials: rds.Credentials
+    ) -> rds.DatabaseInstance:
+        """
+        RDS PostgreSQLインスタンスを作成
+
+        Args:
+            vpc: VPCインスタンス
+            vpc_subnets: 配置するサブネット
+            instance_type: インスタンスクラス
+            credentials: 認証情報
+
+        Returns:
+            RDSインスタンス
+        """
+        iops = self.config.database_iops
+
+        return rds.DatabaseInstance(
+            self, "Instance",
+            engine=rds.DatabaseInstanceEngine.postgres(
+                version=rds.PostgresEngineVersion.VER_16_4
+            ),
+            vpc=vpc,
+            vpc_subnets=vpc_subnets,
+            security_groups=[self.security_group],
+            instance_type=instance_type,
+            credentials=credentials,
+            database_name=self.DATABASE_NAME,
+            allocated_storage=self.config.database_allocated_storage,
+            storage_type=rds.StorageType.GP3,
+            iops=iops or None,  # 0の場合はgp3のベースラインIOPS
+            storage_encrypted=True,
+            enable_performance_insights=self.config.database_performance_insights,
+            backup_retention=Duration.days(7),
+            removal_policy=RemovalPolicy.SNAPSHOT
+        )
+
+    def _create_aurora_cluster(
+        self,
+        vpc: ec2.Vpc,
+        vpc_subnets: ec2.SubnetSelection,
+        instance_type: ec2.InstanceType,
+        credentials: rds.Credentials
+    ) -> rds.DatabaseCluster:
+        """
+        Aurora PostgreSQLクラスターを作成
+
+        Args:
+            vpc: VPCインスタンス
+            vpc_subnets: 配置するサブネット
+            instance_type: インスタンスクラス
+            credentials: 認証情報
+
+        Returns:
+            Auroraクラスター
+        """
+        # IOPSを指定した場合はI/O最適化ストレージを使用（Auroraはストレージ単位のIOPS指定不可）
+        storage_type = (
+            rds.DBClusterStorageType.AURORA_IOPT1
+            if self.config.database_iops
+            else rds.DBClusterStorageType.AURORA
+        )
+
+        return rds.DatabaseCluster(
+            self, "Cluster",
+            engine=rds.DatabaseClusterEngine.aurora_postgres(
+                version=rds.AuroraPostgresEngineVersion.VER_16_4
+            ),
+            vpc=vpc,
+            vpc_subnets=vpc_subnets,
+            security_groups=[self.security_group],
+            writer=rds.ClusterInstance.provisioned(
+                "Writer",
+                instance_type=instance_type,
+                enable_performance_insights=self.config.database_performance_insights
+            ),
+            credentials=credentials,
+            default_database_name=self.DATABASE_NAME,
+            storage_type=storage_type,
+            storage_encrypted=True,
+            backup=rds.BackupProps(retention=Duration.days(7)),
+            removal_policy=RemovalPolicy.SNAPSHOT
+        )
+
+    def configure_dify(self, settings: DifyRuntimeSettings) -> None:
+        """
+        Difyの接続先をこのデータベースに設定する
+
+        Args:
+            settings: Dify実行時設定
+        """
+        host = self.endpoint.hostname
+        port = Token.as_string(self.endpoint.port)
+
+        settings.set_env(
+            DB_HOST=host,
+            DB_PORT=port,
+            DB_DATABASE=self.DATABASE_NAME
+        )
+        settings.set_secret_env("DB_USERNAME", self.secret, "username")
+        settings.set_secret_env("DB_PASSWORD", self.secret, "password")
+
+        # コンテナのPostgreSQLを無効化
+        settings.disable_service("db")
+
+        if self.config.database_pgvector:
+            # pgvector拡張を有効化し、Weaviateの代わりにベクトルストアとして使用
+            settings.add_pre_start_commands(
+                "docker run --rm -e PGPASSWORD=\"${DB_PASSWORD}\" postgres:16-alpine \\",
+                f"    psql -h {host} -p {port} -U \"${{DB_USERNAME}}\" -d {self.DATABASE_NAME} \\",
+                "    -c 'CREATE EXTENSION IF NOT EXISTS vector;'"
+            )
+            settings.set_env(
+                VECTOR_STORE="pgvector",
+                PGVECTOR_HOST=host,
+                PGVECTOR_PORT=port,
+                PGVECTOR_USER="${DB_USERNAME}",
+                PGVECTOR_PASSWORD="${DB_PASSWORD}",
+                PGVECTOR_DATABASE=self.DATABASE_NAME
+            )
+            settings.disable_service("weaviate")
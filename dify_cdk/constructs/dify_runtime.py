@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+
+"""
+Dify実行時設定
+
+このモジュールは、Linux VM上のDify（Docker Compose）に適用する実行時設定を定義します。
+マネージドサービス等のコンストラクトが.envの値やdocker-compose.override.yamlの内容を登録し、
+Linux VMのユーザーデータがそれらを起動前に適用します。
+設定ストア（RuntimeConfigConstruct）に登録した.envの値は、ユーザーデータに含めず起動時にSSMパラメータストアから取得します。
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from aws_cdk import aws_secretsmanager as secretsmanager
+
+
+# .envの値を格納するSSMパラメータのパス（RuntimeConfigConstructと共通）
+CONFIG_PARAMETER_PATH = "/dify/config"
+
+
+class YamlTag(str):
+    """YAMLにそのまま出力するタグ付きの値（例: "!reset []"）"""
+
+
+# docker-compose.override.yamlで既存の設定を打ち消すための値
+COMPOSE_RESET_LIST = YamlTag("!reset []")
+
+
+def to_yaml(value: Any, indent: int = 0) -> List[str]:
+    """
+    辞書・リストをYAMLの行リストに変換する
+
+    docker-compose.override.yamlの生成用の最小限の実装です。
+    文字列はJSON形式（ダブルクォート）で出力します。
+
+    Args:
+        value: 変換する値
+        indent: インデントの深さ
+
+    Returns:
+        YAMLの行リスト
+    """
+    pad = "  " * indent
+    lines = []
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if isinstance(item, (dict, list)) and item:
+                lines.append(f"{pad}{key}:")
+                lines.extend(to_yaml(item, indent + 1))
+            else:
+                lines.append(f"{pad}{key}: {_yaml_scalar(item)}")
+    elif isinstance(value, list):
+        for item in value:
+            if isinstance(item, (dict, list)) and item:
+                sub_lines = to_yaml(item, indent + 1)
+                lines.append(f"{pad}- {sub_lines[0].lstrip()}")
+                lines.extend(sub_lines[1:])
+            else:
+                lines.append(f"{pad}- {_yaml_scalar(item)}")
+    else:
+        lines.append(f"{pad}{_yaml_scalar(value)}")
+    return lines
+
+
+def _yaml_scalar(value: Any) -> str:
+    """
+    スカラー値をYAML表現に変換する
+
+    Args:
+        value: 変換する値
+
+    Returns:
+        YAML表現の文字列
+    """
+    if isinstance(value, YamlTag):
+        return str(value)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if value is None:
+        return "null"
+    if isinstance(value, dict):
+        return "{}"
+    if isinstance(value, list):
+        return "[]"
+    return json.dumps(str(value), ensure_ascii=False)
+
+
+class DifyRuntimeSettings:
+    """Difyの.envとDocker Compose構成への変更を集約するクラス"""
+
+    def __init__(self):
+        """
+        コンストラクタ
+        """
+        # .envに追記する値（後勝ちで既定値を上書き）
+        self.env: Dict[str, str] = {}
+
+        # Secrets Managerから起動時に取得する値（環境変数名 -> (シークレット, JSONフィールド)）
+        self.secret_env: Dict[str, Tuple[secretsmanager.ISecret, str]] = {}
+
+        # docker-compose.override.yamlのservicesセクション
+        self.compose_services: Dict[str, Dict[str, Any]] = {}
+
+        # docker compose up の前に実行するコマンド
+        self.pre_start_commands: List[str] = []
+
+        # 起動前処理でAWS CLIを使用するか（Secrets Manager以外の用途）
+        self.uses_aws_cli = False
+
+        # .envの値を登録する設定ストア（RuntimeConfigConstruct）
+        self.config_store: Optional[Any] = None
+
+        # 起動時にSSMパラメータストアから取得する値のスコープ（後のスコープの値で上書き）
+        self.config_scopes: List[str] = []
+
+        # 設定ストアに登録済みの.envの値
+        self.published_env: Dict[str, str] = {}
+
+    @property
+    def secrets(self) -> List[secretsmanager.ISecret]:
+        """起動時に読み取るシークレットの一覧（重複なし）"""
+        secrets = []
+        for secret, _ in self.secret_env.values():
+            if secret not in secrets:
+                secrets.append(secret)
+        return secrets
+
+    @property
+    def is_empty(self) -> bool:
+        """適用する設定が存在しないか"""
+        return not (self.env or self.secret_env or self.compose_services or self.pre_start_commands)
+
+    def runs_service(self, name: str) -> bool:
+        """
+        Docker Composeサービスを実行するか（無効化されていないか）
+
+        Args:
+            name: サービス名
+
+        Returns:
+            実行する場合True
+        """
+        return "profiles" not in self.compose_services.get(name, {})
+
+    def copy(self) -> "DifyRuntimeSettings":
+        """
+        設定の複製を作成する（役割ごとに異なる構成のホストを作成する場合）
+
+        Returns:
+            複製した実行時設定
+        """
+        settings = DifyRuntimeSettings()
+        settings.env = dict(self.env)
+        settings.secret_env = dict(self.secret_env)
+        settings.compose_services = {name: dict(spec) for name, spec in self.compose_services.items()}
+        settings.pre_start_commands = list(self.pre_start_commands)
+        settings.uses_aws_cli = self.uses_aws_cli
+        settings.config_store = self.config_store
+        settings.config_scopes = list(self.config_scopes)
+        settings.published_env = dict(self.published_env)
+        return settings
+
+    def set_env(self, **values: Any) -> None:
+        """
+        .envの値を設定する
+
+        値には、登録済みのシークレット（set_secret_env）をシェル変数 ${名前} として埋め込めます。
+
+        Args:
+            **values: 環境変数名と値
+        """
+        for name, value in values.items():
+            self.env[name] = str(value)
+
+    def set_secret_env(self, name: str, secret: secretsmanager.ISecret, field: str) -> None:
+        """
+        Secrets Managerのシークレットから取得した値を.envに設定する
+
+        Args:
+            name: 環境変数名
+            secret: シークレット
+            field: シークレット（JSON）のフィールド名
+        """
+        self.secret_env[name] = (secret, field)
+
+    def override_service(self, name: str, **spec: Any) -> None:
+        """
+        Docker Composeサービスの設定を上書き（または追加）する
+
+        Args:
+            name: サービス名
+            **spec: サービス定義
+        """
+        self.compose_services.setdefault(name, {}).update(spec)
+
+    def disable_service(self, name: str, dependents: Tuple[str, ...] = ("api", "worker")) -> None:
+        """
+        Docker Composeサービスを無効化する（外部のマネージドサービスに置き換える場合）
+
+        Args:
+            name: 無効化するサービス名
+            dependents: depends_onを解除するサービス名
+        """
+        self.override_service(name, profiles=["external"])
+        for dependent in dependents:
+            self.override_service(dependent, depends_on=COMPOSE_RESET_LIST)
+
+    def add_pre_start_commands(self, *commands: str, aws_cli: bool = False) -> None:
+        """
+        docker compose up の前に実行するコマンドを追加する
+
+        Args:
+            *commands: シェルコマンド
+            aws_cli: コマンドがAWS CLIを使用するか（AWS_DEFAULT_REGIONを設定済みの状態で実行）
+        """
+        self.pre_start_commands.extend(commands)
+        self.uses_aws_cli = self.uses_aws_cli or aws_cli
+
+    def render_pre_start_script(self) -> str:
+        """
+        起動前に実行するシェルスクリプトを生成する
+
+        Difyのdockerディレクトリ（/opt/dify/docker）をカレントディレクトリとして実行されます。
+
+        Returns:
+            シェルスクリプト文字列
+        """
+        lines = ["# Dify実行時設定の適用（CDKにより生成）"]
+
+        if self.secret_env or self.uses_aws_cli or self.config_scopes:
+            lines.extend([
+                "",
+                "# AWS CLIの準備",
+                "if ! command -v aws > /dev/null 2>&1; then",
+                "    apt-get install -y awscli",
+                "fi",
+                "IMDS_TOKEN=$(curl -s -X PUT http://169.254.169.254/latest/api/token -H 'X-aws-ec2-metadata-token-ttl-seconds: 300')",
+                "export AWS_DEFAULT_REGION=$(curl -s -H \"X-aws-ec2-metadata-token: ${IMDS_TOKEN}\" http://169.254.169.254/latest/meta-data/placement/region)",
+            ])
+
+        if self.secret_env:
+            lines.extend([
+                "",
+                "# Secrets Managerからの認証情報の取得",
+                "get_secret_field() {",
+                "    aws secretsmanager get-secret-value --secret-id \"$1\" --query SecretString --output text \\",
+                "        | python3 -c 'import json, sys; print(json.load(sys.stdin)[sys.argv[1]])' \"$2\"",
+                "}",
+            ])
+            for name, (secret, field) in self.secret_env.items():
+                lines.append(f"export {name}=$(get_secret_field \"{secret.secret_arn}\" {field})")
+
+        if self.config_scopes:
+            lines.extend([
+                "",
+                "# SSMパラメータストアの値を.envに追記（1回の取得で全スコープを読み込み、後のスコープで上書き）",
+                f"aws ssm get-parameters-by-path --path {CONFIG_PARAMETER_PATH} --recursive \\",
+                "    --query 'Parameters[].[Name,Value]' --output json | python3 -c '",
+                "import json, os, sys",
+                "parameters = dict(json.load(sys.stdin))",
+                "values = {}",
+                "for scope in sys.argv[1:]:",
+                f"    prefix = \"{CONFIG_PARAMETER_PATH}/%s/\" % scope",
+                "    values.update((name[len(prefix):], value) for name, value in parameters.items() if name.startswith(prefix))",
+                "for name, value in values.items():",
+                "    print(\"%s=%s\" % (name, os.path.expandvars(value)))",
+                f"' {' '.join(self.config_scopes)} >> .env",
+            ])
+
+        inline_env = {
+            name: value for name, value in self.env.items()
+            if self.published_env.get(name) != value
+        }
+        if inline_env or self.secret_env:
+            lines.extend(["", "# .envへの追記（既定値を上書き）", "cat >> .env << EOF"])
+            for name in self.secret_env:
+                if name not in self.env:
+                    lines.append(f"{name}=${{{name}}}")
+            for name, value in inline_env.items():
+                lines.append(f"{name}={value}")
+            lines.append("EOF")
+
+        if self.compose_services:
+            lines.extend(["", "# Docker Compose構成の上書き", "cat > docker-compose.override.yaml << 'EOF'"])
+            lines.extend(to_yaml({"services": self.compose_services}))
+            lines.append("EOF")
+
+        if self.pre_start_commands:
+            lines.extend(["", "# 起動前処理"])
+            lines.extend(self.pre_start_commands)
+
+        return "\n".join(lines) + "\n"
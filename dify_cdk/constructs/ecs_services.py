@@ -0,0 +1,461 @@
+# -*- coding: utf-8 -*-
+
+"""
+ECSサービスコンストラクト
+
+このモジュールは、DifyのコンテナをECS（Fargate）のサービスとして実行する構成を定義します。
+api・worker・web・sandbox・plugin_daemon・nginxを個別のサービスとし、
+サービス間の通信にはService Connectを使用します。
+"""
+
+import re
+from typing import Dict, List, Optional
+
+from constructs import Construct
+from aws_cdk import aws_ec2 as ec2
+from aws_cdk import aws_ecs as ecs
+from aws_cdk import aws_iam as iam
+from aws_cdk import aws_logs as logs
+from aws_cdk import aws_secretsmanager as secretsmanager
+from aws_cdk import RemovalPolicy, Tags, CfnOutput
+
+from dify_cdk.constructs.dify_runtime import DifyRuntimeSettings
+from dify_cdk.constructs.linux_auto_scaling import validate_external_services
+from dify_cdk.constructs.load_balancer import LoadBalancerConstruct
+
+
+class EcsServicesConstruct(Construct):
+    """DifyのコンテナをECS Fargateのサービスとして作成するコンストラクト"""
+
+    # Service Connectの名前空間
+    NAMESPACE = "dify.local"
+
+    # サービスごとのコンテナポート（Service ConnectのDNS名はサービス名）
+    PORTS = {
+        "api": 5001,
+        "web": 3000,
+        "sandbox": 8194,
+        "plugin-daemon": 5002,
+        "nginx": 80,
+    }
+
+    # Dify本体以外のコンテナイメージ
+    SANDBOX_IMAGE = "langgenius/dify-sandbox:0.2.12"
+    PLUGIN_DAEMON_IMAGE = "langgenius/dify-plugin-daemon:0.1.2-local"
+    NGINX_IMAGE = "nginx:latest"
+
+    # サービス間の認証に使用するキー（環境変数名はDifyのdocker-compose.yamlに準拠）
+    INTERNAL_KEYS = ("sandbox-api-key", "plugin-daemon-key", "plugin-inner-api-key")
+
+    def __init__(
+        self,
+        scope: Construct,
+        id: str,
+        vpc: ec2.Vpc,
+        security_group: ec2.SecurityGroup,
+        task_role: iam.Role,
+        load_balancer: LoadBalancerConstruct,
+        config,
+        dify_settings: DifyRuntimeSettings,
+        **kwargs
+    ):
+        """
+        コンストラクタ
+
+        Args:
+            scope: 親スコープ
+            id: コンストラクトID
+            vpc: VPCインスタンス
+            security_group: タスクのセキュリティグループ（マネージドサービスへの接続許可済み）
+            task_role: タスクロール
+            load_balancer: 前段の内部ALB（ターゲットの種類はIP）
+            config: 設定オブジェクト
+            dify_settings: Dify実行時設定（マネージドサービスへの接続等）
+            **kwargs: その他の引数
+        """
+        super().__init__(scope, id)
+
+        self.config = config
+        self.dify_settings = dify_settings
+        self.security_group = security_group
+        self.task_role = task_role
+
+        validate_external_services(config, "ECS構成")
+        if config.pgbouncer_enabled:
+            raise ValueError("ECS構成ではPgBouncerは使用できません（PGBOUNCER_ENABLED=false を指定してください）")
+
+        # タスク間の通信（Service Connect）を許可
+        for name, port in self.PORTS.items():
+            security_group.add_ingress_rule(
+                security_group,
+                ec2.Port.tcp(port),
+                f"Allow {name} from Dify tasks"
+            )
+
+        # Service Connectの名前空間を持つクラスター
+        self.cluster = ecs.Cluster(
+            self, "Cluster",
+            vpc=vpc,
+            default_cloud_map_namespace=ecs.CloudMapNamespaceOptions(
+                name=self.NAMESPACE,
+                use_for_service_connect=True
+            )
+        )
+
+        self.log_group = logs.LogGroup(
+            self, "LogGroup",
+            retention=logs.RetentionDays.ONE_MONTH,
+            removal_policy=RemovalPolicy.DESTROY
+        )
+
+        # サービス間認証キー
+        self.internal_keys = {
+            key: secretsmanager.Secret(
+                self, f"InternalKey{''.join(part.title() for part in key.split('-'))}",
+                secret_name=f"/dify/{id}/{key}",
+                description=f"Dify {key}",
+                generate_secret_string=secretsmanager.SecretStringGenerator(
+                    secret_string_template="{}",
+                    generate_string_key="key",
+                    exclude_punctuation=True,
+                    password_length=48
+                )
+            )
+            for key in self.INTERNAL_KEYS
+        }
+
+        # 呼び出し先のサービスを先に作成（Service Connectのエンドポイントを起動時に解決するため）
+        self.services: Dict[str, ecs.FargateService] = {}
+        self._add_sandbox_service()
+        self._add_plugin_daemon_service()
+        self._add_dify_service("api")
+        self._add_dify_service("worker")
+        self._add_web_service()
+        self._add_nginx_service()
+
+        # nginxをALBのターゲットグループに登録
+        for target_group in load_balancer.target_groups:
+            self.services["nginx"].attach_to_application_target_group(target_group)
+
+        # 出力の設定
+        CfnOutput(
+            self, "ClusterName",
+            value=self.cluster.cluster_name,
+            description="Dify ECS cluster name"
+        )
+
+    def _secret(self, key: str) -> ecs.Secret:
+        """
+        サービス間認証キーをコンテナのシークレットとして取得
+
+        Args:
+            key: INTERNAL_KEYSのキー
+
+        Returns:
+            ECSシークレット
+        """
+        return ecs.Secret.from_secrets_manager(self.internal_keys[key], "key")
+
+    def _runtime_secrets(self) -> Dict[str, ecs.Secret]:
+        """
+        Dify実行時設定のシークレット（DBパスワード等）をコンテナのシークレットとして取得
+
+        Returns:
+            環境変数名とECSシークレット
+        """
+        return {
+            name: ecs.Secret.from_secrets_manager(secret, field)
+            for name, (secret, field) in self.dify_settings.secret_env.items()
+        }
+
+    def _runtime_environment(self) -> Dict[str, str]:
+        """
+        Dify実行時設定の環境変数のうち、シークレットを参照しないもの
+
+        Returns:
+            環境変数
+        """
+        return {
+            name: value for name, value in self.dify_settings.env.items()
+            if not self._secret_references(value)
+        }
+
+    def _secret_references(self, value: str) -> List[str]:
+        """
+        値に埋め込まれたシークレットの参照（${名前}）を取得
+
+        Args:
+            value: 環境変数の値
+
+        Returns:
+            参照しているシークレットの環境変数名
+        """
+        return [
+            name for name in re.findall(r"\$\{(\w+)\}", value)
+            if name in self.dify_settings.secret_env
+        ]
+
+    def _expanding_command(self, command: str) -> Optional[List[str]]:
+        """
+        シークレットを参照する環境変数（CELERY_BROKER_URL等）をコンテナ内で展開して起動するコマンド
+
+        ECSの環境変数ではシェル変数を展開できないため、起動時にexportしてから元のコマンドを実行します。
+
+        Args:
+            command: 元の起動コマンド
+
+        Returns:
+            起動コマンド（展開が不要な場合はNone）
+        """
+        exports = [
+            f'export {name}="{value}"'
+            for name, value in self.dify_settings.env.items()
+            if self._secret_references(value)
+        ]
+        if not exports:
+            return None
+        return ["/bin/bash", "-c", "; ".join(exports + [f"exec {command}"])]
+
+    def _add_service(
+        self,
+        name: str,
+        image: str,
+        environment: Dict[str, str],
+        secrets: Dict[str, ecs.Secret],
+        command: Optional[List[str]] = None,
+        isolated: bool = False
+    ) -> ecs.FargateService:
+        """
+        Fargateサービスを作成し、CPU使用率によるスケーリングを設定
+
+        Args:
+            name: サービス名（ECS_SERVICE_DEFAULTSのキー、Service ConnectのDNS名）
+            image: コンテナイメージ
+            environment: 環境変数
+            secrets: シークレット
+            command: 起動コマンド（エントリポイントを置き換える場合）
+            isolated: 権限のない専用のタスクロールを使用し、ECS Execを無効にするか（任意のコードを実行するサービス）
+
+        Returns:
+            Fargateサービス
+        """
+        construct_id = "".join(part.title() for part in name.split("-"))
+        port = self.PORTS.get(name)
+
+        # 任意のコードを実行するサービスには共有のタスクロール（S3等の権限）を渡さない
+        task_role = self.task_role
+        if isolated:
+            task_role = iam.Role(
+                self, f"{construct_id}TaskRole",
+                assumed_by=iam.ServicePrincipal("ecs-tasks.amazonaws.com"),
+                description=f"Dify {name} task role without permissions"
+            )
+
+        task_definition = ecs.FargateTaskDefinition(
+            self, f"{construct_id}Task",
+            cpu=self.config.get_ecs_service(name, "cpu"),
+            memory_limit_mib=self.config.get_ecs_service(name, "memory"),
+            task_role=task_role
+        )
+        container = task_definition.add_container(
+            name,
+            image=ecs.ContainerImage.from_registry(image),
+            environment=environment,
+            secrets=secrets,
+            entry_point=command[:2] if command else None,
+            command=command[2:] if command else None,
+            logging=ecs.LogDrivers.aws_logs(
+                stream_prefix=name,
+                log_group=self.log_group
+            )
+        )
+
+        # 待ち受けポートを持つサービスはService Connectで公開
+        if port:
+            container.add_port_mappings(
+                ecs.PortMapping(
+                    name=name,
+                    container_port=port,
+                    app_protocol=ecs.AppProtocol.http
+                )
+            )
+            service_connect = ecs.ServiceConnectProps(
+                services=[ecs.ServiceConnectService(port_mapping_name=name, dns_name=name, port=port)],
+                log_driver=ecs.LogDrivers.aws_logs(
+                    stream_prefix=f"{name}-service-connect",
+                    log_group=self.log_group
+                )
+            )
+        else:
+            service_connect = ecs.ServiceConnectProps()
+
+        min_capacity = self.config.get_ecs_service(name, "min-capacity")
+        service = ecs.FargateService(
+            self, f"{construct_id}Service",
+            cluster=self.cluster,
+            task_definition=task_definition,
+            desired_count=min_capacity,
+            security_groups=[self.security_group],
+            vpc_subnets=ec2.SubnetSelection(
+                subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
+            ),
+            service_connect_configuration=service_connect,
+            circuit_breaker=ecs.DeploymentCircuitBreaker(rollback=True),
+            min_healthy_percent=100,
+            max_healthy_percent=200,
+            enable_execute_command=not isolated
+        )
+
+        # サービスごとに独立してスケール
+        scaling = service.auto_scale_task_count(
+            min_capacity=min_capacity,
+            max_capacity=self.config.get_ecs_service(name, "max-capacity")
+        )
+        scaling.scale_on_cpu_utilization(
+            "CpuScaling",
+            target_utilization_percent=self.config.ecs_target_cpu
+        )
+
+        # 呼び出し先のサービスより後に作成
+        for dependency in self.services.values():
+            service.node.add_dependency(dependency)
+
+        Tags.of(service).add("Name", f"dify-{name}")
+        self.services[name] = service
+        return service
+
+    def _add_dify_service(self, mode: str):
+        """
+        Dify本体（api / worker）のサービスを追加
+
+        Args:
+            mode: api / worker
+        """
+        environment = {
+            "MODE": mode,
+            "LOG_LEVEL": "INFO",
+            "DEPLOY_ENV": "PRODUCTION",
+            # マイグレーションはapiの起動時に実行（Redisのロックで多重実行を防止）
+            "MIGRATION_ENABLED": "true" if mode == "api" else "false",
+            "CODE_EXECUTION_ENDPOINT": f"http://sandbox:{self.PORTS['sandbox']}",
+            "PLUGIN_DAEMON_URL": f"http://plugin-daemon:{self.PORTS['plugin-daemon']}",
+            "MARKETPLACE_ENABLED": "true",
+            **self._runtime_environment(),
+        }
+        secrets = {
+            "CODE_EXECUTION_API_KEY": self._secret("sandbox-api-key"),
+            "PLUGIN_DAEMON_KEY": self._secret("plugin-daemon-key"),
+            "INNER_API_KEY_FOR_PLUGIN": self._secret("plugin-inner-api-key"),
+            **self._runtime_secrets(),
+        }
+        self._add_service(
+            mode,
+            f"langgenius/dify-api:{self.config.dify_version}",
+            environment,
+            secrets,
+            command=self._expanding_command("/bin/bash /entrypoint.sh")
+        )
+
+    def _add_web_service(self):
+        """Difyのフロントエンド（Next.js）のサービスを追加"""
+        runtime_env = self.dify_settings.env
+        environment = {
+            "CONSOLE_API_URL": runtime_env.get("CONSOLE_API_URL", ""),
+            "APP_API_URL": runtime_env.get("APP_API_URL", ""),
+            "NEXT_TELEMETRY_DISABLED": "1",
+        }
+        self._add_service("web", f"langgenius/dify-web:{self.config.dify_version}", environment, {})
+
+    def _add_sandbox_service(self):
+        """
+        コード実行用サンドボックスのサービスを追加
+
+        ECS構成にはSSRFプロキシ（ssrf_proxy）がないため、実行するコードからのネットワーク接続は
+        既定で無効にします（有効にするとVPC内のマネージドサービス等にも接続できます）。
+        """
+        environment = {
+            "GIN_MODE": "release",
+            "WORKER_TIMEOUT": "15",
+            "ENABLE_NETWORK": str(self.config.ecs_sandbox_network_enabled).lower(),
+            "SANDBOX_PORT": str(self.PORTS["sandbox"]),
+        }
+        secrets = {"API_KEY": self._secret("sandbox-api-key")}
+        self._add_service("sandbox", self.SANDBOX_IMAGE, environment, secrets, isolated=True)
+
+    def _add_plugin_daemon_service(self):
+        """プラグインデーモンのサービスを追加（接続先はDifyと同じDB・Redis・S3）"""
+        runtime_env = self._runtime_environment()
+        environment = {
+            **runtime_env,
+            "DB_DATABASE": "dify_plugin",
+            "SERVER_PORT": str(self.PORTS["plugin-daemon"]),
+            "DIFY_INNER_API_URL": f"http://api:{self.PORTS['api']}",
+            "PLUGIN_REMOTE_INSTALLING_HOST": "0.0.0.0",
+            "PLUGIN_REMOTE_INSTALLING_PORT": "5003",
+            "PLUGIN_WORKING_PATH": "/app/storage/cwd",
+            "FORCE_VERIFYING_SIGNATURE": "true",
+            "PPROF_ENABLED": "false",
+            # docker-compose.yamlと同じ対応付け
+            "S3_USE_AWS_MANAGED_IAM": runtime_env.get("PLUGIN_S3_USE_AWS_MANAGED_IAM", "false"),
+            "AWS_REGION": runtime_env.get("PLUGIN_AWS_REGION", ""),
+        }
+        secrets = {
+            "SERVER_KEY": self._secret("plugin-daemon-key"),
+            "DIFY_INNER_API_KEY": self._secret("plugin-inner-api-key"),
+            **self._runtime_secrets(),
+        }
+        self._add_service("plugin-daemon", self.PLUGIN_DAEMON_IMAGE, environment, secrets)
+
+    def _add_nginx_service(self):
+        """
+        リバースプロキシ（nginx）のサービスを追加
+
+        設定ファイルは環境変数で渡し、起動時に書き出します（Difyのnginx設定と同じ振り分け）。
+        """
+        environment = {"NGINX_CONF": self._render_nginx_conf()}
+        command = [
+            "/bin/sh", "-c",
+            'printf "%s" "$NGINX_CONF" > /etc/nginx/conf.d/default.conf && exec nginx -g "daemon off;"'
+        ]
+        self._add_service("nginx", self.NGINX_IMAGE, environment, {}, command=command)
+
+    def _render_nginx_conf(self) -> str:
+        """
+        nginxの設定ファイルを生成
+
+        Returns:
+            nginx設定ファイルの内容
+        """
+        api = f"http://api:{self.PORTS['api']}"
+        routes = [
+            ("/console/api", api),
+            ("/api", api),
+            ("/v1", api),
+            ("/files", api),
+            ("/mcp", api),
+            ("/e/", f"http://plugin-daemon:{self.PORTS['plugin-daemon']}"),
+            ("/", f"http://web:{self.PORTS['web']}"),
+        ]
+        lines = [
+            "server {",
+            "    listen 80;",
+            "    server_name _;",
+            "    client_max_body_size 100M;",
+            "    proxy_http_version 1.1;",
+            '    proxy_set_header Connection "";',
+            "    proxy_set_header Host $host;",
+            "    proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;",
+            "    proxy_set_header X-Forwarded-Proto $http_x_forwarded_proto;",
+            "    proxy_read_timeout 3600s;",
+            "    proxy_send_timeout 3600s;",
+            # LLMのストリーミング応答（SSE）をバッファリングしない
+            "    proxy_buffering off;",
+        ]
+        for path, upstream in routes:
+            lines.extend([
+                f"    location {path} {{",
+                f"        proxy_pass {upstream};",
+                "    }",
+            ])
+        lines.append("}")
+        return "\n".join(lines) + "\n"
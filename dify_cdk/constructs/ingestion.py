@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+"""
+一括登録コンストラクト
+
+このモジュールは、Difyのナレッジ（データセット）にドキュメントを一括登録するパイプラインを定義します。
+受け付け用のS3バケットに配置したファイルのイベント通知をSQSキューで受け取り、Lambda関数
+（リポジトリ直下のingestion/）がDifyのナレッジAPIで登録します。
+
+- Lambda関数の同時実行数と1回の実行内の同時登録数で、Difyへの同時リクエスト数を制限
+- Difyのワーカー層のキュー滞留数が上限を超えている間は登録を後回しにし、ワーカーの処理を待つ
+- 再試行しても失敗したファイルはデッドレターキューに移動
+"""
+
+import json
+import os
+from typing import List, Optional
+
+from constructs import Construct
+from aws_cdk import aws_cloudwatch as cloudwatch
+from aws_cdk import aws_ec2 as ec2
+from aws_cdk import aws_iam as iam
+from aws_cdk import aws_lambda as lambda_
+from aws_cdk import aws_lambda_event_sources as lambda_event_sources
+from aws_cdk import aws_s3 as s3
+from aws_cdk import aws_s3_notifications as s3_notifications
+from aws_cdk import aws_secretsmanager as secretsmanager
+from aws_cdk import aws_sqs as sqs
+from aws_cdk import CfnOutput, Duration, IgnoreMode, RemovalPolicy
+
+
+# Lambda関数のパッケージ（リポジトリ直下のingestion/のみを含める）
+PROJECT_DIRECTORY = os.path.join(os.path.dirname(__file__), "..", "..")
+PACKAGE_EXCLUDE = ["*", ".*", "!ingestion", "!ingestion/*.py"]
+
+# Lambda関数のタイムアウト（キューの可視性タイムアウトはこの6倍）
+FUNCTION_TIMEOUT = Duration.minutes(3)
+
+# バッチをまとめる最大の待ち時間
+MAX_BATCHING_WINDOW = Duration.seconds(30)
+
+# 登録に失敗した場合の最大の受信回数（超えたメッセージはデッドレターキューに移動）
+# 後回しにしたメッセージは再送信するため、受信回数に含まれない
+MAX_RECEIVE_COUNT = 10
+
+# ワーカーのキュー滞留数が上限を超えた場合に、メッセージを再配信するまでの時間（秒、SQSの遅延の上限は900）
+DEFER_SECONDS = 300
+
+# メッセージを後回しにする最大の回数（既定の間隔で24時間）
+MAX_DEFER_COUNT = 288
+
+
+class IngestionConstruct(Construct):
+    """S3・SQS・LambdaでDifyのナレッジにドキュメントを一括登録するコンストラクト"""
+
+    def __init__(
+        self,
+        scope: Construct,
+        id: str,
+        vpc: ec2.Vpc,
+        api_url: str,
+        config,
+        verify_tls: bool = True,
+        queue_metric: Optional[cloudwatch.Metric] = None,
+        **kwargs
+    ):
+        """
+        コンストラクタ
+
+        Args:
+            scope: 親スコープ
+            id: コンストラクトID
+            vpc: VPCインスタンス
+            api_url: DifyのベースURL（内部ALBまたはLinux VM）
+            config: 設定オブジェクト
+            verify_tls: TLS証明書を検証するか（ALBのDNS名で接続する場合は検証しない）
+            queue_metric: バックプレッシャーに使用するワーカーのキュー滞留数（ワーカー層を使用しない場合はNone）
+            **kwargs: その他の引数
+        """
+        super().__init__(scope, id)
+
+        # ファイルの受け付け用バケット（登録後のファイルは一定期間で削除）
+        self.bucket = s3.Bucket(
+            self, "Bucket",
+            encryption=s3.BucketEncryption.S3_MANAGED,
+            block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
+            enforce_ssl=True,
+            removal_policy=RemovalPolicy.RETAIN,
+            lifecycle_rules=[
+                s3.LifecycleRule(
+                    expiration=Duration.days(config.ingestion_retention_days),
+                    abort_incomplete_multipart_upload_after=Duration.days(7)
+                )
+            ]
+        )
+
+        # イベント通知のキュー（再試行しても失敗したファイルはデッドレターキューへ）
+        self.dead_letter_queue = sqs.Queue(
+            self, "DeadLetterQueue",
+            encryption=sqs.QueueEncryption.SQS_MANAGED,
+            enforce_ssl=True,
+            retention_period=Duration.days(14)
+        )
+        self.queue = sqs.Queue(
+            self, "Queue",
+            encryption=sqs.QueueEncryption.SQS_MANAGED,
+            enforce_ssl=True,
+            visibility_timeout=Duration.seconds(FUNCTION_TIMEOUT.to_seconds() * 6),
+            retention_period=Duration.days(14),
+            dead_letter_queue=sqs.DeadLetterQueue(
+                queue=self.dead_letter_queue,
+                max_receive_count=MAX_RECEIVE_COUNT
+            )
+        )
+        self.bucket.add_event_notification(
+            s3.EventType.OBJECT_CREATED,
+            s3_notifications.SqsDestination(self.queue)
+        )
+
+        # ナレッジのAPIキー（Difyで発行した値をapi_keyフィールドに設定）
+        self.api_key_secret = secretsmanager.Secret(
+            self, "ApiKey",
+            secret_name=f"/dify/{id}/dataset-api-key",
+            description="Dify dataset API key for bulk ingestion (replace api_key)",
+            generate_secret_string=secretsmanager.SecretStringGenerator(
+                secret_string_template="{}",
+                generate_string_key="api_key",
+                exclude_punctuation=True
+            )
+        )
+
+        # Lambda関数のセキュリティグループ（DifyのALB・Linux VMへの接続）
+        self.security_group = ec2.SecurityGroup(
+            self, "FunctionSG",
+            vpc=vpc,
+            description="Security group for Dify bulk ingestion function",
+            allow_all_outbound=True
+        )
+
+        environment = {
+            "DIFY_API_URL": api_url,
+            "DIFY_API_KEY_SECRET_ARN": self.api_key_secret.secret_arn,
+            "DIFY_TLS_VERIFY": "true" if verify_tls else "false",
+            "QUEUE_URL": self.queue.queue_url,
+            "UPLOAD_CONCURRENCY": str(config.ingestion_upload_concurrency),
+            "INDEXING_TECHNIQUE": config.ingestion_indexing_technique,
+            "DEFER_SECONDS": str(DEFER_SECONDS),
+            "MAX_DEFER_COUNT": str(MAX_DEFER_COUNT),
+        }
+        if queue_metric:
+            environment.update(
+                MAX_QUEUE_LENGTH=str(config.ingestion_max_queue_length),
+                QUEUE_METRIC_NAMESPACE=queue_metric.namespace,
+                QUEUE_METRIC_NAME=queue_metric.metric_name,
+                QUEUE_METRIC_DIMENSIONS=json.dumps([
+                    {"Name": name, "Value": value}
+                    for name, value in (queue_metric.dimensions or {}).items()
+                ])
+            )
+
+        self.function = lambda_.Function(
+            self, "Function",
+            runtime=lambda_.Runtime.PYTHON_3_12,
+            handler="ingestion.handler.handler",
+            code=lambda_.Code.from_asset(
+                PROJECT_DIRECTORY,
+                exclude=PACKAGE_EXCLUDE,
+                ignore_mode=IgnoreMode.GLOB
+            ),
+            description="Ingest documents from S3 into Dify knowledge bases",
+            timeout=FUNCTION_TIMEOUT,
+            memory_size=512,
+            vpc=vpc,
+            vpc_subnets=ec2.SubnetSelection(subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS),
+            security_groups=[self.security_group],
+            environment=environment
+        )
+        self.bucket.grant_read(self.function)
+        self.api_key_secret.grant_read(self.function)
+        self.queue.grant_send_messages(self.function)  # 後回しにするメッセージの再送信
+        if queue_metric:
+            self.function.add_to_role_policy(iam.PolicyStatement(
+                actions=["cloudwatch:GetMetricData"],
+                resources=["*"]
+            ))
+
+        # バッチで受信し、失敗したメッセージのみを再配信（同時実行数でDifyへの負荷を制限）
+        self.function.add_event_source(lambda_event_sources.SqsEventSource(
+            self.queue,
+            batch_size=config.ingestion_batch_size,
+            max_batching_window=MAX_BATCHING_WINDOW,
+            max_concurrency=config.ingestion_max_concurrency,
+            report_batch_item_failures=True
+        ))
+
+        # 出力の設定
+        CfnOutput(
+            self, "BucketName",
+            value=self.bucket.bucket_name,
+            description="Bucket for bulk ingestion (s3://<bucket>/<dataset-id>/<document>)"
+        )
+
+        CfnOutput(
+            self, "ApiKeySecretArn",
+            value=self.api_key_secret.secret_arn,
+            description="Secret for the Dify dataset API key (set the api_key field)"
+        )
+
+        CfnOutput(
+            self, "DeadLetterQueueUrl",
+            value=self.dead_letter_queue.queue_url,
+            description="Dead-letter queue of files that failed to ingest"
+        )
+
+    @property
+    def metrics(self) -> List[cloudwatch.IMetric]:
+        """ダッシュボードに表示するメトリクス（未処理・失敗したファイルの数）"""
+        return [
+            self.queue.metric_approximate_number_of_messages_visible(period=Duration.minutes(1)),
+            self.dead_letter_queue.metric_approximate_number_of_messages_visible(period=Duration.minutes(1)),
+        ]
@@ -0,0 +1,495 @@
+# -*- coding: utf-8 -*-
+
+"""
+Linux Auto Scalingコンストラクト
+
+このモジュールは、DifyのAPI/Web層をAuto Scaling Groupで水平スケールする構成を定義します。
+データベース・キャッシュ・ストレージ・ベクトルストアは外部のマネージドサービスを使用します。
+"""
+
+from typing import List
+
+from constructs import Construct
+from aws_cdk import aws_autoscaling as autoscaling
+from aws_cdk import aws_ec2 as ec2
+from aws_cdk import aws_iam as iam
+from aws_cdk import Duration, Stack, Tags, CfnOutput
+
+from dify_cdk.constructs.dify_runtime import DifyRuntimeSettings
+from dify_cdk.constructs.linux_user_data import LinuxUserData, ubuntu_machine_image
+from dify_cdk.constructs.nginx_tuning import configure_nginx
+from dify_cdk.constructs.runtime_config import RUNTIME_CONFIG_TAG
+from dify_cdk.constructs.load_balancer import LoadBalancerConstruct
+
+
+def validate_external_services(config, feature: str) -> None:
+    """
+    複数ホスト構成の前提条件を確認する
+
+    ホストを使い捨てにするため、状態を持つコンポーネントはすべて外部サービスである必要があります。
+
+    Args:
+        config: 設定オブジェクト
+        feature: エラーメッセージに表示する構成名
+    """
+    missing = []
+    if config.database_mode == 'container':
+        missing.append("DATABASE_MODE=rds|aurora")
+    if config.cache_mode == 'container':
+        missing.append("CACHE_MODE=elasticache")
+    if config.storage_mode != 's3':
+        missing.append("STORAGE_MODE=s3")
+    if config.vector_store_mode == 'container' and not config.database_pgvector:
+        missing.append("VECTOR_STORE_MODE=opensearch または DATABASE_PGVECTOR=true")
+    if missing:
+        raise ValueError(f"{feature}には外部サービスが必要です: {', '.join(missing)}")
+
+
+# 終了時のライフサイクルフック名（ALBからの登録解除・Celeryの停止を待つ）
+DRAIN_HOOK_NAME = "dify-drain"
+
+
+def spot_instances_policy(
+    launch_template: ec2.LaunchTemplate,
+    instance_types: List[str],
+    on_demand_base_capacity: int,
+    on_demand_percentage: int
+) -> autoscaling.MixedInstancesPolicy:
+    """
+    スポットインスタンスとオンデマンドを組み合わせる混合インスタンスポリシーを作成する
+
+    複数のインスタンスタイプから、空き容量が多く価格の低いプールを選択します。
+    スポットを確保できない場合も、残りのインスタンスタイプ・オンデマンドで容量を維持します。
+
+    Args:
+        launch_template: 起動テンプレート
+        instance_types: 組み合わせるインスタンスタイプ（先頭がオンデマンドの優先タイプ）
+        on_demand_base_capacity: 常にオンデマンドで起動するインスタンス数
+        on_demand_percentage: ベース容量を超える分のオンデマンドの割合（%）
+
+    Returns:
+        混合インスタンスポリシー
+    """
+    return autoscaling.MixedInstancesPolicy(
+        launch_template=launch_template,
+        launch_template_overrides=[
+            autoscaling.LaunchTemplateOverrides(instance_type=ec2.InstanceType(instance_type))
+            for instance_type in instance_types
+        ],
+        instances_distribution=autoscaling.InstancesDistribution(
+            on_demand_allocation_strategy=autoscaling.OnDemandAllocationStrategy.PRIORITIZED,
+            on_demand_base_capacity=on_demand_base_capacity,
+            on_demand_percentage_above_base_capacity=on_demand_percentage,
+            spot_allocation_strategy=autoscaling.SpotAllocationStrategy.PRICE_CAPACITY_OPTIMIZED
+        )
+    )
+
+
+def add_drain_commands(user_data: ec2.UserData, target_group_arns: List[str]) -> None:
+    """
+    スポット中断通知・Auto Scalingによる終了を検知してDifyを切り離すスクリプトをユーザーデータに追加する
+
+    IMDSのスポット中断通知（spot/instance-action）とライフサイクル状態
+    （autoscaling/target-lifecycle-state）を監視し、ALBのターゲットグループから登録解除した後、
+    Celeryワーカーを停止します（ウォームシャットダウンで実行中のタスクの完了を待ちます）。
+
+    Args:
+        user_data: ユーザーデータ
+        target_group_arns: 登録解除するターゲットグループのARN
+    """
+    target_groups = " ".join(f'"{arn}"' for arn in target_group_arns)
+    user_data.add_commands(f"""
+# 中断・終了時のドレインスクリプトの作成
+log "Configuring drain on interruption..."
+if ! command -v aws > /dev/null 2>&1; then
+    apt-get install -y awscli
+fi
+
+cat > /usr/local/bin/dify-drain.sh << 'DIFY_DRAIN_EOF'
+#!/bin/bash
+# スポット中断通知またはAuto Scalingによる終了を検知し、Difyを切り離す
+IMDS=http://169.254.169.254/latest
+imds() {{
+    curl -sf -H "X-aws-ec2-metadata-token: ${{TOKEN}}" "$IMDS/meta-data/$1"
+}}
+
+while true; do
+    TOKEN=$(curl -s -X PUT $IMDS/api/token -H 'X-aws-ec2-metadata-token-ttl-seconds: 300')
+    SPOT_ACTION=$(imds spot/instance-action)
+    LIFECYCLE_STATE=$(imds autoscaling/target-lifecycle-state)
+    if [ -n "$SPOT_ACTION" ] || [ "$LIFECYCLE_STATE" = "Terminated" ]; then
+        break
+    fi
+    sleep 5
+done
+
+INSTANCE_ID=$(imds instance-id)
+ASG_NAME=$(imds tags/instance/aws:autoscaling:groupName)
+export AWS_DEFAULT_REGION=$(imds placement/region)
+logger -t dify-drain "Draining instance (spot: ${{SPOT_ACTION:-none}}, lifecycle: ${{LIFECYCLE_STATE}})"
+
+# ALBのターゲットグループから登録解除（新しいリクエストを受け付けない）
+for target_group in {target_groups}; do
+    aws elbv2 deregister-targets --target-group-arn "$target_group" --targets "Id=$INSTANCE_ID" || true
+done
+
+# Celeryのコンシューマーを停止（ウォームシャットダウンで実行中のタスクの完了を待つ）
+cd /opt/dify/docker && docker compose stop --timeout 90 worker || true
+
+# Auto Scalingによる終了の場合はライフサイクルアクションを完了
+if [ "$LIFECYCLE_STATE" = "Terminated" ]; then
+    aws autoscaling complete-lifecycle-action \
+        --lifecycle-hook-name {DRAIN_HOOK_NAME} \
+        --auto-scaling-group-name "$ASG_NAME" \
+        --instance-id "$INSTANCE_ID" \
+        --lifecycle-action-result CONTINUE || true
+fi
+DIFY_DRAIN_EOF
+chmod +x /usr/local/bin/dify-drain.sh
+
+cat > /etc/systemd/system/dify-drain.service << 'DIFY_DRAIN_EOF'
+[Unit]
+Description=Drain Dify on spot interruption or Auto Scaling termination
+After=docker.service network-online.target
+Wants=network-online.target
+
+[Service]
+Type=simple
+ExecStart=/usr/local/bin/dify-drain.sh
+
+[Install]
+WantedBy=multi-user.target
+DIFY_DRAIN_EOF
+systemctl daemon-reload
+systemctl enable --now dify-drain.service
+log "Drain on interruption configured"
+""")
+
+
+class LinuxAutoScalingConstruct(Construct):
+    """DifyのLinuxホストをLaunch TemplateとAuto Scaling Groupで作成するコンストラクト"""
+
+    # 起動時のライフサイクルフック名（Difyの応答を確認してから完了する）
+    LIFECYCLE_HOOK_NAME = "dify-bootstrap"
+
+    def __init__(
+        self,
+        scope: Construct,
+        id: str,
+        vpc: ec2.Vpc,
+        security_group: ec2.SecurityGroup,
+        instance_role: iam.Role,
+        instance_type: str,
+        load_balancer: LoadBalancerConstruct,
+        config,
+        dify_settings: DifyRuntimeSettings,
+        **kwargs
+    ):
+        """
+        コンストラクタ
+
+        Args:
+            scope: 親スコープ
+            id: コンストラクトID
+            vpc: VPCインスタンス
+            security_group: セキュリティグループ
+            instance_role: IAMロール
+            instance_type: インスタンスタイプ
+            load_balancer: 前段の内部ALB
+            config: 設定オブジェクト
+            dify_settings: Dify実行時設定（マネージドサービスへの接続等）
+            **kwargs: その他の引数
+        """
+        super().__init__(scope, id)
+
+        self.config = config
+        self.dify_settings = dify_settings
+
+        validate_external_services(config, "Auto Scaling構成")
+        if config.asg_spot_enabled and config.asg_warm_pool_enabled:
+            raise ValueError("スポットインスタンス（混合インスタンスポリシー）とウォームプールは併用できません")
+
+        # 起動時に読み取るシークレットへのアクセス権限を付与
+        for secret in dify_settings.secrets:
+            secret.grant_read(instance_role)
+
+        # nginxの設定の上書き（インスタンスタイプに応じた接続数）
+        settings = dify_settings
+        if config.nginx_tuning_enabled:
+            settings = dify_settings.copy()
+            configure_nginx(settings, instance_type)
+
+        # ユーザーデータスクリプトの読み込み
+        user_data = LinuxUserData(config, settings, host_id=id).build()
+
+        # ウォームプールのインスタンスを休止状態で保持する場合はハイバネーションを有効化
+        hibernation = config.asg_warm_pool_enabled and config.asg_warm_pool_state == 'hibernated'
+
+        self._add_lifecycle_commands(user_data, hibernation)
+        if config.asg_spot_enabled:
+            add_drain_commands(
+                user_data,
+                [target_group.target_group_arn for target_group in load_balancer.target_groups]
+            )
+
+        # 起動テンプレート（単一インスタンス構成と同じ設定）
+        self.launch_template = ec2.LaunchTemplate(
+            self, "LaunchTemplate",
+            machine_image=ubuntu_machine_image(),
+            instance_type=ec2.InstanceType(instance_type),
+            security_group=security_group,
+            role=instance_role,
+            user_data=user_data,
+            http_tokens=ec2.LaunchTemplateHttpTokens.REQUIRED,  # セキュリティ強化（IMDSv2必須）
+            http_put_response_hop_limit=2,  # コンテナからIMDSv2（インスタンスロールの認証情報）を利用するため
+            instance_metadata_tags=True,  # ライフサイクルスクリプトでAuto Scaling Group名を取得するため
+            hibernation_configured=hibernation or None,
+            detailed_monitoring=True,
+            block_devices=[
+                ec2.BlockDevice(
+                    device_name="/dev/sda1",
+                    volume=ec2.BlockDeviceVolume.ebs(
+                        volume_size=100,  # 100GB
+                        volume_type=ec2.EbsDeviceVolumeType.GP3,
+                        encrypted=True
+                    )
+                )
+            ]
+        )
+
+        # スポットインスタンスの利用（オンデマンドのベース容量を維持し、残りをスポットで補う）
+        mixed_instances_policy = None
+        if config.asg_spot_enabled:
+            instance_types = [instance_type] + [
+                other for other in config.asg_instance_types if other != instance_type
+            ]
+            mixed_instances_policy = spot_instances_policy(
+                self.launch_template,
+                instance_types,
+                config.asg_on_demand_base_capacity,
+                config.asg_on_demand_percentage
+            )
+
+        # 両AZのプライベートサブネットに分散
+        self.auto_scaling_group = autoscaling.AutoScalingGroup(
+            self, "AutoScalingGroup",
+            vpc=vpc,
+            launch_template=None if mixed_instances_policy else self.launch_template,
+            mixed_instances_policy=mixed_instances_policy,
+            capacity_rebalance=config.asg_spot_enabled or None,
+            vpc_subnets=ec2.SubnetSelection(
+                subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
+            ),
+            min_capacity=config.asg_min_capacity,
+            max_capacity=config.asg_max_capacity,
+            # ユーザーデータによるセットアップ（Dockerインストール・イメージ取得）の完了を待つ
+            health_checks=autoscaling.HealthChecks.with_additional_checks(
+                additional_types=[autoscaling.AdditionalHealthCheckType.ELB],
+                grace_period=Duration.minutes(15)
+            ),
+            default_instance_warmup=Duration.minutes(10),
+            # ローリング更新の維持台数は最大台数未満（CloudFormationの制約）
+            update_policy=autoscaling.UpdatePolicy.rolling_update(
+                min_instances_in_service=min(config.asg_min_capacity, config.asg_max_capacity - 1),
+                pause_time=Duration.minutes(15)
+            ),
+            group_metrics=[autoscaling.GroupMetrics.all()]
+        )
+
+        # 起動時のライフサイクルフック（Difyが応答するまでInService/ウォームプールへ移行しない）
+        self.auto_scaling_group.add_lifecycle_hook(
+            "BootstrapHook",
+            lifecycle_hook_name=self.LIFECYCLE_HOOK_NAME,
+            lifecycle_transition=autoscaling.LifecycleTransition.INSTANCE_LAUNCHING,
+            heartbeat_timeout=Duration.minutes(20),
+            default_result=autoscaling.DefaultResult.ABANDON
+        )
+        # 終了時のライフサイクルフック（スポットの容量再調整・スケールイン時にドレインを待つ）
+        if config.asg_spot_enabled:
+            self.auto_scaling_group.add_lifecycle_hook(
+                "DrainHook",
+                lifecycle_hook_name=DRAIN_HOOK_NAME,
+                lifecycle_transition=autoscaling.LifecycleTransition.INSTANCE_TERMINATING,
+                heartbeat_timeout=Duration.minutes(3),
+                default_result=autoscaling.DefaultResult.CONTINUE
+            )
+        # 起動テンプレートとの循環参照を避けるため、ロールのデフォルトポリシーとは別に作成
+        lifecycle_policy = iam.Policy(
+            self, "LifecyclePolicy",
+            roles=[instance_role],
+            statements=[
+                iam.PolicyStatement(
+                    effect=iam.Effect.ALLOW,
+                    actions=["autoscaling:CompleteLifecycleAction"],
+                    resources=[self.auto_scaling_group.auto_scaling_group_arn]
+                )
+            ]
+        )
+        if config.asg_spot_enabled:
+            lifecycle_policy.add_statements(
+                iam.PolicyStatement(
+                    effect=iam.Effect.ALLOW,
+                    actions=["elasticloadbalancing:DeregisterTargets"],
+                    resources=[target_group.target_group_arn for target_group in load_balancer.target_groups]
+                )
+            )
+
+        # ウォームプール（セットアップ済みのインスタンスを停止・休止状態で待機）
+        if config.asg_warm_pool_enabled:
+            pool_state = (
+                autoscaling.PoolState.HIBERNATED if hibernation else autoscaling.PoolState.STOPPED
+            )
+            self.auto_scaling_group.add_warm_pool(
+                min_size=config.asg_warm_pool_min_size,
+                pool_state=pool_state,
+                reuse_on_scale_in=True
+            )
+
+        # ALBのターゲットグループに登録
+        for target_group in load_balancer.target_groups:
+            self.auto_scaling_group.attach_to_application_target_group(target_group)
+
+        # スケーリングポリシー（ターゲット追跡）
+        self._create_scaling_policy(load_balancer)
+
+        # タグの追加
+        Tags.of(self.auto_scaling_group).add("Name", f"{id}-instance")
+        Tags.of(self.auto_scaling_group).add(RUNTIME_CONFIG_TAG, Stack.of(self).stack_name)
+
+        # 出力の設定
+        CfnOutput(
+            self, "AutoScalingGroupName",
+            value=self.auto_scaling_group.auto_scaling_group_name,
+            description="Dify Auto Scaling Group name"
+        )
+
+    def _add_lifecycle_commands(self, user_data: ec2.UserData, hibernation: bool):
+        """
+        ライフサイクルアクションを完了するスクリプトをユーザーデータに追加する
+
+        初回起動時はセットアップ完了後に実行し、以降の起動時（ウォームプールからの起動）は
+        systemdサービスとして実行します。休止状態のウォームプールから再開した場合は再起動を
+        伴わないため、休止からの復帰時に実行するサービスも登録します。Docker Composeの
+        コンテナは自動的に再起動するため、ウォームプールからのスケールアウトはコンテナの
+        起動待ちのみで完了します。Difyが応答しない場合はライフサイクルアクションを中止
+        （ABANDON）し、インスタンスを置き換えます。
+
+        Args:
+            user_data: ユーザーデータ
+            hibernation: ウォームプールのインスタンスを休止状態で保持するか
+        """
+        user_data.add_commands(f"""
+# ライフサイクルアクション完了スクリプトの作成
+log "Configuring Auto Scaling lifecycle action..."
+if ! command -v aws > /dev/null 2>&1; then
+    apt-get install -y awscli
+fi
+
+cat > /usr/local/bin/dify-lifecycle.sh << 'DIFY_LIFECYCLE_EOF'
+#!/bin/bash
+# Difyが応答するまで待機し、Auto Scalingのライフサイクルアクションを完了する
+# （応答しない場合はABANDONで完了し、インスタンスを置き換える）
+IMDS=http://169.254.169.254/latest
+TOKEN=$(curl -s -X PUT $IMDS/api/token -H 'X-aws-ec2-metadata-token-ttl-seconds: 300')
+imds() {{
+    curl -s -H "X-aws-ec2-metadata-token: ${{TOKEN}}" "$IMDS/meta-data/$1"
+}}
+INSTANCE_ID=$(imds instance-id)
+ASG_NAME=$(imds tags/instance/aws:autoscaling:groupName)
+export AWS_DEFAULT_REGION=$(imds placement/region)
+
+RESULT=ABANDON
+for i in $(seq 1 120); do
+    if curl -sf -o /dev/null http://localhost/console/api/ping; then
+        RESULT=CONTINUE
+        break
+    fi
+    sleep 5
+done
+echo "Dify health check result: $RESULT"
+
+# ライフサイクルアクションを待機していない場合（InService中の再起動等）は失敗するため無視する
+aws autoscaling complete-lifecycle-action \
+    --lifecycle-hook-name {self.LIFECYCLE_HOOK_NAME} \
+    --auto-scaling-group-name "$ASG_NAME" \
+    --instance-id "$INSTANCE_ID" \
+    --lifecycle-action-result "$RESULT" || true
+[ "$RESULT" = CONTINUE ]
+DIFY_LIFECYCLE_EOF
+chmod +x /usr/local/bin/dify-lifecycle.sh
+
+cat > /etc/systemd/system/dify-lifecycle.service << 'DIFY_LIFECYCLE_EOF'
+[Unit]
+Description=Complete Auto Scaling lifecycle action when Dify is ready
+After=docker.service network-online.target
+Wants=network-online.target
+
+[Service]
+Type=oneshot
+ExecStart=/usr/local/bin/dify-lifecycle.sh
+
+[Install]
+WantedBy=multi-user.target
+DIFY_LIFECYCLE_EOF
+systemctl daemon-reload
+systemctl enable dify-lifecycle.service
+""")
+
+        if hibernation:
+            user_data.add_commands("""
+# 休止状態のウォームプールから再開した場合もライフサイクルアクションを完了する
+# （休止からの復帰ではmulti-user.targetが再実行されないため）
+if ! dpkg -s ec2-hibinit-agent > /dev/null 2>&1; then
+    apt-get install -y ec2-hibinit-agent
+fi
+cat > /etc/systemd/system/dify-lifecycle-resume.service << 'DIFY_LIFECYCLE_EOF'
+[Unit]
+Description=Complete Auto Scaling lifecycle action after resuming from hibernation
+After=hibernate.target
+
+[Service]
+Type=oneshot
+ExecStart=/usr/local/bin/dify-lifecycle.sh
+
+[Install]
+WantedBy=hibernate.target
+DIFY_LIFECYCLE_EOF
+systemctl daemon-reload
+systemctl enable dify-lifecycle-resume.service
+""")
+
+        user_data.add_commands("""
+# 初回起動（ウォームプールへの投入またはスケールアウト）
+if /usr/local/bin/dify-lifecycle.sh; then
+    log "Auto Scaling lifecycle action completed"
+else
+    log "Dify did not become ready; lifecycle action abandoned"
+fi
+""")
+
+    def _create_scaling_policy(self, load_balancer: LoadBalancerConstruct):
+        """
+        ALBリクエスト数またはCPU使用率のターゲット追跡スケーリングポリシーを作成
+
+        Args:
+            load_balancer: 前段の内部ALB
+        """
+        if self.config.asg_scaling_metric == 'cpu':
+            self.auto_scaling_group.scale_on_cpu_utilization(
+                "CpuScaling",
+                target_utilization_percent=self.config.asg_target_cpu
+            )
+            return
+
+        # ターゲットグループを複数登録しているため、API側のリクエスト数で直接ポリシーを作成
+        resource_label = (
+            f"{load_balancer.load_balancer.load_balancer_full_name}/"
+            f"{load_balancer.api_target_group.target_group_full_name}"
+        )
+        autoscaling.TargetTrackingScalingPolicy(
+            self, "RequestCountScaling",
+            auto_scaling_group=self.auto_scaling_group,
+            predefined_metric=autoscaling.PredefinedMetric.ALB_REQUEST_COUNT_PER_TARGET,
+            resource_label=resource_label,
+            target_value=self.config.asg_target_requests_per_instance
+        )
@@ -6,12 +6,31 @@ Linux VMコンストラクト
 このモジュールは、Linux VMインスタンスを定義します。
 """
 
-import os
+from typing import Optional
 from constructs import Construct
 from aws_cdk import aws_ec2 as ec2
 from aws_cdk import aws_iam as iam
-from aws_cdk import aws_ssm as ssm
-from aws_cdk import Tags, CfnOutput
+from aws_cdk import aws_route53 as route53
+from aws_cdk import CfnCreationPolicy, CfnResourceSignal, Duration, Stack, Tags, CfnOutput
+
+from dify_cdk.config.instance_types import hibernation_volume_size
+from dify_cdk.constructs.dify_runtime import DifyRuntimeSettings
+from dify_cdk.constructs.linux_user_data import LinuxUserData, ubuntu_machine_image
+from dify_cdk.constructs.nginx_tuning import configure_nginx
+from dify_cdk.constructs.runtime_config import RUNTIME_CONFIG_TAG
+
+
+# cfn-signal（aws-cfn-bootstrap）の配布元（UbuntuのAMIには含まれない）
+CFN_BOOTSTRAP_URL = "https://s3.amazonaws.com/cloudformation-examples/aws-cfn-bootstrap-py3-latest.tar.gz"
+
+# 旧インスタンスの停止前に待つ時間（秒）。ALBの登録解除の遅延（30秒）とDNSのTTL（60秒）を待つ
+BLUE_GREEN_DRAIN_DELAY = 60
+
+# 休止状態でルートボリュームに必要な容量のうち、OS・Dockerイメージが使用する分（GB）
+HIBERNATION_USED_SIZE = 40
+
+# 休止状態に対応するメモリ量の上限（Linux、GiB）
+HIBERNATION_MAX_MEMORY = 150
 
 
 class LinuxInstanceConstruct(Construct):
@@ -27,6 +46,14 @@ class LinuxInstanceConstruct(Construct):
         instance_type: str,
         ami_name_pattern: str,
         config,
+        dify_settings: Optional[DifyRuntimeSettings] = None,
+        volume_size: int = 100,
+        volume_iops: Optional[int] = None,
+        volume_throughput: Optional[int] = None,
+        blue_green: bool = False,
+        data_volume_size: Optional[int] = None,
+        data_volume_snapshot_id: Optional[str] = None,
+        hibernation: bool = False,
         **kwargs
     ):
         """
@@ -41,25 +68,77 @@ class LinuxInstanceConstruct(Construct):
             instance_type: インスタンスタイプ
             ami_name_pattern: AMI名のパターン
             config: 設定オブジェクト
+            dify_settings: Dify実行時設定（マネージドサービスへの接続等）
+            volume_size: ルートボリュームのサイズ（GB）
+            volume_iops: ルートボリューム（gp3）のIOPS（未指定の場合はベースライン）
+            volume_throughput: ルートボリューム（gp3）のスループット（MiB/s、未指定の場合はベースライン）
+            blue_green: ユーザーデータの変更時に新しいインスタンスの正常性を確認してから切り替えるか
+            data_volume_size: Difyのデータ用ボリュームのサイズ（GB、未指定の場合はルートボリュームに格納）
+            data_volume_snapshot_id: データ用ボリュームの復元元のスナップショットID
+            hibernation: 休止状態を有効にするか（ルートボリュームはメモリ量に応じて拡張）
             **kwargs: その他の引数
         """
         super().__init__(scope, id)
 
         self.config = config
+        self.dify_settings = dify_settings or DifyRuntimeSettings()
+
+        # 起動時に読み取るシークレットへのアクセス権限を付与
+        for secret in self.dify_settings.secrets:
+            secret.grant_read(instance_role)
+
+        # nginxの設定の上書き（インスタンスタイプに応じた接続数、nginxを実行するホストのみ）
+        settings = self.dify_settings
+        if config.nginx_tuning_enabled and settings.runs_service("nginx"):
+            settings = settings.copy()
+            configure_nginx(settings, instance_type)
 
         # ユーザーデータスクリプトの読み込み
-        user_data = self._load_user_data()
+        data_volume = bool(data_volume_size or data_volume_snapshot_id)
+        user_data = LinuxUserData(config, settings, host_id=id, data_volume=data_volume).build()
+
+        # 休止状態用のスワップファイルを作成するエージェント（UbuntuのAMIに含まれない場合のみインストール）
+        if hibernation:
+            user_data.add_commands(
+                "dpkg -s ec2-hibinit-agent > /dev/null 2>&1 || apt-get install -y ec2-hibinit-agent",
+                "systemctl enable --now hibinit-agent.service || true"
+            )
+            volume_size = hibernation_volume_size(
+                instance_type, volume_size, HIBERNATION_USED_SIZE, HIBERNATION_MAX_MEMORY
+            )
+
+        if blue_green:
+            self._add_blue_green_commands(user_data)
 
         # Ubuntu AMIの設定
-        ubuntu_ami = ec2.MachineImage.generic_linux({
-            'ap-northeast-1': 'ami-0d52744d6551d851e',  # 東京リージョンのUbuntu 22.04
-            'us-east-1': 'ami-0c7217cdde317cfec',       # バージニアリージョンのUbuntu 22.04
-            'us-west-2': 'ami-0efcece6bed30fd98',       # オレゴンリージョンのUbuntu 22.04
-        })
+        ubuntu_ami = ubuntu_machine_image()
 
         # インスタンスタイプの設定
         instance_type_obj = ec2.InstanceType(instance_type)
 
+        # ボリュームの設定（データ用ボリュームを使用する場合、IOPS・スループットはデータ用ボリュームに設定）
+        block_devices = [
+            ec2.BlockDevice(
+                device_name="/dev/sda1",
+                volume=ec2.BlockDeviceVolume.ebs(
+                    volume_size=volume_size,  # 既定は100GB
+                    volume_type=ec2.EbsDeviceVolumeType.GP3,
+                    iops=None if data_volume else volume_iops,
+                    throughput=None if data_volume else volume_throughput,
+                    encrypted=True
+                )
+            )
+        ]
+        if data_volume:
+            block_devices.append(
+                ec2.BlockDevice(
+                    device_name="/dev/sdf",
+                    volume=self._data_volume(
+                        data_volume_size, data_volume_snapshot_id, volume_iops, volume_throughput
+                    )
+                )
+            )
+
         # Linux VMの作成
         self.instance = ec2.Instance(
             self,
@@ -73,34 +152,21 @@ class LinuxInstanceConstruct(Construct):
             security_group=security_group,
             role=instance_role,
             user_data=user_data,
-            require_imdsv2=True,  # セキュリティ強化
+            http_tokens=ec2.HttpTokens.REQUIRED,  # セキュリティ強化（IMDSv2必須）
+            http_put_response_hop_limit=2,  # コンテナからIMDSv2（インスタンスロールの認証情報）を利用するため
             detailed_monitoring=True,  # 詳細なモニタリングを優先
+            hibernation_enabled=hibernation or None,
             user_data_causes_replacement=True,
-            block_devices=[
-                ec2.BlockDevice(
-                    device_name="/dev/sda1",
-                    volume=ec2.BlockDeviceVolume.ebs(
-                        volume_size=100,  # 100GB
-                        volume_type=ec2.EbsDeviceVolumeType.GP3,
-                        encrypted=True
-                    )
-                )
-            ]
+            block_devices=block_devices
         )
 
-        # SSMパラメータストアにユーザーパスワードを保存
-        user_password = ssm.StringParameter(
-            self,
-            "UserPassword",
-            parameter_name=f"/dify/{id}/user-password",
-            string_value=config.linux_admin_password,
-            description="Linux VM user password",
-            tier=ssm.ParameterTier.STANDARD,
-            simple_name=False
-        )
+        # Blue/Green切り替え（新しいインスタンスの作成完了をヘルスチェックの成功まで遅らせる）
+        if blue_green:
+            self._configure_blue_green(user_data, instance_role)
 
         # タグの追加
         Tags.of(self.instance).add("Name", f"{id}-instance")
+        Tags.of(self.instance).add(RUNTIME_CONFIG_TAG, Stack.of(self).stack_name)
 
         # 出力の設定
         CfnOutput(
@@ -117,249 +183,161 @@ class LinuxInstanceConstruct(Construct):
             description="Linux VM Private IP Address"
         )
 
-    def _load_user_data(self) -> ec2.UserData:
+    def _data_volume(
+        self,
+        volume_size: Optional[int],
+        snapshot_id: Optional[str],
+        volume_iops: Optional[int],
+        volume_throughput: Optional[int]
+    ) -> ec2.BlockDeviceVolume:
         """
-        ユーザーデータスクリプトを読み込む
+        Difyのデータ用ボリュームを定義する
+
+        スナップショットを指定した場合は、そのスナップショットから復元したボリュームで起動します。
+        高速スナップショット復元が有効なスナップショットでは、復元直後からボリューム本来の性能で動作します。
+
+        Args:
+            volume_size: ボリュームのサイズ（GB、スナップショットを指定した場合はスナップショット以上のサイズ）
+            snapshot_id: 復元元のスナップショットID
+            volume_iops: gp3のIOPS
+            volume_throughput: gp3のスループット（MiB/s）
 
         Returns:
-            UserDataインスタンス
+            ブロックデバイスのボリューム
         """
-        user_data = ec2.UserData.for_linux()
-
-        # 環境変数の設定
-        user_data.add_commands(
-            f"export admin_username='{self.config.linux_admin_username}'",
-            f"export admin_password='{self.config.linux_admin_password}'"
+        if snapshot_id:
+            # 暗号化はスナップショットから引き継ぐ
+            return ec2.BlockDeviceVolume.ebs_from_snapshot(
+                snapshot_id,
+                volume_size=volume_size,
+                volume_type=ec2.EbsDeviceVolumeType.GP3,
+                iops=volume_iops,
+                throughput=volume_throughput
+            )
+        return ec2.BlockDeviceVolume.ebs(
+            volume_size=volume_size,
+            volume_type=ec2.EbsDeviceVolumeType.GP3,
+            iops=volume_iops,
+            throughput=volume_throughput,
+            encrypted=True
         )
 
-        # ユーザーデータスクリプトの追加
-        user_data.add_commands(self._get_user_data_script())
+    def add_private_dns_record(self, vpc: ec2.Vpc, zone_name: str) -> str:
+        """
+        インスタンスのプライベートIPを指すDNSレコードを作成する
 
-        return user_data
+        ALBを使用しない構成でBlue/Green切り替えを行う場合や、ワーカー層から接続する場合の接続先です。
+        インスタンスの置き換え時は、新しいインスタンスの正常性を確認した後にレコードが更新されます。
 
-    def _get_user_data_script(self) -> str:
-        """
-        ユーザーデータスクリプトを取得
+        Args:
+            vpc: VPCインスタンス
+            zone_name: プライベートホストゾーンの名前（ゾーンの頂点にレコードを作成）
 
         Returns:
-            ユーザーデータスクリプト文字列
+            DNS名
         """
-        return """
-#!/bin/bash
-# Difyインストール用Ubuntuユーザーデータスクリプト
-
-# エラーハンドリングの設定
-set -e
-set -o pipefail
-
-# ログ関数
-log() {
-    echo "[$(date '+%Y-%m-%d %H:%M:%S')] $1" | tee -a /var/log/user-data.log
-}
-
-# エラーハンドリング関数
-handle_error() {
-    log "ERROR: An error occurred on line $1"
+        hosted_zone = route53.PrivateHostedZone(
+            self, "HostedZone",
+            zone_name=zone_name,
+            vpc=vpc
+        )
+        route53.ARecord(
+            self, "Record",
+            zone=hosted_zone,
+            target=route53.RecordTarget.from_ip_addresses(self.instance.instance_private_ip),
+            ttl=Duration.minutes(1)
+        )
+
+        CfnOutput(
+            self,
+            "DnsName",
+            value=zone_name,
+            description="Linux VM private DNS name"
+        )
+        return zone_name
+
+    def _add_blue_green_commands(self, user_data: ec2.UserData):
+        """
+        Blue/Green切り替え用のスクリプトをユーザーデータに追加する
+
+        セットアップ完了後にALBと同じパスでDifyの応答を確認し、応答しない場合は
+        失敗として終了します（CloudFormationが新しいインスタンスを削除し、旧インスタンスを維持します）。
+        また、インスタンスの終了時にDifyを停止するsystemdサービスを登録し、
+        旧インスタンスの削除時に処理中のリクエスト・タスクの完了を待ちます。
+
+        Args:
+            user_data: ユーザーデータ
+        """
+        user_data.add_commands(f"""
+# 終了時のドレインサービスの作成（旧インスタンスの削除時に実行）
+log "Configuring drain on shutdown..."
+cat > /etc/systemd/system/dify-drain.service << 'DIFY_DRAIN_EOF'
+[Unit]
+Description=Drain Dify before the instance is retired
+After=docker.service network-online.target
+Wants=network-online.target
+
+[Service]
+Type=oneshot
+RemainAfterExit=yes
+ExecStart=/bin/true
+ExecStop=/bin/sh -c 'sleep {BLUE_GREEN_DRAIN_DELAY}; cd /opt/dify/docker && docker compose stop --timeout 90 nginx api worker'
+TimeoutStopSec={BLUE_GREEN_DRAIN_DELAY + 120}
+
+[Install]
+WantedBy=multi-user.target
+DIFY_DRAIN_EOF
+systemctl daemon-reload
+systemctl enable --now dify-drain.service
+
+# 切り替え前のヘルスチェック（ALBのヘルスチェックと同じパス）
+log "Waiting for Dify health checks before switching traffic..."
+healthy=false
+for i in $(seq 1 60); do
+    if curl -sf -o /dev/null http://localhost/console/api/ping && curl -sf -o /dev/null http://localhost/; then
+        healthy=true
+        break
+    fi
+    sleep 10
+done
+if [ "$healthy" != true ]; then
+    log "Dify did not become healthy; the previous instance keeps serving"
     exit 1
-}
-
-# エラートラップの設定
-trap 'handle_error $LINENO' ERR
-
-# スクリプト開始
-log "Starting Dify installation script..."
-
-# デフォルト値の設定
-admin_username=${admin_username:-ubuntu}
-admin_password=${admin_password:-P@ssw0rd123!}
-enable_cloudwatch_agent=${enable_cloudwatch_agent:-false}
-
-# ユーザーパスワード設定
-log "Setting ${admin_username} user password..."
-echo "${admin_username}:${admin_password}" | chpasswd
-
-# SSH設定
-log "Configuring SSH settings..."
-sed -i 's/#PasswordAuthentication no/PasswordAuthentication yes/' /etc/ssh/sshd_config
-sed -i 's/PasswordAuthentication no/PasswordAuthentication yes/' /etc/ssh/sshd_config
-sed -i 's/#PermitRootLogin yes/PermitRootLogin no/' /etc/ssh/sshd_config
-sed -i 's/PermitRootLogin yes/PermitRootLogin no/' /etc/ssh/sshd_config
-systemctl restart sshd
-
-# システムの更新（コメントアウト）
-# log "Updating system packages..."
-# export DEBIAN_FRONTEND=noninteractive
-# apt-get update -y
-# apt-get upgrade -y -o Dpkg::Options::="--force-confdef" -o Dpkg::Options::="--force-confold"
-
-# 必要最小限のパッケージのインストール（DifyとDocker用）
-log "Installing required packages for Dify and Docker..."
-apt-get update -y
-apt-get install -y \\
-    apt-transport-https \\
-    ca-certificates \\
-    curl \\
-    gnupg \\
-    lsb-release \\
-    git
-
-# SSMエージェント状態確認（コメントアウト）
-# log "Checking SSM Agent status..."
-# if systemctl is-active --quiet amazon-ssm-agent; then
-#     log "SSM Agent is already running"
-#     systemctl status amazon-ssm-agent --no-pager | tee -a /var/log/user-data.log
-# else
-#     log "SSM Agent is not running, attempting to start..."
-#     systemctl start amazon-ssm-agent
-#     systemctl enable amazon-ssm-agent
-#     sleep 5
-#     if systemctl is-active --quiet amazon-ssm-agent; then
-#         log "SSM Agent started successfully"
-#     else
-#         log "ERROR: Failed to start SSM Agent"
-#     fi
-# fi
-
-# Session Manager Plugin のインストール（コメントアウト）
-# log "Checking if Session Manager Plugin is already installed..."
-# if ! command -v session-manager-plugin &> /dev/null; then
-#     log "Session Manager Plugin not found, installing..."
-#     curl "https://s3.amazonaws.com/session-manager-downloads/plugin/latest/ubuntu_64bit/session-manager-plugin.deb" -o "session-manager-plugin.deb"
-#     dpkg -i session-manager-plugin.deb
-#     rm -f session-manager-plugin.deb
-# fi
-
-# Dockerのインストール
-log "Installing Docker..."
-curl -fsSL https://download.docker.com/linux/ubuntu/gpg | gpg --dearmor -o /usr/share/keyrings/docker-archive-keyring.gpg
-echo "deb [arch=$(dpkg --print-architecture) signed-by=/usr/share/keyrings/docker-archive-keyring.gpg] https://download.docker.com/linux/ubuntu $(lsb_release -cs) stable" | tee /etc/apt/sources.list.d/docker.list > /dev/null
-apt-get update -y
-apt-get install -y docker-ce docker-ce-cli containerd.io docker-compose-plugin
-
-# Dockerサービスの開始と有効化
-systemctl start docker
-systemctl enable docker
-
-# ubuntuユーザーをdockerグループに追加
-usermod -aG docker ${admin_username}
-
-# Difyのインストール
-log "Installing Dify..."
-cd /opt
-
-# Difyのクローン
-git clone https://github.com/langgenius/dify.git dify
-cd dify/docker
-
-# 環境設定ファイルの作成
-log "Creating environment configuration..."
-cp .env.example .env
-
-# 基本的な設定を.envファイルに追加
-# 動的にIPアドレスを取得
-PRIVATE_IP=$(hostname -I | awk '{print $1}')
-SECRET_KEY_VALUE="dify_secret_key_$(openssl rand -hex 32)"
-
-cat >> .env << EOF
-# 基本設定
-EDITION=SELF_HOSTED
-CONSOLE_URL=http://${PRIVATE_IP}
-API_URL=http://${PRIVATE_IP}/api
-SERVICE_API_URL=http://${PRIVATE_IP}/api
-APP_URL=http://${PRIVATE_IP}
-
-# データベース設定
-DB_HOST=db
-DB_PORT=5432
-DB_USERNAME=postgres
-DB_PASSWORD=difyai123456
-DB_DATABASE=dify
-
-# Redis設定
-REDIS_HOST=redis
-REDIS_PORT=6379
-REDIS_USERNAME=
-REDIS_PASSWORD=
-REDIS_DB=0
-
-# ストレージ設定
-STORAGE_TYPE=local
-LOCAL_STORAGE_PATH=./storage
-
-# セキュリティ設定
-SECRET_KEY=${SECRET_KEY_VALUE}
-EOF
-
-# Docker ComposeでDifyを起動
-log "Starting Dify with Docker Compose..."
-docker compose up -d
-
-# データベースとRedisが起動するまで待機
-log "Waiting for database and Redis to be ready..."
-sleep 60
-
-# データベース接続テスト
-log "Testing database connection..."
-docker compose exec -T db pg_isready -U postgres || true
-
-# ファイアウォールの設定
-log "Configuring firewall..."
-ufw allow 22/tcp
-ufw allow 80/tcp
-ufw allow 443/tcp
-ufw allow 3000/tcp
-ufw allow 5001/tcp
-echo "y" | ufw enable
-
-# Difyアプリケーションが完全に起動するまで待機
-log "Waiting for Dify application to be fully ready..."
-sleep 30
-
-# Difyコンテナの状態確認
-log "Checking Dify containers status..."
-cd /opt/dify/docker && docker compose ps
-
-# エラーログがあれば表示
-log "Checking for any container errors..."
-cd /opt/dify/docker && docker compose logs --tail=20 | grep -i error || true
-
-# 簡単なステータス確認スクリプトを作成
-log "Creating status check script..."
-cat > /opt/dify/check_status.sh << 'EOF'
-#!/bin/bash
-echo "Difyコンテナステータス:"
-cd /opt/dify/docker && docker compose ps
-
-echo -e "\\nDifyアプリケーションURL:"
-echo "http://$(hostname -I | awk '{print $1}')"
-echo "初期設定: http://$(hostname -I | awk '{print $1}')/install"
-
-echo -e "\\nシステム情報:"
-echo "Docker: $(docker --version)"
-echo "Docker Compose: $(docker compose version)"
-
-echo -e "\\nDifyログ（最新10行）:"
-cd /opt/dify/docker && docker compose logs --tail=10
-EOF
-
-chmod +x /opt/dify/check_status.sh
-
-# セットアップ完了
-log "Dify installation completed successfully!"
-log "System information:"
-log "Docker: $(docker --version)"
-log "Docker Compose: $(docker compose version)"
-
-# 完了をログに記録
-echo "Difyのインストールが正常に完了しました！" > /var/log/dify-setup.log
-echo "インストール完了時刻: $(date)" >> /var/log/dify-setup.log
-echo "Difyアクセス先: http://$(hostname -I | awk '{print $1}')" >> /var/log/dify-setup.log
-echo "管理画面初期設定: http://$(hostname -I | awk '{print $1}')/install" >> /var/log/dify-setup.log
-
-# 最終状態確認
-log "Final status check:"
-sleep 10
-cd /opt/dify/docker && docker compose ps | tee -a /var/log/user-data.log
-
-log "Dify installation script completed at $(date)"
-"""
\ No newline at end of file
+fi
+log "Dify is healthy; switching traffic to this instance"
+""")
+
+    def _configure_blue_green(self, user_data: ec2.UserData, instance_role: iam.Role):
+        """
+        スクリプトの終了コードをCloudFormationに通知し、作成完了をその通知まで待つ
+
+        ユーザーデータの変更によるインスタンスの置き換えでは、CloudFormationは新しいインスタンスを
+        作成してからALBのターゲット・DNSレコードを更新し、最後に旧インスタンスを削除します。
+
+        Args:
+            user_data: ユーザーデータ
+            instance_role: IAMロール
+        """
+        # 終了時にcfn-signalを用意して結果を通知（セットアップの途中で失敗した場合も通知する）
+        user_data.add_on_exit_commands(
+            "if [ ! -x /opt/aws/bin/cfn-signal ]; then",
+            "    apt-get update -q && apt-get install -y -q python3-pip"
+            f" && pip3 install -q {CFN_BOOTSTRAP_URL}"
+            " && mkdir -p /opt/aws/bin && ln -sf /usr/local/bin/cfn-signal /opt/aws/bin/cfn-signal || true",
+            "fi"
+        )
+        user_data.add_signal_on_exit_command(self.instance)
+        instance_role.add_to_principal_policy(
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=["cloudformation:SignalResource"],
+                resources=[Stack.of(self).stack_id]
+            )
+        )
+
+        self.instance.instance.cfn_options.creation_policy = CfnCreationPolicy(
+            resource_signal=CfnResourceSignal(
+                count=1,
+                timeout=f"PT{self.config.blue_green_timeout_minutes}M"
+            )
+        )
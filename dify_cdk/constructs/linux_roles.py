@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+
+"""
+Linuxロール分割コンストラクト
+
+このモジュールは、DifyのコンポーネントをロールごとのLinux VMに分割して配置する構成を定義します。
+各ホストは同じユーザーデータ（Docker Compose）を使用し、ロールに応じてサービスを有効化します。
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from constructs import Construct
+from aws_cdk import aws_ec2 as ec2
+from aws_cdk import aws_route53 as route53
+from aws_cdk import aws_secretsmanager as secretsmanager
+from aws_cdk import Duration
+
+from dify_cdk.constructs.dify_runtime import COMPOSE_RESET_LIST, DifyRuntimeSettings
+from dify_cdk.constructs.linux_instance import LinuxInstanceConstruct
+from dify_cdk.constructs.llm_gateway import GATEWAY_SERVICE, SEMANTIC_CACHE_SERVICE
+from dify_cdk.constructs.local_inference import LOCAL_INFERENCE_SERVICES
+
+
+class LinuxRolesConstruct(Construct):
+    """DifyのコンポーネントをロールごとのLinux VMに分割して作成するコンストラクト"""
+
+    # ホスト名を登録するプライベートホストゾーン
+    ZONE_NAME = "dify.internal"
+
+    # ロールごとに実行するDocker Composeサービス
+    ROLE_SERVICES = {
+        "app": ("api", "web", "nginx", "ssrf_proxy"),
+        "worker": ("worker", "ssrf_proxy"),
+        "sandbox": ("sandbox", "plugin_daemon", "ssrf_proxy"),
+        "data": ("db", "redis", "weaviate"),
+    }
+
+    # 他のロールのホストから接続されるサービスと公開ポート
+    PUBLISHED_PORTS = {
+        "api": 5001,
+        "sandbox": 8194,
+        "plugin_daemon": 5002,
+        "db": 5432,
+        "redis": 6379,
+        "weaviate": 8080,
+    }
+
+    # 公開ポートを待ち受けるサービス（sandboxは内部ネットワークのみに接続するため、
+    # 同じホストのssrf_proxyのリバースプロキシ（SSRF_REVERSE_PROXY_PORT）で公開する）
+    PUBLISHING_SERVICES = {
+        "sandbox": "ssrf_proxy",
+    }
+
+    # depends_onを解除するサービス（依存先が別ホストに配置されるため）
+    DEPENDENTS = ("api", "worker", "plugin_daemon")
+
+    # 別ホストのサービスに接続するサービス（ssrf_proxyはsandboxへのリバースプロキシを含む）
+    CLIENTS = ("api", "worker", "plugin_daemon", "nginx", "ssrf_proxy", GATEWAY_SERVICE)
+
+    # モデルを呼び出すプラグインデーモンと同じロールで実行するサービス（ローカル推論・LLMゲートウェイ）
+    MODEL_SERVICES = (*LOCAL_INFERENCE_SERVICES, GATEWAY_SERVICE, SEMANTIC_CACHE_SERVICE)
+
+    def __init__(
+        self,
+        scope: Construct,
+        id: str,
+        vpc: ec2.Vpc,
+        security,
+        config,
+        dify_settings: DifyRuntimeSettings,
+        **kwargs
+    ):
+        """
+        コンストラクタ
+
+        Args:
+            scope: 親スコープ
+            id: コンストラクトID
+            vpc: VPCインスタンス
+            security: セキュリティコンストラクト（Linux VM共通のセキュリティグループとIAMロール）
+            config: 設定オブジェクト
+            dify_settings: Dify実行時設定（全ロール共通）
+            **kwargs: その他の引数
+        """
+        super().__init__(scope, id)
+
+        self.config = config
+        self._validate_config()
+
+        # マネージドサービスに置き換え済みのサービスはデータノードに配置しない
+        self.role_services = {
+            role: tuple(
+                service for service in services
+                if not self._is_disabled(dify_settings, service)
+            )
+            for role, services in self.ROLE_SERVICES.items()
+        }
+        roles = [role for role, services in self.role_services.items() if services]
+
+        # 別ホストのサービスが使用する認証情報（コンテナの既定値を使用しない）
+        self._configure_credentials(dify_settings)
+
+        # ロールのホスト名（ユーザーデータで解決するため、インスタンス間の循環参照が発生しない）
+        self.hosted_zone = route53.PrivateHostedZone(
+            self, "HostedZone",
+            zone_name=self.ZONE_NAME,
+            vpc=vpc
+        )
+
+        self.instances: Dict[str, LinuxInstanceConstruct] = {}
+        for role in roles:
+            settings = dify_settings.copy()
+            self._configure_role(settings, role, roles)
+
+            # データノードのデータはスナップショットを取得するデータ用ボリュームに格納（オプション）
+            data_volume = role == "data" and config.data_volume_enabled
+
+            # ロールが公開するポートへの接続を他のロールから許可
+            ports = {
+                service: self.PUBLISHED_PORTS[service]
+                for service in self.role_services[role]
+                if service in self.PUBLISHED_PORTS
+            }
+
+            linux_instance = LinuxInstanceConstruct(
+                self, role.title(),
+                vpc=vpc,
+                security_group=security.linux_sg,
+                instance_role=security.instance_role,
+                instance_type=config.get_linux_role(role, "instance-type"),
+                ami_name_pattern=config.linux_ami_name,
+                config=config,
+                dify_settings=settings,
+                volume_size=int(config.get_linux_role(role, "volume-size")),
+                volume_iops=int(config.get_linux_role(role, "volume-iops")),
+                volume_throughput=int(config.get_linux_role(role, "volume-throughput")),
+                data_volume_size=config.snapshot_data_volume_size if data_volume else None,
+                data_volume_snapshot_id=config.snapshot_restore_id if data_volume else None,
+                hibernation=config.hibernation_enabled
+            )
+            if ports:
+                linux_instance.instance.add_security_group(
+                    security.create_linux_role_security_group(vpc, role, ports)
+                )
+
+            route53.ARecord(
+                self, f"{role.title()}Record",
+                zone=self.hosted_zone,
+                record_name=self._host_name(role),
+                target=route53.RecordTarget.from_ip_addresses(linux_instance.instance.instance_private_ip),
+                ttl=Duration.minutes(1)
+            )
+            self.instances[role] = linux_instance
+
+    @property
+    def app_instance(self) -> ec2.Instance:
+        """Web/APIロールのインスタンス（ALBのターゲット）"""
+        return self.instances["app"].instance
+
+    def _validate_config(self):
+        """
+        ロール分割構成の前提条件を確認する
+
+        apiとworkerが別ホストになるため、アップロードファイルはS3に保存する必要があります。
+        """
+        if self.config.storage_mode != 's3':
+            raise ValueError("ロール分割構成にはS3ストレージが必要です（STORAGE_MODE=s3）")
+        if self.config.pgbouncer_enabled and self.config.database_mode == 'container':
+            raise ValueError("ロール分割構成でPgBouncerを使用する場合はマネージドデータベースが必要です（DATABASE_MODE=rds|aurora）")
+
+    def _host_name(self, role: str) -> str:
+        """
+        ロールのホスト名
+
+        Args:
+            role: ロール名
+
+        Returns:
+            ホスト名（FQDN）
+        """
+        return f"{role}.{self.ZONE_NAME}"
+
+    def _role_of(self, service: str) -> Optional[str]:
+        """
+        サービスを配置するロール（ssrf_proxyのように複数ロールで実行するサービスはNone）
+
+        Args:
+            service: Docker Composeのサービス名
+
+        Returns:
+            ロール名
+        """
+        roles = [role for role, services in self.role_services.items() if service in services]
+        return roles[0] if len(roles) == 1 else None
+
+    @staticmethod
+    def _is_disabled(settings: DifyRuntimeSettings, service: str) -> bool:
+        """
+        サービスが無効化（マネージドサービスに置き換え）済みか
+
+        Args:
+            settings: Dify実行時設定
+            service: Docker Composeのサービス名
+
+        Returns:
+            無効化済みの場合True
+        """
+        return "profiles" in settings.compose_services.get(service, {})
+
+    def _configure_credentials(self, settings: DifyRuntimeSettings):
+        """
+        データノードのサービス（PostgreSQL・Redis・Weaviate）の認証情報を生成して設定する
+
+        Args:
+            settings: Dify実行時設定
+        """
+        credentials: List[Tuple[str, Tuple[str, ...]]] = []
+        data_services = self.role_services["data"]
+        if "db" in data_services:
+            credentials.append(("db-password", ("DB_PASSWORD", "POSTGRES_PASSWORD")))
+        if "redis" in data_services:
+            credentials.append(("redis-password", ("REDIS_PASSWORD",)))
+        if "weaviate" in data_services:
+            credentials.append(("weaviate-api-key", ("WEAVIATE_API_KEY", "WEAVIATE_AUTHENTICATION_APIKEY_ALLOWED_KEYS")))
+
+        for name, env_names in credentials:
+            secret = secretsmanager.Secret(
+                self, "".join(part.title() for part in name.split("-")),
+                secret_name=f"/dify/{self.node.id}/{name}",
+                description=f"Dify {name}",
+                generate_secret_string=secretsmanager.SecretStringGenerator(
+                    secret_string_template="{}",
+                    generate_string_key="password",
+                    exclude_punctuation=True,
+                    password_length=32
+                )
+            )
+            for env_name in env_names:
+                settings.set_secret_env(env_name, secret, "password")
+
+        # Celeryブローカーの接続文字列にRedisのパスワードを反映
+        if "redis" in data_services:
+            settings.set_env(CELERY_BROKER_URL="redis://:${REDIS_PASSWORD}@redis:6379/1")
+
+    def _configure_role(self, settings: DifyRuntimeSettings, role: str, roles: List[str]):
+        """
+        ロールのホストで実行するサービスと、別ホストのサービスへの接続を設定する
+
+        別ホストのサービス名（db・sandbox等）はextra_hostsでロールのホストのIPアドレスに解決するため、
+        .envの接続先（DB_HOST=db等）は単一インスタンス構成と同じ値のまま使用できます。
+
+        Args:
+            settings: ロール用に複製したDify実行時設定
+            role: ロール名
+            roles: 作成するロールの一覧
+        """
+        services = self.role_services[role]
+
+        # ロール以外のサービスを無効化
+        for other in roles:
+            if other == role:
+                continue
+            for service in self.role_services[other]:
+                if service not in services:
+                    settings.disable_service(service, dependents=())
+        # ローカル推論・LLMゲートウェイのサービスはモデルを呼び出すプラグインデーモンと同じロールで実行
+        model_services = [service for service in self.MODEL_SERVICES if service in settings.compose_services]
+        if "plugin_daemon" not in services:
+            for service in model_services:
+                settings.disable_service(service, dependents=())
+            model_services = []
+        for dependent in self.DEPENDENTS:
+            if dependent in services:
+                settings.override_service(dependent, depends_on=COMPOSE_RESET_LIST)
+
+        # 他のロールから接続されるサービスのポートを公開
+        for service in services:
+            if service in self.PUBLISHED_PORTS:
+                port = self.PUBLISHED_PORTS[service]
+                publisher = self.PUBLISHING_SERVICES.get(service, service)
+                settings.override_service(publisher, ports=[f"{port}:{port}"])
+
+        # 別ホストのサービス名をロールのホストのIPアドレスに解決
+        clients = [service for service in (*services, *model_services) if service in self.CLIENTS]
+        remote = {
+            service: self._role_of(service)
+            for service in self.PUBLISHED_PORTS
+            if self._role_of(service) not in (None, role)
+        }
+        if not (clients and remote):
+            return
+
+        remote_roles = sorted(set(remote.values()))
+        settings.add_pre_start_commands(
+            "resolve_role_host() {",
+            "    for i in $(seq 1 60); do",
+            "        ip=$(getent hosts \"$1\" | awk '{print $1}' | head -n 1)",
+            "        if [ -n \"$ip\" ]; then",
+            "            echo \"$ip\"",
+            "            return 0",
+            "        fi",
+            "        sleep 10",
+            "    done",
+            "    log \"Failed to resolve $1 in the private hosted zone\"",
+            "    return 1",
+            "}",
+            *[
+                line
+                for other in remote_roles
+                for line in (
+                    f"role_host_ip=$(resolve_role_host {self._host_name(other)})",
+                    f"echo \"{self._ip_variable(other)}=$role_host_ip\" >> .env",
+                )
+            ]
+        )
+        extra_hosts = [
+            f"{service}:${{{self._ip_variable(other)}}}"
+            for service, other in remote.items()
+        ]
+        for service in clients:
+            settings.override_service(service, extra_hosts=extra_hosts)
+
+    @staticmethod
+    def _ip_variable(role: str) -> str:
+        """
+        ロールのホストのIPアドレスを格納する.envの変数名
+
+        Args:
+            role: ロール名
+
+        Returns:
+            変数名
+        """
+        return f"DIFY_{role.upper()}_HOST_IP"
@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+
+"""
+Linux VMユーザーデータ
+
+このモジュールは、DifyをインストールするLinux VMのユーザーデータを定義します。
+単一インスタンス・Auto Scaling Groupのどちらの構成でも同じスクリプトを使用します。
+"""
+
+from typing import Optional
+
+from aws_cdk import aws_ec2 as ec2
+
+from dify_cdk.constructs.dify_runtime import DifyRuntimeSettings
+from dify_cdk.constructs.observability import LINUX_AGENT_SETUP_PARAMETER
+from dify_cdk.constructs.runtime_config import ADMIN_PASSWORD_PARAMETER
+
+
+# Ubuntu 22.04 AMI（リージョンごと）
+UBUNTU_AMI_MAP = {
+    'ap-northeast-1': 'ami-0d52744d6551d851e',  # 東京リージョンのUbuntu 22.04
+    'us-east-1': 'ami-0c7217cdde317cfec',       # バージニアリージョンのUbuntu 22.04
+    'us-west-2': 'ami-0efcece6bed30fd98',       # オレゴンリージョンのUbuntu 22.04
+}
+
+
+def ubuntu_machine_image() -> ec2.IMachineImage:
+    """
+    Dify用のUbuntu AMIを取得する
+
+    Returns:
+        マシンイメージ
+    """
+    return ec2.MachineImage.generic_linux(UBUNTU_AMI_MAP)
+
+
+class LinuxUserData:
+    """Dify用Linux VMのユーザーデータを生成するクラス"""
+
+    def __init__(
+        self,
+        config,
+        dify_settings: DifyRuntimeSettings,
+        host_id: Optional[str] = None,
+        data_volume: bool = False
+    ):
+        """
+        コンストラクタ
+
+        Args:
+            config: 設定オブジェクト
+            dify_settings: Dify実行時設定
+            host_id: ホスト固有の.envの値と起動前処理を登録するホストID（設定ストアを使用する場合）
+            data_volume: Difyのデータ（docker/volumes）をルートボリューム以外のEBSボリュームに格納するか
+        """
+        self.config = config
+        self.dify_settings = dify_settings
+        self.host_id = host_id
+        self.data_volume = data_volume
+
+        # PgBouncerの追加（オプション）
+        if config.pgbouncer_enabled:
+            self.configure_pgbouncer()
+
+    def configure_pgbouncer(self):
+        """
+        PgBouncerをDocker Composeサービスとして追加し、DifyのDB接続先を切り替える
+
+        api・worker・plugin_daemonの接続をトランザクションプーリングで集約し、
+        PostgreSQLへの接続数をプロセス数から切り離します。
+        """
+        settings = self.dify_settings
+
+        # 接続先（マネージドデータベース利用時はそのエンドポイント）
+        upstream_host = settings.env.get("DB_HOST", "db")
+        upstream_port = settings.env.get("DB_PORT", "5432")
+
+        settings.override_service(
+            "pgbouncer",
+            image="edoburu/pgbouncer:latest",
+            restart="always",
+            environment={
+                "DB_HOST": upstream_host,
+                "DB_PORT": upstream_port,
+                # 認証情報は.envの値をDocker Composeが展開
+                "DB_USER": "${DB_USERNAME}",
+                "DB_PASSWORD": "${DB_PASSWORD}",
+                "AUTH_TYPE": "scram-sha-256",
+                "LISTEN_PORT": 6432,
+                "POOL_MODE": "transaction",
+                "DEFAULT_POOL_SIZE": self.config.pgbouncer_default_pool_size,
+                "MAX_CLIENT_CONN": self.config.pgbouncer_max_client_conn,
+                "MAX_PREPARED_STATEMENTS": 200,
+                # SQLAlchemyが送る起動パラメータ（options等）はPgBouncerで扱えないため無視
+                "IGNORE_STARTUP_PARAMETERS": "extra_float_digits,options",
+            }
+        )
+        if upstream_host == "db":
+            settings.override_service("pgbouncer", depends_on=["db"])
+
+        settings.set_env(
+            DB_HOST="pgbouncer",
+            DB_PORT=6432
+        )
+
+    def build(self) -> ec2.UserData:
+        """
+        ユーザーデータを生成する
+
+        Returns:
+            UserDataインスタンス
+        """
+        user_data = ec2.UserData.for_linux()
+
+        # ホスト固有の.envの値を設定ストアに登録（値を変更してもユーザーデータは変わらない）
+        settings = self.dify_settings
+        config_store = settings.config_store if self.host_id else None
+        if config_store:
+            settings = settings.copy()
+            config_store.publish_env(self.host_id, settings)
+
+        # 環境変数の設定（パスワードはSSMパラメータストアから取得）
+        user_data.add_commands(
+            f"export admin_username='{self.config.linux_admin_username}'",
+            f"export admin_password_parameter='{ADMIN_PASSWORD_PARAMETER}'"
+        )
+
+        # Dify実行時設定（docker compose up の前に読み込まれる、設定ストアを使用する場合は起動時に取得）
+        if not settings.is_empty and config_store:
+            user_data.add_commands(
+                f"export pre_start_parameter='{config_store.publish_pre_start(self.host_id, settings)}'"
+            )
+        elif not settings.is_empty:
+            user_data.add_commands(
+                "mkdir -p /etc/dify",
+                "cat > /etc/dify/pre-start.sh << 'DIFY_PRE_START_EOF'",
+                settings.render_pre_start_script() + "DIFY_PRE_START_EOF"
+            )
+
+        # データ用ボリュームの使用（スナップショットから復元したボリュームを含む）
+        if self.data_volume:
+            user_data.add_commands("export dify_data_volume=true")
+
+        # CloudWatch Agentの有効化（セットアップスクリプトはSSMパラメータから取得）
+        if self.config.observability_enabled:
+            user_data.add_commands(
+                "export enable_cloudwatch_agent=true",
+                f"export cloudwatch_agent_setup_parameter='{LINUX_AGENT_SETUP_PARAMETER}'"
+            )
+
+        # ユーザーデータスクリプトの追加
+        user_data.add_commands(self._get_user_data_script())
+
+        return user_data
+
+    def _get_user_data_script(self) -> str:
+        """
+        ユーザーデータスクリプトを取得
+
+        Returns:
+            ユーザーデータスクリプト文字列
+        """
+        return """
+#!/bin/bash
+# Difyインストール用Ubuntuユーザーデータスクリプト
+
+# エラーハンドリングの設定
+set -e
+set -o pipefail
+
+# ログ関数
+log() {
+    echo "[$(date '+%Y-%m-%d %H:%M:%S')] $1" | tee -a /var/log/user-data.log
+}
+
+# エラーハンドリング関数
+handle_error() {
+    log "ERROR: An error occurred on line $1"
+    exit 1
+}
+
+# エラートラップの設定
+trap 'handle_error $LINENO' ERR
+
+# スクリプト開始
+log "Starting Dify installation script..."
+
+# デフォルト値の設定
+admin_username=${admin_username:-ubuntu}
+enable_cloudwatch_agent=${enable_cloudwatch_agent:-false}
+
+# SSH設定
+log "Configuring SSH settings..."
+sed -i 's/#PasswordAuthentication no/PasswordAuthentication yes/' /etc/ssh/sshd_config
+sed -i 's/PasswordAuthentication no/PasswordAuthentication yes/' /etc/ssh/sshd_config
+sed -i 's/#PermitRootLogin yes/PermitRootLogin no/' /etc/ssh/sshd_config
+sed -i 's/PermitRootLogin yes/PermitRootLogin no/' /etc/ssh/sshd_config
+systemctl restart sshd
+
+# システムの更新（コメントアウト）
+# log "Updating system packages..."
+# export DEBIAN_FRONTEND=noninteractive
+# apt-get update -y
+# apt-get upgrade -y -o Dpkg::Options::="--force-confdef" -o Dpkg::Options::="--force-confold"
+
+# 必要最小限のパッケージのインストール（DifyとDocker用）
+log "Installing required packages for Dify and Docker..."
+apt-get update -y
+apt-get install -y \\
+    apt-transport-https \\
+    ca-certificates \\
+    curl \\
+    gnupg \\
+    lsb-release \\
+    git \\
+    awscli
+
+# AWS CLIの設定（リージョン）
+IMDS_TOKEN=$(curl -s -X PUT http://169.254.169.254/latest/api/token -H 'X-aws-ec2-metadata-token-ttl-seconds: 300')
+export AWS_DEFAULT_REGION=$(curl -s -H "X-aws-ec2-metadata-token: ${IMDS_TOKEN}" http://169.254.169.254/latest/meta-data/placement/region)
+
+# ユーザーパスワード設定（SSMパラメータストアから取得し、ユーザーデータには含めない）
+log "Setting ${admin_username} user password..."
+admin_password=$(aws ssm get-parameter --name "${admin_password_parameter}" --query Parameter.Value --output text)
+echo "${admin_username}:${admin_password}" | chpasswd
+
+# SSMエージェント状態確認（コメントアウト）
+# log "Checking SSM Agent status..."
+# if systemctl is-active --quiet amazon-ssm-agent; then
+#     log "SSM Agent is already running"
+#     systemctl status amazon-ssm-agent --no-pager | tee -a /var/log/user-data.log
+# else
+#     log "SSM Agent is not running, attempting to start..."
+#     systemctl start amazon-ssm-agent
+#     systemctl enable amazon-ssm-agent
+#     sleep 5
+#     if systemctl is-active --quiet amazon-ssm-agent; then
+#         log "SSM Agent started successfully"
+#     else
+#         log "ERROR: Failed to start SSM Agent"
+#     fi
+# fi
+
+# Session Manager Plugin のインストール（コメントアウト）
+# log "Checking if Session Manager Plugin is already installed..."
+# if ! command -v session-manager-plugin &> /dev/null; then
+#     log "Session Manager Plugin not found, installing..."
+#     curl "https://s3.amazonaws.com/session-manager-downloads/plugin/latest/ubuntu_64bit/session-manager-plugin.deb" -o "session-manager-plugin.deb"
+#     dpkg -i session-manager-plugin.deb
+#     rm -f session-manager-plugin.deb
+# fi
+
+# Dockerのインストール
+log "Installing Docker..."
+curl -fsSL https://download.docker.com/linux/ubuntu/gpg | gpg --dearmor -o /usr/share/keyrings/docker-archive-keyring.gpg
+echo "deb [arch=$(dpkg --print-architecture) signed-by=/usr/share/keyrings/docker-archive-keyring.gpg] https://download.docker.com/linux/ubuntu $(lsb_release -cs) stable" | tee /etc/apt/sources.list.d/docker.list > /dev/null
+apt-get update -y
+apt-get install -y docker-ce docker-ce-cli containerd.io docker-compose-plugin
+
+# Dockerサービスの開始と有効化
+systemctl start docker
+systemctl enable docker
+
+# ubuntuユーザーをdockerグループに追加
+usermod -aG docker ${admin_username}
+
+# CloudWatch Agentのインストール（オプション）
+if [ "${enable_cloudwatch_agent}" = "true" ]; then
+    log "Installing CloudWatch Agent..."
+    aws ssm get-parameter --name "${cloudwatch_agent_setup_parameter}" --query Parameter.Value --output text | bash
+fi
+
+# Difyのインストール
+log "Installing Dify..."
+cd /opt
+
+# Difyのクローン
+git clone https://github.com/langgenius/dify.git dify
+cd dify/docker
+
+# データ用ボリュームのマウント（空の場合は初期化、スナップショットから復元した場合はデータを引き継ぐ）
+if [ "${dify_data_volume:-false}" = "true" ]; then
+    log "Mounting Dify data volume..."
+    root_disk=$(lsblk -npo PKNAME "$(findmnt -no SOURCE /)")
+    data_device=$(lsblk -dnpo NAME,TYPE,MODEL | awk -v root="${root_disk}" '$1 != root && $2 == "disk" && ($0 ~ /Elastic Block Store/ || $1 ~ /xvd/) {print $1; exit}')
+    if [ -z "$(blkid -o value -s TYPE "${data_device}")" ]; then
+        mkfs.ext4 -L dify-data "${data_device}"
+    fi
+    mv volumes /opt/dify/volumes.repo
+    mkdir volumes
+    echo "LABEL=dify-data /opt/dify/docker/volumes ext4 defaults,nofail 0 2" >> /etc/fstab
+    mount /opt/dify/docker/volumes
+    resize2fs "${data_device}"
+    cp -rn /opt/dify/volumes.repo/. volumes/
+fi
+
+# 環境設定ファイルの作成
+log "Creating environment configuration..."
+cp .env.example .env
+
+# 基本的な設定を.envファイルに追加
+# 動的にIPアドレスを取得
+PRIVATE_IP=$(hostname -I | awk '{print $1}')
+SECRET_KEY_VALUE="dify_secret_key_$(openssl rand -hex 32)"
+
+cat >> .env << EOF
+# 基本設定
+EDITION=SELF_HOSTED
+CONSOLE_URL=http://${PRIVATE_IP}
+API_URL=http://${PRIVATE_IP}/api
+SERVICE_API_URL=http://${PRIVATE_IP}/api
+APP_URL=http://${PRIVATE_IP}
+
+# データベース設定
+DB_HOST=db
+DB_PORT=5432
+DB_USERNAME=postgres
+DB_PASSWORD=difyai123456
+DB_DATABASE=dify
+
+# Redis設定
+REDIS_HOST=redis
+REDIS_PORT=6379
+REDIS_USERNAME=
+REDIS_PASSWORD=
+REDIS_DB=0
+
+# ストレージ設定
+STORAGE_TYPE=local
+LOCAL_STORAGE_PATH=./storage
+
+# セキュリティ設定
+SECRET_KEY=${SECRET_KEY_VALUE}
+EOF
+
+# 実行時設定の取得（設定の再適用時も同じパラメータから取得）
+if [ -n "${pre_start_parameter:-}" ]; then
+    mkdir -p /etc/dify
+    echo "${pre_start_parameter}" > /etc/dify/pre-start.parameter
+    aws ssm get-parameter --name "${pre_start_parameter}" --query Parameter.Value --output text > /etc/dify/pre-start.sh
+fi
+
+# 実行時設定の適用（マネージドサービスへの接続等）
+if [ -f /etc/dify/pre-start.sh ]; then
+    log "Applying Dify runtime settings..."
+    # 設定の再適用（SSMドキュメント）で.envを再生成するため、適用前の内容を保存
+    cp .env /etc/dify/env.base
+    source /etc/dify/pre-start.sh
+fi
+
+# Docker ComposeでDifyを起動
+log "Starting Dify with Docker Compose..."
+docker compose up -d
+
+# データベースとRedisが起動するまで待機
+log "Waiting for database and Redis to be ready..."
+sleep 60
+
+# データベース接続テスト
+log "Testing database connection..."
+docker compose exec -T db pg_isready -U postgres || true
+
+# ファイアウォールの設定
+log "Configuring firewall..."
+ufw allow 22/tcp
+ufw allow 80/tcp
+ufw allow 443/tcp
+ufw allow 3000/tcp
+ufw allow 5001/tcp
+echo "y" | ufw enable
+
+# Difyアプリケーションが完全に起動するまで待機
+log "Waiting for Dify application to be fully ready..."
+sleep 30
+
+# Difyコンテナの状態確認
+log "Checking Dify containers status..."
+cd /opt/dify/docker && docker compose ps
+
+# エラーログがあれば表示
+log "Checking for any container errors..."
+cd /opt/dify/docker && docker compose logs --tail=20 | grep -i error || true
+
+# 簡単なステータス確認スクリプトを作成
+log "Creating status check script..."
+cat > /opt/dify/check_status.sh << 'EOF'
+#!/bin/bash
+echo "Difyコンテナステータス:"
+cd /opt/dify/docker && docker compose ps
+
+echo -e "\\nDifyアプリケーションURL:"
+echo "http://$(hostname -I | awk '{print $1}')"
+echo "初期設定: http://$(hostname -I | awk '{print $1}')/install"
+
+echo -e "\\nシステム情報:"
+echo "Docker: $(docker --version)"
+echo "Docker Compose: $(docker compose version)"
+
+echo -e "\\nDifyログ（最新10行）:"
+cd /opt/dify/docker && docker compose logs --tail=10
+EOF
+
+chmod +x /opt/dify/check_status.sh
+
+# セットアップ完了
+log "Dify installation completed successfully!"
+log "System information:"
+log "Docker: $(docker --version)"
+log "Docker Compose: $(docker compose version)"
+
+# 完了をログに記録
+echo "Difyのインストールが正常に完了しました！" > /var/log/dify-setup.log
+echo "インストール完了時刻: $(date)" >> /var/log/dify-setup.log
+echo "Difyアクセス先: http://$(hostname -I | awk '{print $1}')" >> /var/log/dify-setup.log
+echo "管理画面初期設定: http://$(hostname -I | awk '{print $1}')/install" >> /var/log/dify-setup.log
+
+# 最終状態確認
+log "Final status check:"
+sleep 10
+cd /opt/dify/docker && docker compose ps | tee -a /var/log/user-data.log
+
+log "Dify installation script completed at $(date)"
+"""
\ No newline at end of file
@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+
+"""
+LLMゲートウェイコンストラクト
+
+このモジュールは、Difyとモデルプロバイダーの間に配置するOpenAI互換のLLMゲートウェイ
+（LiteLLM Proxy）を定義します。ゲートウェイはDocker Composeのサービスとしてプラグインデーモンと
+同じホストで実行し、Difyの「OpenAI-API-compatible」モデルプロバイダーから呼び出します。
+
+- 同一のリクエストの応答をRedis（Difyと共用）にキャッシュ（評価の繰り返し・同じワークフローの再実行）
+- オプションで、意味的に類似したプロンプトの応答もキャッシュ（ゲートウェイ専用のRedis Stack）
+- プロバイダーへの接続をゲートウェイのプロセス内で再利用し、プロバイダーごとに同時リクエスト数を制限
+- リクエスト数・キャッシュヒット数・レイテンシをCloudWatchメトリクスに送信（llm_gateway/）
+"""
+
+import json
+import os
+from typing import Any, Dict, List
+
+from constructs import Construct
+from aws_cdk import aws_cloudwatch as cloudwatch
+from aws_cdk import aws_iam as iam
+from aws_cdk import aws_s3_assets as s3_assets
+from aws_cdk import aws_secretsmanager as secretsmanager
+from aws_cdk import aws_ssm as ssm
+from aws_cdk import CfnOutput, Duration, Stack
+
+from dify_cdk.constructs.dify_runtime import DifyRuntimeSettings
+
+
+# ゲートウェイの設定を格納するSSMパラメータ
+GATEWAY_CONFIG_PARAMETER = "/dify/llm-gateway/config"
+
+# ゲートウェイのサービス名と待ち受けポート（プロバイダーに登録するAPIのベースURL）
+GATEWAY_SERVICE = "llm-gateway"
+GATEWAY_PORT = 4000
+
+# セマンティックキャッシュ（ベクトル検索に対応したRedis Stack）のサービス名とイメージ
+SEMANTIC_CACHE_SERVICE = "llm-gateway-cache"
+SEMANTIC_CACHE_IMAGE = "redis/redis-stack-server:7.4.0-v3"
+
+# ゲートウェイのパッケージ（リポジトリ直下のllm_gateway/）と、Difyのdockerディレクトリ内の配置先
+PACKAGE_DIRECTORY = os.path.join(os.path.dirname(__file__), "..", "..", "llm_gateway")
+GATEWAY_DIRECTORY = "llm-gateway"
+
+# キャッシュのキーの接頭辞（Difyのキーと区別）
+CACHE_NAMESPACE = "litellm"
+
+# プロバイダーのエラー（429等）時の再試行回数とリクエストのタイムアウト（秒）
+NUM_RETRIES = 3
+REQUEST_TIMEOUT = 600
+
+
+class LlmGatewayConstruct(Construct):
+    """DifyからのLLM呼び出しをキャッシュ・集約するゲートウェイを作成するコンストラクト"""
+
+    # メトリクスの名前空間（llm_gateway/metrics_callback.pyと共通）
+    METRIC_NAMESPACE = "Dify/LLMGateway"
+
+    def __init__(
+        self,
+        scope: Construct,
+        id: str,
+        instance_role: iam.Role,
+        config,
+        **kwargs
+    ):
+        """
+        コンストラクタ
+
+        Args:
+            scope: 親スコープ
+            id: コンストラクトID
+            instance_role: ゲートウェイを実行するVMのIAMロール
+            config: 設定オブジェクト
+            **kwargs: その他の引数
+        """
+        super().__init__(scope, id)
+
+        self.config = config
+        self.models = config.llm_gateway_models
+        self.providers = sorted({model.split("/", 1)[0] for model in self.models.values()})
+        self._validate_config()
+
+        # ゲートウェイのマスターキー（Difyのモデルプロバイダーに登録するAPIキー）
+        self.master_key = secretsmanager.Secret(
+            self, "MasterKey",
+            secret_name=f"/dify/{id}/master-key",
+            description="Dify LLM gateway master key",
+            generate_secret_string=secretsmanager.SecretStringGenerator(
+                secret_string_template="{}",
+                generate_string_key="password",
+                exclude_punctuation=True,
+                password_length=32
+            )
+        )
+
+        # Bedrock以外のプロバイダーのAPIキー（<プロバイダー>_API_KEYのフィールドを持つ既存のシークレット）
+        self.api_key_secret = None
+        if config.llm_gateway_api_key_secret:
+            self.api_key_secret = secretsmanager.Secret.from_secret_name_v2(
+                self, "ApiKeySecret", config.llm_gateway_api_key_secret
+            )
+            self.api_key_secret.grant_read(instance_role)
+
+        # Bedrockのモデル呼び出し（クロスリージョン推論プロファイルを含む）
+        if self.uses_bedrock:
+            stack = Stack.of(self)
+            instance_role.add_to_policy(iam.PolicyStatement(
+                actions=["bedrock:InvokeModel", "bedrock:InvokeModelWithResponseStream"],
+                resources=[
+                    "arn:aws:bedrock:*::foundation-model/*",
+                    stack.format_arn(service="bedrock", resource="inference-profile", resource_name="*"),
+                ]
+            ))
+
+        # メトリクスの送信（ゲートウェイの名前空間のみ）
+        instance_role.add_to_policy(iam.PolicyStatement(
+            actions=["cloudwatch:PutMetricData"],
+            resources=["*"],
+            conditions={"StringEquals": {"cloudwatch:namespace": self.METRIC_NAMESPACE}}
+        ))
+
+        # メトリクスのコールバック（S3アセットとして配置し、起動時に展開）
+        self.package = s3_assets.Asset(
+            self, "Package",
+            path=PACKAGE_DIRECTORY,
+            exclude=["__pycache__"]
+        )
+        self.package.grant_read(instance_role)
+
+        # ゲートウェイの設定（ユーザーデータの容量を抑えるため、起動時にVMが読み込む）
+        self.config_parameter = ssm.StringParameter(
+            self, "GatewayConfig",
+            parameter_name=GATEWAY_CONFIG_PARAMETER,
+            string_value=json.dumps(self._gateway_config()),
+            description="LiteLLM Proxy configuration for Dify",
+            tier=ssm.ParameterTier.STANDARD,
+            simple_name=False
+        )
+
+        # 出力の設定（Difyのモデルプロバイダーに登録する値）
+        CfnOutput(
+            self, "GatewayUrl",
+            value=f"http://{GATEWAY_SERVICE}:{GATEWAY_PORT}/v1",
+            description="OpenAI-compatible API endpoint of the LLM gateway"
+        )
+
+        CfnOutput(
+            self, "MasterKeySecretArn",
+            value=self.master_key.secret_arn,
+            description="Secret containing the LLM gateway API key (prefix it with sk-)"
+        )
+
+    @property
+    def uses_bedrock(self) -> bool:
+        """Bedrockのモデルを使用するか"""
+        return "bedrock" in self.providers
+
+    @property
+    def metrics(self) -> List[cloudwatch.IMetric]:
+        """ダッシュボードに表示するメトリクス（キャッシュヒット率・失敗数）"""
+        requests, hits, failures = (
+            cloudwatch.Metric(
+                namespace=self.METRIC_NAMESPACE,
+                metric_name=metric_name,
+                statistic=cloudwatch.Stats.SUM,
+                period=Duration.minutes(1)
+            )
+            for metric_name in ("Requests", "CacheHits", "Failures")
+        )
+        return [
+            cloudwatch.MathExpression(
+                expression="100 * hits / requests",
+                using_metrics={"hits": hits, "requests": requests},
+                label="Cache hit rate (%)",
+                period=Duration.minutes(1)
+            ),
+            failures,
+        ]
+
+    @property
+    def latency_metrics(self) -> List[cloudwatch.IMetric]:
+        """ダッシュボードに表示するレイテンシ（プロバイダーへのリクエスト・最初のトークンまで）"""
+        return [
+            cloudwatch.Metric(
+                namespace=self.METRIC_NAMESPACE,
+                metric_name=metric_name,
+                statistic=statistic,
+                label=f"{metric_name} {statistic}",
+                period=Duration.minutes(1)
+            )
+            for metric_name in ("Latency", "TimeToFirstToken")
+            for statistic in ("p50", "p90")
+        ]
+
+    def _validate_config(self):
+        """
+        ゲートウェイの設定を確認する
+        """
+        if any(provider != "bedrock" for provider in self.providers) and not self.config.llm_gateway_api_key_secret:
+            raise ValueError("Bedrock以外のプロバイダーを使用する場合はAPIキーのシークレットを指定してください（LLM_GATEWAY_API_KEY_SECRET）")
+        if self.config.llm_gateway_semantic_cache and self.config.llm_gateway_semantic_cache_model not in self.models:
+            raise ValueError(
+                f"セマンティックキャッシュの埋め込みモデルがLLM_GATEWAY_MODELSにありません: {self.config.llm_gateway_semantic_cache_model}"
+            )
+
+    @staticmethod
+    def _api_key_variable(provider: str) -> str:
+        """
+        プロバイダーのAPIキーの環境変数名（シークレットのフィールド名と共通）
+
+        Args:
+            provider: プロバイダー名
+
+        Returns:
+            環境変数名
+        """
+        return f"{provider.upper().replace('-', '_')}_API_KEY"
+
+    def _gateway_config(self) -> Dict[str, Any]:
+        """
+        LiteLLM Proxyの設定を生成する（JSONはYAMLとしても読み込める）
+
+        Returns:
+            ゲートウェイの設定
+        """
+        model_list = []
+        for name, model in self.models.items():
+            provider = model.split("/", 1)[0]
+            litellm_params: Dict[str, Any] = {"model": model}
+            if provider != "bedrock":
+                litellm_params["api_key"] = f"os.environ/{self._api_key_variable(provider)}"
+            model_list.append({"model_name": name, "litellm_params": litellm_params})
+
+        if self.config.llm_gateway_semantic_cache:
+            cache_params = {
+                "type": "redis-semantic",
+                "host": SEMANTIC_CACHE_SERVICE,
+                "port": 6379,
+                "similarity_threshold": self.config.llm_gateway_semantic_cache_threshold,
+                "redis_semantic_cache_embedding_model": self.config.llm_gateway_semantic_cache_model,
+            }
+        else:
+            # Difyと同じRedis（コンテナまたはElastiCache）の接続先を使用
+            cache_params = {
+                "type": "redis",
+                "host": "os.environ/REDIS_HOST",
+                "port": "os.environ/REDIS_PORT",
+                "password": "os.environ/REDIS_PASSWORD",
+                "namespace": CACHE_NAMESPACE,
+            }
+            if self.config.cache_mode == 'elasticache':
+                cache_params["ssl"] = True
+        cache_params["ttl"] = self.config.llm_gateway_cache_ttl
+
+        return {
+            "model_list": model_list,
+            "litellm_settings": {
+                "cache": True,
+                "cache_params": cache_params,
+                # 同時リクエスト数はプロバイダーの全モデルで共有する上限（provider_limits）で制限
+                "callbacks": ["provider_limits.proxy_handler_instance", "metrics_callback.proxy_handler_instance"],
+                "request_timeout": REQUEST_TIMEOUT,
+                "drop_params": True,
+            },
+            "router_settings": {
+                "num_retries": NUM_RETRIES,
+                "retry_after": 1,
+            },
+            "general_settings": {
+                "master_key": "os.environ/LITELLM_MASTER_KEY",
+            },
+        }
+
+    def configure_dify(self, settings: DifyRuntimeSettings):
+        """
+        Difyの実行時設定にゲートウェイのサービスを登録する
+
+        Args:
+            settings: Dify実行時設定
+        """
+        region = Stack.of(self).region
+        settings.set_secret_env("LLM_GATEWAY_MASTER_KEY", self.master_key, "password")
+        environment = {
+            "LITELLM_MASTER_KEY": "sk-${LLM_GATEWAY_MASTER_KEY}",
+            "AWS_DEFAULT_REGION": region,
+            "AWS_REGION_NAME": region,
+            "LLM_GATEWAY_METRIC_NAMESPACE": self.METRIC_NAMESPACE,
+            "LLM_GATEWAY_PROVIDER_LIMITS": ",".join(
+                f"{provider}={limit}" for provider, limit in self.config.llm_gateway_provider_limits.items()
+            ),
+            "LLM_GATEWAY_MODEL_PROVIDERS": ",".join(
+                f"{name}={model.split('/', 1)[0]}" for name, model in self.models.items()
+            ),
+        }
+        if not self.config.llm_gateway_semantic_cache:
+            environment.update(
+                REDIS_HOST="${REDIS_HOST:-redis}",
+                REDIS_PORT="${REDIS_PORT:-6379}",
+                REDIS_PASSWORD="${REDIS_PASSWORD:-}",
+            )
+        for provider in self.providers:
+            if provider != "bedrock":
+                variable = self._api_key_variable(provider)
+                settings.set_secret_env(variable, self.api_key_secret, variable)
+                environment[variable] = f"${{{variable}}}"
+
+        # 1プロセスで実行し、プロバイダーへの接続プールと同時リクエスト数の上限を全リクエストで共有
+        settings.override_service(
+            GATEWAY_SERVICE,
+            image=self.config.llm_gateway_image,
+            restart="always",
+            command=["--config", "/app/config/config.yaml", "--port", str(GATEWAY_PORT), "--num_workers", "1"],
+            environment=environment,
+            volumes=[f"./{GATEWAY_DIRECTORY}:/app/config:ro"]
+        )
+        if self.config.llm_gateway_semantic_cache:
+            settings.override_service(
+                SEMANTIC_CACHE_SERVICE,
+                image=SEMANTIC_CACHE_IMAGE,
+                restart="always",
+                mem_limit="512m"
+            )
+            settings.override_service(GATEWAY_SERVICE, depends_on=[SEMANTIC_CACHE_SERVICE])
+
+        settings.add_pre_start_commands(
+            "# LLMゲートウェイの設定（SSMパラメータから取得）とメトリクスのコールバック（S3アセット）",
+            f"mkdir -p {GATEWAY_DIRECTORY}",
+            f"aws ssm get-parameter --name {GATEWAY_CONFIG_PARAMETER} --query Parameter.Value --output text > {GATEWAY_DIRECTORY}/config.yaml",
+            f"aws s3 cp s3://{self.package.s3_bucket_name}/{self.package.s3_object_key} /tmp/llm-gateway.zip --only-show-errors",
+            f"python3 -m zipfile -e /tmp/llm-gateway.zip {GATEWAY_DIRECTORY}/",
+            aws_cli=True
+        )
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+
+"""
+ロードバランサーコンストラクト
+
+このモジュールは、Difyの前段に配置する内部Application Load Balancerを定義します。
+"""
+
+from typing import List
+
+from constructs import Construct
+from aws_cdk import aws_certificatemanager as acm
+from aws_cdk import aws_ec2 as ec2
+from aws_cdk import aws_elasticloadbalancingv2 as elbv2
+from aws_cdk import aws_elasticloadbalancingv2_targets as elbv2_targets
+from aws_cdk import aws_route53 as route53
+from aws_cdk import Duration, Tags, CfnOutput
+
+from dify_cdk.constructs.dify_runtime import DifyRuntimeSettings
+
+
+class LoadBalancerConstruct(Construct):
+    """Linux VM（Dify）の前段に内部ALBを作成するコンストラクト"""
+
+    # Dify APIへ振り分けるパス（nginxと同じ振り分け）
+    API_PATH_PATTERNS = ["/console/api/*", "/api/*", "/v1/*", "/files/*"]
+
+    # 別ホストのプラグインデーモンからDify API（内部API）へ接続するポート（api:5001へ直接転送）
+    INNER_API_PORT = 5001
+
+    def __init__(
+        self,
+        scope: Construct,
+        id: str,
+        vpc: ec2.Vpc,
+        app_security_group: ec2.SecurityGroup,
+        client_security_group: ec2.SecurityGroup,
+        config,
+        target_type: elbv2.TargetType = elbv2.TargetType.INSTANCE,
+        **kwargs
+    ):
+        """
+        コンストラクタ
+
+        Args:
+            scope: 親スコープ
+            id: コンストラクトID
+            vpc: VPCインスタンス
+            app_security_group: Difyアプリケーション（Linux VM）のセキュリティグループ
+            client_security_group: ALBへのアクセスを許可するクライアント（Windows VM）のセキュリティグループ
+            config: 設定オブジェクト
+            target_type: ターゲットの種類（ECS構成ではIP）
+            **kwargs: その他の引数
+        """
+        super().__init__(scope, id)
+
+        self.config = config
+        self.target_type = target_type
+        self.inner_api_target_group = None
+
+        # ALBのセキュリティグループ
+        self.security_group = ec2.SecurityGroup(
+            self, "LoadBalancerSG",
+            vpc=vpc,
+            description="Security group for Dify internal ALB",
+            allow_all_outbound=False
+        )
+
+        # VPC内およびWindows VMからのHTTPS/HTTPトラフィックを許可
+        for port, protocol in ((443, "HTTPS"), (80, "HTTP")):
+            self.security_group.add_ingress_rule(
+                ec2.Peer.ipv4(vpc.vpc_cidr_block),
+                ec2.Port.tcp(port),
+                f"Allow {protocol} from VPC"
+            )
+            self.security_group.add_ingress_rule(
+                client_security_group,
+                ec2.Port.tcp(port),
+                f"Allow {protocol} from Windows VM"
+            )
+
+        # ALBからLinux VM（nginx）へのHTTPトラフィックを許可
+        self.security_group.add_egress_rule(
+            app_security_group,
+            ec2.Port.tcp(80),
+            "Allow HTTP to Linux VM"
+        )
+        app_security_group.add_ingress_rule(
+            self.security_group,
+            ec2.Port.tcp(80),
+            "Allow HTTP from internal ALB"
+        )
+
+        # 内部ALB（LLMのストリーミング応答に合わせてアイドルタイムアウトを延長）
+        self.load_balancer = elbv2.ApplicationLoadBalancer(
+            self, "LoadBalancer",
+            vpc=vpc,
+            internet_facing=False,
+            vpc_subnets=ec2.SubnetSelection(
+                subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
+            ),
+            security_group=self.security_group,
+            http2_enabled=True,
+            idle_timeout=Duration.seconds(config.load_balancer_idle_timeout),
+            client_keep_alive=Duration.hours(1),
+            drop_invalid_header_fields=True
+        )
+
+        # ターゲットグループ（どちらもnginx:80へ転送し、ヘルスチェック先のみ異なる）
+        self.web_target_group = self._create_target_group(vpc, "WebTargetGroup", "/")
+        self.api_target_group = self._create_target_group(vpc, "ApiTargetGroup", "/console/api/ping")
+
+        # HTTPSリスナー（TLSはALBで終端）
+        self.listener = self.load_balancer.add_listener(
+            "HttpsListener",
+            port=443,
+            protocol=elbv2.ApplicationProtocol.HTTPS,
+            certificates=[self._get_certificate()],
+            ssl_policy=elbv2.SslPolicy.RECOMMENDED_TLS,
+            default_target_groups=[self.web_target_group],
+            open=False
+        )
+        self.listener.add_target_groups(
+            "ApiRoute",
+            target_groups=[self.api_target_group],
+            conditions=[elbv2.ListenerCondition.path_patterns(self.API_PATH_PATTERNS)],
+            priority=10
+        )
+
+        # HTTPはHTTPSへリダイレクト
+        self.load_balancer.add_redirect(
+            source_port=80,
+            source_protocol=elbv2.ApplicationProtocol.HTTP,
+            target_port=443,
+            target_protocol=elbv2.ApplicationProtocol.HTTPS,
+            open=False
+        )
+
+        # タグの追加
+        Tags.of(self.load_balancer).add("Name", f"{id}-alb")
+
+        # 出力の設定
+        CfnOutput(
+            self, "DnsName",
+            value=self.load_balancer.load_balancer_dns_name,
+            description="Dify internal ALB DNS name"
+        )
+
+    @property
+    def target_groups(self) -> List[elbv2.ApplicationTargetGroup]:
+        """Difyのターゲットグループの一覧"""
+        target_groups = [self.web_target_group, self.api_target_group]
+        if self.inner_api_target_group:
+            target_groups.append(self.inner_api_target_group)
+        return target_groups
+
+    @property
+    def inner_api_url(self) -> str:
+        """Dify APIの内部APIのURL（VPC内のHTTP）"""
+        return f"http://{self.load_balancer.load_balancer_dns_name}:{self.INNER_API_PORT}"
+
+    @property
+    def url(self) -> str:
+        """DifyのベースURL（ドメイン名未指定の場合はALBのDNS名）"""
+        host = self.config.load_balancer_domain_name or self.load_balancer.load_balancer_dns_name
+        return f"https://{host}"
+
+    def _create_target_group(self, vpc: ec2.Vpc, id: str, health_check_path: str) -> elbv2.ApplicationTargetGroup:
+        """
+        nginx（ポート80）向けのターゲットグループを作成
+
+        Args:
+            vpc: VPCインスタンス
+            id: コンストラクトID
+            health_check_path: ヘルスチェックのパス
+
+        Returns:
+            ターゲットグループ
+        """
+        return elbv2.ApplicationTargetGroup(
+            self, id,
+            vpc=vpc,
+            port=80,
+            protocol=elbv2.ApplicationProtocol.HTTP,
+            target_type=self.target_type,
+            deregistration_delay=Duration.seconds(30),
+            health_check=elbv2.HealthCheck(
+                path=health_check_path,
+                healthy_http_codes="200-399",
+                interval=Duration.seconds(15),
+                timeout=Duration.seconds(5),
+                healthy_threshold_count=2,
+                unhealthy_threshold_count=3
+            )
+        )
+
+    def _get_certificate(self) -> elbv2.IListenerCertificate:
+        """
+        HTTPSリスナーの証明書を取得
+
+        証明書ARNが指定されている場合はそれをインポートし、
+        ドメイン名とパブリックホストゾーンが指定されている場合はACM証明書を発行します。
+
+        Returns:
+            リスナー証明書
+        """
+        certificate_arn = self.config.load_balancer_certificate_arn
+        if certificate_arn:
+            return elbv2.ListenerCertificate.from_arn(certificate_arn)
+
+        domain_name = self.config.load_balancer_domain_name
+        zone_name = self.config.load_balancer_hosted_zone_name
+        if not (domain_name and zone_name):
+            raise ValueError(
+                "ALBの証明書が設定されていません。LOAD_BALANCER_CERTIFICATE_ARN、または"
+                "LOAD_BALANCER_DOMAIN_NAMEとLOAD_BALANCER_HOSTED_ZONE_NAMEを設定してください。"
+            )
+
+        zone = route53.HostedZone.from_lookup(self, "HostedZone", domain_name=zone_name)
+        certificate = acm.Certificate(
+            self, "Certificate",
+            domain_name=domain_name,
+            validation=acm.CertificateValidation.from_dns(zone)
+        )
+        return elbv2.ListenerCertificate.from_certificate_manager(certificate)
+
+    def add_instance_target(self, instance: ec2.Instance) -> None:
+        """
+        EC2インスタンスをすべてのターゲットグループに登録する
+
+        Args:
+            instance: 登録するインスタンス
+        """
+        for target_group in self.target_groups:
+            port = self.INNER_API_PORT if target_group is self.inner_api_target_group else 80
+            target_group.add_target(elbv2_targets.InstanceTarget(instance, port))
+
+    def add_inner_api_listener(self, vpc: ec2.Vpc, app_security_group: ec2.SecurityGroup) -> None:
+        """
+        Dify APIの内部API（ポート5001）へ転送するHTTPリスナーを追加する
+
+        ワーカー層のホストはapiを実行しないため、プラグインデーモンの接続先（DIFY_INNER_API_URL）を
+        このリスナー経由でAPI/Web層のホストに向けます。ホストの追加前に呼び出してください。
+
+        Args:
+            vpc: VPCインスタンス
+            app_security_group: Difyアプリケーション（Linux VM）のセキュリティグループ
+        """
+        port = ec2.Port.tcp(self.INNER_API_PORT)
+
+        # Linux VM（ワーカー層）からALB、ALBからLinux VM（api）への通信を許可
+        self.security_group.add_ingress_rule(app_security_group, port, "Allow Dify inner API from Linux VM")
+        self.security_group.add_egress_rule(app_security_group, port, "Allow Dify inner API to Linux VM")
+        app_security_group.add_ingress_rule(self.security_group, port, "Allow Dify inner API from internal ALB")
+
+        self.inner_api_target_group = elbv2.ApplicationTargetGroup(
+            self, "InnerApiTargetGroup",
+            vpc=vpc,
+            port=self.INNER_API_PORT,
+            protocol=elbv2.ApplicationProtocol.HTTP,
+            target_type=self.target_type,
+            deregistration_delay=Duration.seconds(30),
+            health_check=elbv2.HealthCheck(
+                path="/health",
+                healthy_http_codes="200",
+                interval=Duration.seconds(15),
+                timeout=Duration.seconds(5),
+                healthy_threshold_count=2,
+                unhealthy_threshold_count=3
+            )
+        )
+        self.load_balancer.add_listener(
+            "InnerApiListener",
+            port=self.INNER_API_PORT,
+            protocol=elbv2.ApplicationProtocol.HTTP,
+            default_target_groups=[self.inner_api_target_group],
+            open=False
+        )
+
+    def configure_dify(self, settings: DifyRuntimeSettings) -> None:
+        """
+        DifyのURLをALB経由（HTTPS）に設定する
+
+        Args:
+            settings: Dify実行時設定
+        """
+        url = self.url
+        settings.set_env(
+            CONSOLE_API_URL=url,
+            CONSOLE_WEB_URL=url,
+            SERVICE_API_URL=url,
+            APP_API_URL=url,
+            APP_WEB_URL=url,
+            FILES_URL=url
+        )
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+"""
+負荷生成VMコンストラクト
+
+このモジュールは、プライベートサブネットから内部ALB（またはLinux VM）に負荷をかけるための
+Linux VMを定義します。負荷試験パッケージ（loadtest/）をS3アセットとして配置し、
+起動時に仮想環境へ依存パッケージをインストールします。操作はSession Managerで行います。
+"""
+
+import os
+
+from constructs import Construct
+from aws_cdk import aws_ec2 as ec2
+from aws_cdk import aws_iam as iam
+from aws_cdk import aws_s3_assets as s3_assets
+from aws_cdk import Tags, CfnOutput
+
+from dify_cdk.constructs.linux_user_data import ubuntu_machine_image
+
+
+# 負荷試験パッケージのディレクトリ（リポジトリ直下のloadtest/）
+LOADTEST_DIRECTORY = os.path.join(os.path.dirname(__file__), "..", "..", "loadtest")
+
+# VM上の配置先
+INSTALL_DIRECTORY = "/opt/dify-loadtest"
+
+
+class LoadGeneratorConstruct(Construct):
+    """負荷試験パッケージを配置した負荷生成VMを作成するコンストラクト"""
+
+    def __init__(
+        self,
+        scope: Construct,
+        id: str,
+        vpc: ec2.Vpc,
+        target_url: str,
+        config,
+        **kwargs
+    ):
+        """
+        コンストラクタ
+
+        Args:
+            scope: 親スコープ
+            id: コンストラクトID
+            vpc: VPCインスタンス
+            target_url: 負荷をかけるDifyのベースURL
+            config: 設定オブジェクト
+            **kwargs: その他の引数
+        """
+        super().__init__(scope, id)
+
+        # 負荷生成VMのセキュリティグループ（受信は不要）
+        self.security_group = ec2.SecurityGroup(
+            self, "SecurityGroup",
+            vpc=vpc,
+            description="Security group for Dify load generator",
+            allow_all_outbound=True
+        )
+
+        # Session Managerで接続するためのロール（Difyのインスタンスロールとは分離）
+        role = iam.Role(
+            self, "Role",
+            assumed_by=iam.ServicePrincipal("ec2.amazonaws.com"),
+            description="Role for Dify load generator"
+        )
+        role.add_managed_policy(
+            iam.ManagedPolicy.from_aws_managed_policy_name("AmazonSSMManagedInstanceCore")
+        )
+
+        # 負荷試験パッケージ（結果ファイルは含めない）
+        package = s3_assets.Asset(
+            self, "Package",
+            path=LOADTEST_DIRECTORY,
+            exclude=["results", "__pycache__"]
+        )
+        package.grant_read(role)
+
+        # ユーザーデータ（パッケージの展開と依存パッケージのインストール）
+        user_data = ec2.UserData.for_linux()
+        user_data.add_commands(
+            "apt-get update",
+            "apt-get install -y python3-venv unzip awscli"
+        )
+        archive = user_data.add_s3_download_command(
+            bucket=package.bucket,
+            bucket_key=package.s3_object_key
+        )
+        user_data.add_commands(
+            f"mkdir -p {INSTALL_DIRECTORY}/loadtest",
+            f"unzip -o {archive} -d {INSTALL_DIRECTORY}/loadtest",
+            f"python3 -m venv {INSTALL_DIRECTORY}/venv",
+            f"{INSTALL_DIRECTORY}/venv/bin/pip install -r {INSTALL_DIRECTORY}/loadtest/requirements.txt",
+            f"chown -R ubuntu:ubuntu {INSTALL_DIRECTORY}",
+            "# 負荷試験の実行環境（ログイン時に読み込む）",
+            "cat > /etc/profile.d/dify-loadtest.sh << 'EOF'",
+            f"export DIFY_LOADTEST_TARGET='{target_url}'",
+            f"export PATH={INSTALL_DIRECTORY}/venv/bin:$PATH",
+            "EOF"
+        )
+
+        # 負荷生成VM
+        self.instance = ec2.Instance(
+            self, "Instance",
+            vpc=vpc,
+            instance_type=ec2.InstanceType(config.load_generator_instance_type),
+            machine_image=ubuntu_machine_image(),
+            vpc_subnets=ec2.SubnetSelection(
+                subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
+            ),
+            security_group=self.security_group,
+            role=role,
+            user_data=user_data,
+            http_tokens=ec2.HttpTokens.REQUIRED,  # セキュリティ強化（IMDSv2必須）
+            user_data_causes_replacement=True,
+            block_devices=[
+                ec2.BlockDevice(
+                    device_name="/dev/sda1",
+                    volume=ec2.BlockDeviceVolume.ebs(
+                        volume_size=20,
+                        volume_type=ec2.EbsDeviceVolumeType.GP3,
+                        encrypted=True
+                    )
+                )
+            ]
+        )
+
+        # タグの追加
+        Tags.of(self.instance).add("Name", f"{id}-instance")
+
+        # 出力の設定
+        CfnOutput(
+            self, "InstanceId",
+            value=self.instance.instance_id,
+            description="Dify load generator Instance ID"
+        )
+
+        CfnOutput(
+            self, "TargetUrl",
+            value=target_url,
+            description="Dify base URL used by the load generator"
+        )
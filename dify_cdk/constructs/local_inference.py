@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+"""
+ローカル推論コンストラクト
+
+このモジュールは、埋め込み（Embedding）とリランク（Rerank）をDifyのホスト上のCPUで実行する
+Text Embeddings Inference（TEI）のサービスを定義します。TEIはDocker Composeのサービスとして
+プラグインデーモンと同じホストで実行し、Difyの「Text Embedding Inference」モデルプロバイダーから
+呼び出します。ナレッジの登録・検索の埋め込み呼び出しがNAT経由の外部APIを経由しなくなり、
+一括登録が外部APIのレート制限を受けなくなります。
+
+モデルの重みはホストのEBSボリューム（/opt/dify/model-cache）にキャッシュし、S3ストレージを使用する
+場合はバケットにも保存して、新しいホスト（Auto Scaling等）はHugging Face Hubからではなく
+VPCエンドポイント経由でS3から取得します。
+"""
+
+from typing import Optional
+
+from constructs import Construct
+from aws_cdk import aws_s3 as s3
+from aws_cdk import CfnOutput
+
+from dify_cdk.constructs.dify_runtime import DifyRuntimeSettings
+
+
+# 埋め込み・リランクのサービス名（プロバイダーに登録するサーバーURLのホスト名）
+EMBEDDING_SERVICE = "tei-embedding"
+RERANK_SERVICE = "tei-rerank"
+LOCAL_INFERENCE_SERVICES = (EMBEDDING_SERVICE, RERANK_SERVICE)
+
+# モデルのキャッシュ（ホストのディレクトリとS3のプレフィックス）
+MODEL_CACHE_DIRECTORY = "/opt/dify/model-cache"
+MODEL_CACHE_PREFIX = "model-cache"
+
+# ダウンロードしたモデルをS3に保存するまでの待ち時間と保存の間隔
+MODEL_CACHE_UPLOAD_DELAY = "15min"
+MODEL_CACHE_UPLOAD_INTERVAL = "1h"
+
+
+class LocalInferenceConstruct(Construct):
+    """埋め込み・リランクをホスト上のText Embeddings Inferenceで実行するコンストラクト"""
+
+    def __init__(
+        self,
+        scope: Construct,
+        id: str,
+        config,
+        model_cache_bucket: Optional[s3.IBucket] = None,
+        **kwargs
+    ):
+        """
+        コンストラクタ
+
+        Args:
+            scope: 親スコープ
+            id: コンストラクトID
+            config: 設定オブジェクト
+            model_cache_bucket: モデルの重みを保存するS3バケット（Difyのストレージと共用、未指定の場合はEBSのみ）
+            **kwargs: その他の引数
+        """
+        super().__init__(scope, id)
+
+        self.config = config
+        self.model_cache_bucket = model_cache_bucket
+
+        # 出力の設定（Difyのモデルプロバイダーに登録する値）
+        CfnOutput(
+            self, "EmbeddingServerUrl",
+            value=f"http://{EMBEDDING_SERVICE}",
+            description=f"Text Embeddings Inference server URL for {config.local_embedding_model}"
+        )
+
+        if config.local_rerank_model:
+            CfnOutput(
+                self, "RerankServerUrl",
+                value=f"http://{RERANK_SERVICE}",
+                description=f"Text Embeddings Inference server URL for {config.local_rerank_model}"
+            )
+
+    def configure_dify(self, settings: DifyRuntimeSettings) -> None:
+        """
+        Difyの実行時設定に埋め込み・リランクのサービスを追加する
+
+        Args:
+            settings: Dify実行時設定
+        """
+        models = {EMBEDDING_SERVICE: self.config.local_embedding_model}
+        if self.config.local_rerank_model:
+            models[RERANK_SERVICE] = self.config.local_rerank_model
+
+        for service, model in models.items():
+            settings.override_service(
+                service,
+                image=self.config.local_inference_image,
+                restart="always",
+                command=[
+                    "--model-id", model,
+                    "--max-batch-tokens", str(self.config.local_inference_max_batch_tokens),
+                    "--auto-truncate",
+                ],
+                volumes=[f"{MODEL_CACHE_DIRECTORY}:/data"]
+            )
+
+        # モデルのキャッシュ（ロール分割構成でサービスを実行しないホストでは取得しない）
+        commands = [
+            f"if docker compose config --services | grep -qx {EMBEDDING_SERVICE}; then",
+            f"    mkdir -p {MODEL_CACHE_DIRECTORY}",
+        ]
+        if self.model_cache_bucket:
+            cache_url = f"s3://{self.model_cache_bucket.bucket_name}/{MODEL_CACHE_PREFIX}"
+            commands.extend([
+                f"    aws s3 sync {cache_url} {MODEL_CACHE_DIRECTORY} --only-show-errors || log \"Model cache is not available in S3\"",
+                # Hugging Face Hubからダウンロードしたモデルを定期的にS3へ保存（次のホストはS3から取得）
+                # ダウンロード中のファイル（.incomplete）とロックファイルは保存しない
+                f"    systemd-run --on-active={MODEL_CACHE_UPLOAD_DELAY} --on-unit-active={MODEL_CACHE_UPLOAD_INTERVAL} "
+                f"--unit=dify-model-cache-upload --setenv=AWS_DEFAULT_REGION=${{AWS_DEFAULT_REGION}} "
+                f"aws s3 sync {MODEL_CACHE_DIRECTORY} {cache_url} --only-show-errors "
+                "--exclude '*.incomplete' --exclude '*.lock' || true",
+            ])
+        commands.append("fi")
+        settings.add_pre_start_commands(*commands, aws_cli=bool(self.model_cache_bucket))
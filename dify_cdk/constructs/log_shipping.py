@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+
+"""
+ログ転送コンストラクト
+
+このモジュールは、Linux VM上のDifyコンテナのログをCloudWatch Logsに転送する構成を定義します。
+Docker Composeのサービスごとにawslogsドライバーを設定し、ロググループの保持期間と
+nginxのアクセスログ（JSON形式）から5xx応答・低速リクエストのメトリクスフィルターを作成します。
+"""
+
+from typing import Dict, List
+
+from constructs import Construct
+from aws_cdk import aws_cloudwatch as cloudwatch
+from aws_cdk import aws_logs as logs
+from aws_cdk import aws_ssm as ssm
+from aws_cdk import Duration, RemovalPolicy, Stack
+
+from dify_cdk.constructs.dify_runtime import DifyRuntimeSettings, to_yaml
+
+
+# ロググループ名の接頭辞（インスタンスロールのCloudWatch Logs権限の対象）
+LOG_GROUP_PREFIX = "/aws/ec2/dify-logs"
+
+# ログ転送のセットアップスクリプトを格納するSSMパラメータ
+LOG_SHIPPING_SETUP_PARAMETER = "/dify/log-shipping/setup"
+
+# ログ転送用のDocker Compose構成ファイル（COMPOSE_FILEで既存の構成に重ねる）
+LOG_SHIPPING_COMPOSE_FILE = "docker-compose.logging.yaml"
+
+# 指定可能なログの保持期間（日数）
+RETENTION_DAYS = {
+    1: logs.RetentionDays.ONE_DAY,
+    3: logs.RetentionDays.THREE_DAYS,
+    5: logs.RetentionDays.FIVE_DAYS,
+    7: logs.RetentionDays.ONE_WEEK,
+    14: logs.RetentionDays.TWO_WEEKS,
+    30: logs.RetentionDays.ONE_MONTH,
+    60: logs.RetentionDays.TWO_MONTHS,
+    90: logs.RetentionDays.THREE_MONTHS,
+    180: logs.RetentionDays.SIX_MONTHS,
+    365: logs.RetentionDays.ONE_YEAR,
+}
+
+# nginxのアクセスログ形式（応答時間を含むJSON）
+NGINX_LOG_FORMAT = (
+    "log_format dify_json escape=json '{"
+    "\"time\":\"$time_iso8601\","
+    "\"remote_addr\":\"$remote_addr\","
+    "\"forwarded_for\":\"$http_x_forwarded_for\","
+    "\"method\":\"$request_method\","
+    "\"uri\":\"$request_uri\","
+    "\"status\":$status,"
+    "\"bytes_sent\":$body_bytes_sent,"
+    "\"request_time\":$request_time,"
+    "\"upstream_addr\":\"$upstream_addr\","
+    "\"upstream_status\":\"$upstream_status\","
+    "\"upstream_header_time\":\"$upstream_header_time\","
+    "\"upstream_response_time\":\"$upstream_response_time\","
+    "\"user_agent\":\"$http_user_agent\""
+    "}';"
+)
+
+
+class LogShippingConstruct(Construct):
+    """DifyコンテナのログをCloudWatch Logsに転送するコンストラクト"""
+
+    # メトリクスフィルターの名前空間とメトリクス名
+    METRIC_NAMESPACE = "Dify"
+    ERROR_METRIC = "Nginx5xxCount"
+    SLOW_REQUEST_METRIC = "NginxSlowRequestCount"
+    REQUEST_TIME_METRIC = "NginxRequestTime"
+
+    def __init__(
+        self,
+        scope: Construct,
+        id: str,
+        config,
+        **kwargs
+    ):
+        """
+        コンストラクタ
+
+        Args:
+            scope: 親スコープ
+            id: コンストラクトID
+            config: 設定オブジェクト
+            **kwargs: その他の引数
+        """
+        super().__init__(scope, id)
+
+        self.config = config
+        if config.log_retention_days not in RETENTION_DAYS:
+            raise ValueError(
+                f"LOG_RETENTION_DAYSには {', '.join(str(days) for days in RETENTION_DAYS)} のいずれかを指定してください"
+            )
+
+        # サービスごとのロググループ（ストリームはホストのインスタンスID）
+        self.log_groups: Dict[str, logs.LogGroup] = {}
+        for service in config.log_shipping_services:
+            self.log_groups[service] = logs.LogGroup(
+                self, f"{''.join(part.title() for part in service.split('_'))}LogGroup",
+                log_group_name=self.log_group_name(service),
+                retention=RETENTION_DAYS[config.log_retention_days],
+                removal_policy=RemovalPolicy.DESTROY
+            )
+
+        # nginxのアクセスログのメトリクスフィルター
+        if "nginx" in self.log_groups:
+            self._create_nginx_metric_filters(self.log_groups["nginx"])
+
+        # セットアップスクリプト（ユーザーデータの容量を抑えるため、起動時にVMが読み込む）
+        setup_script = self._setup_script()
+        self.setup_parameter = ssm.StringParameter(
+            self, "SetupParameter",
+            parameter_name=LOG_SHIPPING_SETUP_PARAMETER,
+            string_value=setup_script,
+            description="Dify container log shipping setup script",
+            tier=ssm.ParameterTier.STANDARD if len(setup_script) < 4000 else ssm.ParameterTier.ADVANCED,
+            simple_name=False
+        )
+
+    @staticmethod
+    def log_group_name(service: str) -> str:
+        """
+        サービスのロググループ名
+
+        Args:
+            service: Docker Composeのサービス名
+
+        Returns:
+            ロググループ名
+        """
+        return f"{LOG_GROUP_PREFIX}/{service.replace('_', '-')}"
+
+    @property
+    def metrics(self) -> List[cloudwatch.Metric]:
+        """メトリクスフィルターのメトリクス（5xx応答数・低速リクエスト数）"""
+        return [
+            cloudwatch.Metric(
+                namespace=self.METRIC_NAMESPACE,
+                metric_name=metric_name,
+                statistic=cloudwatch.Stats.SUM,
+                period=Duration.minutes(1)
+            )
+            for metric_name in (self.ERROR_METRIC, self.SLOW_REQUEST_METRIC)
+        ]
+
+    def _create_nginx_metric_filters(self, log_group: logs.LogGroup):
+        """
+        nginxのアクセスログ（JSON形式）から5xx応答・低速リクエスト・応答時間のメトリクスを作成する
+
+        Args:
+            log_group: nginxのロググループ
+        """
+        log_group.add_metric_filter(
+            "ErrorMetricFilter",
+            filter_pattern=logs.FilterPattern.number_value("$.status", ">=", 500),
+            metric_namespace=self.METRIC_NAMESPACE,
+            metric_name=self.ERROR_METRIC,
+            metric_value="1",
+            default_value=0
+        )
+        log_group.add_metric_filter(
+            "SlowRequestMetricFilter",
+            filter_pattern=logs.FilterPattern.number_value(
+                "$.request_time", ">=", self.config.log_slow_request_seconds
+            ),
+            metric_namespace=self.METRIC_NAMESPACE,
+            metric_name=self.SLOW_REQUEST_METRIC,
+            metric_value="1",
+            default_value=0
+        )
+        log_group.add_metric_filter(
+            "RequestTimeMetricFilter",
+            filter_pattern=logs.FilterPattern.number_value("$.request_time", ">=", 0),
+            metric_namespace=self.METRIC_NAMESPACE,
+            metric_name=self.REQUEST_TIME_METRIC,
+            metric_value="$.request_time",
+            unit=cloudwatch.Unit.SECONDS
+        )
+
+    def _setup_script(self) -> str:
+        """
+        ログ転送を設定するシェルスクリプトを生成する
+
+        Difyのdockerディレクトリ（/opt/dify/docker）をカレントディレクトリとして実行されます。
+        awslogsドライバーはPutLogEventsでまとめて送信し（non-blockingモードでコンテナを待たせない）、
+        ホストにはdocker logs用の圧縮済みキャッシュのみを保持します。
+
+        Returns:
+            シェルスクリプト文字列
+        """
+        region = Stack.of(self).region
+        services = {
+            service: {
+                "logging": {
+                    "driver": "awslogs",
+                    "options": {
+                        "awslogs-region": region,
+                        "awslogs-group": self.log_group_name(service),
+                        "awslogs-stream": "${DIFY_LOG_STREAM}",
+                        "mode": "non-blocking",
+                        "max-buffer-size": "4m",
+                        "cache-max-size": "20m",
+                        "cache-max-file": "5",
+                        "cache-compress": "true",
+                    }
+                }
+            }
+            for service in self.log_groups
+        }
+
+        lines = [
+            "#!/bin/bash",
+            "# Difyコンテナのログ転送の設定（CDKにより生成）",
+            "set -e",
+            "",
+            "# ログストリーム名（インスタンスID）",
+            "IMDS_TOKEN=$(curl -s -X PUT http://169.254.169.254/latest/api/token -H 'X-aws-ec2-metadata-token-ttl-seconds: 300')",
+            "echo \"DIFY_LOG_STREAM=$(curl -s -H \"X-aws-ec2-metadata-token: ${IMDS_TOKEN}\" "
+            "http://169.254.169.254/latest/meta-data/instance-id)\" >> .env",
+            "",
+            "# サービスごとのログドライバー（既存のComposeファイルに重ねる）",
+            f"cat > {LOG_SHIPPING_COMPOSE_FILE} << 'DIFY_LOGGING_EOF'",
+        ]
+        lines.extend(to_yaml({"services": services}))
+        lines.extend([
+            "DIFY_LOGGING_EOF",
+            "compose_files=docker-compose.yaml",
+            "if [ -f docker-compose.override.yaml ]; then",
+            "    compose_files=\"${compose_files}:docker-compose.override.yaml\"",
+            "fi",
+            f"echo \"COMPOSE_FILE=${{compose_files}}:{LOG_SHIPPING_COMPOSE_FILE}\" >> .env",
+        ])
+        if "nginx" in self.log_groups:
+            lines.extend([
+                "",
+                "# nginxのアクセスログをJSON形式（応答時間を含む）に変更",
+                "sed -i '/access_log.* main;/d' nginx/nginx.conf.template",
+                "cat > nginx/conf.d/dify-logging.conf << 'DIFY_LOGGING_EOF'",
+                NGINX_LOG_FORMAT,
+                "access_log /var/log/nginx/access.log dify_json;",
+                "DIFY_LOGGING_EOF",
+            ])
+        return "\n".join(lines) + "\n"
+
+    def configure_dify(self, settings: DifyRuntimeSettings):
+        """
+        Difyの実行時設定にログ転送を登録する
+
+        Args:
+            settings: Dify実行時設定
+        """
+        settings.add_pre_start_commands(
+            "# コンテナログ転送の設定（セットアップスクリプトはSSMパラメータから取得）",
+            f"aws ssm get-parameter --name {LOG_SHIPPING_SETUP_PARAMETER} --query Parameter.Value --output text | bash",
+            aws_cli=True
+        )
@@ -58,6 +58,12 @@ class NetworkConstruct(Construct):
         # VPCエンドポイントの作成（AWS Systems Manager接続用）
         self._create_ssm_endpoints()
         
+        # S3ゲートウェイエンドポイント（必要時に作成）
+        self.s3_endpoint = None
+        
+        # 追加のインターフェースエンドポイント（必要時に作成）
+        self.interface_endpoints = {}
+        
         # タグの追加
         Tags.of(self.vpc).add("Name", f"{id}-vpc")
     
@@ -70,8 +76,8 @@ class NetworkConstruct(Construct):
         - ssmmessages: Session Manager
         - ec2messages: EC2メッセージ
         """
-        # セキュリティグループの作成
-        sg = ec2.SecurityGroup(
+        # セキュリティグループの作成（追加のインターフェースエンドポイントでも共用）
+        self.endpoint_sg = ec2.SecurityGroup(
             self, "SSMEndpointSG",
             vpc=self.vpc,
             description="Security group for SSM VPC Endpoints",
@@ -79,7 +85,7 @@ class NetworkConstruct(Construct):
         )
         
         # 内部からのHTTPSトラフィックを許可
-        sg.add_ingress_rule(
+        self.endpoint_sg.add_ingress_rule(
             ec2.Peer.ipv4(self.vpc.vpc_cidr_block),
             ec2.Port.tcp(443),
             "Allow HTTPS from VPC"
@@ -89,19 +95,56 @@ class NetworkConstruct(Construct):
         self.vpc.add_interface_endpoint(
             "SSMEndpoint",
             service=ec2.InterfaceVpcEndpointAwsService.SSM,
-            security_groups=[sg]
+            security_groups=[self.endpoint_sg]
         )
         
         # SSMメッセージエンドポイント
         self.vpc.add_interface_endpoint(
             "SSMMessagesEndpoint",
             service=ec2.InterfaceVpcEndpointAwsService.SSM_MESSAGES,
-            security_groups=[sg]
+            security_groups=[self.endpoint_sg]
         )
         
         # EC2メッセージエンドポイント
         self.vpc.add_interface_endpoint(
             "EC2MessagesEndpoint",
             service=ec2.InterfaceVpcEndpointAwsService.EC2_MESSAGES,
-            security_groups=[sg]
+            security_groups=[self.endpoint_sg]
         )
+    
+    def add_s3_gateway_endpoint(self) -> ec2.GatewayVpcEndpoint:
+        """
+        S3ゲートウェイエンドポイントを作成（作成済みの場合はそれを返す）
+        
+        プライベートサブネットからのS3通信をNATゲートウェイ経由にしないために使用します。
+        
+        Returns:
+            ゲートウェイエンドポイント
+        """
+        if self.s3_endpoint is None:
+            self.s3_endpoint = self.vpc.add_gateway_endpoint(
+                "S3Endpoint",
+                service=ec2.GatewayVpcEndpointAwsService.S3
+            )
+        return self.s3_endpoint
+    
+    def add_interface_endpoint(self, id: str, service: ec2.InterfaceVpcEndpointAwsService) -> ec2.InterfaceVpcEndpoint:
+        """
+        インターフェースエンドポイントを作成（作成済みの場合はそれを返す）
+        
+        プライベートサブネットからのAWS API呼び出しをNATゲートウェイ経由にしないために使用します。
+        
+        Args:
+            id: エンドポイントのコンストラクトID
+            service: エンドポイントのサービス
+            
+        Returns:
+            インターフェースエンドポイント
+        """
+        if id not in self.interface_endpoints:
+            self.interface_endpoints[id] = self.vpc.add_interface_endpoint(
+                id,
+                service=service,
+                security_groups=[self.endpoint_sg]
+            )
+        return self.interface_endpoints[id]
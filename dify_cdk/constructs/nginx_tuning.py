@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+"""
+nginxチューニング
+
+このモジュールは、Linux VM上のDify（Docker Compose）に同梱のnginxの設定を上書きする
+起動前処理を定義します。
+
+- Next.jsのWebアセットとAPIのJSON応答をgzipで圧縮（SSEのtext/event-streamは圧縮しない）
+- api・webへの接続をupstreamのkeep-aliveプールで再利用
+- ストリーミング応答（SSE）のバッファリングを無効化し、最初のトークンを即座に転送
+- 内容が変わらない_next/staticのファイルをnginxでキャッシュ
+- worker_connectionsをインスタンスタイプのメモリ量・vCPU数に合わせて設定
+"""
+
+from typing import Optional
+
+from dify_cdk.config.instance_types import instance_spec
+from dify_cdk.constructs.dify_runtime import DifyRuntimeSettings
+
+
+# nginxの既定のworker_connections（インスタンスタイプが未知の場合）
+DEFAULT_WORKER_CONNECTIONS = 1024
+
+# 接続あたりのメモリ（バッファ等）を約1MBとして、メモリ1GiBあたりに割り当てる接続数
+CONNECTIONS_PER_GIB = 1024
+
+# ワーカープロセスあたりのworker_connectionsの上限
+MAX_WORKER_CONNECTIONS = 16384
+
+# upstreamとのkeep-alive。サーバー側（gunicornは既定2秒、Next.jsは5秒）より先にnginxが接続を閉じる
+API_KEEPALIVE_TIMEOUT = 60
+API_SERVER_KEEPALIVE = 75
+WEB_KEEPALIVE_TIMEOUT = 4
+
+# Difyのnginx設定（docker/nginx）のserverブロックに追加するlocation（*.confではないためhttpブロックでは読み込まれない）
+STATIC_LOCATIONS_FILE = "conf.d/dify-static.locations"
+
+# gzipで圧縮するContent-Type（text/htmlは常に対象、text/event-streamは含めない）
+GZIP_TYPES = (
+    "text/plain",
+    "text/css",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "application/manifest+json",
+    "image/svg+xml",
+)
+
+
+def worker_connections(instance_type: str) -> int:
+    """
+    インスタンスタイプに応じたnginxのworker_connectionsを取得する
+
+    ワーカープロセス数はvCPU数（NGINX_WORKER_PROCESSES=auto）のため、メモリ量に応じた接続数を
+    vCPU数で分配します。
+
+    Args:
+        instance_type: インスタンスタイプ
+
+    Returns:
+        ワーカープロセスあたりの接続数
+    """
+    spec = instance_spec(instance_type)
+    if spec is None:
+        return DEFAULT_WORKER_CONNECTIONS
+    vcpus, memory = spec
+    connections = int(memory * CONNECTIONS_PER_GIB / vcpus)
+    return max(DEFAULT_WORKER_CONNECTIONS, min(connections, MAX_WORKER_CONNECTIONS))
+
+
+def configure_nginx(settings: DifyRuntimeSettings, instance_type: Optional[str]) -> None:
+    """
+    Difyの実行時設定にnginxの設定の上書きを登録する
+
+    Difyのnginx設定のテンプレート（docker/nginx）を書き換えるため、設定の再適用で
+    繰り返し実行しても同じ結果になるようにしています。
+
+    Args:
+        settings: Dify実行時設定（nginxを実行するホストの複製）
+        instance_type: インスタンスタイプ（worker_connectionsの算出に使用）
+    """
+    connections = worker_connections(instance_type) if instance_type else DEFAULT_WORKER_CONNECTIONS
+
+    # gunicornのkeep-aliveをnginxのupstreamより長くする（再利用した接続がサーバー側で閉じられないように）
+    settings.override_service("api", environment={"GUNICORN_CMD_ARGS": f"--keep-alive {API_SERVER_KEEPALIVE}"})
+
+    settings.add_pre_start_commands(
+        "# nginxの設定の上書き（圧縮・upstreamのkeep-alive・SSEのバッファリング無効化・静的ファイルのキャッシュ）",
+        f"sed -i 's/worker_connections *[0-9]*;/worker_connections {connections};/' nginx/nginx.conf.template",
+        "sed -i '/^worker_rlimit_nofile/d' nginx/nginx.conf.template",
+        f"sed -i '/^worker_processes/a worker_rlimit_nofile {connections * 2};' nginx/nginx.conf.template",
+        "cat > nginx/conf.d/dify-tuning.conf << 'DIFY_NGINX_EOF'",
+        "upstream dify_api {",
+        "    server api:5001;",
+        "    keepalive 64;",
+        f"    keepalive_timeout {API_KEEPALIVE_TIMEOUT}s;",
+        "}",
+        "upstream dify_web {",
+        "    server web:3000;",
+        "    keepalive 32;",
+        f"    keepalive_timeout {WEB_KEEPALIVE_TIMEOUT}s;",
+        "}",
+        "gzip on;",
+        "gzip_comp_level 5;",
+        "gzip_min_length 1024;",
+        "gzip_proxied any;",
+        "gzip_vary on;",
+        f"gzip_types {' '.join(GZIP_TYPES)};",
+        "proxy_cache_path /var/cache/nginx/dify_static levels=1:2 keys_zone=dify_static:10m max_size=1g inactive=7d use_temp_path=off;",
+        "DIFY_NGINX_EOF",
+        f"cat > nginx/{STATIC_LOCATIONS_FILE} << 'DIFY_NGINX_EOF'",
+        "location /_next/static/ {",
+        "    proxy_pass http://dify_web;",
+        "    proxy_http_version 1.1;",
+        "    proxy_set_header Connection \"\";",
+        "    proxy_set_header Host $host;",
+        "    proxy_cache dify_static;",
+        "    proxy_cache_valid 200 7d;",
+        "    proxy_cache_use_stale error timeout updating;",
+        "    proxy_hide_header Cache-Control;",
+        "    add_header Cache-Control \"public, max-age=31536000, immutable\";",
+        "    add_header X-Cache-Status $upstream_cache_status;",
+        "}",
+        "DIFY_NGINX_EOF",
+        "sed -i 's#http://api:5001#http://dify_api#; s#http://web:3000#http://dify_web#' nginx/conf.d/default.conf.template",
+        f"grep -q dify-static.locations nginx/conf.d/default.conf.template || "
+        f"sed -i 's#^\\( *\\)location / {{#\\1include /etc/nginx/{STATIC_LOCATIONS_FILE};\\n&#' nginx/conf.d/default.conf.template",
+        "for directive in 'proxy_http_version 1.1;' 'proxy_set_header Connection \"\";' 'proxy_buffering off;'; do",
+        "    grep -qF \"${directive}\" nginx/proxy.conf.template || echo \"${directive}\" >> nginx/proxy.conf.template",
+        "done",
+    )
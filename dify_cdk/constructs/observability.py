@@ -0,0 +1,731 @@
+# -*- coding: utf-8 -*-
+
+"""
+オブザーバビリティコンストラクト
+
+このモジュールは、Dify用VMのCloudWatch Agent設定と、スタック全体のダッシュボード・アラームを定義します。
+CloudWatch AgentはLinux/Windows VMのユーザーデータでインストールし、メモリ・ディスク・
+ネットワーク・プロセスのメトリクスを収集します。EC2上のDocker Composeコンテナの統計は
+CloudWatch Agentでは収集できないため、systemdタイマーのスクリプトで送信します。
+"""
+
+import json
+from typing import Any, Dict, List
+
+from constructs import Construct
+from aws_cdk import aws_autoscaling as autoscaling
+from aws_cdk import aws_cloudwatch as cloudwatch
+from aws_cdk import aws_cloudwatch_actions as cloudwatch_actions
+from aws_cdk import aws_ec2 as ec2
+from aws_cdk import aws_ecs as ecs
+from aws_cdk import aws_elasticloadbalancingv2 as elbv2
+from aws_cdk import aws_sns as sns
+from aws_cdk import aws_sns_subscriptions as subscriptions
+from aws_cdk import aws_ssm as ssm
+from aws_cdk import Duration, CfnOutput
+
+
+# CloudWatch Agentのメトリクスの名前空間
+AGENT_NAMESPACE = "CWAgent"
+
+# コンテナメトリクス送信スクリプトの名前空間（ワーカー層のキューメトリクスと共通）
+METRIC_NAMESPACE = "Dify"
+
+# CloudWatch Agentのセットアップスクリプト・設定・コンテナメトリクス送信スクリプトを格納するSSMパラメータ
+# （ユーザーデータのサイズ上限を避けるため、インスタンスロールが読み取れる/dify/*に格納）
+LINUX_AGENT_SETUP_PARAMETER = "/dify/cloudwatch-agent/linux-setup"
+LINUX_AGENT_CONFIG_PARAMETER = "/dify/cloudwatch-agent/linux"
+WINDOWS_AGENT_CONFIG_PARAMETER = "/dify/cloudwatch-agent/windows"
+CONTAINER_METRICS_PARAMETER = "/dify/cloudwatch-agent/container-metrics"
+
+# メトリクスの収集間隔（秒）
+METRICS_INTERVAL = 60
+
+
+def linux_agent_config() -> Dict[str, Any]:
+    """
+    Linux VM用のCloudWatch Agent設定
+
+    アラームで参照できるよう、インスタンスID・Auto Scaling Group名だけを次元とする集計メトリクスも送信します。
+
+    Returns:
+        CloudWatch Agentの設定（JSON）
+    """
+    return {
+        "agent": {"metrics_collection_interval": METRICS_INTERVAL},
+        "metrics": {
+            "namespace": AGENT_NAMESPACE,
+            "append_dimensions": {
+                "InstanceId": "${aws:InstanceId}",
+                "AutoScalingGroupName": "${aws:AutoScalingGroupName}",
+            },
+            "aggregation_dimensions": [["InstanceId"], ["AutoScalingGroupName"]],
+            "metrics_collected": {
+                "mem": {"measurement": ["mem_used_percent", "mem_available_percent"]},
+                "swap": {"measurement": ["swap_used_percent"]},
+                "disk": {
+                    "measurement": ["used_percent", "inodes_free"],
+                    "resources": ["/"],
+                    "ignore_file_system_types": ["sysfs", "devtmpfs", "tmpfs", "overlay", "squashfs"],
+                },
+                # ルートボリューム（Nitroインスタンスのデバイス名）
+                "diskio": {
+                    "measurement": ["io_time", "reads", "writes", "read_bytes", "write_bytes"],
+                    "resources": ["nvme0n1"],
+                },
+                "netstat": {"measurement": ["tcp_established", "tcp_time_wait", "tcp_close_wait"]},
+                "procstat": [
+                    {"exe": "dockerd", "measurement": ["cpu_usage", "memory_rss", "pid_count"]},
+                    {"exe": "containerd", "measurement": ["cpu_usage", "memory_rss", "pid_count"]},
+                ],
+            },
+        },
+    }
+
+
+def windows_agent_config() -> Dict[str, Any]:
+    """
+    Windows VM用のCloudWatch Agent設定
+
+    Returns:
+        CloudWatch Agentの設定（JSON）
+    """
+    return {
+        "agent": {"metrics_collection_interval": METRICS_INTERVAL},
+        "metrics": {
+            "namespace": AGENT_NAMESPACE,
+            "append_dimensions": {"InstanceId": "${aws:InstanceId}"},
+            "aggregation_dimensions": [["InstanceId"]],
+            "metrics_collected": {
+                "Memory": {"measurement": ["% Committed Bytes In Use", "Available MBytes"]},
+                "LogicalDisk": {"measurement": ["% Free Space"], "resources": ["C:"]},
+                "PhysicalDisk": {"measurement": ["% Idle Time", "Disk Transfers/sec"], "resources": ["_Total"]},
+                "TCPv4": {"measurement": ["Connections Established"]},
+            },
+        },
+    }
+
+
+# コンテナメトリクス送信スクリプトの本体（METRIC_NAMESPACEはcontainer_metrics_scriptで定義）
+_CONTAINER_METRICS_BODY = """cd /opt/dify/docker 2> /dev/null || exit 0
+
+IMDS=http://169.254.169.254/latest
+TOKEN=$(curl -s -X PUT $IMDS/api/token -H 'X-aws-ec2-metadata-token-ttl-seconds: 300')
+imds() {
+    curl -sf -H "X-aws-ec2-metadata-token: ${TOKEN}" "$IMDS/meta-data/$1"
+}
+export AWS_DEFAULT_REGION=$(imds placement/region)
+
+# Auto Scaling Groupのホストはグループ単位、それ以外はインスタンス単位で集計
+ASG_NAME=$(imds tags/instance/aws:autoscaling:groupName)
+if [ -n "$ASG_NAME" ]; then
+    HOST_DIMENSION="{Name=AutoScalingGroupName,Value=$ASG_NAME}"
+else
+    HOST_DIMENSION="{Name=InstanceId,Value=$(imds instance-id)}"
+fi
+
+# 異常なコンテナ（unhealthy・再起動中・異常終了）の数
+UNHEALTHY=0
+RUNNING=0
+declare -A SERVICES
+while IFS=$'\\t' read -r name service state health exit_code; do
+    [ -z "$name" ] && continue
+    case "$state" in
+        running)
+            RUNNING=$((RUNNING + 1))
+            SERVICES[$name]=$service
+            if [ "$health" = "unhealthy" ]; then
+                UNHEALTHY=$((UNHEALTHY + 1))
+            fi
+            ;;
+        exited)
+            # 初期化用のコンテナ（正常終了）は除外
+            if [ "$exit_code" != "0" ]; then
+                UNHEALTHY=$((UNHEALTHY + 1))
+            fi
+            ;;
+        *)
+            UNHEALTHY=$((UNHEALTHY + 1))
+            ;;
+    esac
+done < <(docker compose ps -a --format '{{.Name}}\\t{{.Service}}\\t{{.State}}\\t{{.Health}}\\t{{.ExitCode}}')
+
+METRIC_DATA=(
+    "MetricName=UnhealthyContainers,Value=$UNHEALTHY,Unit=Count,Dimensions=[$HOST_DIMENSION]"
+    "MetricName=RunningContainers,Value=$RUNNING,Unit=Count,Dimensions=[$HOST_DIMENSION]"
+)
+
+# サービスごとのCPU・メモリ使用率（docker stats）
+if [ ${#SERVICES[@]} -gt 0 ]; then
+    while IFS=$'\\t' read -r name cpu memory; do
+        service=${SERVICES[$name]}
+        [ -z "$service" ] && continue
+        METRIC_DATA+=(
+            "MetricName=ContainerCpuUtilization,Value=${cpu%\\%},Unit=Percent,Dimensions=[$HOST_DIMENSION,{Name=Service,Value=$service}]"
+            "MetricName=ContainerMemoryUtilization,Value=${memory%\\%},Unit=Percent,Dimensions=[$HOST_DIMENSION,{Name=Service,Value=$service}]"
+        )
+    done < <(docker stats --no-stream --format '{{.Name}}\\t{{.CPUPerc}}\\t{{.MemPerc}}' "${!SERVICES[@]}")
+fi
+
+aws cloudwatch put-metric-data --namespace "$METRIC_NAMESPACE" --metric-data "${METRIC_DATA[@]}"
+"""
+
+
+def container_metrics_script() -> str:
+    """
+    Docker Composeコンテナの状態とリソース使用率をCloudWatchに送信するスクリプト
+
+    異常なコンテナ（unhealthy・再起動中・異常終了）の数と、サービスごとのCPU・メモリ使用率を送信します。
+    Linux VMのsystemdタイマーで1分ごとに実行されます。
+
+    Returns:
+        シェルスクリプト文字列
+    """
+    return f"""#!/bin/bash
+# Difyコンテナの状態とリソース使用率をCloudWatchに送信する
+METRIC_NAMESPACE={METRIC_NAMESPACE}
+""" + _CONTAINER_METRICS_BODY
+
+
+def linux_agent_setup_script() -> str:
+    """
+    CloudWatch Agentのインストールとコンテナメトリクス送信を設定するスクリプト
+
+    Linux VMのユーザーデータ（enable_cloudwatch_agent=true）がSSMパラメータから取得して実行します。
+
+    Returns:
+        シェルスクリプト文字列
+    """
+    return f"""#!/bin/bash
+# CloudWatch Agentのインストールとコンテナメトリクス送信の設定
+set -e
+curl -fsSL -o /tmp/amazon-cloudwatch-agent.deb \\
+    "https://amazoncloudwatch-agent.s3.amazonaws.com/ubuntu/$(dpkg --print-architecture)/latest/amazon-cloudwatch-agent.deb"
+dpkg -i -E /tmp/amazon-cloudwatch-agent.deb
+rm -f /tmp/amazon-cloudwatch-agent.deb
+/opt/aws/amazon-cloudwatch-agent/bin/amazon-cloudwatch-agent-ctl -a fetch-config -m ec2 -s -c ssm:{LINUX_AGENT_CONFIG_PARAMETER}
+
+# Difyコンテナの状態とリソース使用率の送信（1分ごと）
+aws ssm get-parameter --name {CONTAINER_METRICS_PARAMETER} --query Parameter.Value --output text \\
+    > /usr/local/bin/dify-container-metrics.sh
+chmod +x /usr/local/bin/dify-container-metrics.sh
+
+cat > /etc/systemd/system/dify-container-metrics.service << 'EOF'
+[Unit]
+Description=Publish Dify container metrics to CloudWatch
+After=docker.service
+
+[Service]
+Type=oneshot
+ExecStart=/usr/local/bin/dify-container-metrics.sh
+EOF
+
+cat > /etc/systemd/system/dify-container-metrics.timer << 'EOF'
+[Unit]
+Description=Publish Dify container metrics every minute
+
+[Timer]
+OnBootSec=1min
+OnUnitActiveSec=1min
+
+[Install]
+WantedBy=timers.target
+EOF
+systemctl daemon-reload
+systemctl enable --now dify-container-metrics.timer
+"""
+
+
+def windows_agent_commands() -> str:
+    """
+    CloudWatch AgentをインストールしてSSMパラメータの設定を適用するPowerShellコマンド
+
+    Returns:
+        PowerShellスクリプト文字列
+    """
+    return f'''
+# CloudWatch Agentのインストールと設定
+Write-Log "CloudWatch Agentをインストールしています..."
+try {{
+    $AgentInstaller = "$env:TEMP\\amazon-cloudwatch-agent.msi"
+    Invoke-WebRequest -Uri "https://amazoncloudwatch-agent.s3.amazonaws.com/windows/amd64/latest/amazon-cloudwatch-agent.msi" -OutFile $AgentInstaller -UseBasicParsing
+    Start-Process msiexec.exe -ArgumentList "/i `"$AgentInstaller`" /qn" -Wait
+    & "C:\\Program Files\\Amazon\\AmazonCloudWatchAgent\\amazon-cloudwatch-agent-ctl.ps1" -a fetch-config -m ec2 -s -c "ssm:{WINDOWS_AGENT_CONFIG_PARAMETER}"
+    Write-Log "CloudWatch Agentの設定が完了しました"
+}} catch {{
+    Write-Log "CloudWatch Agentのインストールに失敗しました: $($_.Exception.Message)"
+}}
+'''
+
+
+class ObservabilityConstruct(Construct):
+    """Difyスタックのダッシュボードとアラームを作成するコンストラクト"""
+
+    def __init__(
+        self,
+        scope: Construct,
+        id: str,
+        config,
+        **kwargs
+    ):
+        """
+        コンストラクタ
+
+        Args:
+            scope: 親スコープ
+            id: コンストラクトID
+            config: 設定オブジェクト
+            **kwargs: その他の引数
+        """
+        super().__init__(scope, id)
+
+        self.config = config
+        self.alarms: List[cloudwatch.Alarm] = []
+
+        # アラームの通知先
+        self.alarm_topic = sns.Topic(
+            self, "AlarmTopic",
+            display_name="Dify alarms"
+        )
+        if config.alarm_email:
+            self.alarm_topic.add_subscription(subscriptions.EmailSubscription(config.alarm_email))
+
+        # CloudWatch Agentのセットアップスクリプト・設定とコンテナメトリクス送信スクリプト（起動時にVMが読み込む）
+        self.parameters = [
+            self._create_parameter("LinuxAgentSetup", LINUX_AGENT_SETUP_PARAMETER,
+                                   linux_agent_setup_script(), "CloudWatch Agent setup script for Linux VMs"),
+            self._create_parameter("LinuxAgentConfig", LINUX_AGENT_CONFIG_PARAMETER,
+                                   json.dumps(linux_agent_config()), "CloudWatch Agent configuration for Linux VMs"),
+            self._create_parameter("WindowsAgentConfig", WINDOWS_AGENT_CONFIG_PARAMETER,
+                                   json.dumps(windows_agent_config()), "CloudWatch Agent configuration for Windows VM"),
+            self._create_parameter("ContainerMetricsScript", CONTAINER_METRICS_PARAMETER,
+                                   container_metrics_script(), "Dify container metrics script"),
+        ]
+
+        # スタック全体のダッシュボード（ホスト・ALB・ワーカー層等を順に追加）
+        self.dashboard = cloudwatch.Dashboard(
+            self, "Dashboard",
+            default_interval=Duration.hours(3)
+        )
+
+        # 出力の設定
+        CfnOutput(
+            self, "DashboardName",
+            value=self.dashboard.dashboard_name,
+            description="Dify CloudWatch dashboard name"
+        )
+
+        CfnOutput(
+            self, "AlarmTopicArn",
+            value=self.alarm_topic.topic_arn,
+            description="Dify alarm SNS topic ARN"
+        )
+
+    def add_linux_instance(self, name: str, instance: ec2.Instance, instance_type: str):
+        """
+        Linux VM（単一インスタンス）のウィジェットとアラームを追加する
+
+        Args:
+            name: 表示名（コンストラクトIDの接頭辞にも使用）
+            instance: EC2インスタンス
+            instance_type: インスタンスタイプ
+        """
+        self._depend_on_parameters(instance)
+        self._add_linux_host(name, {"InstanceId": instance.instance_id}, instance_type)
+
+    def add_auto_scaling_group(self, name: str, auto_scaling_group: autoscaling.AutoScalingGroup, instance_type: str):
+        """
+        Linux VMのAuto Scaling Groupのウィジェットとアラームを追加する（グループ内の最大値で評価）
+
+        Args:
+            name: 表示名（コンストラクトIDの接頭辞にも使用）
+            auto_scaling_group: Auto Scaling Group
+            instance_type: インスタンスタイプ（スポット利用時は優先タイプ）
+        """
+        self._depend_on_parameters(auto_scaling_group)
+        self._add_linux_host(
+            name,
+            {"AutoScalingGroupName": auto_scaling_group.auto_scaling_group_name},
+            instance_type
+        )
+
+    def add_windows_instance(self, name: str, instance: ec2.Instance, instance_type: str):
+        """
+        Windows VMのウィジェットとアラームを追加する
+
+        Args:
+            name: 表示名（コンストラクトIDの接頭辞にも使用）
+            instance: EC2インスタンス
+            instance_type: インスタンスタイプ
+        """
+        self._depend_on_parameters(instance)
+        dimensions = {"InstanceId": instance.instance_id}
+        memory = self._agent_metric("Memory % Committed Bytes In Use", dimensions, "Memory used %")
+        free_space = self._agent_metric("LogicalDisk % Free Space", dimensions, "C: free %", cloudwatch.Stats.MINIMUM)
+
+        self.dashboard.add_widgets(cloudwatch.TextWidget(markdown=f"## {name}", width=24, height=1))
+        self.dashboard.add_widgets(
+            self._cpu_widget(dimensions, instance_type),
+            self._graph("Memory / Disk (%)", [memory, free_space]),
+            self._graph("TCP connections", [
+                self._agent_metric("TCPv4 Connections Established", dimensions, "established")
+            ]),
+        )
+
+        self._add_cpu_credit_alarm(name, dimensions, instance_type)
+        self._add_alarm(
+            f"{name}MemoryAlarm", memory,
+            threshold=self.config.alarm_memory_percent,
+            description=f"{name}: メモリ使用率が{self.config.alarm_memory_percent}%を超えています"
+        )
+        self._add_alarm(
+            f"{name}DiskAlarm", free_space,
+            threshold=100 - self.config.alarm_disk_percent,
+            comparison=cloudwatch.ComparisonOperator.LESS_THAN_THRESHOLD,
+            description=f"{name}: Cドライブの使用率が{self.config.alarm_disk_percent}%を超えています"
+        )
+
+    def add_load_balancer(self, load_balancer):
+        """
+        内部ALBのウィジェットとアラーム（異常なターゲット）を追加する
+
+        Args:
+            load_balancer: 内部ALBコンストラクト
+        """
+        metrics = load_balancer.load_balancer.metrics
+        self.dashboard.add_widgets(cloudwatch.TextWidget(markdown="## Load balancer", width=24, height=1))
+        self.dashboard.add_widgets(
+            self._graph("Requests", [
+                metrics.request_count(statistic=cloudwatch.Stats.SUM, label="requests")
+            ]),
+            self._graph("5xx", [
+                metrics.http_code_target(elbv2.HttpCodeTarget.TARGET_5XX_COUNT, statistic=cloudwatch.Stats.SUM, label="target 5xx"),
+                metrics.http_code_elb(elbv2.HttpCodeElb.ELB_5XX_COUNT, statistic=cloudwatch.Stats.SUM, label="ELB 5xx"),
+            ]),
+            self._graph("Target response time (s)", [
+                metrics.target_response_time(statistic=cloudwatch.Stats.percentile(percentile), label=f"p{percentile:g}")
+                for percentile in (50, 95, 99)
+            ]),
+            self._graph("Unhealthy targets", [
+                target_group.metrics.unhealthy_host_count(statistic=cloudwatch.Stats.MAXIMUM, label=target_group.node.id)
+                for target_group in load_balancer.target_groups
+            ]),
+        )
+
+        for target_group in load_balancer.target_groups:
+            self._add_alarm(
+                f"{target_group.node.id}UnhealthyAlarm",
+                target_group.metrics.unhealthy_host_count(statistic=cloudwatch.Stats.MAXIMUM, period=Duration.minutes(1)),
+                threshold=1,
+                comparison=cloudwatch.ComparisonOperator.GREATER_THAN_OR_EQUAL_TO_THRESHOLD,
+                evaluation_periods=3,
+                description=f"{target_group.node.id}: ヘルスチェックに失敗しているターゲットがあります"
+            )
+
+    def add_ecs_services(self, services: Dict[str, ecs.FargateService]):
+        """
+        ECSサービスのCPU・メモリ使用率のウィジェットを追加する
+
+        Args:
+            services: サービス名とFargateサービス
+        """
+        self.dashboard.add_widgets(cloudwatch.TextWidget(markdown="## ECS services", width=24, height=1))
+        self.dashboard.add_widgets(
+            self._graph("Service CPU (%)", [
+                service.metric_cpu_utilization(label=name) for name, service in services.items()
+            ], width=12),
+            self._graph("Service memory (%)", [
+                service.metric_memory_utilization(label=name) for name, service in services.items()
+            ], width=12),
+        )
+
+    def add_graph(self, title: str, metrics: List[cloudwatch.IMetric]):
+        """
+        任意のメトリクスのグラフを追加する（ワーカー層のキュー滞留数等）
+
+        Args:
+            title: グラフのタイトル
+            metrics: 表示するメトリクス
+        """
+        self.dashboard.add_widgets(self._graph(title, metrics, width=24))
+
+    def _create_parameter(self, id: str, name: str, value: str, description: str) -> ssm.StringParameter:
+        """
+        VMが起動時に読み込むSSMパラメータを作成する
+
+        Args:
+            id: コンストラクトID
+            name: パラメータ名
+            value: 値
+            description: 説明
+
+        Returns:
+            SSMパラメータ
+        """
+        return ssm.StringParameter(
+            self, id,
+            parameter_name=name,
+            string_value=value,
+            description=description,
+            tier=ssm.ParameterTier.STANDARD,
+            simple_name=False
+        )
+
+    def _depend_on_parameters(self, host: Construct):
+        """
+        VM（インスタンス・Auto Scaling Group）をSSMパラメータの作成後に起動する
+
+        Args:
+            host: インスタンスまたはAuto Scaling Group
+        """
+        for parameter in self.parameters:
+            host.node.add_dependency(parameter)
+
+    def _add_linux_host(self, name: str, dimensions: Dict[str, str], instance_type: str):
+        """
+        Linux VMのウィジェットとアラームを追加する
+
+        Args:
+            name: 表示名（コンストラクトIDの接頭辞にも使用）
+            dimensions: メトリクスの次元（InstanceIdまたはAutoScalingGroupName）
+            instance_type: インスタンスタイプ
+        """
+        memory = self._agent_metric("mem_used_percent", dimensions, "Memory used %")
+        disk = self._agent_metric("disk_used_percent", dimensions, "Disk used %")
+        # io_time（1分あたりのI/O処理時間ミリ秒）をビジー率（%）に換算
+        disk_io = cloudwatch.MathExpression(
+            expression=f"io_time / {METRICS_INTERVAL * 10}",
+            using_metrics={"io_time": self._agent_metric("diskio_io_time", dimensions, "io_time")},
+            label="Disk IO busy %",
+            period=Duration.minutes(1)
+        )
+        unhealthy = cloudwatch.Metric(
+            namespace=METRIC_NAMESPACE,
+            metric_name="UnhealthyContainers",
+            dimensions_map=dimensions,
+            statistic=cloudwatch.Stats.MAXIMUM,
+            period=Duration.minutes(1),
+            label="unhealthy"
+        )
+
+        self.dashboard.add_widgets(cloudwatch.TextWidget(markdown=f"## {name}", width=24, height=1))
+        self.dashboard.add_widgets(
+            self._cpu_widget(dimensions, instance_type),
+            self._graph("Memory / Disk (%)", [memory, disk]),
+            self._graph("Disk IO busy (%)", [disk_io]),
+            self._graph("TCP connections", [
+                self._agent_metric("netstat_tcp_established", dimensions, "established"),
+                self._agent_metric("netstat_tcp_time_wait", dimensions, "time_wait"),
+            ]),
+        )
+        self.dashboard.add_widgets(
+            self._graph("Container CPU (%)", [self._container_search("ContainerCpuUtilization", dimensions)], width=9),
+            self._graph("Container memory (%)", [self._container_search("ContainerMemoryUtilization", dimensions)], width=9),
+            self._graph("Unhealthy containers", [unhealthy], width=6),
+        )
+
+        self._add_cpu_credit_alarm(name, dimensions, instance_type)
+        self._add_alarm(
+            f"{name}MemoryAlarm", memory,
+            threshold=self.config.alarm_memory_percent,
+            description=f"{name}: メモリ使用率が{self.config.alarm_memory_percent}%を超えています"
+        )
+        self._add_alarm(
+            f"{name}DiskAlarm", disk,
+            threshold=self.config.alarm_disk_percent,
+            description=f"{name}: ルートボリュームの使用率が{self.config.alarm_disk_percent}%を超えています"
+        )
+        self._add_alarm(
+            f"{name}DiskIoAlarm", disk_io,
+            threshold=self.config.alarm_disk_io_percent,
+            evaluation_periods=10,
+            description=f"{name}: ルートボリュームのI/Oビジー率が{self.config.alarm_disk_io_percent}%を超えています（IOPS・スループットの飽和）"
+        )
+        self._add_alarm(
+            f"{name}UnhealthyContainersAlarm", unhealthy,
+            threshold=1,
+            comparison=cloudwatch.ComparisonOperator.GREATER_THAN_OR_EQUAL_TO_THRESHOLD,
+            evaluation_periods=3,
+            description=f"{name}: 異常なDifyコンテナ（unhealthy・再起動中・異常終了）があります"
+        )
+
+    def _cpu_widget(self, dimensions: Dict[str, str], instance_type: str) -> cloudwatch.GraphWidget:
+        """
+        CPU使用率（バースト可能インスタンスの場合はCPUクレジット残高も）のグラフ
+
+        Args:
+            dimensions: メトリクスの次元
+            instance_type: インスタンスタイプ
+
+        Returns:
+            グラフウィジェット
+        """
+        right = []
+        if self._is_burstable(instance_type):
+            right.append(self._ec2_metric("CPUCreditBalance", dimensions, cloudwatch.Stats.MINIMUM))
+        return cloudwatch.GraphWidget(
+            title="CPU",
+            left=[self._ec2_metric("CPUUtilization", dimensions, cloudwatch.Stats.MAXIMUM)],
+            right=right,
+            width=6
+        )
+
+    def _add_cpu_credit_alarm(self, name: str, dimensions: Dict[str, str], instance_type: str):
+        """
+        CPUクレジット残高のアラームを追加する（バースト可能インスタンスのみ）
+
+        Args:
+            name: 表示名
+            dimensions: メトリクスの次元
+            instance_type: インスタンスタイプ
+        """
+        if not self._is_burstable(instance_type):
+            return
+        self._add_alarm(
+            f"{name}CpuCreditAlarm",
+            self._ec2_metric("CPUCreditBalance", dimensions, cloudwatch.Stats.MINIMUM),
+            threshold=self.config.alarm_cpu_credit_balance,
+            comparison=cloudwatch.ComparisonOperator.LESS_THAN_THRESHOLD,
+            evaluation_periods=3,
+            description=f"{name}: CPUクレジット残高が{self.config.alarm_cpu_credit_balance}を下回っています"
+        )
+
+    def _add_alarm(
+        self,
+        id: str,
+        metric: cloudwatch.IMetric,
+        threshold: float,
+        description: str,
+        comparison: cloudwatch.ComparisonOperator = cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+        evaluation_periods: int = 5
+    ) -> cloudwatch.Alarm:
+        """
+        アラームを作成してSNSトピックに通知する
+
+        メトリクスが存在しない期間（起動直後・スケールイン後等）はアラームとしません。
+
+        Args:
+            id: コンストラクトID
+            metric: 評価するメトリクス
+            threshold: しきい値
+            description: アラームの説明
+            comparison: 比較演算子
+            evaluation_periods: 評価期間の数
+
+        Returns:
+            アラーム
+        """
+        alarm = metric.create_alarm(
+            self, id,
+            threshold=threshold,
+            comparison_operator=comparison,
+            evaluation_periods=evaluation_periods,
+            treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING,
+            alarm_description=description
+        )
+        alarm.add_alarm_action(cloudwatch_actions.SnsAction(self.alarm_topic))
+        alarm.add_ok_action(cloudwatch_actions.SnsAction(self.alarm_topic))
+        self.alarms.append(alarm)
+        return alarm
+
+    @staticmethod
+    def _graph(title: str, metrics: List[cloudwatch.IMetric], width: int = 6) -> cloudwatch.GraphWidget:
+        """
+        グラフウィジェットを作成する
+
+        Args:
+            title: タイトル
+            metrics: 表示するメトリクス
+            width: 幅（24で全幅）
+
+        Returns:
+            グラフウィジェット
+        """
+        return cloudwatch.GraphWidget(title=title, left=metrics, width=width)
+
+    @staticmethod
+    def _agent_metric(
+        metric_name: str,
+        dimensions: Dict[str, str],
+        label: str,
+        statistic: str = cloudwatch.Stats.MAXIMUM
+    ) -> cloudwatch.Metric:
+        """
+        CloudWatch Agentの集計メトリクス（インスタンスID・Auto Scaling Group名のみの次元）
+
+        Args:
+            metric_name: メトリクス名
+            dimensions: メトリクスの次元
+            label: 表示名
+            statistic: 統計（Auto Scaling Groupの場合はグループ内で集計）
+
+        Returns:
+            CloudWatchメトリクス
+        """
+        return cloudwatch.Metric(
+            namespace=AGENT_NAMESPACE,
+            metric_name=metric_name,
+            dimensions_map=dimensions,
+            statistic=statistic,
+            period=Duration.minutes(1),
+            label=label
+        )
+
+    @staticmethod
+    def _ec2_metric(metric_name: str, dimensions: Dict[str, str], statistic: str) -> cloudwatch.Metric:
+        """
+        EC2の標準メトリクス（詳細モニタリングの1分間隔）
+
+        Args:
+            metric_name: メトリクス名
+            dimensions: メトリクスの次元
+            statistic: 統計
+
+        Returns:
+            CloudWatchメトリクス
+        """
+        return cloudwatch.Metric(
+            namespace="AWS/EC2",
+            metric_name=metric_name,
+            dimensions_map=dimensions,
+            statistic=statistic,
+            period=Duration.minutes(5) if metric_name == "CPUCreditBalance" else Duration.minutes(1),
+            label=metric_name
+        )
+
+    @staticmethod
+    def _container_search(metric_name: str, dimensions: Dict[str, str]) -> cloudwatch.MathExpression:
+        """
+        サービスごとのコンテナメトリクスを検索する式（サービス構成に依存しない）
+
+        Args:
+            metric_name: メトリクス名
+            dimensions: ホストの次元
+
+        Returns:
+            SEARCH式
+        """
+        (key, value), = dimensions.items()
+        return cloudwatch.MathExpression(
+            expression=(
+                f"SEARCH('{{{METRIC_NAMESPACE},{key},Service}} "
+                f"MetricName=\"{metric_name}\" {key}=\"{value}\"', 'Average', 60)"
+            ),
+            using_metrics={},
+            label="",
+            period=Duration.minutes(1)
+        )
+
+    @staticmethod
+    def _is_burstable(instance_type: str) -> bool:
+        """
+        CPUクレジットを使用するバースト可能インスタンス（T系）か
+
+        Args:
+            instance_type: インスタンスタイプ
+
+        Returns:
+            バースト可能インスタンスの場合True
+        """
+        return instance_type.split(".")[0].startswith("t")
+
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+
+"""
+電源スケジュールコンストラクト
+
+このモジュールは、Windows VM・Linux VMを業務時間外に停止し、業務開始前に起動する
+スケジュールを定義します。EventBridge SchedulerがSSM Automationのランブックを実行し、
+休止状態を有効にしたインスタンスは休止状態（ハイバネーション）で停止します。
+休止状態から再開したインスタンスは、メモリの内容（ページキャッシュ・実行中のコンテナ）を
+保持したまま約1分で利用可能になります。
+"""
+
+from typing import Any, Dict, List
+
+from constructs import Construct
+from aws_cdk import aws_ec2 as ec2
+from aws_cdk import aws_iam as iam
+from aws_cdk import aws_scheduler as scheduler
+from aws_cdk import aws_ssm as ssm
+from aws_cdk import CfnOutput, Stack
+
+
+# 停止・起動の完了を待つ時間（秒）。休止状態ではメモリの内容の書き出しを待つ
+WAIT_TIMEOUT_SECONDS = 900
+
+
+class PowerScheduleConstruct(Construct):
+    """インスタンスを時間帯で停止（休止状態）・起動するコンストラクト"""
+
+    def __init__(
+        self,
+        scope: Construct,
+        id: str,
+        instances: List[ec2.Instance],
+        config,
+        **kwargs
+    ):
+        """
+        コンストラクタ
+
+        Args:
+            scope: 親スコープ
+            id: コンストラクトID
+            instances: 停止・起動するインスタンス
+            config: 設定オブジェクト
+            **kwargs: その他の引数
+        """
+        super().__init__(scope, id)
+
+        stack = Stack.of(self)
+        instance_ids = [instance.instance_id for instance in instances]
+        instance_arns = [
+            stack.format_arn(service="ec2", resource="instance", resource_name=instance_id)
+            for instance_id in instance_ids
+        ]
+
+        # Automationの実行ロール（対象のインスタンスのみ停止・起動可能）
+        automation_role = iam.Role(
+            self, "AutomationRole",
+            assumed_by=iam.ServicePrincipal("ssm.amazonaws.com"),
+            description="Role for Dify power schedule automation"
+        )
+        automation_role.add_to_policy(iam.PolicyStatement(
+            actions=["ec2:StopInstances", "ec2:StartInstances"],
+            resources=instance_arns
+        ))
+        automation_role.add_to_policy(iam.PolicyStatement(
+            actions=["ec2:DescribeInstances"],
+            resources=["*"]
+        ))
+
+        # 停止（休止状態）・起動のランブック
+        self.stop_document = self._create_document(
+            "StopDocument",
+            "Hibernate (or stop) the Dify instances and wait until they are stopped",
+            "StopInstances",
+            {"Hibernate": config.hibernation_enabled},
+            "stopped"
+        )
+        self.start_document = self._create_document(
+            "StartDocument",
+            "Start (or resume) the Dify instances and wait until they are running",
+            "StartInstances",
+            {},
+            "running"
+        )
+
+        # EventBridge Schedulerの実行ロール
+        scheduler_role = iam.Role(
+            self, "SchedulerRole",
+            assumed_by=iam.ServicePrincipal("scheduler.amazonaws.com"),
+            description="Role for Dify power schedule"
+        )
+        scheduler_role.add_to_policy(iam.PolicyStatement(
+            actions=["ssm:StartAutomationExecution"],
+            resources=[
+                stack.format_arn(
+                    service="ssm", resource="automation-definition", resource_name=f"{document.ref}:*"
+                )
+                for document in (self.stop_document, self.start_document)
+            ]
+        ))
+        automation_role.grant_pass_role(scheduler_role)
+
+        # スケジュール（SSM AutomationのStartAutomationExecutionを直接呼び出す）
+        for schedule_id, expression, document in (
+            ("StopSchedule", config.power_schedule_stop, self.stop_document),
+            ("StartSchedule", config.power_schedule_start, self.start_document),
+        ):
+            scheduler.CfnSchedule(
+                self, schedule_id,
+                description=f"Dify power schedule ({schedule_id})",
+                schedule_expression=expression,
+                schedule_expression_timezone=config.power_schedule_timezone,
+                flexible_time_window=scheduler.CfnSchedule.FlexibleTimeWindowProperty(mode="OFF"),
+                target=scheduler.CfnSchedule.TargetProperty(
+                    arn="arn:aws:scheduler:::aws-sdk:ssm:startAutomationExecution",
+                    role_arn=scheduler_role.role_arn,
+                    input=stack.to_json_string({
+                        "DocumentName": document.ref,
+                        "Parameters": {
+                            "InstanceIds": instance_ids,
+                            "AutomationAssumeRole": [automation_role.role_arn]
+                        }
+                    })
+                )
+            )
+
+        # 出力の設定
+        CfnOutput(
+            self, "StopDocumentName",
+            value=self.stop_document.ref,
+            description="SSM Automation runbook that hibernates the Dify instances"
+        )
+
+        CfnOutput(
+            self, "StartDocumentName",
+            value=self.start_document.ref,
+            description="SSM Automation runbook that resumes the Dify instances"
+        )
+
+    def _create_document(
+        self, id: str, description: str, api: str, api_inputs: Dict[str, Any], state: str
+    ) -> ssm.CfnDocument:
+        """
+        インスタンスの状態を変更し、全インスタンスの完了を待つAutomationのランブックを作成する
+
+        Args:
+            id: コンストラクトID
+            description: ランブックの説明
+            api: 呼び出すEC2のAPI（StopInstances / StartInstances）
+            api_inputs: APIの追加の入力
+            state: 完了を待つインスタンスの状態
+
+        Returns:
+            SSMドキュメント
+        """
+        return ssm.CfnDocument(
+            self, id,
+            document_type="Automation",
+            content={
+                "schemaVersion": "0.3",
+                "description": description,
+                "assumeRole": "{{ AutomationAssumeRole }}",
+                "parameters": {
+                    "InstanceIds": {"type": "StringList", "description": "Instance IDs"},
+                    "AutomationAssumeRole": {"type": "String", "description": "Role assumed by the automation"}
+                },
+                "mainSteps": [
+                    {
+                        "name": "changeInstanceState",
+                        "action": "aws:executeAwsApi",
+                        "inputs": {
+                            "Service": "ec2",
+                            "Api": api,
+                            "InstanceIds": "{{ InstanceIds }}",
+                            **api_inputs
+                        }
+                    },
+                    {
+                        "name": "waitForInstances",
+                        "action": "aws:loop",
+                        "inputs": {
+                            "Iterators": "{{ InstanceIds }}",
+                            "Steps": [{
+                                "name": "waitForInstanceState",
+                                "action": "aws:waitForAwsResourceProperty",
+                                "timeoutSeconds": WAIT_TIMEOUT_SECONDS,
+                                "inputs": {
+                                    "Service": "ec2",
+                                    "Api": "DescribeInstances",
+                                    "InstanceIds": ["{{ waitForInstances.CurrentIteratorValue }}"],
+                                    "PropertySelector": "$.Reservations[0].Instances[0].State.Name",
+                                    "DesiredValues": [state]
+                                }
+                            }]
+                        }
+                    }
+                ]
+            }
+        )
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+
+"""
+実行時設定ストアコンストラクト
+
+このモジュールは、Difyの.envの値とLinux VMのユーザーパスワードをSSMパラメータストアに格納し、
+ユーザーデータから切り離す構成を定義します。値を変更してもユーザーデータは変わらないため、
+インスタンスは置き換えられず、State Managerの関連付けが各ホストの.envを再生成して
+変更のあったコンテナのみを再作成します（1ホストずつ順に適用）。
+
+パラメータの構成:
+    /dify/config/common/<環境変数名>: 全ホスト共通の値
+    /dify/config/<ホストID>/<環境変数名>: ホスト固有の値（共通の値を上書き）
+    /dify/pre-start/<ホストID>: ホストの起動前処理（Docker Compose構成の上書き等）
+"""
+
+import hashlib
+import json
+import re
+from typing import Dict, List, Optional
+
+import jsii
+from constructs import Construct
+from aws_cdk import aws_ssm as ssm
+from aws_cdk import CfnOutput, IStableStringProducer, Lazy, Stack
+
+from dify_cdk.constructs.dify_runtime import CONFIG_PARAMETER_PATH, DifyRuntimeSettings
+
+
+# 全ホスト共通の値のスコープ名
+COMMON_SCOPE = "common"
+
+# ホストの起動前処理を格納するSSMパラメータのパス
+PRE_START_PARAMETER_PATH = "/dify/pre-start"
+
+# Linux VMのユーザーパスワードを格納するSSMパラメータ（ユーザーデータには含めない）
+ADMIN_PASSWORD_PARAMETER = "/dify/linux/admin-password"
+
+# 設定の適用対象とするホストのタグ（値はスタック名）
+RUNTIME_CONFIG_TAG = "DifyRuntimeConfig"
+
+
+class RuntimeConfigConstruct(Construct):
+    """Difyの実行時設定をSSMパラメータストアで管理し、変更をホストに適用するコンストラクト"""
+
+    def __init__(
+        self,
+        scope: Construct,
+        id: str,
+        dify_settings: DifyRuntimeSettings,
+        config,
+        **kwargs
+    ):
+        """
+        コンストラクタ
+
+        Args:
+            scope: 親スコープ
+            id: コンストラクトID
+            dify_settings: 全ホスト共通のDify実行時設定（以降の複製にも設定ストアが引き継がれる）
+            config: 設定オブジェクト
+            **kwargs: その他の引数
+        """
+        super().__init__(scope, id)
+
+        self.config = config
+        self.parameters: List[ssm.StringParameter] = []
+        self.values: Dict[str, str] = {}
+        self.association: Optional[ssm.CfnAssociation] = None
+
+        # Linux VMのユーザーパスワード
+        self.admin_password_parameter = self._create_parameter(
+            "AdminPassword",
+            ADMIN_PASSWORD_PARAMETER,
+            config.linux_admin_password,
+            "Linux VM user password"
+        )
+
+        # 全ホスト共通の.envの値
+        dify_settings.config_store = self
+        self.publish_env(COMMON_SCOPE, dify_settings)
+
+        # 設定を再適用するコマンドドキュメント
+        self.document = ssm.CfnDocument(
+            self, "ApplyDocument",
+            document_type="Command",
+            content={
+                "schemaVersion": "2.2",
+                "description": "Re-render the Dify .env from SSM parameters and recreate changed containers",
+                "parameters": {
+                    "ConfigVersion": {
+                        "type": "String",
+                        "default": "",
+                        "description": "Hash of the deployed configuration (changes trigger the association)"
+                    }
+                },
+                "mainSteps": [{
+                    "action": "aws:runShellScript",
+                    "name": "applyDifyConfig",
+                    "inputs": {
+                        "timeoutSeconds": "900",
+                        "runCommand": self._apply_script().splitlines()
+                    }
+                }]
+            }
+        )
+
+        # 設定の変更時に全ホストへ1台ずつ適用（失敗したホストがあれば以降のホストには適用しない）
+        # パラメータの更新後に実行するため、最後に作成したパラメータに依存させる（_create_parameter）
+        self.association = ssm.CfnAssociation(
+            self, "ApplyAssociation",
+            name=self.document.ref,
+            targets=[ssm.CfnAssociation.TargetProperty(
+                key=f"tag:{RUNTIME_CONFIG_TAG}",
+                values=[Stack.of(self).stack_name]
+            )],
+            parameters={
+                "ConfigVersion": [Lazy.string(_ConfigVersion(self))]
+            },
+            max_concurrency="1",
+            max_errors="0"
+        )
+        self.association.node.add_dependency(self.parameters[-1])
+
+        # 出力の設定
+        CfnOutput(
+            self, "ApplyDocumentName",
+            value=self.document.ref,
+            description="SSM document that re-applies the Dify runtime configuration"
+        )
+
+        CfnOutput(
+            self, "ApplyAssociationId",
+            value=self.association.attr_association_id,
+            description="Run with 'aws ssm start-associations-once' after editing /dify/config parameters"
+        )
+
+    def publish_env(self, scope_name: str, settings: DifyRuntimeSettings) -> None:
+        """
+        .envの値のうち未登録のものをSSMパラメータに登録し、起動時の取得対象に追加する
+
+        空文字列はSSMパラメータに格納できないため、ユーザーデータに残します。
+
+        Args:
+            scope_name: パラメータのスコープ（commonまたはホストID）
+            settings: Dify実行時設定
+        """
+        values = {
+            name: value
+            for name, value in settings.env.items()
+            if value != "" and settings.published_env.get(name) != value
+        }
+        if not values:
+            return
+
+        for name, value in values.items():
+            path = f"{CONFIG_PARAMETER_PATH}/{scope_name}/{name}"
+            self._create_parameter(f"{scope_name}{name}", path, value, f"Dify .env {name}")
+            self.values[path] = value
+        settings.config_scopes.append(scope_name)
+        settings.published_env.update(values)
+
+    def publish_pre_start(self, host_id: str, settings: DifyRuntimeSettings) -> str:
+        """
+        ホストの起動前処理をSSMパラメータに登録する
+
+        Args:
+            host_id: ホストID
+            settings: Dify実行時設定
+
+        Returns:
+            SSMパラメータ名
+        """
+        script = settings.render_pre_start_script()
+        path = f"{PRE_START_PARAMETER_PATH}/{host_id}"
+        # 未解決の値（ARN等）は合成時の表現より長くなるため、余裕をもって階層を選択
+        length = len(script) + 100 * len(re.findall(r"\$\{Token\[", script))
+        self._create_parameter(
+            f"{host_id}PreStart", path, script, f"Dify pre-start script for {host_id}",
+            advanced=length >= 4000
+        )
+        self.values[path] = script
+        return path
+
+    def _create_parameter(
+        self, id: str, name: str, value: str, description: str, advanced: bool = False
+    ) -> ssm.StringParameter:
+        """
+        SSMパラメータを作成する
+
+        多数のパラメータを同時に作成するとPutParameterのレート制限に達するため、順に作成します。
+
+        Args:
+            id: コンストラクトID
+            name: パラメータ名
+            value: 値
+            description: 説明
+            advanced: アドバンスト階層（4KBを超える値）とするか
+
+        Returns:
+            SSMパラメータ
+        """
+        parameter = ssm.StringParameter(
+            self, id,
+            parameter_name=name,
+            string_value=value,
+            description=description,
+            tier=ssm.ParameterTier.ADVANCED if advanced else ssm.ParameterTier.STANDARD,
+            simple_name=False
+        )
+        if self.parameters:
+            parameter.node.add_dependency(self.parameters[-1])
+        if self.association:
+            self.association.node.add_dependency(parameter)
+        self.parameters.append(parameter)
+        return parameter
+
+    def _apply_script(self) -> str:
+        """
+        ホストで実行する設定の再適用スクリプト
+
+        起動時に保存した.envの基本値（/etc/dify/env.base）から、SSMパラメータストアの最新の
+        起動前処理で.envとDocker Compose構成の上書き・nginxの設定を再生成します。内容が変わった場合のみ
+        docker compose up -d で変更のあったコンテナを再作成し（nginxの設定のみの変更はnginxを再起動）、
+        APIを実行するホストではDifyの応答を確認します。
+
+        Returns:
+            シェルスクリプト文字列
+        """
+        return f"""#!/bin/bash
+set -e
+set -o pipefail
+
+# セットアップ（ユーザーデータ）の完了前は何もしない（起動時に同じ設定を適用するため）
+if [ ! -f /var/lib/cloud/instance/boot-finished ] || [ ! -f /etc/dify/env.base ]; then
+    echo "Dify is not set up on this host yet; skipping"
+    exit 0
+fi
+
+log() {{
+    echo "[$(date '+%Y-%m-%d %H:%M:%S')] $1"
+}}
+
+IMDS_TOKEN=$(curl -s -X PUT http://169.254.169.254/latest/api/token -H 'X-aws-ec2-metadata-token-ttl-seconds: 300')
+export AWS_DEFAULT_REGION=$(curl -s -H "X-aws-ec2-metadata-token: ${{IMDS_TOKEN}}" http://169.254.169.254/latest/meta-data/placement/region)
+
+# ユーザーパスワード
+password=$(aws ssm get-parameter --name {ADMIN_PASSWORD_PARAMETER} --query Parameter.Value --output text)
+echo "{self.config.linux_admin_username}:${{password}}" | chpasswd
+
+# .envとDocker Compose構成の再生成（失敗した場合は.envを元に戻す）
+cd /opt/dify/docker
+if [ -f /etc/dify/pre-start.parameter ]; then
+    aws ssm get-parameter --name "$(cat /etc/dify/pre-start.parameter)" --query Parameter.Value --output text > /etc/dify/pre-start.sh
+fi
+# 起動前処理が生成するファイル（.env・Docker Compose構成・nginxの設定）のハッシュ
+# （nginxが起動時にテンプレートから生成するconf.d/default.confは除く）
+nginx_checksum() {{
+    find nginx -type f ! -path nginx/conf.d/default.conf | sort | xargs -r cat | md5sum
+}}
+checksum() {{
+    {{ cat .env; cat docker-compose.*.yaml 2> /dev/null || true; nginx_checksum; }} | md5sum
+}}
+previous=$(checksum)
+previous_nginx=$(nginx_checksum)
+cp .env .env.previous
+cp /etc/dify/env.base .env
+export -f log
+if ! bash -e -o pipefail -c 'source /etc/dify/pre-start.sh'; then
+    log "Failed to render the Dify configuration; restoring the previous .env"
+    cp .env.previous .env
+    exit 1
+fi
+if [ "$(checksum)" = "$previous" ]; then
+    log "No configuration changes"
+    exit 0
+fi
+diff .env.previous .env | grep '^[<>]' | cut -d= -f1 | sort -u || true
+
+# 変更のあったコンテナのみ再作成
+log "Recreating changed containers..."
+docker compose up -d
+
+# nginxの設定ファイル（バインドマウント）の変更はコンテナの再作成の対象にならないため再起動
+if [ "$(nginx_checksum)" != "$previous_nginx" ] && docker compose ps --services --status running | grep -qx nginx; then
+    log "Restarting nginx to apply the updated configuration..."
+    docker compose restart nginx
+fi
+
+# APIを実行するホストではDifyの応答を確認（失敗した場合は以降のホストに適用しない）
+if docker compose ps --services --status running | grep -qx api; then
+    for i in $(seq 1 30); do
+        if curl -sf -o /dev/null http://localhost/console/api/ping; then
+            log "Dify is healthy"
+            exit 0
+        fi
+        sleep 10
+    done
+    log "Dify did not become healthy after applying the configuration"
+    exit 1
+fi
+"""
+
+
+@jsii.implements(IStableStringProducer)
+class _ConfigVersion:
+    """
+    登録した値（パスワードを含む）のハッシュ
+
+    ホストの値は後から登録されるため、合成時に計算します。
+    値が変わると関連付けのパラメータが変わり、State Managerが全ホストに設定を再適用します。
+    """
+
+    def __init__(self, store: RuntimeConfigConstruct):
+        """
+        コンストラクタ
+
+        Args:
+            store: 設定ストア
+        """
+        self.store = store
+
+    def produce(self) -> str:
+        values = dict(self.store.values, password=self.store.config.linux_admin_password)
+        resolved = Stack.of(self.store).resolve(values)
+        return hashlib.sha256(json.dumps(resolved, sort_keys=True).encode()).hexdigest()[:16]
@@ -6,9 +6,11 @@
 このモジュールは、セキュリティグループやIAMロールなどのセキュリティリソースを定義します。
 """
 
+from typing import Dict
 from constructs import Construct
 from aws_cdk import aws_ec2 as ec2
 from aws_cdk import aws_iam as iam
+from aws_cdk import aws_secretsmanager as secretsmanager
 from aws_cdk import Tags
 
 
@@ -178,3 +180,90 @@ class SecurityConstruct(Construct):
         role.attach_inline_policy(custom_policy)
         
         return role
+    
+    def create_linux_role_security_group(self, vpc: ec2.Vpc, role: str, ports: Dict[str, int]) -> ec2.SecurityGroup:
+        """
+        ロール分割構成のロール用セキュリティグループを作成
+        
+        Linux VM共通のセキュリティグループ（他のロールのホスト）から、ロールが公開するポートへの接続を許可します。
+        
+        Args:
+            vpc: VPCインスタンス
+            role: ロール名
+            ports: 公開するサービス名とポート
+            
+        Returns:
+            セキュリティグループ
+        """
+        sg = ec2.SecurityGroup(
+            self, f"Linux{role.title()}SG",
+            vpc=vpc,
+            description=f"Security group for Dify {role} role",
+            allow_all_outbound=True
+        )
+        
+        for name, port in ports.items():
+            sg.add_ingress_rule(
+                self.linux_sg,
+                ec2.Port.tcp(port),
+                f"Allow {name} from Dify hosts"
+            )
+        
+        # タグの追加
+        Tags.of(sg).add("Name", f"linux-{role}-sg")
+        
+        return sg
+    
+    def create_task_role(self) -> iam.Role:
+        """
+        ECSタスク（Difyコンテナ）用のIAMロールを作成
+        
+        EC2インスタンスロールと同様に、SSMパラメータ（/dify/*）の読み取りを許可します。
+        S3・OpenSearch等へのアクセス権限は各コンストラクトで付与されます。
+        
+        Returns:
+            IAMロール
+        """
+        role = iam.Role(
+            self, "EcsTaskRole",
+            assumed_by=iam.ServicePrincipal("ecs-tasks.amazonaws.com"),
+            description="Role for Dify ECS tasks"
+        )
+        
+        # SSMパラメータの読み取り権限
+        role.add_to_policy(
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=[
+                    "ssm:GetParameter",
+                    "ssm:GetParameters",
+                    "ssm:GetParametersByPath"
+                ],
+                resources=[
+                    f"arn:aws:ssm:*:*:parameter/dify/*"
+                ]
+            )
+        )
+        
+        return role
+    
+    def create_dify_secret_key(self) -> secretsmanager.Secret:
+        """
+        Difyのセッション署名・暗号化に使用するSECRET_KEYを作成
+        
+        複数のホストでDifyを実行する場合、すべてのホストで同じ値を使用する必要があります。
+        
+        Returns:
+            シークレット（JSONフィールド secret_key）
+        """
+        return secretsmanager.Secret(
+            self, "DifySecretKey",
+            secret_name="/dify/secret-key",
+            description="Dify SECRET_KEY shared by all hosts",
+            generate_secret_string=secretsmanager.SecretStringGenerator(
+                secret_string_template="{}",
+                generate_string_key="secret_key",
+                exclude_punctuation=True,
+                password_length=64
+            )
+        )
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+"""
+スナップショットライフサイクルコンストラクト
+
+このモジュールは、Linux VMのDifyのデータ用ボリューム（/opt/dify/docker/volumes）の
+スナップショットをData Lifecycle Manager（DLM）で定期的に取得するポリシーを定義します。
+最新のスナップショットでは高速スナップショット復元（FSR）を有効にし、復元したボリュームが
+初回アクセス時の遅延読み込みなしに最初からボリューム本来の性能で動作するようにします。
+"""
+
+from typing import List
+
+from constructs import Construct
+from aws_cdk import aws_dlm as dlm
+from aws_cdk import aws_ec2 as ec2
+from aws_cdk import aws_iam as iam
+from aws_cdk import CfnOutput, CfnTag, Stack, Tags
+
+
+# スナップショットの取得対象とするインスタンスのタグ（値はスタック名）
+SNAPSHOT_TAG = "DifySnapshot"
+
+
+class SnapshotLifecycleConstruct(Construct):
+    """Difyのデータ用ボリュームのスナップショットを取得・保持するコンストラクト"""
+
+    def __init__(
+        self,
+        scope: Construct,
+        id: str,
+        availability_zones: List[str],
+        config,
+        **kwargs
+    ):
+        """
+        コンストラクタ
+
+        Args:
+            scope: 親スコープ
+            id: コンストラクトID
+            availability_zones: 高速スナップショット復元を有効にするアベイラビリティゾーン（Linux VMを配置するAZ）
+            config: 設定オブジェクト
+            **kwargs: その他の引数
+        """
+        super().__init__(scope, id)
+
+        self.tag_value = Stack.of(self).stack_name
+
+        # DLMがスナップショットを作成・削除するためのロール
+        role = iam.Role(
+            self, "Role",
+            assumed_by=iam.ServicePrincipal("dlm.amazonaws.com"),
+            description="Role for Dify data volume snapshot lifecycle",
+            managed_policies=[
+                iam.ManagedPolicy.from_aws_managed_policy_name("service-role/AWSDataLifecycleManagerServiceRole")
+            ]
+        )
+
+        # 最新のスナップショットでの高速スナップショット復元（AZ・スナップショットごとに課金）
+        fast_restore_rule = None
+        if config.snapshot_fast_restore_count > 0:
+            fast_restore_rule = dlm.CfnLifecyclePolicy.FastRestoreRuleProperty(
+                availability_zones=availability_zones,
+                count=config.snapshot_fast_restore_count
+            )
+
+        # タグ付けしたインスタンスのルートボリューム以外（データ用ボリューム）のスナップショット
+        self.policy = dlm.CfnLifecyclePolicy(
+            self, "Policy",
+            description=f"Dify data volume snapshots for {self.tag_value}",
+            state="ENABLED",
+            execution_role_arn=role.role_arn,
+            policy_details=dlm.CfnLifecyclePolicy.PolicyDetailsProperty(
+                policy_type="EBS_SNAPSHOT_MANAGEMENT",
+                resource_types=["INSTANCE"],
+                target_tags=[CfnTag(key=SNAPSHOT_TAG, value=self.tag_value)],
+                parameters=dlm.CfnLifecyclePolicy.ParametersProperty(
+                    exclude_boot_volume=True
+                ),
+                schedules=[dlm.CfnLifecyclePolicy.ScheduleProperty(
+                    name=f"Every {config.snapshot_interval_hours} hours",
+                    create_rule=dlm.CfnLifecyclePolicy.CreateRuleProperty(
+                        interval=config.snapshot_interval_hours,
+                        interval_unit="HOURS",
+                        times=[config.snapshot_time]
+                    ),
+                    retain_rule=dlm.CfnLifecyclePolicy.RetainRuleProperty(
+                        count=config.snapshot_retain_count
+                    ),
+                    fast_restore_rule=fast_restore_rule,
+                    copy_tags=True,
+                    tags_to_add=[CfnTag(key="Name", value=f"{self.tag_value}-dify-data")]
+                )]
+            )
+        )
+
+        # 出力の設定
+        CfnOutput(
+            self, "PolicyId",
+            value=self.policy.ref,
+            description="Data Lifecycle Manager policy for Dify data volume snapshots"
+        )
+
+    def add_instance(self, instance: ec2.Instance) -> None:
+        """
+        インスタンスをスナップショットの取得対象に追加する
+
+        Args:
+            instance: Difyのデータ用ボリュームを接続したLinux VM
+        """
+        Tags.of(instance).add(SNAPSHOT_TAG, self.tag_value)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+"""
+ストレージコンストラクト
+
+このモジュールは、Difyのファイル保存先となるS3バケットを定義します。
+"""
+
+from constructs import Construct
+from aws_cdk import aws_iam as iam
+from aws_cdk import aws_s3 as s3
+from aws_cdk import Duration, RemovalPolicy, Stack, CfnOutput
+
+from dify_cdk.constructs.dify_runtime import DifyRuntimeSettings
+
+
+class StorageConstruct(Construct):
+    """Difyのアップロードファイル・生成ファイル用のS3バケットを作成するコンストラクト"""
+
+    def __init__(
+        self,
+        scope: Construct,
+        id: str,
+        instance_role: iam.Role,
+        **kwargs
+    ):
+        """
+        コンストラクタ
+
+        Args:
+            scope: 親スコープ
+            id: コンストラクトID
+            instance_role: バケットへのアクセスを許可するIAMロール
+            **kwargs: その他の引数
+        """
+        super().__init__(scope, id)
+
+        # 暗号化されたプライベートバケット（スタック削除時もデータを保持）
+        self.bucket = s3.Bucket(
+            self, "Bucket",
+            encryption=s3.BucketEncryption.S3_MANAGED,
+            block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
+            enforce_ssl=True,
+            removal_policy=RemovalPolicy.RETAIN,
+            lifecycle_rules=[
+                s3.LifecycleRule(
+                    abort_incomplete_multipart_upload_after=Duration.days(7)
+                )
+            ]
+        )
+
+        # インスタンスロール（コンテナからIMDS経由で使用）に読み書き権限を付与
+        self.bucket.grant_read_write(instance_role)
+
+        # 出力の設定
+        CfnOutput(
+            self, "BucketName",
+            value=self.bucket.bucket_name,
+            description="Dify storage bucket name"
+        )
+
+    def configure_dify(self, settings: DifyRuntimeSettings) -> None:
+        """
+        Difyのストレージをこのバケットに設定する
+
+        認証にはインスタンスロールを使用します（アクセスキーは発行しません）。
+
+        Args:
+            settings: Dify実行時設定
+        """
+        region = Stack.of(self).region
+
+        settings.set_env(
+            STORAGE_TYPE="s3",
+            S3_ENDPOINT=f"https://s3.{region}.amazonaws.com",
+            S3_REGION=region,
+            S3_BUCKET_NAME=self.bucket.bucket_name,
+            S3_USE_AWS_MANAGED_IAM="true",
+            S3_ACCESS_KEY="",
+            S3_SECRET_KEY="",
+            # プラグインパッケージの保存先
+            PLUGIN_STORAGE_TYPE="aws_s3",
+            PLUGIN_STORAGE_OSS_BUCKET=self.bucket.bucket_name,
+            PLUGIN_S3_USE_AWS_MANAGED_IAM="true",
+            PLUGIN_AWS_REGION=region
+        )
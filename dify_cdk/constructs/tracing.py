@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+
+"""
+トレースコンストラクト
+
+このモジュールは、DifyのOpenTelemetryトレースを収集する構成を定義します。
+Docker Composeのサービスとして各Linux VMでOpenTelemetry Collectorを実行し、
+Dify（Flask・SQLAlchemy・Redis・Celery・LLM等へのHTTP呼び出し）のスパンを
+AWS X-Ray、またはホスト上のOTLP（JSON Lines）ファイルに出力します。
+"""
+
+import json
+from typing import Any, Dict
+
+from constructs import Construct
+from aws_cdk import aws_iam as iam
+from aws_cdk import aws_logs as logs
+from aws_cdk import aws_ssm as ssm
+from aws_cdk import RemovalPolicy, Stack
+
+from dify_cdk.constructs.dify_runtime import DifyRuntimeSettings
+from dify_cdk.constructs.log_shipping import LOG_GROUP_PREFIX, RETENTION_DAYS
+
+
+# Collectorの設定を格納するSSMパラメータ
+COLLECTOR_CONFIG_PARAMETER = "/dify/tracing/collector-config"
+
+# Collectorのサービス名とOTLP（HTTP）の受信ポート
+COLLECTOR_SERVICE = "otel-collector"
+COLLECTOR_HTTP_PORT = 4318
+
+# ファイル出力先（ホストのディレクトリとコンテナ内のパス）
+HOST_FILE_DIRECTORY = "/var/lib/dify-otel"
+CONTAINER_FILE_DIRECTORY = "/var/lib/otel"
+
+# Collectorコンテナの実行ユーザー（otel/opentelemetry-collector-contribの既定値）
+COLLECTOR_UID = 10001
+
+
+class TracingConstruct(Construct):
+    """DifyのトレースをOpenTelemetry Collector経由で出力するコンストラクト"""
+
+    # X-Ray出力時のメトリクス（EMF）の名前空間
+    METRIC_NAMESPACE = "Dify/OTel"
+
+    def __init__(
+        self,
+        scope: Construct,
+        id: str,
+        instance_role: iam.Role,
+        config,
+        **kwargs
+    ):
+        """
+        コンストラクタ
+
+        Args:
+            scope: 親スコープ
+            id: コンストラクトID
+            instance_role: Collectorを実行するVMのIAMロール
+            config: 設定オブジェクト
+            **kwargs: その他の引数
+        """
+        super().__init__(scope, id)
+
+        self.config = config
+
+        # X-Rayへのセグメント送信とメトリクス（EMF）のロググループ
+        if config.tracing_exporter == 'xray':
+            instance_role.add_managed_policy(
+                iam.ManagedPolicy.from_aws_managed_policy_name("AWSXrayWriteOnlyAccess")
+            )
+            self.metrics_log_group = logs.LogGroup(
+                self, "MetricsLogGroup",
+                log_group_name=f"{LOG_GROUP_PREFIX}/otel-metrics",
+                retention=RETENTION_DAYS.get(config.log_retention_days, logs.RetentionDays.ONE_MONTH),
+                removal_policy=RemovalPolicy.DESTROY
+            )
+
+        # Collectorの設定（ユーザーデータの容量を抑えるため、起動時にVMが読み込む）
+        self.config_parameter = ssm.StringParameter(
+            self, "CollectorConfig",
+            parameter_name=COLLECTOR_CONFIG_PARAMETER,
+            string_value=json.dumps(self._collector_config()),
+            description="OpenTelemetry Collector configuration for Dify",
+            tier=ssm.ParameterTier.STANDARD,
+            simple_name=False
+        )
+
+    def _collector_config(self) -> Dict[str, Any]:
+        """
+        OpenTelemetry Collectorの設定を生成する（JSONはYAMLとしても読み込める）
+
+        Returns:
+            Collectorの設定
+        """
+        region = Stack.of(self).region
+        if self.config.tracing_exporter == 'xray':
+            exporters = {
+                "awsxray": {"region": region},
+                "awsemf": {
+                    "region": region,
+                    "namespace": self.METRIC_NAMESPACE,
+                    "log_group_name": f"{LOG_GROUP_PREFIX}/otel-metrics",
+                    "log_stream_name": "{InstanceId}",
+                    "dimension_rollup_option": "NoDimensionRollup",
+                },
+            }
+            trace_exporters, metric_exporters = ["awsxray"], ["awsemf"]
+        else:
+            exporters = {
+                f"file/{signal}": {
+                    "path": f"{CONTAINER_FILE_DIRECTORY}/{signal}.jsonl",
+                    "rotation": {"max_megabytes": 100, "max_backups": 5},
+                }
+                for signal in ("traces", "metrics")
+            }
+            trace_exporters, metric_exporters = ["file/traces"], ["file/metrics"]
+
+        processors = ["memory_limiter", "resourcedetection", "batch"]
+        return {
+            "receivers": {
+                "otlp": {
+                    "protocols": {
+                        "grpc": {"endpoint": "0.0.0.0:4317"},
+                        "http": {"endpoint": f"0.0.0.0:{COLLECTOR_HTTP_PORT}"},
+                    }
+                }
+            },
+            "processors": {
+                "memory_limiter": {"check_interval": "1s", "limit_mib": 400, "spike_limit_mib": 100},
+                "resourcedetection": {"detectors": ["env", "ec2"], "timeout": "5s", "override": False},
+                "batch": {"send_batch_size": 512, "timeout": "5s"},
+            },
+            "exporters": exporters,
+            "service": {
+                "pipelines": {
+                    "traces": {"receivers": ["otlp"], "processors": processors, "exporters": trace_exporters},
+                    "metrics": {"receivers": ["otlp"], "processors": processors, "exporters": metric_exporters},
+                }
+            },
+        }
+
+    def configure_dify(self, settings: DifyRuntimeSettings):
+        """
+        Difyの実行時設定にトレースとCollectorのサービスを登録する
+
+        Args:
+            settings: Dify実行時設定
+        """
+        settings.set_env(
+            ENABLE_OTEL="true",
+            OTLP_BASE_ENDPOINT=f"http://{COLLECTOR_SERVICE}:{COLLECTOR_HTTP_PORT}",
+            OTEL_EXPORTER_TYPE="otlp",
+            OTEL_EXPORTER_OTLP_PROTOCOL="http",
+            OTEL_SAMPLING_RATE=self.config.tracing_sample_rate
+        )
+
+        volumes = ["./otel/config.yaml:/etc/otelcol-contrib/config.yaml:ro"]
+        commands = [
+            "# OpenTelemetry Collectorの設定（SSMパラメータから取得）",
+            "mkdir -p otel",
+            f"aws ssm get-parameter --name {COLLECTOR_CONFIG_PARAMETER} --query Parameter.Value --output text > otel/config.yaml",
+        ]
+        if self.config.tracing_exporter == 'file':
+            volumes.append(f"{HOST_FILE_DIRECTORY}:{CONTAINER_FILE_DIRECTORY}")
+            commands.append(f"install -d -o {COLLECTOR_UID} -g {COLLECTOR_UID} {HOST_FILE_DIRECTORY}")
+
+        settings.override_service(
+            COLLECTOR_SERVICE,
+            image=self.config.otel_collector_image,
+            restart="always",
+            command=["--config=/etc/otelcol-contrib/config.yaml"],
+            volumes=volumes,
+            mem_limit="512m"
+        )
+        settings.add_pre_start_commands(*commands, aws_cli=True)
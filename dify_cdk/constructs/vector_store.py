@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+"""
+ベクトルストアコンストラクト
+
+このモジュールは、Difyのベクトルストアとして使用するOpenSearch Serviceドメインを定義します。
+"""
+
+from constructs import Construct
+from aws_cdk import aws_ec2 as ec2
+from aws_cdk import aws_iam as iam
+from aws_cdk import aws_opensearchservice as opensearch
+from aws_cdk import aws_secretsmanager as secretsmanager
+from aws_cdk import RemovalPolicy, Stack, Tags, CfnOutput
+
+from dify_cdk.constructs.dify_runtime import DifyRuntimeSettings
+
+
+class VectorStoreConstruct(Construct):
+    """DifyのベクトルストアとしてOpenSearch Serviceドメインを作成するコンストラクト"""
+
+    # 基本認証で使用するマスターユーザー名
+    MASTER_USERNAME = "dify"
+
+    def __init__(
+        self,
+        scope: Construct,
+        id: str,
+        vpc: ec2.Vpc,
+        app_security_group: ec2.SecurityGroup,
+        instance_role: iam.Role,
+        config,
+        **kwargs
+    ):
+        """
+        コンストラクタ
+
+        Args:
+            scope: 親スコープ
+            id: コンストラクトID
+            vpc: VPCインスタンス
+            app_security_group: Difyアプリケーション（Linux VM）のセキュリティグループ
+            instance_role: IAM認証時にアクセスを許可するIAMロール
+            config: 設定オブジェクト
+            **kwargs: その他の引数
+        """
+        super().__init__(scope, id)
+
+        self.auth_method = config.opensearch_auth
+        if self.auth_method not in ('basic', 'iam'):
+            raise ValueError(f"不明なOpenSearch認証方式です: {self.auth_method}（basic / iam のいずれかを指定してください）")
+
+        # ドメイン用のセキュリティグループ
+        self.security_group = ec2.SecurityGroup(
+            self, "VectorStoreSG",
+            vpc=vpc,
+            description="Security group for Dify vector store",
+            allow_all_outbound=False
+        )
+
+        # Linux VMからのHTTPS接続を許可
+        self.security_group.add_ingress_rule(
+            app_security_group,
+            ec2.Port.tcp(443),
+            "Allow HTTPS from Linux VM"
+        )
+
+        # データノード数が2以上の場合は2つのAZに分散
+        data_nodes = config.opensearch_data_nodes
+        zone_awareness = data_nodes > 1
+        subnets = vpc.select_subnets(subnet_type=ec2.SubnetType.PRIVATE_ISOLATED).subnets
+        vpc_subnets = [ec2.SubnetSelection(subnets=subnets[:2] if zone_awareness else subnets[:1])]
+
+        # 基本認証（ファインアクセスコントロール）の場合はマスターユーザーを作成
+        self.master_secret = None
+        fine_grained_access_control = None
+        if self.auth_method == 'basic':
+            self.master_secret = secretsmanager.Secret(
+                self, "MasterUser",
+                secret_name=f"/dify/{id}/master-user",
+                description="Dify vector store master user",
+                generate_secret_string=secretsmanager.SecretStringGenerator(
+                    secret_string_template=f'{{"username": "{self.MASTER_USERNAME}"}}',
+                    generate_string_key="password",
+                    exclude_characters=" \"'\\/@:$`%&#",
+                    require_each_included_type=True,
+                    password_length=32
+                )
+            )
+            fine_grained_access_control = opensearch.AdvancedSecurityOptions(
+                master_user_name=self.MASTER_USERNAME,
+                master_user_password=self.master_secret.secret_value_from_json("password")
+            )
+
+        # k-NNプラグインはOpenSearch Serviceで常に有効（インデックス作成時にDifyが index.knn を設定）
+        self.domain = opensearch.Domain(
+            self, "Domain",
+            version=opensearch.EngineVersion.OPENSEARCH_2_13,
+            vpc=vpc,
+            vpc_subnets=vpc_subnets,
+            security_groups=[self.security_group],
+            capacity=opensearch.CapacityConfig(
+                data_node_instance_type=config.opensearch_instance_type,
+                data_nodes=data_nodes,
+                multi_az_with_standby_enabled=False
+            ),
+            zone_awareness=opensearch.ZoneAwarenessConfig(
+                enabled=zone_awareness,
+                availability_zone_count=2 if zone_awareness else None
+            ),
+            ebs=opensearch.EbsOptions(
+                volume_size=config.opensearch_volume_size,
+                volume_type=ec2.EbsDeviceVolumeType.GP3
+            ),
+            encryption_at_rest=opensearch.EncryptionAtRestOptions(enabled=True),
+            node_to_node_encryption=True,
+            enforce_https=True,
+            fine_grained_access_control=fine_grained_access_control,
+            removal_policy=RemovalPolicy.RETAIN
+        )
+
+        # アクセスポリシー（基本認証ではファインアクセスコントロールで認可）
+        if self.auth_method == 'basic':
+            principal = iam.AnyPrincipal()
+        else:
+            principal = iam.ArnPrincipal(instance_role.role_arn)
+        self.domain.add_access_policies(
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                principals=[principal],
+                actions=["es:ESHttp*"],
+                resources=[f"{self.domain.domain_arn}/*"]
+            )
+        )
+        if self.auth_method == 'iam':
+            self.domain.grant_read_write(instance_role)
+
+        # タグの追加
+        Tags.of(self.domain).add("Name", f"{id}-opensearch")
+
+        # 出力の設定
+        CfnOutput(
+            self, "Endpoint",
+            value=self.domain.domain_endpoint,
+            description="Dify vector store endpoint"
+        )
+
+    def configure_dify(self, settings: DifyRuntimeSettings) -> None:
+        """
+        Difyのベクトルストアをこのドメインに設定する
+
+        Args:
+            settings: Dify実行時設定
+        """
+        settings.set_env(
+            VECTOR_STORE="opensearch",
+            OPENSEARCH_HOST=self.domain.domain_endpoint,
+            OPENSEARCH_PORT=443,
+            OPENSEARCH_SECURE="true",
+            OPENSEARCH_VERIFY_CERTS="true"
+        )
+
+        if self.auth_method == 'basic':
+            settings.set_env(OPENSEARCH_AUTH_METHOD="basic")
+            settings.set_secret_env("OPENSEARCH_USER", self.master_secret, "username")
+            settings.set_secret_env("OPENSEARCH_PASSWORD", self.master_secret, "password")
+        else:
+            settings.set_env(
+                OPENSEARCH_AUTH_METHOD="aws_managed_iam",
+                OPENSEARCH_AWS_REGION=Stack.of(self).region,
+                OPENSEARCH_AWS_SERVICE="es"
+            )
+
+        # コンテナのWeaviateを無効化
+        settings.disable_service("weaviate")
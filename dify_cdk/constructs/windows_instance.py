@@ -13,6 +13,16 @@ from aws_cdk import aws_iam as iam
 from aws_cdk import aws_ssm as ssm
 from aws_cdk import Tags, CfnOutput
 
+from dify_cdk.config.instance_types import hibernation_volume_size
+from dify_cdk.constructs.observability import windows_agent_commands
+
+
+# 休止状態でルートボリュームに必要な容量のうち、OSが使用する分（GB）
+HIBERNATION_USED_SIZE = 40
+
+# 休止状態に対応するメモリ量の上限（Windows、GiB）
+HIBERNATION_MAX_MEMORY = 16
+
 
 class WindowsInstanceConstruct(Construct):
     """Windows VMインスタンスを作成するコンストラクト"""
@@ -27,6 +37,7 @@ class WindowsInstanceConstruct(Construct):
         instance_type: str,
         ami_name_pattern: str,
         config,
+        hibernation: bool = False,
         **kwargs
     ):
         """
@@ -41,6 +52,7 @@ class WindowsInstanceConstruct(Construct):
             instance_type: インスタンスタイプ
             ami_name_pattern: AMI名のパターン
             config: 設定オブジェクト
+            hibernation: 休止状態を有効にするか（ルートボリュームはメモリ量に応じて拡張）
             **kwargs: その他の引数
         """
         super().__init__(scope, id)
@@ -58,6 +70,13 @@ class WindowsInstanceConstruct(Construct):
         # インスタンスタイプの設定
         instance_type_obj = ec2.InstanceType(instance_type)
         
+        # ルートボリュームのサイズ（休止状態ではメモリの内容を書き出す容量を追加）
+        volume_size = 50
+        if hibernation:
+            volume_size = hibernation_volume_size(
+                instance_type, volume_size, HIBERNATION_USED_SIZE, HIBERNATION_MAX_MEMORY
+            )
+        
         # Windows VMの作成
         self.instance = ec2.Instance(
             self, "Instance",
@@ -72,12 +91,13 @@ class WindowsInstanceConstruct(Construct):
             user_data=user_data,
             require_imdsv2=True,  # セキュリティ強化
             detailed_monitoring=False,  # コスト最適化
+            hibernation_enabled=hibernation or None,
             user_data_causes_replacement=True,
             block_devices=[
                 ec2.BlockDevice(
                     device_name="/dev/sda1",
                     volume=ec2.BlockDeviceVolume.ebs(
-                        volume_size=50,  # 50GB
+                        volume_size=volume_size,  # 既定は50GB
                         volume_type=ec2.EbsDeviceVolumeType.GP3,
                         encrypted=True
                     )
@@ -475,4 +495,8 @@ Write-Host "IMDSv2診断を実行するには: PowerShell -ExecutionPolicy Bypas
         # PowerShellスクリプトを追加
         user_data.add_commands(powershell_script)
         
+        # CloudWatch Agentのインストール（オプション）
+        if self.config.observability_enabled:
+            user_data.add_commands(windows_agent_commands())
+        
         return user_data
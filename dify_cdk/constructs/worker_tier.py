@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+
+"""
+ワーカー層コンストラクト
+
+このモジュールは、DifyのCeleryワーカーのみを実行するAuto Scaling Groupを定義します。
+Celeryキュー（Redis）の滞留数をCloudWatchに送信し、ワーカー1台あたりの滞留数でスケールします。
+"""
+
+from constructs import Construct
+from aws_cdk import aws_autoscaling as autoscaling
+from aws_cdk import aws_cloudwatch as cloudwatch
+from aws_cdk import aws_ec2 as ec2
+from aws_cdk import aws_iam as iam
+from aws_cdk import aws_ssm as ssm
+from aws_cdk import Duration, Stack, Tags, CfnOutput
+
+from dify_cdk.constructs.dify_runtime import DifyRuntimeSettings
+from dify_cdk.constructs.linux_auto_scaling import (
+    DRAIN_HOOK_NAME,
+    add_drain_commands,
+    spot_instances_policy,
+    validate_external_services,
+)
+from dify_cdk.constructs.linux_user_data import LinuxUserData, ubuntu_machine_image
+from dify_cdk.constructs.runtime_config import RUNTIME_CONFIG_TAG
+
+
+class WorkerTierConstruct(Construct):
+    """DifyのCeleryワーカー専用ホストをAuto Scaling Groupで作成するコンストラクト"""
+
+    # ワーカーホストで無効化するサービス（API・Web層）
+    DISABLED_SERVICES = ("api", "web", "nginx")
+
+    # Difyのワーカーが購読するCeleryキュー（バージョンにより存在しないキューは0件として扱う）
+    CELERY_QUEUES = (
+        "dataset", "generation", "mail", "ops_trace", "app_deletion",
+        "plugin", "workflow_storage", "conversation",
+    )
+
+    # CloudWatchメトリクスの名前空間とメトリクス名
+    METRIC_NAMESPACE = "Dify"
+    QUEUE_LENGTH_METRIC = "CeleryQueueLength"
+    BACKLOG_METRIC = "CeleryBacklogPerInstance"
+
+    def __init__(
+        self,
+        scope: Construct,
+        id: str,
+        vpc: ec2.Vpc,
+        security_group: ec2.SecurityGroup,
+        instance_role: iam.Role,
+        instance_type: str,
+        config,
+        dify_settings: DifyRuntimeSettings,
+        inner_api_url: str,
+        **kwargs
+    ):
+        """
+        コンストラクタ
+
+        Args:
+            scope: 親スコープ
+            id: コンストラクトID
+            vpc: VPCインスタンス
+            security_group: セキュリティグループ
+            instance_role: IAMロール
+            instance_type: インスタンスタイプ
+            config: 設定オブジェクト
+            dify_settings: ワーカーホスト用のDify実行時設定（API層とは別の複製）
+            inner_api_url: プラグインデーモンが接続するAPI/Web層の内部APIのURL
+            **kwargs: その他の引数
+        """
+        super().__init__(scope, id)
+
+        self.config = config
+        self.dify_settings = dify_settings
+
+        validate_external_services(config, "ワーカー層")
+
+        # ワーカー以外のアプリケーションサービスを無効化（sandbox・plugin_daemonはワーカーからも使用）
+        for service in self.DISABLED_SERVICES:
+            dify_settings.disable_service(service, dependents=())
+        # ワーカーホストにはapiがないため、プラグインデーモンの内部APIの接続先をAPI/Web層に向ける
+        dify_settings.set_env(PLUGIN_DIFY_INNER_API_URL=inner_api_url)
+        if config.worker_concurrency > 0:
+            dify_settings.set_env(
+                CELERY_AUTO_SCALE="false",
+                CELERY_WORKER_AMOUNT=config.worker_concurrency
+            )
+
+        # 起動時に読み取るシークレットへのアクセス権限を付与
+        for secret in dify_settings.secrets:
+            secret.grant_read(instance_role)
+
+        # キュー滞留数メトリクス送信のセットアップスクリプト（ユーザーデータの容量を抑えるため、起動時にVMが読み込む）
+        self.queue_metrics_parameter = ssm.StringParameter(
+            self, "QueueMetricsSetup",
+            parameter_name=f"/dify/{id}/queue-metrics-setup",
+            string_value=self._queue_metrics_setup_script(),
+            description="Celery queue metrics setup script for Dify worker hosts",
+            tier=ssm.ParameterTier.STANDARD,
+            simple_name=False
+        )
+
+        # ユーザーデータスクリプトの読み込み
+        user_data = LinuxUserData(config, dify_settings, host_id=id).build()
+        self._add_queue_metrics_commands(user_data)
+        if config.worker_spot_enabled:
+            add_drain_commands(user_data, [])
+
+        # 起動テンプレート（API層と同じ設定）
+        self.launch_template = ec2.LaunchTemplate(
+            self, "LaunchTemplate",
+            machine_image=ubuntu_machine_image(),
+            instance_type=ec2.InstanceType(instance_type),
+            security_group=security_group,
+            role=instance_role,
+            user_data=user_data,
+            http_tokens=ec2.LaunchTemplateHttpTokens.REQUIRED,  # セキュリティ強化（IMDSv2必須）
+            http_put_response_hop_limit=2,  # コンテナからIMDSv2（インスタンスロールの認証情報）を利用するため
+            instance_metadata_tags=True,  # メトリクス送信スクリプトでAuto Scaling Group名を取得するため
+            detailed_monitoring=True,
+            block_devices=[
+                ec2.BlockDevice(
+                    device_name="/dev/sda1",
+                    volume=ec2.BlockDeviceVolume.ebs(
+                        volume_size=100,  # 100GB
+                        volume_type=ec2.EbsDeviceVolumeType.GP3,
+                        encrypted=True
+                    )
+                )
+            ]
+        )
+
+        # スポットインスタンスの利用（同じコストでより多くのワーカーを実行）
+        mixed_instances_policy = None
+        if config.worker_spot_enabled:
+            instance_types = [instance_type] + [
+                other for other in config.worker_instance_types if other != instance_type
+            ]
+            mixed_instances_policy = spot_instances_policy(
+                self.launch_template,
+                instance_types,
+                config.worker_on_demand_base_capacity,
+                config.worker_on_demand_percentage
+            )
+
+        # 両AZのプライベートサブネットに分散（ALBには登録しない）
+        self.auto_scaling_group = autoscaling.AutoScalingGroup(
+            self, "AutoScalingGroup",
+            vpc=vpc,
+            launch_template=None if mixed_instances_policy else self.launch_template,
+            mixed_instances_policy=mixed_instances_policy,
+            capacity_rebalance=config.worker_spot_enabled or None,
+            vpc_subnets=ec2.SubnetSelection(
+                subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
+            ),
+            min_capacity=config.worker_min_capacity,
+            max_capacity=config.worker_max_capacity,
+            health_checks=autoscaling.HealthChecks.ec2(
+                grace_period=Duration.minutes(15)
+            ),
+            default_instance_warmup=Duration.minutes(10),
+            # ローリング更新の維持台数は最大台数未満（CloudFormationの制約）
+            update_policy=autoscaling.UpdatePolicy.rolling_update(
+                min_instances_in_service=min(config.worker_min_capacity, config.worker_max_capacity - 1),
+                pause_time=Duration.minutes(15)
+            ),
+            group_metrics=[autoscaling.GroupMetrics.all()]
+        )
+        self.auto_scaling_group.node.add_dependency(self.queue_metrics_parameter)
+
+        # メトリクス送信スクリプトがInService台数を取得するための権限
+        # （起動テンプレートとの循環参照を避けるため、ロールのデフォルトポリシーとは別に作成）
+        queue_metrics_policy = iam.Policy(
+            self, "QueueMetricsPolicy",
+            roles=[instance_role],
+            statements=[
+                iam.PolicyStatement(
+                    effect=iam.Effect.ALLOW,
+                    actions=["autoscaling:DescribeAutoScalingGroups"],
+                    resources=["*"]
+                )
+            ]
+        )
+
+        # 終了時のライフサイクルフック（実行中のCeleryタスクの完了を待つ）
+        if config.worker_spot_enabled:
+            self.auto_scaling_group.add_lifecycle_hook(
+                "DrainHook",
+                lifecycle_hook_name=DRAIN_HOOK_NAME,
+                lifecycle_transition=autoscaling.LifecycleTransition.INSTANCE_TERMINATING,
+                heartbeat_timeout=Duration.minutes(3),
+                default_result=autoscaling.DefaultResult.CONTINUE
+            )
+            queue_metrics_policy.add_statements(
+                iam.PolicyStatement(
+                    effect=iam.Effect.ALLOW,
+                    actions=["autoscaling:CompleteLifecycleAction"],
+                    resources=[self.auto_scaling_group.auto_scaling_group_arn]
+                )
+            )
+
+        # スケーリングポリシー（ワーカー1台あたりの滞留数のターゲット追跡）
+        self.auto_scaling_group.scale_to_track_metric(
+            "BacklogScaling",
+            metric=self.backlog_metric,
+            target_value=config.worker_target_backlog_per_instance
+        )
+
+        # タグの追加
+        Tags.of(self.auto_scaling_group).add("Name", f"{id}-instance")
+        Tags.of(self.auto_scaling_group).add(RUNTIME_CONFIG_TAG, Stack.of(self).stack_name)
+
+        # 出力の設定
+        CfnOutput(
+            self, "AutoScalingGroupName",
+            value=self.auto_scaling_group.auto_scaling_group_name,
+            description="Dify worker Auto Scaling Group name"
+        )
+
+    @property
+    def queue_length_metric(self) -> cloudwatch.Metric:
+        """Celeryキューの滞留タスク数（全キューの合計）"""
+        return self._metric(self.QUEUE_LENGTH_METRIC)
+
+    @property
+    def backlog_metric(self) -> cloudwatch.Metric:
+        """ワーカー1台あたりの滞留タスク数"""
+        return self._metric(self.BACKLOG_METRIC)
+
+    def _metric(self, metric_name: str) -> cloudwatch.Metric:
+        """
+        メトリクス送信スクリプトが送信するメトリクスを取得
+
+        各ワーカーホストが同じ値を送信するため、最大値で集計します。
+
+        Args:
+            metric_name: メトリクス名
+
+        Returns:
+            CloudWatchメトリクス
+        """
+        return cloudwatch.Metric(
+            namespace=self.METRIC_NAMESPACE,
+            metric_name=metric_name,
+            dimensions_map={
+                "AutoScalingGroupName": self.auto_scaling_group.auto_scaling_group_name
+            },
+            statistic=cloudwatch.Stats.MAXIMUM,
+            period=Duration.minutes(1)
+        )
+
+    def _add_queue_metrics_commands(self, user_data: ec2.UserData):
+        """
+        キュー滞留数メトリクス送信のセットアップをユーザーデータに追加する
+
+        Args:
+            user_data: ユーザーデータ
+        """
+        user_data.add_commands(f"""
+# キュー滞留数メトリクス送信の設定（セットアップスクリプトはSSMパラメータから取得）
+log "Configuring Celery queue metrics..."
+if ! command -v aws > /dev/null 2>&1; then
+    apt-get install -y awscli
+fi
+IMDS_TOKEN=$(curl -s -X PUT http://169.254.169.254/latest/api/token -H 'X-aws-ec2-metadata-token-ttl-seconds: 300')
+export AWS_DEFAULT_REGION=$(curl -s -H "X-aws-ec2-metadata-token: ${{IMDS_TOKEN}}" http://169.254.169.254/latest/meta-data/placement/region)
+aws ssm get-parameter --name "{self.queue_metrics_parameter.parameter_name}" --query Parameter.Value --output text | bash
+log "Celery queue metrics configured"
+""")
+
+    def _queue_metrics_setup_script(self) -> str:
+        """
+        Celeryキューの滞留数をCloudWatchに送信するスクリプトを設定するシェルスクリプト
+
+        redis-cliで各キューの長さを取得し、Auto Scaling GroupのInService台数で割った値を
+        1分ごとに送信します（systemdタイマーで実行）。
+
+        Returns:
+            シェルスクリプト文字列
+        """
+        queues = " ".join(self.CELERY_QUEUES)
+        return f"""#!/bin/bash
+# キュー滞留数メトリクス送信スクリプトの作成
+set -e
+apt-get install -y redis-tools
+
+cat > /usr/local/bin/dify-queue-metrics.sh << 'DIFY_QUEUE_METRICS_EOF'
+#!/bin/bash
+# Celeryキュー（Redis）の滞留数をCloudWatchに送信する
+ENV_FILE=/opt/dify/docker/.env
+env_value() {{
+    grep "^$1=" "$ENV_FILE" | tail -n 1 | cut -d= -f2-
+}}
+
+IMDS=http://169.254.169.254/latest
+TOKEN=$(curl -s -X PUT $IMDS/api/token -H 'X-aws-ec2-metadata-token-ttl-seconds: 300')
+imds() {{
+    curl -s -H "X-aws-ec2-metadata-token: ${{TOKEN}}" "$IMDS/meta-data/$1"
+}}
+ASG_NAME=$(imds tags/instance/aws:autoscaling:groupName)
+export AWS_DEFAULT_REGION=$(imds placement/region)
+
+# Celeryブローカー（REDIS_HOSTのDB 1）への接続
+REDIS_ARGS="-h $(env_value REDIS_HOST) -p $(env_value REDIS_PORT) -n 1"
+if [ "$(env_value REDIS_USE_SSL)" = "true" ]; then
+    REDIS_ARGS="$REDIS_ARGS --tls --cacert /etc/ssl/certs/ca-certificates.crt"
+fi
+export REDISCLI_AUTH=$(env_value REDIS_PASSWORD)
+
+TOTAL=0
+for queue in {queues}; do
+    length=$(redis-cli $REDIS_ARGS LLEN "$queue" 2> /dev/null)
+    case "$length" in
+        ''|*[!0-9]*) length=0 ;;
+    esac
+    TOTAL=$((TOTAL + length))
+done
+
+IN_SERVICE=$(aws autoscaling describe-auto-scaling-groups \\
+    --auto-scaling-group-names "$ASG_NAME" \\
+    --query "length(AutoScalingGroups[0].Instances[?LifecycleState=='InService'])" \\
+    --output text)
+case "$IN_SERVICE" in
+    ''|*[!0-9]*|0) IN_SERVICE=1 ;;
+esac
+BACKLOG=$(awk "BEGIN {{ printf \\"%.2f\\", $TOTAL / $IN_SERVICE }}")
+
+aws cloudwatch put-metric-data --namespace {self.METRIC_NAMESPACE} \\
+    --metric-name {self.QUEUE_LENGTH_METRIC} --unit Count --value "$TOTAL" \\
+    --dimensions "AutoScalingGroupName=$ASG_NAME"
+aws cloudwatch put-metric-data --namespace {self.METRIC_NAMESPACE} \\
+    --metric-name {self.BACKLOG_METRIC} --unit Count --value "$BACKLOG" \\
+    --dimensions "AutoScalingGroupName=$ASG_NAME"
+DIFY_QUEUE_METRICS_EOF
+chmod +x /usr/local/bin/dify-queue-metrics.sh
+
+cat > /etc/systemd/system/dify-queue-metrics.service << 'DIFY_QUEUE_METRICS_EOF'
+[Unit]
+Description=Publish Dify Celery queue length to CloudWatch
+After=docker.service network-online.target
+Wants=network-online.target
+
+[Service]
+Type=oneshot
+ExecStart=/usr/local/bin/dify-queue-metrics.sh
+DIFY_QUEUE_METRICS_EOF
+
+cat > /etc/systemd/system/dify-queue-metrics.timer << 'DIFY_QUEUE_METRICS_EOF'
+[Unit]
+Description=Publish Dify Celery queue length every minute
+
+[Timer]
+OnBootSec=1min
+OnUnitActiveSec=1min
+AccuracySec=5s
+
+[Install]
+WantedBy=timers.target
+DIFY_QUEUE_METRICS_EOF
+systemctl daemon-reload
+systemctl enable --now dify-queue-metrics.timer
+"""
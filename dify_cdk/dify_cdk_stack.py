@@ -8,12 +8,34 @@ Dify CDKスタック
 
 from constructs import Construct
 from aws_cdk import Stack
+from aws_cdk import aws_ec2 as ec2
+from aws_cdk import aws_elasticloadbalancingv2 as elbv2
 
 from dify_cdk.config.config import Config
 from dify_cdk.constructs.network import NetworkConstruct
 from dify_cdk.constructs.security import SecurityConstruct
 from dify_cdk.constructs.windows_instance import WindowsInstanceConstruct
 from dify_cdk.constructs.linux_instance import LinuxInstanceConstruct
+from dify_cdk.constructs.linux_auto_scaling import LinuxAutoScalingConstruct, validate_external_services
+from dify_cdk.constructs.linux_roles import LinuxRolesConstruct
+from dify_cdk.constructs.database import DatabaseConstruct
+from dify_cdk.constructs.cache import CacheConstruct
+from dify_cdk.constructs.storage import StorageConstruct
+from dify_cdk.constructs.vector_store import VectorStoreConstruct
+from dify_cdk.constructs.load_balancer import LoadBalancerConstruct
+from dify_cdk.constructs.worker_tier import WorkerTierConstruct
+from dify_cdk.constructs.ecs_services import EcsServicesConstruct
+from dify_cdk.constructs.observability import ObservabilityConstruct
+from dify_cdk.constructs.log_shipping import LogShippingConstruct
+from dify_cdk.constructs.tracing import TracingConstruct
+from dify_cdk.constructs.llm_gateway import LlmGatewayConstruct
+from dify_cdk.constructs.local_inference import LocalInferenceConstruct
+from dify_cdk.constructs.load_generator import LoadGeneratorConstruct
+from dify_cdk.constructs.ingestion import IngestionConstruct
+from dify_cdk.constructs.power_schedule import PowerScheduleConstruct
+from dify_cdk.constructs.runtime_config import RuntimeConfigConstruct
+from dify_cdk.constructs.snapshot_lifecycle import SnapshotLifecycleConstruct
+from dify_cdk.constructs.dify_runtime import DifyRuntimeSettings
 
 
 class DifyCdkStack(Stack):
@@ -45,6 +67,162 @@ class DifyCdkStack(Stack):
             vpc=network.vpc
         )
         
+        # Difyの実行時設定（マネージドサービス利用時に.env等を上書き）
+        dify_settings = DifyRuntimeSettings()
+        
+        # Difyコンテナが使用するIAMロール（ECS構成ではタスクロール）
+        ecs_mode = config.linux_deployment_mode == 'ecs'
+        app_role = security.create_task_role() if ecs_mode else security.instance_role
+        
+        # マネージドデータベースの作成（オプション）
+        if config.database_mode != 'container':
+            database = DatabaseConstruct(
+                self, "Database",
+                vpc=network.vpc,
+                app_security_group=security.linux_sg,
+                config=config
+            )
+            database.configure_dify(dify_settings)
+        
+        # マネージドキャッシュの作成（オプション）
+        if config.cache_mode != 'container':
+            cache = CacheConstruct(
+                self, "Cache",
+                vpc=network.vpc,
+                app_security_group=security.linux_sg,
+                config=config
+            )
+            cache.configure_dify(dify_settings)
+        
+        # S3ストレージの作成（オプション）
+        if config.storage_mode == 's3':
+            network.add_s3_gateway_endpoint()
+            storage = StorageConstruct(
+                self, "Storage",
+                instance_role=app_role
+            )
+            storage.configure_dify(dify_settings)
+        
+        # マネージドベクトルストアの作成（オプション）
+        if config.vector_store_mode == 'opensearch':
+            vector_store = VectorStoreConstruct(
+                self, "VectorStore",
+                vpc=network.vpc,
+                app_security_group=security.linux_sg,
+                instance_role=app_role,
+                config=config
+            )
+            vector_store.configure_dify(dify_settings)
+        
+        # 内部ALBの作成（オプション）
+        load_balancer = None
+        if config.load_balancer_enabled:
+            load_balancer = LoadBalancerConstruct(
+                self, "LoadBalancer",
+                vpc=network.vpc,
+                app_security_group=security.linux_sg,
+                client_security_group=security.windows_sg,
+                config=config,
+                target_type=elbv2.TargetType.IP if ecs_mode else elbv2.TargetType.INSTANCE
+            )
+            load_balancer.configure_dify(dify_settings)
+        
+        # Linux VMの起動前に作成が必要なリソース（VMが起動時に読み込むSSMパラメータ等）
+        host_dependencies = []
+        
+        # コンテナログのCloudWatch Logsへの転送（オプション）
+        log_shipping = None
+        if config.log_shipping_enabled:
+            if ecs_mode:
+                raise ValueError("ECS構成ではコンテナのログは既にCloudWatch Logsに出力されます（LOG_SHIPPING_ENABLEDは使用できません）")
+            log_shipping = LogShippingConstruct(
+                self, "LogShipping",
+                config=config
+            )
+            log_shipping.configure_dify(dify_settings)
+            host_dependencies.append(log_shipping)
+        
+        # OpenTelemetryによるトレース（オプション）
+        if config.tracing_enabled:
+            if ecs_mode:
+                raise ValueError("ECS構成ではOpenTelemetry Collectorを使用できません（TRACING_ENABLEDはLinux VM構成で使用してください）")
+            if config.tracing_exporter == 'xray':
+                network.add_interface_endpoint("XRayEndpoint", ec2.InterfaceVpcEndpointAwsService.XRAY)
+            tracing = TracingConstruct(
+                self, "Tracing",
+                instance_role=security.instance_role,
+                config=config
+            )
+            tracing.configure_dify(dify_settings)
+            host_dependencies.append(tracing)
+        
+        # 埋め込み・リランクのローカル推論（オプション、モデルはS3ストレージにもキャッシュ）
+        if config.local_inference_enabled:
+            if ecs_mode:
+                raise ValueError("ECS構成ではローカル推論を使用できません（LOCAL_INFERENCE_ENABLEDはLinux VM構成で使用してください）")
+            local_inference = LocalInferenceConstruct(
+                self, "LocalInference",
+                config=config,
+                model_cache_bucket=storage.bucket if config.storage_mode == 's3' else None
+            )
+            local_inference.configure_dify(dify_settings)
+        
+        # LLMゲートウェイ（オプション、応答キャッシュ・接続の再利用・同時リクエスト数の制限）
+        llm_gateway = None
+        if config.llm_gateway_enabled:
+            if ecs_mode:
+                raise ValueError("ECS構成ではLLMゲートウェイを使用できません（LLM_GATEWAY_ENABLEDはLinux VM構成で使用してください）")
+            llm_gateway = LlmGatewayConstruct(
+                self, "LlmGateway",
+                instance_role=security.instance_role,
+                config=config
+            )
+            if llm_gateway.uses_bedrock:
+                network.add_interface_endpoint("BedrockRuntimeEndpoint", ec2.InterfaceVpcEndpointAwsService.BEDROCK_RUNTIME)
+            llm_gateway.configure_dify(dify_settings)
+            host_dependencies.append(llm_gateway)
+        
+        # 複数ホスト構成（Blue/Green切り替えの新旧インスタンスを含む）ではSECRET_KEYを全ホストで共有
+        if config.linux_deployment_mode != 'instance' or config.worker_tier_enabled or config.blue_green_enabled:
+            secret_key = security.create_dify_secret_key()
+            dify_settings.set_secret_env("SECRET_KEY", secret_key, "secret_key")
+        
+        # .envの値とユーザーパスワードをSSMパラメータストアで管理（変更時はインスタンスを置き換えずに再適用）
+        if not ecs_mode:
+            runtime_config = RuntimeConfigConstruct(
+                self, "RuntimeConfig",
+                dify_settings=dify_settings,
+                config=config
+            )
+            host_dependencies.append(runtime_config)
+        
+        # ワーカー層を分離する場合は、API/Web層のホストでワーカーを実行しない
+        worker_settings = None
+        if config.worker_tier_enabled:
+            worker_settings = dify_settings.copy()
+            dify_settings.disable_service("worker", dependents=())
+            
+            # ワーカー層のプラグインデーモンからAPI/Web層のapi（内部API）へ接続できるようにポートを公開
+            inner_api_port = LoadBalancerConstruct.INNER_API_PORT
+            dify_settings.override_service("api", ports=[f"{inner_api_port}:{inner_api_port}"])
+            if load_balancer:
+                load_balancer.add_inner_api_listener(network.vpc, security.linux_sg)
+        
+        # ダッシュボードとアラームの作成（オプション）
+        observability = None
+        if config.observability_enabled:
+            observability = ObservabilityConstruct(
+                self, "Observability",
+                config=config
+            )
+            if load_balancer:
+                observability.add_load_balancer(load_balancer)
+            if log_shipping:
+                observability.add_graph("Nginx 5xx / slow requests", log_shipping.metrics)
+            if llm_gateway:
+                observability.add_graph("LLM gateway cache hit rate / failures", llm_gateway.metrics)
+                observability.add_graph("LLM gateway latency (ms)", llm_gateway.latency_metrics)
+        
         # Windows VMの作成
         windows_instance = WindowsInstanceConstruct(
             self, "WindowsVM",
@@ -53,16 +231,201 @@ class DifyCdkStack(Stack):
             instance_role=security.instance_role,
             instance_type=config.windows_instance_type,
             ami_name_pattern=config.windows_ami_name,
-            config=config
+            config=config,
+            hibernation=config.hibernation_enabled
         )
+        scheduled_instances = [windows_instance.instance]
+        if observability:
+            observability.add_windows_instance("WindowsVM", windows_instance.instance, config.windows_instance_type)
         
-        # Linux VMの作成
-        linux_instance = LinuxInstanceConstruct(
-            self, "LinuxVM",
-            vpc=network.vpc,
-            security_group=security.linux_sg,
-            instance_role=security.instance_role,
-            instance_type=config.linux_instance_type,
-            ami_name_pattern=config.linux_ami_name,
-            config=config
-        )
+        # Blue/Green切り替え（単一インスタンス構成のみ、状態は外部サービスに保持）
+        if config.blue_green_enabled:
+            if config.linux_deployment_mode != 'instance':
+                raise ValueError("Blue/Green切り替えは単一インスタンス構成でのみ使用できます（Auto Scaling・ECS構成はローリング更新を使用します）")
+            validate_external_services(config, "Blue/Green切り替え")
+        
+        # データ用ボリュームのスナップショット（オプション、状態をVM上に保持する構成のみ）
+        snapshot_lifecycle = None
+        if config.data_volume_enabled:
+            if config.linux_deployment_mode not in ('instance', 'split'):
+                raise ValueError("スナップショットは単一インスタンス・ロール分割構成でのみ使用できます（Auto Scaling・ECS構成の状態はマネージドサービスのバックアップを使用してください）")
+            if config.blue_green_enabled:
+                raise ValueError("Blue/Green切り替えでは状態を外部サービスに保持するため、スナップショットは使用できません")
+        if config.snapshot_enabled:
+            snapshot_lifecycle = SnapshotLifecycleConstruct(
+                self, "SnapshotLifecycle",
+                availability_zones=network.vpc.select_subnets(
+                    subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
+                ).availability_zones,
+                config=config
+            )
+        
+        # Linux VMの作成（ALBを使用しない場合の負荷試験の対象はWeb/APIのホスト）
+        app_instance = None
+        app_dns_name = None
+        if ecs_mode:
+            # ECS Fargate構成（内部ALBが必須、Celeryワーカーもサービスとしてスケール）
+            if not load_balancer:
+                raise ValueError("ECS構成には内部ALBが必要です（LOAD_BALANCER_ENABLED=true）")
+            if config.worker_tier_enabled:
+                raise ValueError("ECS構成ではワーカー層は使用できません（workerはECSサービスとしてスケールします）")
+            ecs_services = EcsServicesConstruct(
+                self, "EcsServices",
+                vpc=network.vpc,
+                security_group=security.linux_sg,
+                task_role=app_role,
+                load_balancer=load_balancer,
+                config=config,
+                dify_settings=dify_settings
+            )
+            if observability:
+                observability.add_ecs_services(ecs_services.services)
+        elif config.linux_deployment_mode == 'split':
+            # ロール分割構成（Web/API・ワーカー・サンドボックス・データノード）
+            if config.worker_tier_enabled:
+                raise ValueError("ロール分割構成ではワーカー層は使用できません（ワーカーロールのホストを使用します）")
+            linux_roles = LinuxRolesConstruct(
+                self, "LinuxRoles",
+                vpc=network.vpc,
+                security=security,
+                config=config,
+                dify_settings=dify_settings
+            )
+            
+            # Web/APIロールをALBのターゲットに登録
+            app_instance = linux_roles.app_instance
+            if load_balancer:
+                load_balancer.add_instance_target(app_instance)
+            # 実行時設定（SSMパラメータ）はロールのシークレットを参照するため、依存はインスタンスのみに追加
+            for role_instance in linux_roles.instances.values():
+                role_instance.instance.node.add_dependency(*host_dependencies)
+            scheduled_instances.extend(role_instance.instance for role_instance in linux_roles.instances.values())
+            if snapshot_lifecycle and "data" in linux_roles.instances:
+                snapshot_lifecycle.add_instance(linux_roles.instances["data"].instance)
+            if observability:
+                for role, role_instance in linux_roles.instances.items():
+                    observability.add_linux_instance(
+                        f"Linux{role.title()}", role_instance.instance, config.get_linux_role(role, "instance-type")
+                    )
+        elif config.linux_deployment_mode == 'asg':
+            # Auto Scaling Group構成（内部ALBが必須）
+            if not load_balancer:
+                raise ValueError("Auto Scaling構成には内部ALBが必要です（LOAD_BALANCER_ENABLED=true）")
+            linux_hosts = LinuxAutoScalingConstruct(
+                self, "LinuxASG",
+                vpc=network.vpc,
+                security_group=security.linux_sg,
+                instance_role=security.instance_role,
+                instance_type=config.linux_instance_type,
+                load_balancer=load_balancer,
+                config=config,
+                dify_settings=dify_settings
+            )
+            linux_hosts.node.add_dependency(*host_dependencies)
+            if observability:
+                observability.add_auto_scaling_group("LinuxASG", linux_hosts.auto_scaling_group, config.linux_instance_type)
+        else:
+            linux_instance = LinuxInstanceConstruct(
+                self, "LinuxVM",
+                vpc=network.vpc,
+                security_group=security.linux_sg,
+                instance_role=security.instance_role,
+                instance_type=config.linux_instance_type,
+                ami_name_pattern=config.linux_ami_name,
+                config=config,
+                dify_settings=dify_settings,
+                blue_green=config.blue_green_enabled,
+                data_volume_size=config.snapshot_data_volume_size if config.data_volume_enabled else None,
+                data_volume_snapshot_id=config.snapshot_restore_id or None,
+                hibernation=config.hibernation_enabled
+            )
+            scheduled_instances.append(linux_instance.instance)
+            
+            # Linux VMをALBのターゲットに登録（ALBを使用しない場合のBlue/GreenはDNSレコードで切り替え、
+            # ワーカー層はDNSレコードで接続（IPアドレスは共有の実行時設定に含められないため））
+            app_instance = linux_instance.instance
+            if load_balancer:
+                load_balancer.add_instance_target(app_instance)
+            elif config.blue_green_enabled or config.worker_tier_enabled:
+                app_dns_name = linux_instance.add_private_dns_record(network.vpc, config.blue_green_dns_name)
+            linux_instance.node.add_dependency(*host_dependencies)
+            if snapshot_lifecycle:
+                snapshot_lifecycle.add_instance(linux_instance.instance)
+            if observability:
+                observability.add_linux_instance("LinuxVM", linux_instance.instance, config.linux_instance_type)
+        
+        # Celeryワーカー層の作成（オプション）
+        worker_tier = None
+        if config.worker_tier_enabled:
+            if load_balancer:
+                inner_api_url = load_balancer.inner_api_url
+            else:
+                # 実行時設定（SSMパラメータ）はLinux VMより先に作成するため、インスタンスの属性は参照しない
+                inner_api_url = f"http://{app_dns_name}:{inner_api_port}"
+                security.linux_sg.add_ingress_rule(
+                    security.linux_sg,
+                    ec2.Port.tcp(inner_api_port),
+                    "Allow Dify inner API from worker tier"
+                )
+            worker_tier = WorkerTierConstruct(
+                self, "WorkerTier",
+                vpc=network.vpc,
+                security_group=security.linux_sg,
+                instance_role=security.instance_role,
+                instance_type=config.worker_instance_type,
+                config=config,
+                dify_settings=worker_settings,
+                inner_api_url=inner_api_url
+            )
+            worker_tier.node.add_dependency(*host_dependencies)
+            if observability:
+                observability.add_auto_scaling_group("WorkerTier", worker_tier.auto_scaling_group, config.worker_instance_type)
+                observability.add_graph("Celery queue", [worker_tier.queue_length_metric, worker_tier.backlog_metric])
+        
+        # ナレッジへの一括登録（オプション、ワーカー層のキュー滞留数が多い間は登録を後回しにする）
+        if config.ingestion_enabled:
+            ingestion = IngestionConstruct(
+                self, "Ingestion",
+                vpc=network.vpc,
+                api_url=load_balancer.url if load_balancer else f"http://{app_dns_name or app_instance.instance_private_ip}",
+                config=config,
+                verify_tls=bool(load_balancer and config.load_balancer_domain_name),
+                queue_metric=worker_tier.queue_length_metric if worker_tier else None
+            )
+            if not load_balancer:
+                security.linux_sg.add_ingress_rule(
+                    ingestion.security_group,
+                    ec2.Port.tcp(80),
+                    "Allow HTTP from bulk ingestion function"
+                )
+            if observability:
+                observability.add_graph("Bulk ingestion queue / dead-letter queue", ingestion.metrics)
+        
+        # 負荷生成VMの作成（オプション）
+        if config.load_generator_enabled:
+            if load_balancer:
+                target_url = load_balancer.url
+            else:
+                target_url = f"http://{app_dns_name or app_instance.instance_private_ip}"
+            load_generator = LoadGeneratorConstruct(
+                self, "LoadGenerator",
+                vpc=network.vpc,
+                target_url=target_url,
+                config=config
+            )
+            
+            # ALBを使用しない場合はLinux VM（nginx）への接続を許可
+            if not load_balancer:
+                security.linux_sg.add_ingress_rule(
+                    load_generator.security_group,
+                    ec2.Port.tcp(80),
+                    "Allow HTTP from load generator"
+                )
+        
+        # 時間帯による停止（休止状態）・起動（オプション、Auto Scaling・ECS構成のLinuxホストは対象外）
+        if config.power_schedule_enabled:
+            PowerScheduleConstruct(
+                self, "PowerSchedule",
+                instances=scheduled_instances,
+                config=config
+            )
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+
+"""
+Difyナレッジへの一括登録パッケージ
+
+このパッケージは、S3のバケットに配置したファイルをDifyのナレッジ（データセット）APIで
+登録する処理を提供します。Lambda関数（handler.handler）としてS3のイベント通知（SQS経由）から
+実行するほか、ローカルのファイルをスタブのDify APIに登録して動作を確認できます。
+
+オブジェクトキーの先頭のプレフィックスを登録先のデータセットIDとして使用します。
+    s3://<バケット>/<データセットID>/manuals/setup.pdf -> ドキュメント名「manuals/setup.pdf」
+
+使用例:
+    python -m ingestion stub-dify --port 8001 --error-rate 0.2
+    python -m ingestion upload --api-url http://localhost:8001 --api-key dataset-xxx \\
+        --dataset-id 00000000-0000-0000-0000-000000000000 docs/
+"""
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""
+一括登録のコマンドラインインターフェース
+
+サブコマンド:
+    upload: ローカルのファイルをDify（またはスタブ）のナレッジに登録する（Lambdaと同じ処理）
+    stub-dify: スタブのDifyナレッジAPIサーバーを起動する
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+from ingestion import stub_dify
+from ingestion.dify_client import DifyDatasetClient
+from ingestion.pipeline import Document, IngestionSettings, Ingestor
+
+
+def upload(args: argparse.Namespace) -> int:
+    """
+    ローカルのファイルをナレッジに登録する
+
+    ディレクトリを指定した場合は、配下のファイルをディレクトリからの相対パスを
+    ドキュメント名として登録します（S3のキーのデータセットID以降と同じ）。
+
+    Args:
+        args: コマンドライン引数
+
+    Returns:
+        終了コード（失敗したドキュメントがある場合は1）
+    """
+    documents = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for file_name in sorted(files):
+                    file_path = os.path.join(root, file_name)
+                    name = os.path.relpath(file_path, path).replace(os.sep, "/")
+                    documents.append(Document(dataset_id=args.dataset_id, name=name, source=file_path))
+        else:
+            documents.append(Document(dataset_id=args.dataset_id, name=os.path.basename(path), source=path))
+
+    def read_content(path: str) -> bytes:
+        with open(path, "rb") as file:
+            return file.read()
+
+    client = DifyDatasetClient(args.api_url, args.api_key, verify_tls=not args.insecure)
+    settings = IngestionSettings(concurrency=args.concurrency, indexing_technique=args.indexing_technique)
+    result = Ingestor(client, read_content, settings).ingest(documents)
+
+    print(f"{len(documents)} documents: {result.created} created, {result.skipped} skipped, "
+          f"{len(result.failures)} failed")
+    for index, failure in result.failures.items():
+        print(f"  {documents[index].name}: {failure}")
+    return 1 if result.failures else 0
+
+
+def main() -> int:
+    """
+    エントリーポイント
+
+    Returns:
+        終了コード
+    """
+    parser = argparse.ArgumentParser(prog="python -m ingestion", description="Difyナレッジへの一括登録")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    upload_parser = subparsers.add_parser("upload", help="ローカルのファイルをナレッジに登録する")
+    upload_parser.add_argument("paths", nargs="+", help="登録するファイルまたはディレクトリ")
+    upload_parser.add_argument("--api-url", required=True, help="DifyのベースURL")
+    upload_parser.add_argument("--api-key", required=True, help="ナレッジのAPIキー")
+    upload_parser.add_argument("--dataset-id", required=True, help="登録先のデータセットID")
+    upload_parser.add_argument("--concurrency", type=int, default=4, help="並行して登録するドキュメント数")
+    upload_parser.add_argument("--indexing-technique", default="high_quality", help="インデックスの作成方法")
+    upload_parser.add_argument("--insecure", action="store_true", help="TLS証明書を検証しない")
+    upload_parser.set_defaults(func=upload)
+
+    stub_parser = subparsers.add_parser("stub-dify", help="スタブのDifyナレッジAPIサーバーを起動する")
+    stub_dify.add_arguments(stub_parser)
+    stub_parser.set_defaults(func=lambda args: stub_dify.serve(
+        args.host, args.port, args.api_key, args.latency_ms, args.error_rate
+    ) or 0)
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(message)s")
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+"""
+DifyナレッジAPIクライアント
+
+このモジュールは、Difyのナレッジ（データセット）APIのうち、ドキュメントの検索とファイルからの
+ドキュメント作成を呼び出すクライアントを提供します。Lambdaのランタイムに追加のパッケージを
+含めないよう、標準ライブラリ（urllib）のみを使用します。
+
+レート制限（429）・サーバーエラー（5xx）・接続エラーは、指数バックオフ（ジッター付き）で
+再試行します。Retry-Afterヘッダーがある場合はその秒数を待ちます。期限（Lambdaの残り実行時間）を
+設定した場合は、リクエストのタイムアウトと再試行を期限内に収めます。
+"""
+
+import json
+import random
+import ssl
+import time
+import uuid
+from typing import Any, Dict, Optional
+from urllib import error, parse, request
+
+
+# 再試行するHTTPステータス
+RETRYABLE_STATUSES = (408, 429, 500, 502, 503, 504)
+
+
+class DifyApiError(Exception):
+    """Dify APIの呼び出しの失敗"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        """
+        コンストラクタ
+
+        Args:
+            message: エラーメッセージ
+            status: HTTPステータス（接続エラーの場合はNone）
+        """
+        super().__init__(message)
+        self.status = status
+
+    @property
+    def retryable(self) -> bool:
+        """再試行で成功する可能性があるか"""
+        return self.status is None or self.status in RETRYABLE_STATUSES
+
+
+class DifyDatasetClient:
+    """DifyのナレッジAPIを呼び出すクライアント"""
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        timeout: float = 60,
+        max_attempts: int = 4,
+        backoff: float = 1.0,
+        max_backoff: float = 30.0,
+        verify_tls: bool = True
+    ):
+        """
+        コンストラクタ
+
+        Args:
+            base_url: DifyのベースURL（/v1は含めない）
+            api_key: ナレッジのAPIキー（dataset-で始まる値）
+            timeout: リクエストのタイムアウト（秒）
+            max_attempts: 最大試行回数
+            backoff: 再試行の待ち時間の基準（秒、試行ごとに倍増）
+            max_backoff: 再試行の待ち時間の上限（秒）
+            verify_tls: TLS証明書を検証するか
+        """
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.ssl_context = None if verify_tls else ssl._create_unverified_context()
+        self.deadline: Optional[float] = None
+
+    def set_deadline(self, seconds: Optional[float]):
+        """
+        APIの呼び出しを打ち切る期限を設定する
+
+        Args:
+            seconds: 現在からの秒数（Noneの場合は期限なし）
+        """
+        self.deadline = None if seconds is None else time.monotonic() + seconds
+
+    def _remaining(self) -> Optional[float]:
+        """期限までの秒数（期限なしの場合はNone）"""
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def find_document(self, dataset_id: str, name: str) -> Optional[Dict[str, Any]]:
+        """
+        名前が一致するドキュメントを検索する（再配信されたファイルを重複して登録しないため）
+
+        Args:
+            dataset_id: データセットID
+            name: ドキュメント名
+
+        Returns:
+            ドキュメント（存在しない場合はNone）
+        """
+        query = parse.urlencode({"keyword": name, "page": 1, "limit": 100})
+        result = self._request("GET", f"/v1/datasets/{dataset_id}/documents?{query}")
+        for document in result.get("data", []):
+            if document.get("name") == name:
+                return document
+        return None
+
+    def create_document_by_file(
+        self, dataset_id: str, name: str, content: bytes, data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        ファイルからドキュメントを作成する（インデックスの作成はCeleryワーカーで非同期に実行）
+
+        Args:
+            dataset_id: データセットID
+            name: ドキュメント名（ファイル名）
+            content: ファイルの内容
+            data: 作成の設定（indexing_technique・process_rule等）
+
+        Returns:
+            APIの応答（document・batch）
+        """
+        boundary = uuid.uuid4().hex
+        file_name = name.replace('"', "_")
+        body = b"".join([
+            f"--{boundary}\r\n".encode(),
+            b'Content-Disposition: form-data; name="data"\r\n',
+            b"Content-Type: text/plain\r\n\r\n",
+            json.dumps(data).encode(), b"\r\n",
+            f"--{boundary}\r\n".encode(),
+            f'Content-Disposition: form-data; name="file"; filename="{file_name}"\r\n'.encode(),
+            b"Content-Type: application/octet-stream\r\n\r\n",
+            content, b"\r\n",
+            f"--{boundary}--\r\n".encode(),
+        ])
+        return self._request(
+            "POST", f"/v1/datasets/{dataset_id}/document/create-by-file",
+            body=body, content_type=f"multipart/form-data; boundary={boundary}"
+        )
+
+    def _request(
+        self, method: str, path: str, body: Optional[bytes] = None, content_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        APIを呼び出す（再試行可能なエラーは指数バックオフで再試行）
+
+        Args:
+            method: HTTPメソッド
+            path: パス（/v1から始まる）
+            body: リクエスト本文
+            content_type: Content-Type
+
+        Returns:
+            応答（JSON）
+        """
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        if content_type:
+            headers["Content-Type"] = content_type
+
+        for attempt in range(1, self.max_attempts + 1):
+            # リクエストのタイムアウトは期限までの時間以内
+            remaining = self._remaining()
+            if remaining is not None and remaining <= 1:
+                raise DifyApiError(f"{method} {path} was not attempted: deadline exceeded")
+            timeout = self.timeout if remaining is None else min(self.timeout, remaining)
+
+            retry_after = None
+            try:
+                req = request.Request(f"{self.base_url}{path}", data=body, headers=headers, method=method)
+                with request.urlopen(req, timeout=timeout, context=self.ssl_context) as response:
+                    return json.loads(response.read() or b"{}")
+            except error.HTTPError as http_error:
+                detail = http_error.read().decode(errors="replace")[:500]
+                api_error = DifyApiError(f"{method} {path} failed with {http_error.code}: {detail}", http_error.code)
+                retry_after = http_error.headers.get("Retry-After")
+            except (error.URLError, TimeoutError, ConnectionError) as connection_error:
+                api_error = DifyApiError(f"{method} {path} failed: {connection_error}")
+
+            if not api_error.retryable or attempt == self.max_attempts:
+                raise api_error
+            if retry_after and retry_after.isdigit():
+                delay = min(float(retry_after), self.max_backoff)
+            else:
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+            # 待機後に期限が残らない場合は再試行しない（再配信に任せる）
+            remaining = self._remaining()
+            if remaining is not None and delay >= remaining - 1:
+                raise api_error
+            time.sleep(delay)
+
+        raise DifyApiError(f"{method} {path} failed")
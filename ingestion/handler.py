@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+"""
+一括登録のLambda関数
+
+このモジュールは、S3のイベント通知（SQS経由）を受け取り、作成されたオブジェクトをDifyのナレッジに
+登録するLambda関数のハンドラーを提供します。
+
+- SQSのメッセージをまとめて受け取り（バッチ）、1回の実行内で同時実行数を制限して登録
+- 失敗したメッセージのみを再配信の対象とする（部分的なバッチの失敗の応答）
+- Difyのワーカー（Celery）のキュー滞留数が上限を超えている場合は、登録せずにメッセージを
+  遅延付きで再送信して後回しにする（バックプレッシャー）。再送信したメッセージは受信回数が
+  リセットされるため、ワーカーの処理待ちでデッドレターキューに移動しない
+- Dify APIの呼び出しは、Lambdaの残り実行時間から応答に必要な時間を除いた期限内で打ち切る
+
+環境変数:
+    DIFY_API_URL: DifyのベースURL
+    DIFY_API_KEY_SECRET_ARN: ナレッジのAPIキー（api_keyフィールド）を格納したシークレット
+    DIFY_TLS_VERIFY: TLS証明書を検証するか（true / false）
+    QUEUE_URL: イベント通知のSQSキューのURL
+    UPLOAD_CONCURRENCY: 1回の実行で並行して登録するドキュメント数
+    INDEXING_TECHNIQUE: インデックスの作成方法
+    MAX_QUEUE_LENGTH: 登録を一時停止するワーカーのキュー滞留数（0の場合は確認しない）
+    QUEUE_METRIC_NAMESPACE / QUEUE_METRIC_NAME / QUEUE_METRIC_DIMENSIONS: キュー滞留数のメトリクス
+    DEFER_SECONDS: 後回しにしたメッセージを再配信するまでの時間（秒、最大900）
+    MAX_DEFER_COUNT: メッセージを後回しにする最大の回数（超えた場合は通常の失敗として再配信）
+"""
+
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import unquote_plus
+
+from ingestion.dify_client import DifyDatasetClient
+from ingestion.pipeline import Document, IngestionSettings, Ingestor
+
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# 実行環境の再利用時に使い回す一括登録の処理と、メッセージの再配信を遅らせる関数
+_ingestor: Optional[Ingestor] = None
+_defer = None
+
+# 後回しにした回数を格納するメッセージ属性
+DEFER_COUNT_ATTRIBUTE = "DeferCount"
+
+# 期限の算出で、Lambdaの残り実行時間から除く時間（部分的なバッチの失敗の応答に必要な時間）
+RESPONSE_MARGIN_SECONDS = 15
+
+
+def parse_message(body: str) -> List[Document]:
+    """
+    S3のイベント通知のメッセージから登録するドキュメントを取得する
+
+    Args:
+        body: SQSのメッセージ本文
+
+    Returns:
+        ドキュメントの一覧（テストイベント・フォルダー・データセットIDのないキーは除外）
+    """
+    event = json.loads(body)
+    documents = []
+    for record in event.get("Records", []):
+        if not record.get("eventName", "").startswith("ObjectCreated"):
+            continue
+        bucket = record["s3"]["bucket"]["name"]
+        key = unquote_plus(record["s3"]["object"]["key"])
+        dataset_id, _, name = key.partition("/")
+        if not name or key.endswith("/"):
+            logger.warning("Ignoring s3://%s/%s (expected <dataset-id>/<document name>)", bucket, key)
+            continue
+        documents.append(Document(dataset_id=dataset_id, name=name, source=(bucket, key)))
+    return documents
+
+
+def process_event(event: Dict[str, Any], ingestor: Ingestor, defer=None) -> Dict[str, Any]:
+    """
+    SQSのメッセージのバッチを処理する
+
+    Args:
+        event: Lambdaのイベント（SQS）
+        ingestor: 一括登録の処理
+        defer: メッセージ（SQSのレコードの一覧）を後回しにし、後回しにできなかったmessageIdを返す関数
+
+    Returns:
+        部分的なバッチの失敗の応答（batchItemFailures）
+    """
+    records = event.get("Records", [])
+    if ingestor.is_overloaded():
+        # 後回しにしたメッセージは成功として応答し、元のメッセージを削除させる
+        failed = defer(records) if defer else [record["messageId"] for record in records]
+        return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failed]}
+
+    documents: List[Document] = []
+    owners: List[str] = []
+    for record in records:
+        try:
+            message_documents = parse_message(record["body"])
+        except (ValueError, KeyError):
+            logger.exception("Ignoring malformed message %s", record["messageId"])
+            continue
+        documents.extend(message_documents)
+        owners.extend([record["messageId"]] * len(message_documents))
+
+    result = ingestor.ingest(documents)
+    failed = {owners[index] for index in result.failures}
+    logger.info(
+        "Processed %d messages: %d created, %d skipped, %d failed",
+        len(records), result.created, result.skipped, len(result.failures)
+    )
+    return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in sorted(failed)]}
+
+
+def _create_ingestor() -> Tuple[Ingestor, Any]:
+    """
+    Lambdaの環境変数からS3・CloudWatch・SQSを使用する一括登録の処理を作成する
+
+    Returns:
+        (一括登録の処理, メッセージの再配信を遅らせる関数)
+    """
+    # boto3はLambdaのランタイムに含まれる（ローカルの実行では不要）
+    import boto3
+
+    s3 = boto3.client("s3")
+    sqs = boto3.client("sqs")
+    cloudwatch = boto3.client("cloudwatch")
+    secret = boto3.client("secretsmanager").get_secret_value(SecretId=os.environ["DIFY_API_KEY_SECRET_ARN"])
+    api_key = json.loads(secret["SecretString"])["api_key"]
+
+    client = DifyDatasetClient(
+        os.environ["DIFY_API_URL"],
+        api_key,
+        verify_tls=os.environ.get("DIFY_TLS_VERIFY", "true") == "true"
+    )
+
+    def read_content(source: Tuple[str, str]) -> bytes:
+        bucket, key = source
+        return s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+
+    def queue_length() -> Optional[float]:
+        now = datetime.now(timezone.utc)
+        response = cloudwatch.get_metric_data(
+            MetricDataQueries=[{
+                "Id": "queue",
+                "MetricStat": {
+                    "Metric": {
+                        "Namespace": os.environ["QUEUE_METRIC_NAMESPACE"],
+                        "MetricName": os.environ["QUEUE_METRIC_NAME"],
+                        "Dimensions": json.loads(os.environ.get("QUEUE_METRIC_DIMENSIONS", "[]")),
+                    },
+                    "Period": 60,
+                    "Stat": "Maximum",
+                },
+            }],
+            StartTime=now - timedelta(minutes=5),
+            EndTime=now,
+            ScanBy="TimestampDescending"
+        )
+        values = response["MetricDataResults"][0]["Values"]
+        return values[0] if values else None
+
+    def defer(records: List[Dict[str, Any]]) -> List[str]:
+        # 可視性タイムアウトの延長では受信回数が増えるため、遅延付きで再送信する
+        failed = []
+        for index in range(0, len(records), 10):
+            batch = records[index:index + 10]
+            entries = []
+            for i, record in enumerate(batch):
+                attribute = record.get("messageAttributes", {}).get(DEFER_COUNT_ATTRIBUTE, {})
+                count = int(attribute.get("stringValue", 0)) + 1
+                if count > int(os.environ.get("MAX_DEFER_COUNT", 288)):
+                    failed.append(record["messageId"])
+                    continue
+                entries.append({
+                    "Id": str(i),
+                    "MessageBody": record["body"],
+                    "DelaySeconds": int(os.environ.get("DEFER_SECONDS", 300)),
+                    "MessageAttributes": {DEFER_COUNT_ATTRIBUTE: {"DataType": "Number", "StringValue": str(count)}},
+                })
+            if not entries:
+                continue
+            response = sqs.send_message_batch(QueueUrl=os.environ["QUEUE_URL"], Entries=entries)
+            failed.extend(batch[int(entry["Id"])]["messageId"] for entry in response.get("Failed", []))
+        return failed
+
+    settings = IngestionSettings(
+        concurrency=int(os.environ.get("UPLOAD_CONCURRENCY", 4)),
+        max_queue_length=int(os.environ.get("MAX_QUEUE_LENGTH", 0)),
+        indexing_technique=os.environ.get("INDEXING_TECHNIQUE", "high_quality")
+    )
+    has_metric = bool(os.environ.get("QUEUE_METRIC_NAME"))
+    return Ingestor(client, read_content, settings, queue_length if has_metric else None), defer
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Lambda関数のエントリーポイント
+
+    Args:
+        event: Lambdaのイベント（SQS）
+        context: Lambdaのコンテキスト
+
+    Returns:
+        部分的なバッチの失敗の応答
+    """
+    global _ingestor, _defer
+    if _ingestor is None:
+        _ingestor, _defer = _create_ingestor()
+    _ingestor.client.set_deadline(context.get_remaining_time_in_millis() / 1000 - RESPONSE_MARGIN_SECONDS)
+    return process_event(event, _ingestor, _defer)
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+"""
+一括登録の処理
+
+このモジュールは、登録するドキュメントの一覧を、同時実行数を制限してDifyのナレッジに登録する
+処理を提供します。Dify APIのクライアント・ファイルの読み込み・ワーカーのキュー滞留数の取得は
+引数で受け取るため、Lambda（S3・CloudWatch）とローカル（ファイル・スタブのDify API）で
+同じ処理を使用できます。
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from ingestion.dify_client import DifyApiError
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Document:
+    """登録するドキュメント"""
+
+    # 登録先のデータセットID
+    dataset_id: str
+
+    # ドキュメント名（データセット内で一意）
+    name: str
+
+    # 読み込み元（S3のオブジェクトキー・ローカルのパス等、read_contentに渡す値）
+    source: Any
+
+
+@dataclass
+class IngestionSettings:
+    """一括登録の設定"""
+
+    # 1回の実行で並行して登録するドキュメント数
+    concurrency: int = 4
+
+    # 登録を一時停止するワーカーのキュー滞留数（0の場合は確認しない）
+    max_queue_length: int = 0
+
+    # インデックスの作成方法（high_quality / economy）
+    indexing_technique: str = "high_quality"
+
+    # チャンク分割の設定
+    process_rule: Dict[str, Any] = field(default_factory=lambda: {"mode": "automatic"})
+
+
+@dataclass
+class IngestionResult:
+    """一括登録の結果"""
+
+    # 登録したドキュメント数
+    created: int = 0
+
+    # 登録済みのため省略したドキュメント数
+    skipped: int = 0
+
+    # 失敗したドキュメント（インデックス -> エラー）
+    failures: Dict[int, Exception] = field(default_factory=dict)
+
+
+class Ingestor:
+    """ドキュメントを同時実行数を制限してDifyのナレッジに登録するクラス"""
+
+    def __init__(
+        self,
+        client,
+        read_content: Callable[[Any], bytes],
+        settings: IngestionSettings,
+        queue_length: Optional[Callable[[], Optional[float]]] = None
+    ):
+        """
+        コンストラクタ
+
+        Args:
+            client: DifyのナレッジAPIクライアント（DifyDatasetClientと同じメソッドを持つオブジェクト）
+            read_content: ドキュメントの読み込み元から内容を読み込む関数
+            settings: 一括登録の設定
+            queue_length: ワーカーのキュー滞留数を取得する関数（不明な場合はNoneを返す）
+        """
+        self.client = client
+        self.read_content = read_content
+        self.settings = settings
+        self.queue_length = queue_length
+
+    def is_overloaded(self) -> bool:
+        """
+        ワーカーのキュー滞留数が上限を超えているか（超えている場合は登録を後回しにする）
+
+        Returns:
+            上限を超えている場合True
+        """
+        if not (self.queue_length and self.settings.max_queue_length):
+            return False
+        length = self.queue_length()
+        if length is not None and length > self.settings.max_queue_length:
+            logger.warning("Worker queue length %s exceeds %s, deferring ingestion", length, self.settings.max_queue_length)
+            return True
+        return False
+
+    def ingest(self, documents: List[Document]) -> IngestionResult:
+        """
+        ドキュメントを登録する
+
+        Args:
+            documents: 登録するドキュメント
+
+        Returns:
+            登録の結果
+        """
+        result = IngestionResult()
+        with ThreadPoolExecutor(max_workers=max(1, self.settings.concurrency)) as executor:
+            outcomes = list(executor.map(self._ingest_one, documents))
+        for index, outcome in enumerate(outcomes):
+            if isinstance(outcome, Exception):
+                result.failures[index] = outcome
+            elif outcome:
+                result.created += 1
+            else:
+                result.skipped += 1
+        return result
+
+    def _ingest_one(self, document: Document):
+        """
+        ドキュメントを1件登録する
+
+        Args:
+            document: 登録するドキュメント
+
+        Returns:
+            登録した場合True、登録済みの場合False、失敗した場合は例外
+        """
+        try:
+            if self.client.find_document(document.dataset_id, document.name):
+                logger.info("Skipping %s/%s (already exists)", document.dataset_id, document.name)
+                return False
+            response = self.client.create_document_by_file(
+                document.dataset_id,
+                document.name,
+                self.read_content(document.source),
+                {
+                    "indexing_technique": self.settings.indexing_technique,
+                    "process_rule": self.settings.process_rule,
+                }
+            )
+            logger.info("Created %s/%s (batch %s)", document.dataset_id, document.name, response.get("batch"))
+            return True
+        except DifyApiError as api_error:
+            logger.error("Failed to ingest %s/%s: %s", document.dataset_id, document.name, api_error)
+            return api_error
+        except Exception as read_error:  # 読み込みの失敗は他のドキュメントの登録を止めない
+            logger.exception("Failed to read %s", document.source)
+            return read_error
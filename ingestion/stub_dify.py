@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+"""
+スタブのDifyナレッジAPI
+
+このモジュールは、DifyのナレッジAPI（ドキュメントの一覧・ファイルからのドキュメント作成）を
+模したHTTPサーバーを提供します。登録したドキュメントはメモリ上に保持し、応答の遅延と
+一定の割合のレート制限（429）・サーバーエラー（503）を発生させて、一括登録の再試行と
+同時実行数の制限をDifyを起動せずに確認するために使用します。
+
+標準ライブラリのみを使用するため、単体のスクリプトとしても実行できます。
+    python stub_dify.py --port 8001 --latency-ms 200 --error-rate 0.2
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+from urllib.parse import parse_qs, urlparse
+
+
+DOCUMENTS_PATH = re.compile(r"^/v1/datasets/([^/]+)/documents$")
+CREATE_BY_FILE_PATH = re.compile(r"^/v1/datasets/([^/]+)/document/create-by-file$")
+
+
+class StubDifyHandler(BaseHTTPRequestHandler):
+    """DifyナレッジAPIのリクエストハンドラー"""
+
+    # サーバー起動時に設定する応答特性
+    api_key = ""
+    latency = 0.2
+    error_rate = 0.0
+
+    # 登録済みのドキュメント（データセットID -> ドキュメント一覧）と同時処理数の記録
+    documents: Dict[str, List[Dict[str, Any]]] = {}
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+
+    def log_message(self, format, *args):
+        """アクセスログを出力しない（登録結果のみを出力する）"""
+
+    def do_GET(self):
+        if not self._authorize():
+            return
+        url = urlparse(self.path)
+        match = DOCUMENTS_PATH.match(url.path)
+        if not match:
+            self._send_json({"message": "not found"}, status=404)
+            return
+        keyword = parse_qs(url.query).get("keyword", [""])[0]
+        with self.lock:
+            documents = [
+                document for document in self.documents.get(match.group(1), [])
+                if keyword in document["name"]
+            ]
+        self._send_json({"data": documents, "has_more": False, "limit": 100, "total": len(documents), "page": 1})
+
+    def do_POST(self):
+        if not self._authorize():
+            return
+        match = CREATE_BY_FILE_PATH.match(urlparse(self.path).path)
+        if not match:
+            self._send_json({"message": "not found"}, status=404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+
+        with self.lock:
+            StubDifyHandler.in_flight += 1
+            StubDifyHandler.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latency)
+            if random.random() < self.error_rate:
+                status = random.choice((429, 503))
+                self._send_json({"code": "too_many_requests", "message": "stub error"}, status=status,
+                                headers={"Retry-After": "1"} if status == 429 else None)
+                return
+            name = self._file_name(body)
+            document = {
+                "id": str(uuid.uuid4()),
+                "name": name,
+                "indexing_status": "waiting",
+                "created_at": int(time.time()),
+            }
+            with self.lock:
+                self.documents.setdefault(match.group(1), []).append(document)
+                count = sum(len(documents) for documents in self.documents.values())
+            print(f"Created {match.group(1)}/{name} ({len(body)} bytes, {count} documents, "
+                  f"max {self.max_in_flight} concurrent)", flush=True)
+            self._send_json({"document": document, "batch": uuid.uuid4().hex})
+        finally:
+            with self.lock:
+                StubDifyHandler.in_flight -= 1
+
+    def _authorize(self) -> bool:
+        """
+        APIキーを確認する
+
+        Returns:
+            認証に成功した場合True
+        """
+        if self.api_key and self.headers.get("Authorization") != f"Bearer {self.api_key}":
+            self._send_json({"code": "unauthorized", "message": "invalid api key"}, status=401)
+            return False
+        return True
+
+    @staticmethod
+    def _file_name(body: bytes) -> str:
+        """
+        multipart/form-dataの本文からファイル名を取得する
+
+        Args:
+            body: リクエスト本文
+
+        Returns:
+            ファイル名
+        """
+        match = re.search(rb'name="file"; filename="([^"]*)"', body)
+        return match.group(1).decode() if match else "unknown"
+
+    def _send_json(self, payload: Dict[str, Any], status: int = 200, headers: Dict[str, str] = None):
+        """
+        JSONを応答する
+
+        Args:
+            payload: 応答本文
+            status: HTTPステータス
+            headers: 追加の応答ヘッダー
+        """
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve(host: str, port: int, api_key: str, latency_ms: int, error_rate: float):
+    """
+    スタブのDifyナレッジAPIサーバーを起動する
+
+    Args:
+        host: 待ち受けアドレス
+        port: 待ち受けポート
+        api_key: 受け付けるAPIキー（空の場合は確認しない）
+        latency_ms: 応答の遅延（ミリ秒）
+        error_rate: 429・503を応答する割合（0〜1）
+    """
+    StubDifyHandler.api_key = api_key
+    StubDifyHandler.latency = latency_ms / 1000
+    StubDifyHandler.error_rate = error_rate
+    server = ThreadingHTTPServer((host, port), StubDifyHandler)
+    server.daemon_threads = True
+    print(f"Stub Dify dataset API listening on http://{host}:{port}/v1 "
+          f"(latency={latency_ms}ms, error rate={error_rate})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """
+    スタブのDifyナレッジAPIサーバーのコマンドライン引数を追加する
+
+    Args:
+        parser: 引数パーサー
+    """
+    parser.add_argument("--host", default="127.0.0.1", help="待ち受けアドレス")
+    parser.add_argument("--port", type=int, default=8001, help="待ち受けポート")
+    parser.add_argument("--api-key", default="", help="受け付けるAPIキー（空の場合は確認しない）")
+    parser.add_argument("--latency-ms", type=int, default=200, help="応答の遅延（ミリ秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="429・503を応答する割合（0〜1）")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="スタブのDifyナレッジAPI")
+    add_arguments(arg_parser)
+    args = arg_parser.parse_args()
+    serve(args.host, args.port, args.api_key, args.latency_ms, args.error_rate)
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+"""
+LLMゲートウェイのメトリクス
+
+このモジュールは、LiteLLM Proxyのカスタムコールバックとして、リクエスト数・キャッシュヒット数・
+失敗数・レイテンシ・最初のトークンまでの時間をプロバイダーごとに集計し、1分ごとに
+CloudWatchメトリクスに送信します。LiteLLM Proxyの設定ファイルと同じディレクトリに配置し、
+設定のcallbacksに「metrics_callback.proxy_handler_instance」を指定して読み込みます。
+
+レイテンシはパーセンタイルを算出できるよう、値と件数の配列（Values・Counts）で送信します。
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Tuple
+
+import boto3
+from litellm.integrations.custom_logger import CustomLogger
+
+
+logger = logging.getLogger(__name__)
+
+# メトリクスの名前空間と送信間隔（秒）
+METRIC_NAMESPACE = os.environ.get("LLM_GATEWAY_METRIC_NAMESPACE", "Dify/LLMGateway")
+FLUSH_INTERVAL = 60
+
+# PutMetricDataの1データポイントあたりの値の種類の上限
+MAX_VALUES_PER_DATUM = 150
+
+# 集計のキー（プロバイダー、メトリクス名）
+MetricKey = Tuple[str, str]
+
+
+def _round_latency(milliseconds: float) -> float:
+    """
+    レイテンシを有効数字2桁に丸める（値の種類を抑えて配列で送信するため）
+
+    Args:
+        milliseconds: レイテンシ（ミリ秒）
+
+    Returns:
+        丸めたレイテンシ（ミリ秒）
+    """
+    if milliseconds < 10:
+        return round(milliseconds, 1)
+    digits = len(str(int(milliseconds))) - 2
+    return float(round(milliseconds, -digits))
+
+
+class GatewayMetrics(CustomLogger):
+    """リクエストの結果を集計してCloudWatchメトリクスに送信するコールバック"""
+
+    def __init__(self):
+        """
+        コンストラクタ
+        """
+        super().__init__()
+        self._lock = threading.Lock()
+        self._counts: Dict[MetricKey, int] = defaultdict(int)
+        self._latencies: Dict[MetricKey, Counter] = defaultdict(Counter)
+        self._client = None
+        self._flusher = None
+
+    async def async_log_success_event(self, kwargs, response_obj, start_time, end_time):
+        """成功したリクエスト（キャッシュヒットを含む）を集計する"""
+        provider = self._provider(kwargs)
+        latency = (end_time - start_time).total_seconds() * 1000
+        cache_hit = bool(kwargs.get("cache_hit"))
+        self._record(provider, "Requests", 1)
+        self._record(provider, "CacheHits", 1 if cache_hit else 0)
+        self._record_latency(provider, "CacheHitLatency" if cache_hit else "Latency", latency)
+
+        first_token_time = kwargs.get("completion_start_time")
+        if kwargs.get("stream") and first_token_time and not cache_hit:
+            self._record_latency(provider, "TimeToFirstToken", (first_token_time - start_time).total_seconds() * 1000)
+
+    async def async_log_failure_event(self, kwargs, response_obj, start_time, end_time):
+        """失敗したリクエスト（プロバイダーの429等）を集計する"""
+        provider = self._provider(kwargs)
+        self._record(provider, "Requests", 1)
+        self._record(provider, "Failures", 1)
+
+    @staticmethod
+    def _provider(kwargs: Dict[str, Any]) -> str:
+        """
+        リクエストのプロバイダーを取得する
+
+        Args:
+            kwargs: LiteLLMのコールバック引数
+
+        Returns:
+            プロバイダー名（bedrock・openai等）
+        """
+        litellm_params = kwargs.get("litellm_params") or {}
+        return litellm_params.get("custom_llm_provider") or "unknown"
+
+    def _record(self, provider: str, metric_name: str, value: int):
+        """
+        件数を加算する
+
+        Args:
+            provider: プロバイダー名
+            metric_name: メトリクス名
+            value: 加算する件数
+        """
+        with self._lock:
+            self._counts[(provider, metric_name)] += value
+        self._start_flusher()
+
+    def _record_latency(self, provider: str, metric_name: str, milliseconds: float):
+        """
+        レイテンシを記録する
+
+        Args:
+            provider: プロバイダー名
+            metric_name: メトリクス名
+            milliseconds: レイテンシ（ミリ秒）
+        """
+        with self._lock:
+            self._latencies[(provider, metric_name)][_round_latency(milliseconds)] += 1
+
+    def _start_flusher(self):
+        """送信スレッドを開始する（最初のリクエストの時点で開始）"""
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, name="gateway-metrics", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        """一定間隔で集計したメトリクスを送信する"""
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception as error:  # 送信の失敗でゲートウェイを停止しない
+                logger.warning("Failed to put LLM gateway metrics: %s", error)
+
+    def flush(self):
+        """集計したメトリクスをCloudWatchに送信してリセットする"""
+        with self._lock:
+            counts, self._counts = self._counts, defaultdict(int)
+            latencies, self._latencies = self._latencies, defaultdict(Counter)
+        if not (counts or latencies):
+            return
+
+        metric_data: List[Dict[str, Any]] = []
+        for (provider, metric_name), value in counts.items():
+            for dimensions in self._dimensions(provider):
+                metric_data.append({
+                    "MetricName": metric_name,
+                    "Dimensions": dimensions,
+                    "Value": value,
+                    "Unit": "Count",
+                })
+        for (provider, metric_name), values in latencies.items():
+            items = sorted(values.items())
+            for index in range(0, len(items), MAX_VALUES_PER_DATUM):
+                chunk = items[index:index + MAX_VALUES_PER_DATUM]
+                for dimensions in self._dimensions(provider):
+                    metric_data.append({
+                        "MetricName": metric_name,
+                        "Dimensions": dimensions,
+                        "Values": [value for value, _ in chunk],
+                        "Counts": [count for _, count in chunk],
+                        "Unit": "Milliseconds",
+                    })
+
+        if self._client is None:
+            self._client = boto3.client("cloudwatch")
+        for index in range(0, len(metric_data), 500):
+            self._client.put_metric_data(Namespace=METRIC_NAMESPACE, MetricData=metric_data[index:index + 500])
+
+    @staticmethod
+    def _dimensions(provider: str) -> List[List[Dict[str, str]]]:
+        """
+        送信するディメンションの組み合わせ（プロバイダーごと・全体）
+
+        Args:
+            provider: プロバイダー名
+
+        Returns:
+            ディメンションのリスト
+        """
+        return [[{"Name": "Provider", "Value": provider}], []]
+
+
+# LiteLLM Proxyの設定（callbacks）から参照するインスタンス
+proxy_handler_instance = GatewayMetrics()
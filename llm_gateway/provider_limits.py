@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+"""
+LLMゲートウェイのプロバイダーごとの同時リクエスト数の制限
+
+このモジュールは、LiteLLM Proxyのカスタムコールバックとして、同じプロバイダーのすべてのモデルで
+共有する同時リクエスト数の上限を適用します（LiteLLMのmax_parallel_requestsはモデルごとの上限のため、
+モデル数に比例して上限が増えることを防ぎます）。上限に達した場合、リクエストは空きを待ちます。
+
+上限とモデルのプロバイダーは環境変数で指定します:
+    LLM_GATEWAY_PROVIDER_LIMITS: 「プロバイダー=上限」のカンマ区切り
+    LLM_GATEWAY_MODEL_PROVIDERS: 「モデル名=プロバイダー」のカンマ区切り
+
+ストリーミング応答はすべてのチャンクを返し終えるまで、上限の枠を保持します。
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from typing import Any, Dict, Optional
+
+from litellm.integrations.custom_logger import CustomLogger
+
+
+logger = logging.getLogger(__name__)
+
+# リクエストのメタデータに格納する、取得した枠の識別子のキー
+SLOT_METADATA_KEY = "provider_limit_slot"
+
+
+def _parse_pairs(value: str) -> Dict[str, str]:
+    """
+    「キー=値」のカンマ区切りを辞書に変換する
+
+    Args:
+        value: 環境変数の値
+
+    Returns:
+        キーと値の辞書
+    """
+    pairs = {}
+    for item in value.split(","):
+        key, _, item_value = item.partition("=")
+        if key.strip() and item_value.strip():
+            pairs[key.strip()] = item_value.strip()
+    return pairs
+
+
+class ProviderConcurrencyLimiter(CustomLogger):
+    """プロバイダーごとに同時リクエスト数を制限するコールバック"""
+
+    def __init__(self):
+        """
+        コンストラクタ
+        """
+        super().__init__()
+        self._limits = {
+            provider: int(limit)
+            for provider, limit in _parse_pairs(os.environ.get("LLM_GATEWAY_PROVIDER_LIMITS", "")).items()
+        }
+        self._providers = _parse_pairs(os.environ.get("LLM_GATEWAY_MODEL_PROVIDERS", ""))
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._slots: Dict[str, str] = {}
+
+    async def async_pre_call_hook(self, user_api_key_dict, cache, data: dict, call_type):
+        """リクエストの前にプロバイダーの枠を取得する（空きがない場合は待機）"""
+        provider = self._providers.get(data.get("model"))
+        if provider not in self._limits:
+            return data
+        semaphore = self._semaphores.setdefault(provider, asyncio.Semaphore(self._limits[provider]))
+        await semaphore.acquire()
+        slot = uuid.uuid4().hex
+        self._slots[slot] = provider
+        data.setdefault("metadata", {})[SLOT_METADATA_KEY] = slot
+        return data
+
+    async def async_post_call_success_hook(self, data: dict, user_api_key_dict, response):
+        """ストリーミング以外の応答を返した後に枠を解放する"""
+        if not data.get("stream"):
+            self._release(data.get("metadata"))
+        return response
+
+    async def async_post_call_failure_hook(self, request_data: dict, original_exception, user_api_key_dict, *args, **kwargs):
+        """リクエストが失敗した場合（再試行後）に枠を解放する"""
+        self._release(request_data.get("metadata"))
+
+    async def async_post_call_streaming_iterator_hook(self, user_api_key_dict, response, request_data: dict):
+        """ストリーミング応答のすべてのチャンクを返した後（切断を含む）に枠を解放する"""
+        try:
+            async for chunk in response:
+                yield chunk
+        finally:
+            self._release(request_data.get("metadata"))
+
+    async def async_log_success_event(self, kwargs, response_obj, start_time, end_time):
+        """応答の記録時に未解放の枠を解放する（フックが呼ばれない経路の保険）"""
+        litellm_params = kwargs.get("litellm_params") or {}
+        self._release(litellm_params.get("metadata"))
+
+    def _release(self, metadata: Optional[Dict[str, Any]]):
+        """
+        リクエストが取得した枠を解放する（同じ枠の2回目以降の解放は無視）
+
+        Args:
+            metadata: リクエストのメタデータ
+        """
+        slot = (metadata or {}).get(SLOT_METADATA_KEY)
+        provider = self._slots.pop(slot, None) if slot else None
+        if provider:
+            self._semaphores[provider].release()
+        elif slot:
+            logger.debug("Provider limit slot %s was already released", slot)
+
+
+# LiteLLM Proxyの設定（callbacks）から参照するインスタンス
+proxy_handler_instance = ProviderConcurrencyLimiter()
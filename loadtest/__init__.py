@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+
+"""
+Dify負荷試験パッケージ
+
+このパッケージは、Dify APIに対してチャット・ストリーミング補完・ワークフロー実行・
+ナレッジ（データセット）へのドキュメント登録の負荷をasyncioで生成し、
+レイテンシ（p50/p95/p99）とスループットを計測します。
+計測結果はJSONで保存し、ベースラインとの比較で性能の劣化を検出できます。
+
+使用例:
+    python -m loadtest run --plan loadtest/plan.example.json --name t3-xlarge
+    python -m loadtest compare loadtest/results/baseline.json loadtest/results/t3-xlarge.json
+    python -m loadtest mock-llm --port 8000
+"""
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+"""
+負荷試験のコマンドラインインターフェース
+
+サブコマンド:
+    run: 計画ファイルに従って負荷を生成し、結果をloadtest/results/<name>.jsonに保存する
+    compare: ベースラインと今回の結果を比較する（劣化があれば終了コード1）
+    mock-llm: OpenAI互換のモックLLMサーバーを起動する
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+from loadtest import mock_llm
+from loadtest.stats import PERCENTILES, compare_results, load_result, save_result
+
+
+# 結果ファイルの既定の保存先
+RESULTS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def run(args: argparse.Namespace) -> int:
+    """
+    負荷試験を実行して結果を保存する
+
+    Args:
+        args: コマンドライン引数
+
+    Returns:
+        終了コード
+    """
+    # aiohttpはrunのみで必要なため、ここで読み込む
+    from loadtest.runner import LoadPlan, LoadRunner
+
+    plan = LoadPlan.load(args.plan, {
+        "base_url": args.base_url,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "ramp_up": args.ramp_up,
+        "warmup": args.warmup,
+        "verify_tls": False if args.insecure else None,
+    })
+    print(f"Running {', '.join(s.name for s in plan.scenarios)} against {plan.base_url} "
+          f"with {plan.concurrency} users for {plan.duration:.0f}s", flush=True)
+
+    result = asyncio.run(LoadRunner(plan).run())
+    result["name"] = args.name
+    result["profile"] = args.profile or args.name
+    print_summary(result)
+
+    path = args.output or os.path.join(RESULTS_DIRECTORY, f"{args.name}.json")
+    save_result(result, path)
+    print(f"\nSaved results to {path}")
+    return 1 if result["total"]["requests"] == 0 else 0
+
+
+def compare(args: argparse.Namespace) -> int:
+    """
+    ベースラインと今回の結果を比較する
+
+    Args:
+        args: コマンドライン引数
+
+    Returns:
+        終了コード（劣化がある場合は1）
+    """
+    baseline = load_result(args.baseline)
+    current = load_result(args.current)
+    rows = compare_results(baseline, current, args.max_regression, args.max_error_rate_increase)
+
+    print(f"Baseline: {baseline.get('name')} ({baseline.get('started_at')})")
+    print(f"Current:  {current.get('name')} ({current.get('started_at')})\n")
+    print(f"{'scenario':<22} {'metric':<14} {'baseline':>10} {'current':>10} {'change':>9}")
+    for row in rows:
+        change = "-" if row["change"] is None else f"{row['change']:+.1f}%"
+        mark = "  << REGRESSION" if row["regressed"] else ""
+        print(f"{row['scenario']:<22} {row['metric']:<14} {row['baseline']:>10} {row['current']:>10} {change:>9}{mark}")
+
+    regressions = [row for row in rows if row["regressed"]]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) exceed the threshold ({args.max_regression}%)")
+        return 1
+    print("\nNo regressions")
+    return 0
+
+
+def print_summary(result: dict):
+    """
+    計測結果の概要を表示する
+
+    Args:
+        result: 計測結果
+    """
+    columns = "".join(f"{f'p{p}':>9}" for p in PERCENTILES)
+    print(f"\n{'scenario':<22} {'requests':>9} {'errors':>7} {'req/s':>8}{columns}{'ttfb p95':>10}")
+    for name, summary in list(result["scenarios"].items()) + [("TOTAL", result["total"])]:
+        latency = "".join(f"{summary['latency_ms'][f'p{p}']:>9.0f}" for p in PERCENTILES)
+        ttfb = f"{summary['ttfb_ms']['p95']:>10.0f}" if "ttfb_ms" in summary else f"{'-':>10}"
+        print(f"{name:<22} {summary['requests']:>9} {summary['errors']:>7} {summary['throughput']:>8.2f}{latency}{ttfb}")
+
+
+def main() -> int:
+    """
+    エントリーポイント
+
+    Returns:
+        終了コード
+    """
+    parser = argparse.ArgumentParser(prog="python -m loadtest", description="Dify負荷試験")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    run_parser = subparsers.add_parser("run", help="負荷試験を実行する")
+    run_parser.add_argument("--plan", required=True, help="計画ファイル（JSON）")
+    run_parser.add_argument("--name", required=True, help="結果の名前（results/<name>.jsonに保存）")
+    run_parser.add_argument("--profile", help="サイジングプロファイル等のラベル（既定は--name）")
+    run_parser.add_argument("--output", help="結果ファイルのパス")
+    run_parser.add_argument("--base-url", help="DifyのベースURL（計画ファイルの値を上書き）")
+    run_parser.add_argument("--concurrency", type=int, help="仮想ユーザー数")
+    run_parser.add_argument("--duration", type=float, help="実行時間（秒）")
+    run_parser.add_argument("--ramp-up", type=float, help="全仮想ユーザーの起動にかける時間（秒）")
+    run_parser.add_argument("--warmup", type=float, help="集計から除外する開始直後の時間（秒）")
+    run_parser.add_argument("--insecure", action="store_true", help="TLS証明書を検証しない")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser("compare", help="ベースラインと比較する")
+    compare_parser.add_argument("baseline", help="ベースラインの結果ファイル")
+    compare_parser.add_argument("current", help="今回の結果ファイル")
+    compare_parser.add_argument("--max-regression", type=float, default=10.0,
+                                help="許容するp95/p99の増加・スループットの低下（％）")
+    compare_parser.add_argument("--max-error-rate-increase", type=float, default=0.01,
+                                help="許容するエラー率の増加（0〜1）")
+    compare_parser.set_defaults(func=compare)
+
+    mock_parser = subparsers.add_parser("mock-llm", help="OpenAI互換のモックLLMサーバーを起動する")
+    mock_llm.add_arguments(mock_parser)
+    mock_parser.set_defaults(func=lambda args: mock_llm.serve(
+        args.host, args.port, args.ttft_ms, args.tokens_per_second, args.output_tokens, args.embedding_dimensions
+    ) or 0)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+
+"""
+モックLLMプロバイダー
+
+このモジュールは、OpenAI互換API（/v1/chat/completions・/v1/completions・/v1/embeddings・/v1/models）を
+模したHTTPサーバーを提供します。最初のトークンまでの待ち時間と生成速度を指定でき、
+LLMの費用や外部APIのレート制限なしにDify自体の処理能力を計測するために使用します。
+Difyには「OpenAI-API-compatible」プロバイダーとして登録してください（APIキーは任意の値）。
+
+標準ライブラリのみを使用するため、単体のスクリプトとしても実行できます。
+    python mock_llm.py --port 8000 --ttft-ms 300 --tokens-per-second 50
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+
+# 応答に使用する単語（トークン相当）
+WORDS = (
+    "Dify", "is", "an", "open", "source", "platform", "for", "building", "LLM", "applications",
+    "with", "workflows", "RAG", "pipelines", "agents", "and", "observability", "on", "AWS",
+)
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """OpenAI互換APIのリクエストハンドラー"""
+
+    # ストリーミング応答はConnection: closeで終端する
+    protocol_version = "HTTP/1.0"
+
+    # サーバー起動時に設定する応答特性
+    ttft = 0.3
+    tokens_per_second = 50.0
+    output_tokens = 100
+    embedding_dimensions = 1536
+
+    def log_message(self, format, *args):
+        """アクセスログを出力しない（負荷試験時の出力を抑える）"""
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/v1/models":
+            self._send_json({"object": "list", "data": [{"id": "mock-llm", "object": "model", "owned_by": "loadtest"}]})
+        elif self.path == "/health":
+            self._send_json({"status": "ok"})
+        else:
+            self._send_json({"error": {"message": "not found"}}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        path = self.path.rstrip("/")
+        if path == "/v1/chat/completions":
+            self._complete(body, chat=True)
+        elif path == "/v1/completions":
+            self._complete(body, chat=False)
+        elif path == "/v1/embeddings":
+            self._embeddings(body)
+        else:
+            self._send_json({"error": {"message": "not found"}}, status=404)
+
+    def _complete(self, body: Dict[str, Any], chat: bool):
+        """
+        テキスト生成（stream=trueの場合はSSEで1トークンずつ送信）
+
+        Args:
+            body: リクエスト本文
+            chat: Chat Completions APIか
+        """
+        tokens = min(self.output_tokens, int(body.get("max_tokens") or self.output_tokens))
+        prompt_tokens = _count_tokens(json.dumps(body.get("messages") or body.get("prompt") or ""))
+        completion_id = f"mock-{uuid.uuid4().hex}"
+        interval = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": tokens,
+                 "total_tokens": prompt_tokens + tokens}
+        time.sleep(self.ttft)
+
+        if not body.get("stream"):
+            time.sleep(interval * max(tokens - 1, 0))
+            text = " ".join(WORDS[i % len(WORDS)] for i in range(tokens))
+            choice = {"index": 0, "finish_reason": "length" if tokens == body.get("max_tokens") else "stop"}
+            if chat:
+                choice["message"] = {"role": "assistant", "content": text}
+            else:
+                choice["text"] = text
+            self._send_json({
+                "id": completion_id, "object": "chat.completion" if chat else "text_completion",
+                "created": int(time.time()), "model": body.get("model", "mock-llm"),
+                "choices": [choice], "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        for i in range(tokens):
+            if i:
+                time.sleep(interval)
+            word = ("" if i == 0 else " ") + WORDS[i % len(WORDS)]
+            delta = {"index": 0, "finish_reason": None}
+            if chat:
+                delta["delta"] = {"role": "assistant", "content": word} if i == 0 else {"content": word}
+            else:
+                delta["text"] = word
+            self._send_event({
+                "id": completion_id, "object": "chat.completion.chunk" if chat else "text_completion",
+                "created": int(time.time()), "model": body.get("model", "mock-llm"), "choices": [delta],
+            })
+        final = {"index": 0, "finish_reason": "stop"}
+        if chat:
+            final["delta"] = {}
+        else:
+            final["text"] = ""
+        self._send_event({
+            "id": completion_id, "object": "chat.completion.chunk" if chat else "text_completion",
+            "created": int(time.time()), "model": body.get("model", "mock-llm"),
+            "choices": [final], "usage": usage,
+        })
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _embeddings(self, body: Dict[str, Any]):
+        """
+        埋め込み（入力テキストから決定的に生成した正規化ベクトル）
+
+        Args:
+            body: リクエスト本文
+        """
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        time.sleep(self.ttft / 10)
+        data = [
+            {"object": "embedding", "index": i, "embedding": _embedding(str(text), self.embedding_dimensions)}
+            for i, text in enumerate(inputs)
+        ]
+        tokens = sum(_count_tokens(str(text)) for text in inputs)
+        self._send_json({
+            "object": "list", "data": data, "model": body.get("model", "mock-embedding"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    def _send_json(self, payload: Dict[str, Any], status: int = 200):
+        """
+        JSONを応答する
+
+        Args:
+            payload: 応答本文
+            status: HTTPステータス
+        """
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_event(self, payload: Dict[str, Any]):
+        """
+        SSEのイベントを1件送信する
+
+        Args:
+            payload: イベントのデータ
+        """
+        self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+        self.wfile.flush()
+
+
+def _count_tokens(text: str) -> int:
+    """
+    トークン数の概算（4文字で1トークン）
+
+    Args:
+        text: テキスト
+
+    Returns:
+        トークン数
+    """
+    return max(1, len(text) // 4)
+
+
+def _embedding(text: str, dimensions: int) -> List[float]:
+    """
+    テキストのハッシュから決定的な正規化ベクトルを生成する
+
+    Args:
+        text: テキスト
+        dimensions: 次元数
+
+    Returns:
+        埋め込みベクトル
+    """
+    seed = hashlib.sha256(text.encode()).digest()
+    values = [((seed[i % len(seed)] + i * 31) % 256) / 255 - 0.5 for i in range(dimensions)]
+    norm = math.sqrt(sum(value * value for value in values)) or 1.0
+    return [value / norm for value in values]
+
+
+def serve(host: str, port: int, ttft_ms: int, tokens_per_second: float, output_tokens: int, embedding_dimensions: int):
+    """
+    モックLLMサーバーを起動する
+
+    Args:
+        host: 待ち受けアドレス
+        port: 待ち受けポート
+        ttft_ms: 最初のトークンまでの待ち時間（ミリ秒）
+        tokens_per_second: 生成速度（トークン/秒）
+        output_tokens: 生成するトークン数（max_tokensが小さい場合はそちらを優先）
+        embedding_dimensions: 埋め込みベクトルの次元数
+    """
+    MockLLMHandler.ttft = ttft_ms / 1000
+    MockLLMHandler.tokens_per_second = tokens_per_second
+    MockLLMHandler.output_tokens = output_tokens
+    MockLLMHandler.embedding_dimensions = embedding_dimensions
+    server = ThreadingHTTPServer((host, port), MockLLMHandler)
+    server.daemon_threads = True
+    print(f"Mock LLM listening on http://{host}:{port}/v1 "
+          f"(ttft={ttft_ms}ms, {tokens_per_second} tokens/s, {output_tokens} tokens)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """
+    モックLLMサーバーのコマンドライン引数を追加する
+
+    Args:
+        parser: 引数パーサー
+    """
+    parser.add_argument("--host", default="0.0.0.0", help="待ち受けアドレス")
+    parser.add_argument("--port", type=int, default=8000, help="待ち受けポート")
+    parser.add_argument("--ttft-ms", type=int, default=300, help="最初のトークンまでの待ち時間（ミリ秒）")
+    parser.add_argument("--tokens-per-second", type=float, default=50, help="生成速度（トークン/秒）")
+    parser.add_argument("--output-tokens", type=int, default=100, help="生成するトークン数")
+    parser.add_argument("--embedding-dimensions", type=int, default=1536, help="埋め込みベクトルの次元数")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="OpenAI互換のモックLLMサーバー")
+    add_arguments(arg_parser)
+    args = arg_parser.parse_args()
+    serve(args.host, args.port, args.ttft_ms, args.tokens_per_second, args.output_tokens, args.embedding_dimensions)
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+"""
+負荷生成モジュール
+
+このモジュールは、計画ファイル（JSON）に従って仮想ユーザーをasyncioのタスクとして起動し、
+重み付きでシナリオを選択しながら一定時間リクエストを送り続けます。
+ウォームアップ期間の計測値は集計から除外します。
+"""
+
+import asyncio
+import json
+import os
+import random
+import ssl
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+from loadtest.scenarios import Scenario, create_scenario
+from loadtest.stats import RequestResult, ScenarioStats
+
+
+class LoadPlan:
+    """負荷試験の計画"""
+
+    def __init__(self, plan: Dict[str, Any]):
+        """
+        コンストラクタ
+
+        Args:
+            plan: 計画ファイルの内容（文字列中の${VAR}は環境変数で置換済み）
+        """
+        self.base_url = plan["base_url"]
+        self.concurrency = int(plan.get("concurrency", 10))
+        self.duration = float(plan.get("duration", 300))
+        self.ramp_up = float(plan.get("ramp_up", 30))
+        self.warmup = float(plan.get("warmup", 30))
+        self.think_time = float(plan.get("think_time", 1.0))
+        self.timeout = float(plan.get("timeout", 120))
+        self.verify_tls = bool(plan.get("verify_tls", True))
+        self.scenarios: List[Scenario] = [
+            create_scenario(name, self.base_url, settings)
+            for name, settings in plan["scenarios"].items()
+            if float(settings.get("weight", 1)) > 0
+        ]
+        if not self.scenarios:
+            raise ValueError("実行するシナリオがありません（scenariosに1つ以上指定してください）")
+        if self.warmup >= self.duration:
+            raise ValueError("warmupはdurationより短くしてください")
+
+    @classmethod
+    def load(cls, path: str, overrides: Optional[Dict[str, Any]] = None) -> "LoadPlan":
+        """
+        計画ファイルを読み込む
+
+        Args:
+            path: 計画ファイルのパス
+            overrides: コマンドライン引数による上書き
+
+        Returns:
+            負荷試験の計画
+        """
+        with open(path, encoding="utf-8") as fp:
+            plan = json.loads(os.path.expandvars(fp.read()))
+        plan.update({key: value for key, value in (overrides or {}).items() if value is not None})
+        return cls(plan)
+
+    def describe(self) -> Dict[str, Any]:
+        """結果ファイルに記録する計画の概要（APIキーを除く）"""
+        return {
+            "base_url": self.base_url,
+            "concurrency": self.concurrency,
+            "duration": self.duration,
+            "ramp_up": self.ramp_up,
+            "warmup": self.warmup,
+            "think_time": self.think_time,
+            "weights": {scenario.name: scenario.weight for scenario in self.scenarios},
+        }
+
+
+class LoadRunner:
+    """仮想ユーザーを起動して計測するクラス"""
+
+    def __init__(self, plan: LoadPlan, progress_interval: float = 10):
+        """
+        コンストラクタ
+
+        Args:
+            plan: 負荷試験の計画
+            progress_interval: 進捗を表示する間隔（秒）
+        """
+        self.plan = plan
+        self.progress_interval = progress_interval
+        self.results: List[RequestResult] = []
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        負荷試験を実行する
+
+        Returns:
+            計測結果（結果ファイルの内容）
+        """
+        plan = self.plan
+        ssl_context = None if plan.verify_tls else _insecure_ssl_context()
+        connector = aiohttp.TCPConnector(limit=plan.concurrency, ssl=ssl_context, keepalive_timeout=60)
+        timeout = aiohttp.ClientTimeout(total=plan.timeout)
+
+        started_at = datetime.now(timezone.utc)
+        self.start = time.time()
+        self.deadline = self.start + plan.duration
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            users = [
+                asyncio.ensure_future(self._user(session, index))
+                for index in range(plan.concurrency)
+            ]
+            reporter = asyncio.ensure_future(self._report_progress())
+            await asyncio.gather(*users)
+            reporter.cancel()
+
+        return self._summarize(started_at)
+
+    async def _user(self, session: aiohttp.ClientSession, index: int):
+        """
+        仮想ユーザー（ランプアップ後、期限まで重み付きでシナリオを実行）
+
+        Args:
+            session: HTTPセッション
+            index: 仮想ユーザーの番号
+        """
+        plan = self.plan
+        await asyncio.sleep(plan.ramp_up * index / plan.concurrency)
+        weights = [scenario.weight for scenario in plan.scenarios]
+        while time.time() < self.deadline:
+            scenario = random.choices(plan.scenarios, weights=weights)[0]
+            self.results.append(await scenario.execute(session, index))
+            if plan.think_time > 0:
+                await asyncio.sleep(random.uniform(0, 2 * plan.think_time))
+
+    async def _report_progress(self):
+        """進捗（経過時間・リクエスト数・エラー数）を定期的に表示する"""
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            errors = sum(1 for result in self.results if not result.ok)
+            print(f"[{time.time() - self.start:6.0f}s] requests={len(self.results)} errors={errors}", flush=True)
+
+    def _summarize(self, started_at: datetime) -> Dict[str, Any]:
+        """
+        ウォームアップ後の計測値を集計する
+
+        Args:
+            started_at: 開始日時
+
+        Returns:
+            計測結果
+        """
+        measured_from = self.start + self.plan.warmup
+        measured = [result for result in self.results if result.started_at >= measured_from]
+        duration = max(time.time(), self.deadline) - measured_from
+
+        total = ScenarioStats()
+        by_scenario: Dict[str, ScenarioStats] = {}
+        for result in measured:
+            by_scenario.setdefault(result.scenario, ScenarioStats()).add(result)
+            total.add(result)
+
+        return {
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "measured_seconds": round(duration, 1),
+            "plan": self.plan.describe(),
+            "total": total.summary(duration),
+            "scenarios": {
+                name: stats.summary(duration) for name, stats in sorted(by_scenario.items())
+            },
+        }
+
+
+def _insecure_ssl_context() -> ssl.SSLContext:
+    """
+    証明書を検証しないSSLコンテキスト（内部ALBをDNS名で呼び出す場合など）
+
+    Returns:
+        SSLコンテキスト
+    """
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+
+"""
+負荷試験シナリオモジュール
+
+このモジュールは、Dify APIのリクエストパターン（シナリオ）を定義します。
+各シナリオはアプリ（またはナレッジ）のAPIキーで認証し、1回の呼び出しを計測値として返します。
+
+- chat: チャットアプリへのメッセージ送信（blocking）
+- streaming_completion: テキスト生成アプリのストリーミング応答（最初のイベントまでの時間も計測）
+- workflow: ワークフローの実行（blocking）
+- dataset_upload: ナレッジへのテキストドキュメントの登録
+"""
+
+import asyncio
+import json
+import random
+import string
+import time
+import uuid
+from typing import Any, Dict
+
+import aiohttp
+
+from loadtest.stats import RequestResult
+
+
+class Scenario:
+    """シナリオの基底クラス"""
+
+    # シナリオ名（計画ファイルのキー）
+    name = ""
+
+    def __init__(self, base_url: str, settings: Dict[str, Any]):
+        """
+        コンストラクタ
+
+        Args:
+            base_url: DifyのベースURL（例: https://dify.example.internal）
+            settings: 計画ファイルのシナリオ設定（api_key, weight, シナリオ固有の値）
+        """
+        self.base_url = base_url.rstrip("/")
+        self.settings = settings
+        self.weight = float(settings.get("weight", 1))
+        self.user_prefix = settings.get("user_prefix", "loadtest")
+        if not settings.get("api_key"):
+            raise ValueError(f"シナリオ {self.name} のapi_keyを指定してください")
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """認証ヘッダー"""
+        return {"Authorization": f"Bearer {self.settings['api_key']}"}
+
+    def user(self, user_index: int) -> str:
+        """
+        Difyのエンドユーザー識別子（仮想ユーザーごと）
+
+        Args:
+            user_index: 仮想ユーザーの番号
+
+        Returns:
+            エンドユーザー識別子
+        """
+        return f"{self.user_prefix}-{user_index}"
+
+    async def execute(self, session: aiohttp.ClientSession, user_index: int) -> RequestResult:
+        """
+        シナリオを1回実行して計測する
+
+        Args:
+            session: HTTPセッション
+            user_index: 仮想ユーザーの番号
+
+        Returns:
+            計測値
+        """
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            status, ttfb, error = await self.request(session, user_index, start)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status, ttfb, error = 0, None, type(e).__name__
+        except ValueError:
+            status, ttfb, error = 0, None, "invalid response"
+        latency = time.perf_counter() - start
+        return RequestResult(
+            scenario=self.name,
+            started_at=started_at,
+            latency=latency,
+            ok=not error and 200 <= status < 300,
+            status=status,
+            ttfb=ttfb,
+            error=error
+        )
+
+    async def request(self, session: aiohttp.ClientSession, user_index: int, start: float):
+        """
+        APIを呼び出す（サブクラスで実装）
+
+        Args:
+            session: HTTPセッション
+            user_index: 仮想ユーザーの番号
+            start: 計測開始時刻（time.perf_counter）
+
+        Returns:
+            (HTTPステータス, 最初の応答までの秒数またはNone, エラー内容)
+        """
+        raise NotImplementedError
+
+    async def post_json(self, session: aiohttp.ClientSession, path: str, body: Dict[str, Any]):
+        """
+        JSONをPOSTし、応答本文を読み切る
+
+        Args:
+            session: HTTPセッション
+            path: APIのパス
+            body: リクエスト本文
+
+        Returns:
+            (HTTPステータス, None, エラー内容)
+        """
+        async with session.post(f"{self.base_url}{path}", json=body, headers=self.headers) as response:
+            text = await response.text()
+            if response.status >= 400:
+                return response.status, None, _api_error(response.status, text)
+            return response.status, None, ""
+
+
+class ChatScenario(Scenario):
+    """チャットアプリへのメッセージ送信（blocking）"""
+
+    name = "chat"
+
+    async def request(self, session, user_index, start):
+        return await self.post_json(session, "/v1/chat-messages", {
+            "inputs": self.settings.get("inputs", {}),
+            "query": self.settings.get("query", "Difyについて3文で説明してください。"),
+            "response_mode": "blocking",
+            "conversation_id": "",
+            "user": self.user(user_index),
+        })
+
+
+class StreamingCompletionScenario(Scenario):
+    """テキスト生成アプリのストリーミング応答（SSE）"""
+
+    name = "streaming_completion"
+
+    async def request(self, session, user_index, start):
+        body = {
+            "inputs": self.settings.get("inputs", {"query": "Difyについて3文で説明してください。"}),
+            "response_mode": "streaming",
+            "user": self.user(user_index),
+        }
+        ttfb = None
+        async with session.post(
+            f"{self.base_url}/v1/completion-messages", json=body, headers=self.headers
+        ) as response:
+            if response.status >= 400:
+                return response.status, None, _api_error(response.status, await response.text())
+            async for line in response.content:
+                if not line.startswith(b"data:"):
+                    continue
+                event = json.loads(line[5:])
+                if ttfb is None and event.get("event") == "message":
+                    ttfb = time.perf_counter() - start
+                if event.get("event") == "error":
+                    return response.status, ttfb, f"stream error: {event.get('code', '')}"
+                if event.get("event") == "message_end":
+                    break
+        return response.status, ttfb, ""
+
+
+class WorkflowScenario(Scenario):
+    """ワークフローの実行（blocking）"""
+
+    name = "workflow"
+
+    async def request(self, session, user_index, start):
+        async with session.post(f"{self.base_url}/v1/workflows/run", json={
+            "inputs": self.settings.get("inputs", {}),
+            "response_mode": "blocking",
+            "user": self.user(user_index),
+        }, headers=self.headers) as response:
+            text = await response.text()
+            if response.status >= 400:
+                return response.status, None, _api_error(response.status, text)
+            status = json.loads(text).get("data", {}).get("status")
+            return response.status, None, "" if status == "succeeded" else f"workflow {status}"
+
+
+class DatasetUploadScenario(Scenario):
+    """ナレッジへのテキストドキュメントの登録（インデックス作成はCeleryワーカーで非同期に実行）"""
+
+    name = "dataset_upload"
+
+    def __init__(self, base_url: str, settings: Dict[str, Any]):
+        super().__init__(base_url, settings)
+        if not settings.get("dataset_id"):
+            raise ValueError("シナリオ dataset_upload のdataset_idを指定してください")
+        self.text_bytes = int(settings.get("text_bytes", 4000))
+
+    async def request(self, session, user_index, start):
+        words = (
+            "".join(random.choices(string.ascii_lowercase, k=random.randint(3, 10)))
+            for _ in range(self.text_bytes // 6)
+        )
+        return await self.post_json(
+            session, f"/v1/datasets/{self.settings['dataset_id']}/document/create-by-text", {
+                "name": f"{self.user(user_index)}-{uuid.uuid4().hex[:12]}.txt",
+                "text": " ".join(words),
+                "indexing_technique": self.settings.get("indexing_technique", "high_quality"),
+                "process_rule": {"mode": "automatic"},
+            }
+        )
+
+
+# シナリオ名とクラスの対応
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (ChatScenario, StreamingCompletionScenario, WorkflowScenario, DatasetUploadScenario)
+}
+
+
+def create_scenario(name: str, base_url: str, settings: Dict[str, Any]) -> Scenario:
+    """
+    計画ファイルの設定からシナリオを作成する
+
+    Args:
+        name: シナリオ名
+        base_url: DifyのベースURL
+        settings: シナリオ設定
+
+    Returns:
+        シナリオ
+    """
+    if name not in SCENARIOS:
+        raise ValueError(f"不明なシナリオです: {name}（{' / '.join(SCENARIOS)} のいずれかを指定してください）")
+    return SCENARIOS[name](base_url, settings)
+
+
+def _api_error(status: int, text: str) -> str:
+    """
+    Dify APIのエラー応答を要約する
+
+    Args:
+        status: HTTPステータス
+        text: 応答本文
+
+    Returns:
+        エラー内容（HTTPステータスとエラーコード）
+    """
+    try:
+        code = json.loads(text).get("code", "")
+    except ValueError:
+        code = ""
+    return f"HTTP {status} {code}".strip()
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+"""
+計測結果の集計モジュール
+
+このモジュールは、リクエストごとの計測値からシナリオ別のレイテンシ分布とスループットを集計し、
+結果ファイル（JSON）の保存・読み込みとベースラインとの比較を行います。
+"""
+
+import json
+import math
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+# 集計するパーセンタイル
+PERCENTILES = (50, 95, 99)
+
+
+@dataclass
+class RequestResult:
+    """1リクエストの計測値"""
+
+    scenario: str
+    started_at: float
+    latency: float
+    ok: bool
+    status: int = 0
+    ttfb: Optional[float] = None
+    error: str = ""
+
+
+@dataclass
+class ScenarioStats:
+    """シナリオごとの計測値の蓄積"""
+
+    latencies: List[float] = field(default_factory=list)
+    ttfbs: List[float] = field(default_factory=list)
+    errors: Dict[str, int] = field(default_factory=dict)
+
+    def add(self, result: RequestResult):
+        """
+        計測値を追加する
+
+        Args:
+            result: リクエストの計測値
+        """
+        if result.ok:
+            self.latencies.append(result.latency)
+            if result.ttfb is not None:
+                self.ttfbs.append(result.ttfb)
+        else:
+            key = result.error or f"HTTP {result.status}"
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def summary(self, duration: float) -> Dict[str, Any]:
+        """
+        集計結果を取得する
+
+        Args:
+            duration: 計測期間（秒）
+
+        Returns:
+            リクエスト数・エラー率・スループット・レイテンシ分布（ミリ秒）
+        """
+        succeeded = len(self.latencies)
+        failed = sum(self.errors.values())
+        total = succeeded + failed
+        summary = {
+            "requests": total,
+            "errors": failed,
+            "error_rate": round(failed / total, 4) if total else 0.0,
+            "throughput": round(succeeded / duration, 3) if duration > 0 else 0.0,
+            "latency_ms": distribution(self.latencies),
+        }
+        if self.ttfbs:
+            summary["ttfb_ms"] = distribution(self.ttfbs)
+        if self.errors:
+            summary["error_breakdown"] = dict(sorted(self.errors.items(), key=lambda item: -item[1]))
+        return summary
+
+
+def percentile(values: List[float], p: float) -> float:
+    """
+    パーセンタイルを求める（nearest-rank法）
+
+    Args:
+        values: 昇順に並べた値
+        p: パーセンタイル（0〜100）
+
+    Returns:
+        パーセンタイル値
+    """
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(values)))
+    return values[rank - 1]
+
+
+def distribution(seconds: List[float]) -> Dict[str, float]:
+    """
+    レイテンシの分布をミリ秒で求める
+
+    Args:
+        seconds: 計測値（秒）
+
+    Returns:
+        平均・最大・パーセンタイル（ミリ秒）
+    """
+    values = sorted(seconds)
+    result = {
+        "mean": round(sum(values) / len(values) * 1000, 1) if values else 0.0,
+        "max": round(values[-1] * 1000, 1) if values else 0.0,
+    }
+    for p in PERCENTILES:
+        result[f"p{p}"] = round(percentile(values, p) * 1000, 1)
+    return result
+
+
+def save_result(result: Dict[str, Any], path: str):
+    """
+    計測結果をJSONファイルに保存する
+
+    Args:
+        result: 計測結果
+        path: 保存先のパス
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as fp:
+        json.dump(result, fp, ensure_ascii=False, indent=2)
+        fp.write("\n")
+
+
+def load_result(path: str) -> Dict[str, Any]:
+    """
+    計測結果をJSONファイルから読み込む
+
+    Args:
+        path: 結果ファイルのパス
+
+    Returns:
+        計測結果
+    """
+    with open(path, encoding="utf-8") as fp:
+        return json.load(fp)
+
+
+def compare_results(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    max_regression: float,
+    max_error_rate_increase: float
+) -> List[Dict[str, Any]]:
+    """
+    ベースラインと今回の計測結果を比較する
+
+    レイテンシ（p95・p99）が`max_regression`％を超えて増加した場合、スループットが同じ割合を超えて
+    低下した場合、またはエラー率が`max_error_rate_increase`ポイントを超えて増加した場合を劣化とします。
+
+    Args:
+        baseline: ベースラインの計測結果
+        current: 今回の計測結果
+        max_regression: 許容するレイテンシ増加・スループット低下の割合（％）
+        max_error_rate_increase: 許容するエラー率の増加（ポイント、0〜1）
+
+    Returns:
+        指標ごとの比較結果（scenario, metric, baseline, current, change, regressed）
+    """
+    rows = []
+    for scenario, now in current["scenarios"].items():
+        before = baseline["scenarios"].get(scenario)
+        if before is None:
+            continue
+
+        metrics = []
+        for p in PERCENTILES:
+            metrics.append((f"latency p{p}", before["latency_ms"][f"p{p}"], now["latency_ms"][f"p{p}"], p >= 95))
+        if "ttfb_ms" in before and "ttfb_ms" in now:
+            metrics.append(("ttfb p95", before["ttfb_ms"]["p95"], now["ttfb_ms"]["p95"], True))
+
+        for name, old, new, checked in metrics:
+            change = _change(old, new)
+            rows.append({
+                "scenario": scenario, "metric": name, "baseline": old, "current": new, "change": change,
+                "regressed": checked and change is not None and change > max_regression,
+            })
+
+        change = _change(before["throughput"], now["throughput"])
+        rows.append({
+            "scenario": scenario, "metric": "throughput", "baseline": before["throughput"],
+            "current": now["throughput"], "change": change,
+            "regressed": change is not None and change < -max_regression,
+        })
+        rows.append({
+            "scenario": scenario, "metric": "error rate", "baseline": before["error_rate"],
+            "current": now["error_rate"], "change": None,
+            "regressed": now["error_rate"] - before["error_rate"] > max_error_rate_increase,
+        })
+    return rows
+
+
+def _change(old: float, new: float) -> Optional[float]:
+    """
+    変化率（％）を求める
+
+    Args:
+        old: 比較元の値
+        new: 比較先の値
+
+    Returns:
+        変化率（比較元が0の場合はNone）
+    """
+    if not old:
+        return None
+    return round((new - old) / old * 100, 1)
@@ -14,7 +14,7 @@ setup(
     package_dir={"": "dify_cdk"},
     packages=find_packages(where="dify_cdk"),
     install_requires=[
-        "aws-cdk-lib>=2.0.0",
+        "aws-cdk-lib>=2.160.0",
         "constructs>=10.0.0",
         "aws-cdk.aws-ec2-alpha>=2.0.0a0",
     ],